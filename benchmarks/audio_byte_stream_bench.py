@@ -0,0 +1,105 @@
+"""
+AudioByteStream throughput before and after slicing the frames from the pushed data.
+
+48 kHz mono audio is split into 10 ms frames, pushed as 10 s chunks (like a TTS plugin
+receiving a whole synthesis at once) and as 20 ms chunks (a streamed synthesis). It's split
+by the previous implementation (which copied the rest of its buffer for each frame), the
+current one, and the current one with a frame pool. The frames of a push are released at the
+next push, so the pool buffers are only reused when a push returns fewer frames than the pool
+holds.
+
+    python -m benchmarks.audio_byte_stream_bench --rounds 20 --seconds 10
+"""
+
+import argparse
+import ctypes
+import statistics
+import time
+
+import numpy as np
+
+from livekit import rtc
+from livekit.agents.utils.audio import AudioByteStream
+
+_SAMPLE_RATE = 48000
+_FRAME_MS = 10
+
+
+class _PreviousAudioByteStream:
+    # AudioByteStream.push as it was before
+    def __init__(self, sample_rate: int, num_channels: int, samples_per_channel: int) -> None:
+        self._sample_rate = sample_rate
+        self._num_channels = num_channels
+        self._bytes_per_sample = num_channels * ctypes.sizeof(ctypes.c_int16)
+        self._bytes_per_frame = samples_per_channel * self._bytes_per_sample
+        self._buf = bytearray()
+
+    def push(self, data: bytes) -> list[rtc.AudioFrame]:
+        self._buf.extend(data)
+
+        frames = []
+        while len(self._buf) >= self._bytes_per_frame:
+            frame_data = self._buf[: self._bytes_per_frame]
+            self._buf = self._buf[self._bytes_per_frame :]
+
+            frames.append(
+                rtc.AudioFrame(
+                    data=frame_data,
+                    sample_rate=self._sample_rate,
+                    num_channels=self._num_channels,
+                    samples_per_channel=len(frame_data) // self._bytes_per_sample,
+                )
+            )
+
+        return frames
+
+
+def _run(
+    stream: AudioByteStream | _PreviousAudioByteStream, chunks: list[bytes], rounds: int
+) -> float:
+    """returns the seconds of audio framed per second, in the median round"""
+    durations = []
+    for _ in range(rounds):
+        frames = 0
+        start = time.perf_counter()
+        for chunk in chunks:
+            frames += len(stream.push(chunk))
+        durations.append(time.perf_counter() - start)
+    return frames * _FRAME_MS / 1000 / statistics.median(durations)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=10.0, help="seconds of audio per round")
+    args = parser.parse_args()
+
+    samples_per_frame = _SAMPLE_RATE * _FRAME_MS // 1000
+    rng = np.random.default_rng(0)
+    audio = (rng.standard_normal(int(_SAMPLE_RATE * args.seconds)) * 3000).astype(np.int16)
+    data = audio.tobytes()
+    small_chunk = 2 * samples_per_frame * audio.itemsize  # 20 ms
+    chunkings = {
+        f"{args.seconds:g} s chunks": [data],
+        "20 ms chunks": [data[i : i + small_chunk] for i in range(0, len(data), small_chunk)],
+    }
+
+    print(f"{_FRAME_MS} ms frames, seconds of audio framed per second:")
+    print(" " * 12 + "".join(f"{name:>16}" for name in chunkings))
+    for name in ("previous", "current", "frame pool"):
+        results = []
+        for chunks in chunkings.values():
+            stream: AudioByteStream | _PreviousAudioByteStream
+            if name == "previous":
+                stream = _PreviousAudioByteStream(_SAMPLE_RATE, 1, samples_per_frame)
+            else:
+                pool_size = 8 if name == "frame pool" else 0
+                stream = AudioByteStream(
+                    _SAMPLE_RATE, 1, samples_per_frame, frame_pool_size=pool_size
+                )
+            results.append(_run(stream, chunks, args.rounds))
+        print(f"{name:>12}" + "".join(f"{r:16.0f}" for r in results))
+
+
+if __name__ == "__main__":
+    main()
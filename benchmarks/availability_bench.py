@@ -0,0 +1,122 @@
+"""
+Compares the SQL availability query with the in-memory AvailabilityIndex.
+
+    python -m benchmarks.availability_bench --bookings 100000 --rooms 50
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import and_, create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from database.availability import AvailabilityIndex
+from database.models import Base, Booking, Customer, Room
+
+
+def _sql_available_rooms(db: Session, check_in: date, check_out: date, num_guests: int):
+    # the query get_available_rooms used to run
+    booked = (
+        db.query(Booking.room_id)
+        .filter(and_(Booking.check_out_date > check_in, Booking.check_in_date < check_out))
+        .all()
+    )
+    booked_ids = [r_id for (r_id,) in booked]
+    return (
+        db.query(Room).filter(and_(Room.id.notin_(booked_ids), Room.capacity >= num_guests)).all()
+    )
+
+
+def _populate(db: Session, num_rooms: int, num_bookings: int, start: date, days: int) -> None:
+    rng = random.Random(42)
+    db.add_all(
+        Room(
+            id=i + 1,
+            room_number=str(100 + i),
+            room_type="Standard",
+            price_per_night=3000,
+            capacity=rng.randint(1, 4),
+        )
+        for i in range(num_rooms)
+    )
+    db.add(Customer(id=1, name="Bench", phone_number="+910000000000"))
+    db.commit()
+
+    rows = []
+    for i in range(num_bookings):
+        check_in = start + timedelta(days=rng.randrange(days))
+        rows.append(
+            {
+                "id": i + 1,
+                "customer_id": 1,
+                "room_id": rng.randint(1, num_rooms),
+                "check_in_date": check_in,
+                "check_out_date": check_in + timedelta(days=rng.randint(1, 5)),
+                "number_of_guests": 1,
+            }
+        )
+    db.execute(Booking.__table__.insert(), rows)
+    db.commit()
+
+
+def _timeit(fnc, queries) -> list[float]:
+    samples = []
+    for q in queries:
+        t = time.perf_counter()
+        fnc(*q)
+        samples.append((time.perf_counter() - t) * 1000)
+    return samples
+
+
+def _report(name: str, samples: list[float]) -> None:
+    samples = sorted(samples)
+    p50 = statistics.median(samples)
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    print(f"{name:<8} p50={p50:8.3f}ms  p99={p99:8.3f}ms  mean={statistics.fmean(samples):8.3f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bookings", type=int, default=100_000)
+    parser.add_argument("--rooms", type=int, default=50)
+    parser.add_argument("--days", type=int, default=3 * 365)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    start = date(2025, 1, 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        _populate(db, args.rooms, args.bookings, start, args.days)
+
+        rng = random.Random(7)
+        queries = []
+        for _ in range(args.queries):
+            check_in = start + timedelta(days=rng.randrange(args.days))
+            queries.append(
+                (check_in, check_in + timedelta(days=rng.randint(1, 7)), rng.randint(1, 4))
+            )
+
+        t = time.perf_counter()
+        index = AvailabilityIndex()
+        index.load(db)
+        print(f"index load: {(time.perf_counter() - t) * 1000:.1f}ms for {args.bookings} bookings")
+
+        for q in queries:  # sanity check: both paths must agree
+            expected = [room.id for room in _sql_available_rooms(db, *q)]
+            assert [room.id for room in index.available_rooms(*q)] == expected
+
+        _report("sql", _timeit(lambda *q: _sql_available_rooms(db, *q), queries))
+        _report("index", _timeit(index.available_rooms, queries))
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Throughput and latency of the inference process for several batch windows, with many
+sessions asking for end of turn predictions at the same time.
+
+The runner is a numpy stand-in for the turn detector (token embedding and a stack of
+feed-forward layers, --tokens 128 is MAX_HISTORY_TOKENS), the model files aren't needed.
+Each session sends a request, waits for the result, then waits an exponentially distributed
+time before the next one (--interval 0 saturates the inference process).
+
+    python -m benchmarks.inference_batch_bench --sessions 50 --interval 0.5 --tokens 128
+"""
+
+import argparse
+import asyncio
+import multiprocessing as mp
+import random
+import struct
+import time
+
+import numpy as np
+
+from livekit.agents import ipc
+from livekit.agents.inference_runner import _InferenceRunner
+
+_VOCAB = 8192
+_DIM = 256
+_LAYERS = 6
+_RESULT = struct.Struct("<d")
+
+
+class _StandInModel:
+    def __init__(self) -> None:
+        rng = np.random.default_rng(0)
+        self._embedding = rng.standard_normal((_VOCAB, _DIM), dtype=np.float32) * 0.1
+        self._layers = [
+            (
+                rng.standard_normal((_DIM, _DIM * 4), dtype=np.float32) * 0.05,
+                rng.standard_normal((_DIM * 4, _DIM), dtype=np.float32) * 0.05,
+            )
+            for _ in range(_LAYERS)
+        ]
+        self._head = rng.standard_normal(_DIM, dtype=np.float32)
+
+    def __call__(self, input_ids: np.ndarray) -> np.ndarray:
+        """(batch, tokens) -> (batch,) probabilities"""
+        h = self._embedding[input_ids]
+        for w1, w2 in self._layers:
+            h = h + np.tanh(h @ w1) @ w2
+        return 1.0 / (1.0 + np.exp(-(h[:, -1] @ self._head)))
+
+
+class _StandInRunner(_InferenceRunner):
+    def initialize(self) -> None:
+        self._model = _StandInModel()
+
+    def run(self, data: bytes) -> bytes | None:
+        input_ids = np.frombuffer(data, dtype=np.int32)[None, :]
+        return _RESULT.pack(float(self._model(input_ids)[0]))
+
+
+def _batched_runner(name: str, window: float) -> type[_InferenceRunner]:
+    def run_batch(self: _StandInRunner, data: list[bytes]) -> list[bytes | None]:
+        input_ids = np.stack([np.frombuffer(d, dtype=np.int32) for d in data])
+        return [_RESULT.pack(float(p)) for p in self._model(input_ids)]
+
+    runner = type(
+        name,
+        (_StandInRunner,),
+        {"INFERENCE_METHOD": name, "BATCH_WINDOW": window, "run_batch": run_batch},
+    )
+    runner.__module__ = __name__
+    globals()[name] = runner  # so that the class can be pickled for the inference process
+    return runner
+
+
+class _Unbatched(_StandInRunner):
+    INFERENCE_METHOD = "unbatched"
+
+
+_WINDOWS_MS = (0, 2, 5, 10, 20)
+_RUNNERS: dict[str, type[_InferenceRunner]] = {"unbatched": _Unbatched}
+for _ms in _WINDOWS_MS:
+    _RUNNERS[f"window_{_ms}ms"] = _batched_runner(f"_BatchedWindow{_ms}ms", _ms / 1000)
+
+
+async def _session(
+    executor: ipc.inference_executor.InferenceExecutor,
+    method: str,
+    tokens: int,
+    interval: float,
+    stop_at: float,
+    latencies: list[float],
+) -> None:
+    rng = random.Random()
+    input_ids = np.array([rng.randrange(_VOCAB) for _ in range(tokens)], dtype=np.int32)
+    await asyncio.sleep(rng.random() * interval)
+    while time.perf_counter() < stop_at:
+        start = time.perf_counter()
+        await executor.do_inference(method, input_ids.tobytes())
+        latencies.append(time.perf_counter() - start)
+        if interval > 0:
+            await asyncio.sleep(rng.expovariate(1 / interval))
+
+
+async def _run(runner: type[_InferenceRunner], args: argparse.Namespace) -> dict:
+    inference = ipc.inference_proc_executor.InferenceProcExecutor(
+        runners={runner.INFERENCE_METHOD: runner},
+        initialize_timeout=30,
+        close_timeout=5,
+        memory_warn_mb=0,
+        memory_limit_mb=0,
+        ping_interval=5,
+        ping_timeout=60,
+        high_ping_threshold=2.5,
+        mp_ctx=mp.get_context("forkserver"),
+        loop=asyncio.get_running_loop(),
+        http_proxy=None,
+    )
+    await inference.start()
+    await inference.initialize()
+
+    # warm up
+    method = runner.INFERENCE_METHOD
+    await _session(inference, method, args.tokens, 0, time.perf_counter() + 1, [])
+
+    latencies: list[float] = []
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            _session(
+                inference, method, args.tokens, args.interval, start + args.duration, latencies
+            )
+            for _ in range(args.sessions)
+        )
+    )
+    elapsed = time.perf_counter() - start
+    await inference.aclose()
+
+    latencies.sort()
+    return {
+        "throughput": len(latencies) / elapsed,
+        "p50": latencies[len(latencies) // 2] * 1000,
+        "p99": latencies[int(len(latencies) * 0.99)] * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument(
+        "--interval", type=float, default=0.5, help="mean seconds between two requests"
+    )
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--tokens", type=int, default=128, help="input tokens per request")
+    args = parser.parse_args()
+
+    model = _StandInModel()
+    input_ids = np.zeros((1, args.tokens), dtype=np.int32)
+    start = time.perf_counter()
+    for _ in range(20):
+        model(input_ids)
+    single = (time.perf_counter() - start) / 20 * 1000
+
+    print(
+        f"{args.sessions} sessions, {args.interval}s mean interval, {args.tokens} tokens, "
+        f"stand-in model {single:.1f} ms per call at batch size 1"
+    )
+    for name, runner in _RUNNERS.items():
+        res = asyncio.run(_run(runner, args))
+        print(
+            f"{name:<14} {res['throughput']:8.1f} req/s   "
+            f"p50 {res['p50']:7.2f} ms   p99 {res['p99']:7.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
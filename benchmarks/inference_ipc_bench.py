@@ -0,0 +1,183 @@
+"""
+Round-trip latency of the turn detector inference calls, job process -> worker -> inference
+process and back, with 50 jobs sending requests at the same time.
+
+Compares the JSON payloads _EUORunnerBase used to exchange with the binary codec, over the
+IPC sockets and over the shared memory rings (WorkerOptions.inference_shm_kb). The runner
+only decodes the chat context and encodes a result, so what is measured is the transport.
+
+    python -m benchmarks.inference_ipc_bench --jobs 50 --requests 200
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import time
+import uuid
+from dataclasses import dataclass
+
+from livekit.agents import JobContext, JobExecutorType, JobProcess, ipc, job
+from livekit.agents.inference_runner import _InferenceRunner
+from livekit.plugins.turn_detector.base import (
+    _decode_chat_ctx,
+    _decode_result,
+    _encode_chat_ctx,
+    _encode_result,
+)
+from livekit.protocol import agent
+
+
+class _JsonRunner(_InferenceRunner):
+    INFERENCE_METHOD = "bench_json"
+
+    def initialize(self) -> None:
+        pass
+
+    def run(self, data: bytes) -> bytes | None:
+        chat_ctx = json.loads(data)["chat_ctx"]
+        text = chat_ctx[-1]["content"]
+        return json.dumps({"eou_probability": 0.5, "input": text, "duration": 0.0}).encode()
+
+
+class _BinaryRunner(_InferenceRunner):
+    INFERENCE_METHOD = "bench_binary"
+
+    def initialize(self) -> None:
+        pass
+
+    def run(self, data: bytes) -> bytes | None:
+        chat_ctx = _decode_chat_ctx(data)
+        return _encode_result(0.5, 0.0, chat_ctx[-1]["content"])
+
+
+@dataclass
+class _BenchArgs:
+    codec: str
+    requests: int
+    chat_ctx: list
+    results: "mp.Queue"
+
+
+def _prewarm(proc: JobProcess) -> None:
+    pass
+
+
+async def _job_entrypoint(ctx: JobContext) -> None:
+    args: _BenchArgs = ctx.proc.user_arguments
+    executor = ctx.inference_executor
+    latencies = []
+    for i in range(args.requests + 10):  # the first requests warm up the path
+        start = time.perf_counter()
+        if args.codec == "json":
+            data = json.dumps({"chat_ctx": args.chat_ctx}).encode()
+            res = await executor.do_inference(_JsonRunner.INFERENCE_METHOD, data)
+            json.loads(res)["eou_probability"]
+        else:
+            data = _encode_chat_ctx(args.chat_ctx)
+            res = await executor.do_inference(_BinaryRunner.INFERENCE_METHOD, data)
+            _decode_result(res)
+        if i >= 10:
+            latencies.append(time.perf_counter() - start)
+
+    args.results.put(latencies)
+    ctx.shutdown()
+
+
+def _fake_job() -> job.RunningJobInfo:
+    return job.RunningJobInfo(
+        job=agent.Job(id=f"bench_{uuid.uuid4().hex}", type=agent.JobType.JT_ROOM),
+        url="fake_url",
+        token="fake_token",
+        accept_arguments=job.JobAcceptArguments(name="", identity="", metadata=""),
+        worker_id="bench",
+    )
+
+
+async def _run(codec: str, shm_kb: int, jobs: int, jobs_per_process: int, args) -> dict:
+    loop = asyncio.get_running_loop()
+    mp_ctx = mp.get_context("forkserver")
+    inference = ipc.inference_proc_executor.InferenceProcExecutor(
+        runners={r.INFERENCE_METHOD: r for r in (_JsonRunner, _BinaryRunner)},
+        initialize_timeout=30,
+        close_timeout=5,
+        memory_warn_mb=0,
+        memory_limit_mb=0,
+        ping_interval=5,
+        ping_timeout=60,
+        high_ping_threshold=2.5,
+        mp_ctx=mp_ctx,
+        loop=loop,
+        http_proxy=None,
+        shm_ring_size=shm_kb * 1024,
+    )
+    await inference.start()
+    await inference.initialize()
+
+    pool = ipc.proc_pool.ProcPool(
+        initialize_process_fnc=_prewarm,
+        job_entrypoint_fnc=_job_entrypoint,
+        num_idle_processes=jobs,
+        initialize_timeout=60,
+        close_timeout=10,
+        inference_executor=inference,
+        job_executor_type=JobExecutorType.SHARED_PROCESS,
+        jobs_per_process=jobs_per_process,
+        mp_ctx=mp_ctx,
+        memory_warn_mb=0,
+        memory_limit_mb=0,
+        http_proxy=None,
+        loop=loop,
+        inference_shm_size=shm_kb * 1024,
+    )
+    turn = "and could you also tell me whether the room has a sea view " * (args.turn_chars // 60)
+    chat_ctx = [{"role": "user" if i % 2 == 0 else "assistant", "content": turn} for i in range(6)]
+    results = mp_ctx.Queue()
+    bench_args = _BenchArgs(codec=codec, requests=args.requests, chat_ctx=chat_ctx, results=results)
+    pool.on("process_created", lambda proc: setattr(proc, "user_arguments", bench_args))
+    await pool.start()
+
+    await asyncio.gather(*(pool.launch_job(_fake_job()) for _ in range(jobs)))
+    latencies = []
+    for _ in range(jobs):
+        latencies.extend(await loop.run_in_executor(None, results.get))
+
+    await pool.aclose()
+    await inference.aclose()
+
+    latencies.sort()
+    return {
+        "p50": latencies[len(latencies) // 2] * 1000,
+        "p99": latencies[int(len(latencies) * 0.99)] * 1000,
+        "payload": len(
+            json.dumps({"chat_ctx": chat_ctx}) if codec == "json" else _encode_chat_ctx(chat_ctx)
+        ),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=50)
+    parser.add_argument("--jobs-per-process", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--turn-chars", type=int, default=240, help="characters per chat turn")
+    parser.add_argument("--shm-kb", type=int, default=256)
+    args = parser.parse_args()
+
+    print(f"{args.jobs} jobs ({args.jobs_per_process} per process), {args.requests} requests each")
+    for codec, shm_kb in (
+        ("json", 0),
+        ("binary", 0),
+        ("json", args.shm_kb),
+        ("binary", args.shm_kb),
+    ):
+        res = asyncio.run(_run(codec, shm_kb, args.jobs, args.jobs_per_process, args))
+        transport = f"shm {shm_kb} KB" if shm_kb else "socket"
+        print(
+            f"{codec:<7} {transport:<12} payload {res['payload']:>6} B   "
+            f"p50 {res['p50']:7.2f} ms   p99 {res['p99']:7.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+CPU used per stream by the Silero VAD with 1, 10 and 50 concurrent streams, each stream
+running its own inference or the windows of all the streams batched together.
+
+Each stream is fed 10 ms frames in real time (like the audio of a room), starting at a random
+phase. The CPU of the whole process is measured (event loop, resampling and inference
+threads). Needs the model file of the silero plugin (git lfs pull).
+
+    python -m benchmarks.silero_vad_bench --duration 10 --max-batch-delay 0.005
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+import numpy as np
+
+from livekit import rtc
+from livekit.plugins import silero
+
+_FRAME_MS = 10
+_STREAMS = (1, 10, 50)
+
+
+async def _stream(vad: silero.VAD, sample_rate: int, duration: float) -> None:
+    samples = sample_rate * _FRAME_MS // 1000
+    rng = np.random.default_rng()
+    stream = vad.stream()
+
+    async def _consume() -> None:
+        async for _ in stream:
+            pass
+
+    consume_task = asyncio.create_task(_consume())
+    await asyncio.sleep(random.random() * _FRAME_MS / 1000)
+    start = time.perf_counter()
+    for i in range(int(duration * 1000 / _FRAME_MS)):
+        data = (rng.standard_normal(samples) * 3000).astype(np.int16)
+        stream.push_frame(
+            rtc.AudioFrame(
+                data=data.tobytes(),
+                sample_rate=sample_rate,
+                num_channels=1,
+                samples_per_channel=samples,
+            )
+        )
+        await asyncio.sleep(max(0.0, start + (i + 1) * _FRAME_MS / 1000 - time.perf_counter()))
+
+    stream.end_input()
+    await consume_task
+
+
+async def _run(vad: silero.VAD, num_streams: int, args: argparse.Namespace) -> float:
+    """returns the CPU used per stream, in % of a core"""
+    cpu_start = time.process_time()
+    await asyncio.gather(
+        *(_stream(vad, args.input_rate, args.duration) for _ in range(num_streams))
+    )
+    cpu = time.process_time() - cpu_start
+    return cpu / args.duration / num_streams * 100
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of audio")
+    parser.add_argument("--input-rate", type=int, default=48000)
+    parser.add_argument("--max-batch-delay", type=float, default=0.005)
+    args = parser.parse_args()
+
+    modes = {
+        "per stream": silero.VAD.load(),
+        "batched": silero.VAD.load(max_batch_delay=args.max_batch_delay),
+    }
+
+    print(f"{args.duration}s of {args.input_rate} Hz audio per stream, CPU per stream:")
+    for num_streams in _STREAMS:
+        results = [
+            f"{name} {asyncio.run(_run(vad, num_streams, args)):6.2f}%"
+            for name, vad in modes.items()
+        ]
+        print(f"{num_streams:>3} streams   " + "   ".join(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Token issuance before and after the move to Starlette.
+
+Signing: api.AccessToken(...).to_jwt() per token against TokenService.mint (cached HMAC key),
+with and without the token cache (the same participant asking again).
+HTTP: POST /get-token on the old Flask app (threaded dev server, a new AccessToken per
+request) against web_server.app under uvicorn, each in its own process, with `--clients`
+concurrent keep-alive clients.
+
+    python -m benchmarks.token_bench --requests 5000 --clients 64
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import statistics
+import time
+
+import aiohttp
+
+API_KEY = "benchkey"
+API_SECRET = "benchsecret" * 4
+
+
+def _env() -> None:
+    os.environ.update(
+        LIVEKIT_URL="ws://localhost:7880", LIVEKIT_API_KEY=API_KEY, LIVEKIT_API_SECRET=API_SECRET
+    )
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _serve_flask(port: int) -> None:
+    # the /get-token handler web_server.py had before
+    import logging
+
+    from flask import Flask, jsonify, request
+
+    from livekit import api
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    app = Flask(__name__)
+
+    @app.route("/get-token", methods=["POST"])
+    def get_token():
+        data = request.json
+        room_name = data.get("roomName", "default-room")
+        participant_name = data.get("participantName", f"user-{os.urandom(4).hex()}")
+        token = (
+            api.AccessToken(API_KEY, API_SECRET)
+            .with_identity(participant_name)
+            .with_name(participant_name)
+            .with_grants(api.VideoGrants(room_join=True, room=room_name))
+        )
+        return jsonify({"token": token.to_jwt(), "url": "ws://localhost:7880"})
+
+    app.run(port=port, host="127.0.0.1", threaded=True, use_reloader=False)
+
+
+def _serve_starlette(port: int) -> None:
+    import logging
+
+    import uvicorn
+
+    _env()
+    logging.disable(logging.INFO)
+    from web_server import app
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+
+
+async def _load(port: int, requests: int, clients: int) -> dict:
+    url = f"http://127.0.0.1:{port}/get-token"
+    latencies: list[float] = []
+    remaining = iter(range(requests))
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=clients)) as http:
+        for _ in range(50):  # wait for the server to come up
+            try:
+                async with http.post(
+                    url, json={"roomName": "bench", "participantName": "warmup"}
+                ) as resp:
+                    await resp.read()
+                break
+            except aiohttp.ClientConnectionError:
+                await asyncio.sleep(0.1)
+
+        async def client(n: int) -> None:
+            for i in remaining:
+                t = time.perf_counter()
+                async with http.post(
+                    url, json={"roomName": f"room-{i % 100}", "participantName": f"user-{n}"}
+                ) as resp:
+                    await resp.json()
+                    resp.raise_for_status()
+                latencies.append(time.perf_counter() - t)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client(n) for n in range(clients)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "rps": requests / elapsed,
+        "p50": latencies[len(latencies) // 2] * 1000,
+        "p99": latencies[int(len(latencies) * 0.99)] * 1000,
+    }
+
+
+def _http_bench(name: str, target, requests: int, clients: int) -> None:
+    port = _free_port()
+    proc = multiprocessing.Process(target=target, args=(port,), daemon=True)
+    proc.start()
+    try:
+        res = asyncio.run(_load(port, requests, clients))
+    finally:
+        proc.terminate()
+        proc.join()
+    print(
+        f"{name:<28} {res['rps']:>9.0f} req/s   p50 {res['p50']:6.2f} ms   p99 {res['p99']:6.2f} ms"
+    )
+
+
+def _sign_bench(tokens: int) -> None:
+    from livekit import api
+    from token_service import TokenService
+
+    service = TokenService("ws://localhost:7880", API_KEY, API_SECRET, cache=False)
+    cached = TokenService("ws://localhost:7880", API_KEY, API_SECRET)
+
+    def access_token(i: int) -> str:
+        return (
+            api.AccessToken(API_KEY, API_SECRET)
+            .with_identity(f"user-{i}")
+            .with_name(f"user-{i}")
+            .with_grants(api.VideoGrants(room_join=True, room="bench"))
+            .to_jwt()
+        )
+
+    for name, fnc in (
+        ("AccessToken.to_jwt", access_token),
+        ("TokenService.mint", lambda i: service.mint(f"user-{i}", "bench")),
+        ("TokenService.mint (cached)", lambda i: cached.mint(f"user-{i % 100}", "bench")),
+    ):
+        samples = []
+        for _ in range(5):
+            start = time.perf_counter()
+            for i in range(tokens):
+                fnc(i)
+            samples.append((time.perf_counter() - start) / tokens)
+        best = min(samples)
+        print(
+            f"{name:<28} {1 / best:>9.0f} tokens/s  {best * 1e6:6.1f} us/token (median {statistics.median(samples) * 1e6:.1f})"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--tokens", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"signing, {args.tokens} tokens")
+    _sign_bench(args.tokens)
+    print(f"\nPOST /get-token, {args.requests} requests, {args.clients} concurrent clients")
+    _http_bench("before: Flask (threaded)", _serve_flask, args.requests, args.clients)
+    _http_bench("after: Starlette + uvicorn", _serve_starlette, args.requests, args.clients)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+# cf4/database/async_database.py
+#
+# Async counterparts of the helpers in database.py, for code running on an asyncio event
+# loop (the voice agent). They never block the loop on SQLite I/O, so audio forwarding and
+# VAD keep running while a commit is being fsynced.
+from datetime import date
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import joinedload
+
+from .availability import BookingResult, availability_index, overlapping_bookings
+from .cache import (
+    customer_cache,
+    customer_record,
+    history_cache,
+    invalidate_customer,
+    invalidate_session,
+    session_phone_cache,
+    turn_record,
+)
+from .models import Booking, CallSession, ConversationTurn, Customer, Room
+
+
+def create_async_sessionmaker(engine: AsyncEngine) -> async_sessionmaker[AsyncSession]:
+    """
+    Returns a factory for short-lived sessions bound to the shared engine.
+    Objects stay usable after commit, so tools can read e.g. `booking.id` without another query.
+    """
+    return async_sessionmaker(engine, expire_on_commit=False)
+
+
+async def get_available_rooms(
+    db: AsyncSession, check_in_date: date, check_out_date: date, num_guests: int
+):
+    """
+    Finds rooms that are not booked for the given dates and can accommodate the number of guests.
+    Served by the in-memory availability index, SQLite is only read when the index needs to sync.
+    """
+    await db.run_sync(availability_index.sync)
+    return availability_index.available_rooms(check_in_date, check_out_date, num_guests)
+
+
+async def book_room(
+    db: AsyncSession,
+    customer_name: str,
+    phone_number: str,
+    room_id: int,
+    check_in_date: date,
+    check_out_date: date,
+    num_guests: int,
+    call_session_id: int = None,
+) -> BookingResult:
+    """
+    Books a room in a single BEGIN IMMEDIATE transaction, see database.book_room.
+    Returns a BookingResult with the conflicting stays and free alternatives if the room
+    was taken in the meantime.
+    """
+    if db.in_transaction():
+        await db.commit()  # BEGIN IMMEDIATE has to be the first statement of the transaction
+    await db.connection(execution_options={"sqlite_begin": "IMMEDIATE"})
+    try:
+        conflicts = (
+            await db.execute(overlapping_bookings(room_id, check_in_date, check_out_date))
+        ).all()
+        if conflicts:
+            await db.rollback()
+            await db.run_sync(lambda s: availability_index.sync(s, force=True))
+            alternatives = availability_index.available_rooms(
+                check_in_date, check_out_date, num_guests
+            )
+            return BookingResult(
+                conflicts=[tuple(c) for c in conflicts],
+                alternatives=[room for room in alternatives if room.id != room_id],
+            )
+
+        result = await db.execute(select(Customer).where(Customer.phone_number == phone_number))
+        customer = result.scalars().first()
+        if not customer:
+            customer = Customer(name=customer_name, phone_number=phone_number)
+            db.add(customer)
+            await db.flush()  # Flush to get the new customer's ID
+
+        booking = Booking(
+            customer_id=customer.id,
+            room_id=room_id,
+            call_session_id=call_session_id,
+            check_in_date=check_in_date,
+            check_out_date=check_out_date,
+            number_of_guests=num_guests,
+        )
+        db.add(booking)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+    availability_index.add_booking(booking)
+    invalidate_customer(phone_number)
+    return BookingResult(booking=booking)
+
+
+async def get_room_by_number(db: AsyncSession, room_number: str):
+    """A helper function to find a room by its number."""
+    result = await db.execute(select(Room).where(Room.room_number == room_number))
+    return result.scalars().first()
+
+
+async def create_call_session(db: AsyncSession, customer_phone: str = None) -> CallSession:
+    """Creates a new record for a call session."""
+    session = CallSession(customer_phone=customer_phone)
+    db.add(session)
+    await db.commit()
+    return session
+
+
+async def log_conversation_turn(db: AsyncSession, session_id: int, speaker: str, text: str):
+    """Logs a single turn of the conversation."""
+    db.add(ConversationTurn(session_id=session_id, speaker=speaker, text=text))
+    await db.commit()
+    invalidate_session(session_id)
+
+
+async def get_conversation_history(db: AsyncSession, session_id: int):
+    """Retrieves all turns for a given session ID, as cached TurnRecord snapshots."""
+    history = history_cache.get(session_id)
+    if history is None:
+        result = await db.execute(
+            select(ConversationTurn)
+            .where(ConversationTurn.session_id == session_id)
+            .order_by(ConversationTurn.timestamp)
+        )
+        history = tuple(turn_record(turn) for turn in result.scalars())
+        if history:
+            history_cache.set(session_id, history)
+    return list(history)
+
+
+def _customer_with_bookings():
+    # bookings and their rooms come back in the same round trip, nothing is lazy loaded later
+    return select(Customer).options(joinedload(Customer.bookings).joinedload(Booking.room))
+
+
+async def find_customer_by_phone(db: AsyncSession, phone_number: str):
+    """
+    Finds a customer by their phone number, as a cached CustomerRecord.
+    The customer's bookings and their rooms are loaded in the same query.
+    """
+    record = customer_cache.get(phone_number)
+    if record is None:
+        result = await db.execute(
+            _customer_with_bookings().where(Customer.phone_number == phone_number)
+        )
+        customer = result.unique().scalars().first()
+        if customer is None:
+            return None
+        record = customer_record(customer)
+        customer_cache.set(phone_number, record)
+    return record
+
+
+async def get_booking_customer_for_session(db: AsyncSession, session_id: int):
+    """Returns the customer of the first booking made during a call session, if any."""
+    phone_number = session_phone_cache.get(session_id)
+    if phone_number is not None:
+        record = customer_cache.get(phone_number)
+        if record is not None:
+            return record
+
+    booked_by = select(Booking.customer_id).where(Booking.call_session_id == session_id).limit(1)
+    result = await db.execute(
+        _customer_with_bookings().where(Customer.id == booked_by.scalar_subquery())
+    )
+    customer = result.unique().scalars().first()
+    if customer is None:
+        return None
+
+    record = customer_record(customer)
+    customer_cache.set(record.phone_number, record)
+    session_phone_cache.set(session_id, record.phone_number)
+    return record
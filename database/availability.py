@@ -0,0 +1,274 @@
+# cf4/database/availability.py
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from .models import Booking, Room
+
+
+@dataclass(frozen=True)
+class RoomInfo:
+    """A detached, read-only snapshot of a Room row.
+
+    It exposes the same attributes the agent reads from a Room, so it can be
+    returned in place of the ORM object without keeping a session around.
+    """
+
+    id: int
+    room_number: str
+    room_type: str
+    price_per_night: float
+    capacity: int
+
+
+@dataclass
+class BookingResult:
+    """
+    The outcome of book_room. Either `booking` is set, or the room was taken for (part of)
+    the requested stay: `conflicts` then lists the (check_in, check_out) ranges it overlaps
+    and `alternatives` the rooms that are still free for the same dates and party size.
+    """
+
+    booking: Optional[Booking] = None
+    conflicts: list[tuple[date, date]] = field(default_factory=list)
+    alternatives: list[RoomInfo] = field(default_factory=list)
+
+    @property
+    def confirmed(self) -> bool:
+        return self.booking is not None
+
+
+class BookingConflictError(Exception):
+    """Raised by create_booking when the room is no longer free for the requested dates."""
+
+    def __init__(self, result: BookingResult) -> None:
+        super().__init__(f"room is already booked for {result.conflicts}")
+        self.result = result
+
+
+# Cancelled bookings don't occupy their room. Rows created before the status column existed
+# have no status and are treated as confirmed.
+_occupies_room = or_(Booking.status.is_(None), Booking.status != "cancelled")
+
+
+def overlapping_bookings(room_id: int, check_in_date: date, check_out_date: date):
+    """The (check_in, check_out) of every booking of `room_id` overlapping [check_in, check_out)."""
+    return (
+        select(Booking.check_in_date, Booking.check_out_date)
+        .where(
+            _occupies_room,
+            Booking.room_id == room_id,
+            Booking.check_out_date > check_in_date,
+            Booking.check_in_date < check_out_date,
+        )
+        .order_by(Booking.check_in_date)
+    )
+
+
+class _RoomCalendar:
+    """
+    The bookings of a single room, kept as two sorted lists of date ordinals.
+
+    For a query [q_in, q_out), every booking that ends on or before q_in also
+    starts before q_out, so the number of overlapping bookings is simply:
+
+        #(starts < q_out) - #(ends <= q_in)
+
+    Both counts are a bisect, so a lookup is O(log n) and stays correct even if
+    the table already contains overlapping bookings for the same room.
+    """
+
+    __slots__ = ("starts", "ends")
+
+    def __init__(self) -> None:
+        self.starts: list[int] = []
+        self.ends: list[int] = []
+
+    def add(self, start: int, end: int) -> None:
+        insort(self.starts, start)
+        insort(self.ends, end)
+
+    def remove(self, start: int, end: int) -> None:
+        i, j = bisect_left(self.starts, start), bisect_left(self.ends, end)
+        if (
+            i < len(self.starts)
+            and self.starts[i] == start
+            and j < len(self.ends)
+            and self.ends[j] == end
+        ):
+            del self.starts[i]
+            del self.ends[j]
+
+    def is_free(self, start: int, end: int) -> bool:
+        return bisect_left(self.starts, end) - bisect_right(self.ends, start) == 0
+
+
+class AvailabilityIndex:
+    """
+    An in-memory view of room occupancy, loaded once from the Booking table.
+
+    The index answers "which rooms with capacity >= N are free for
+    [check_in, check_out)" without querying SQLite. Bookings made by this
+    process are added through `add_booking`; bookings made by other worker
+    processes are picked up by `sync`, which only reads rows newer than the
+    last one seen and runs at most once every `max_staleness` seconds.
+    Cancellations and deletions made elsewhere (e.g. from the admin dashboard)
+    can't be seen that way, so `sync` also reloads everything every
+    `reload_interval` seconds.
+    """
+
+    def __init__(self, max_staleness: float = 2.0, reload_interval: float = 300.0) -> None:
+        self._max_staleness = max_staleness
+        self._reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._rooms: list[RoomInfo] = []  # sorted by capacity, descending
+        self._calendars: dict[int, _RoomCalendar] = {}
+        self._last_booking_id = 0  # highest id read from the table by load() / sync()
+        self._local_ids: set[int] = set()  # added by add_booking() but not yet seen by sync()
+        self._last_sync = 0.0
+        self._last_load = 0.0
+        self._loaded = False
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    @property
+    def room_count(self) -> int:
+        return len(self._rooms)
+
+    def invalidate(self) -> None:
+        """Forces a full reload on the next `sync`."""
+        self._loaded = False
+
+    def load(self, db: Session) -> None:
+        """(Re)builds the index from scratch."""
+        rooms = [
+            RoomInfo(
+                id=room.id,
+                room_number=room.room_number,
+                room_type=room.room_type,
+                price_per_night=room.price_per_night,
+                capacity=room.capacity,
+            )
+            for room in db.query(Room).order_by(Room.id).all()
+        ]
+        # Python's sort is stable, so rooms with the same capacity stay in id order.
+        rooms.sort(key=lambda r: r.capacity, reverse=True)
+
+        calendars = {room.id: _RoomCalendar() for room in rooms}
+        starts: dict[int, list[int]] = {room.id: [] for room in rooms}
+        ends: dict[int, list[int]] = {room.id: [] for room in rooms}
+        last_id = 0
+        rows = (
+            db.query(Booking.id, Booking.room_id, Booking.check_in_date, Booking.check_out_date)
+            .filter(_occupies_room)
+            .yield_per(10_000)
+        )
+        for booking_id, room_id, check_in, check_out in rows:
+            if room_id in starts:
+                starts[room_id].append(check_in.toordinal())
+                ends[room_id].append(check_out.toordinal())
+            last_id = max(last_id, booking_id)
+
+        # sorting once is much cheaper than insort'ing every row on a cold start
+        for room_id, calendar in calendars.items():
+            calendar.starts = sorted(starts[room_id])
+            calendar.ends = sorted(ends[room_id])
+
+        with self._lock:
+            self._rooms = rooms
+            self._calendars = calendars
+            self._last_booking_id = last_id
+            self._local_ids.clear()
+            self._last_sync = self._last_load = time.monotonic()
+            self._loaded = True
+
+    def sync(self, db: Session, *, force: bool = False) -> None:
+        """Loads the index if needed, then pulls bookings written by other processes."""
+        now = time.monotonic()
+        if not self._loaded or now - self._last_load >= self._reload_interval:
+            self.load(db)
+            return
+
+        if not force and now - self._last_sync < self._max_staleness:
+            return
+
+        rows = (
+            db.query(Booking.id, Booking.room_id, Booking.check_in_date, Booking.check_out_date)
+            .filter(Booking.id > self._last_booking_id, _occupies_room)
+            .all()
+        )
+        with self._lock:
+            for booking_id, room_id, check_in, check_out in rows:
+                self._last_booking_id = max(self._last_booking_id, booking_id)
+                if booking_id in self._local_ids:
+                    self._local_ids.discard(booking_id)  # already indexed by add_booking()
+                    continue
+                self._add_locked(room_id, check_in, check_out)
+            self._last_sync = now
+
+    def add_booking(self, booking: Booking) -> None:
+        """Records a booking that has just been committed."""
+        if not self._loaded:
+            return
+
+        with self._lock:
+            if booking.id <= self._last_booking_id or booking.id in self._local_ids:
+                return
+
+            # don't advance _last_booking_id here: rows committed by other processes just
+            # before this one would otherwise be skipped by the next sync()
+            self._local_ids.add(booking.id)
+            self._add_locked(booking.room_id, booking.check_in_date, booking.check_out_date)
+
+    def remove_booking(self, booking: Booking) -> None:
+        """
+        Frees the dates of a booking that has just been cancelled or deleted.
+        Only call it when the booking stops occupying its room, not for one already cancelled.
+        """
+        if not self._loaded:
+            return
+
+        with self._lock:
+            if booking.id > self._last_booking_id and booking.id not in self._local_ids:
+                return  # never indexed
+
+            calendar = self._calendars.get(booking.room_id)
+            if calendar is not None:
+                calendar.remove(
+                    booking.check_in_date.toordinal(), booking.check_out_date.toordinal()
+                )
+
+    def _add_locked(self, room_id: int, check_in: date, check_out: date) -> None:
+        calendar = self._calendars.get(room_id)
+        if calendar is None:
+            # a room created after the index was loaded, it will be picked up by the next load()
+            return
+
+        calendar.add(check_in.toordinal(), check_out.toordinal())
+
+    def available_rooms(
+        self, check_in_date: date, check_out_date: date, num_guests: int
+    ) -> list[RoomInfo]:
+        """Returns the free rooms that fit `num_guests`, ordered by room id."""
+        start, end = check_in_date.toordinal(), check_out_date.toordinal()
+        free = []
+        with self._lock:
+            for room in self._rooms:
+                if room.capacity < num_guests:
+                    break  # rooms are sorted by capacity, nothing further can fit
+                if self._calendars[room.id].is_free(start, end):
+                    free.append(room)
+
+        free.sort(key=lambda r: r.id)
+        return free
+
+
+availability_index = AvailabilityIndex()
@@ -0,0 +1,130 @@
+# cf4/database/cache.py
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Generic, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """
+    A small thread-safe LRU cache whose entries also expire after `ttl` seconds.
+
+    Entries are dropped explicitly by the write paths (see `invalidate`); the TTL only bounds
+    how long a process can serve a value that another worker process has since changed.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0) -> None:
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+    def get(self, key: K) -> Optional[V]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: K, value: V) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self._ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self._maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: K) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# Cached values are plain snapshots rather than ORM objects, so they can be shared between
+# sessions (and threads) without being expired or lazily loaded after their session is closed.
+
+
+@dataclass(frozen=True)
+class TurnRecord:
+    speaker: str
+    text: str
+    timestamp: Optional[datetime]
+
+
+@dataclass(frozen=True)
+class BookingRecord:
+    id: int
+    room_id: int
+    room_number: Optional[str]
+    call_session_id: Optional[int]
+    check_in_date: date
+    check_out_date: date
+    number_of_guests: int
+
+
+@dataclass(frozen=True)
+class CustomerRecord:
+    id: int
+    name: Optional[str]
+    phone_number: str
+    bookings: tuple[BookingRecord, ...]
+
+
+def turn_record(turn) -> TurnRecord:
+    return TurnRecord(speaker=turn.speaker, text=turn.text, timestamp=turn.timestamp)
+
+
+def customer_record(customer) -> CustomerRecord:
+    """Snapshots a Customer whose bookings (and their rooms) were eagerly loaded."""
+    return CustomerRecord(
+        id=customer.id,
+        name=customer.name,
+        phone_number=customer.phone_number,
+        bookings=tuple(
+            BookingRecord(
+                id=booking.id,
+                room_id=booking.room_id,
+                room_number=booking.room.room_number if booking.room else None,
+                call_session_id=booking.call_session_id,
+                check_in_date=booking.check_in_date,
+                check_out_date=booking.check_out_date,
+                number_of_guests=booking.number_of_guests,
+            )
+            for booking in customer.bookings
+        ),
+    )
+
+
+# session id -> tuple[TurnRecord, ...]
+history_cache: TTLCache[int, tuple[TurnRecord, ...]] = TTLCache(maxsize=256, ttl=60.0)
+# phone number -> CustomerRecord
+customer_cache: TTLCache[str, CustomerRecord] = TTLCache(maxsize=1024, ttl=300.0)
+# call session id -> phone number of the customer who booked during that call,
+# the customer itself is then served from customer_cache
+session_phone_cache: TTLCache[int, str] = TTLCache(maxsize=256, ttl=3600.0)
+
+
+def invalidate_session(session_id: int) -> None:
+    history_cache.invalidate(session_id)
+
+
+def invalidate_customer(phone_number: str) -> None:
+    customer_cache.invalidate(phone_number)
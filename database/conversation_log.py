@@ -0,0 +1,146 @@
+# cf4/database/conversation_log.py
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .cache import invalidate_session
+from .models import ConversationTurn
+
+logger = logging.getLogger("conversation-log")
+
+
+@dataclass
+class ConversationLogMetrics:
+    queue_depth: int
+    """Turns waiting to be written"""
+    flushed_turns: int
+    flush_count: int
+    failed_flushes: int
+    last_flush_latency: float
+    """Seconds spent in the last successful flush"""
+    avg_flush_latency: float
+
+
+class ConversationLogWriter:
+    """
+    Write-behind logger for ConversationTurn rows.
+
+    `log` only appends to an in-memory queue and never waits on SQLite. Queued turns are
+    written in a single executemany + commit when `max_batch_size` turns are pending, every
+    `flush_interval` seconds, and one last time in `aclose`. A worker process shares one
+    writer between the calls it serves: create it in `prewarm` and register `aclose` with
+    `JobProcess.add_shutdown_callback`, so the process doesn't exit with turns queued.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        *,
+        max_batch_size: int = 32,
+        flush_interval: float = 1.0,
+    ) -> None:
+        self._engine = engine
+        self._max_batch_size = max_batch_size
+        self._flush_interval = flush_interval
+        self._queue: list[dict] = []
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._closed = False
+
+        self._flushed_turns = 0
+        self._flush_count = 0
+        self._failed_flushes = 0
+        self._last_flush_latency = 0.0
+        self._total_flush_latency = 0.0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="ConversationLogWriter._run")
+
+    def log(self, session_id: int, speaker: str, text: str) -> None:
+        """Queues a turn. The timestamp is taken now, not when the row is written."""
+        if self._closed:
+            logger.warning(
+                "conversation log writer is closed, dropping turn", extra={"session_id": session_id}
+            )
+            return
+
+        self._queue.append(
+            {
+                "session_id": session_id,
+                "speaker": speaker,
+                "text": text,
+                "timestamp": datetime.now(timezone.utc),
+            }
+        )
+        if len(self._queue) >= self._max_batch_size:
+            self._wakeup.set()
+
+    async def flush(self) -> None:
+        """Writes every queued turn. On failure the turns are kept for the next attempt."""
+        async with self._flush_lock:
+            if not self._queue:
+                return
+
+            batch, self._queue = self._queue, []
+            started_at = time.perf_counter()
+            try:
+                async with self._engine.begin() as conn:
+                    # a list of parameter sets is sent as a single executemany
+                    await conn.execute(insert(ConversationTurn), batch)
+            except asyncio.CancelledError:
+                self._queue[:0] = batch
+                raise
+            except Exception:
+                self._failed_flushes += 1
+                self._queue[:0] = batch  # put them back in front, keeping the original order
+                logger.exception("failed to write conversation turns", extra={"count": len(batch)})
+                return
+
+            latency = time.perf_counter() - started_at
+            for session_id in {turn["session_id"] for turn in batch}:
+                invalidate_session(session_id)
+            self._flushed_turns += len(batch)
+            self._flush_count += 1
+            self._last_flush_latency = latency
+            self._total_flush_latency += latency
+
+    async def aclose(self) -> None:
+        """Stops the background flusher and writes whatever is still queued."""
+        self._closed = True
+        if self._task is not None:
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+        await self.flush()
+        if self._queue:
+            logger.error("conversation turns lost on shutdown", extra={"count": len(self._queue)})
+
+    def metrics(self) -> ConversationLogMetrics:
+        return ConversationLogMetrics(
+            queue_depth=len(self._queue),
+            flushed_turns=self._flushed_turns,
+            flush_count=self._flush_count,
+            failed_flushes=self._failed_flushes,
+            last_flush_latency=self._last_flush_latency,
+            avg_flush_latency=(
+                self._total_flush_latency / self._flush_count if self._flush_count else 0.0
+            ),
+        )
+
+    async def _run(self) -> None:
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if not self._closed:
+                await self.flush()
@@ -0,0 +1,675 @@
+# cf4/database/dashboard.py
+#
+# Query layer behind the admin dashboard API (simple_server.py and enhanced_server.py).
+# Lists are paginated with a keyset cursor (newest first), so a request never loads or
+# scans more than one page of rows, and single rows are fetched by primary key.
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, joinedload
+
+from .availability import BookingConflictError, BookingResult, availability_index
+from .cache import invalidate_customer
+from .database import book_room, get_available_rooms, get_room_by_number, write_if_room_free
+from .models import Booking, CallLog, RestaurantOrder, Room
+from .stats import dashboard_stats, day_key, utcnow
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Dashboard ids look like "BK001", the number is the primary key
+BOOKING_PREFIX = "BK"
+ORDER_PREFIX = "ORD"
+CALL_PREFIX = "CALL"
+
+
+@dataclass
+class Page:
+    items: list
+    next_cursor: Optional[str]
+
+    def to_dict(self) -> dict:
+        return {"items": self.items, "nextCursor": self.next_cursor}
+
+
+def public_id(prefix: str, row_id: int) -> str:
+    return f"{prefix}{row_id:03d}"
+
+
+def parse_id(prefix: str, value) -> Optional[int]:
+    """Accepts both "BK012" and "12". Returns None for anything else."""
+    value = str(value)
+    if value.startswith(prefix):
+        value = value[len(prefix) :]
+    return int(value) if value.isdigit() else None
+
+
+def parse_date(value) -> Optional[date]:
+    """Parses "2024-10-12" (or a full ISO timestamp). Raises ValueError on bad input."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    value = str(value)
+    if "T" in value:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).date()
+    return date.fromisoformat(value)
+
+
+def _iso(value) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def _clamp_limit(limit) -> int:
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def _paginate(db: Session, stmt, model, cursor, limit, serialize) -> Page:
+    limit = _clamp_limit(limit)
+    cursor_id = parse_id("", cursor) if cursor else None
+    if cursor_id is not None:
+        stmt = stmt.where(model.id < cursor_id)
+
+    # one extra row tells us whether there is a next page, without a COUNT(*)
+    rows = db.execute(stmt.order_by(model.id.desc()).limit(limit + 1)).unique().scalars().all()
+    next_cursor = str(rows[limit - 1].id) if len(rows) > limit else None
+    return Page(items=[serialize(row) for row in rows[:limit]], next_cursor=next_cursor)
+
+
+def _date_range(column, date_from: Optional[date], date_to: Optional[date], *, is_datetime: bool):
+    """Inclusive [date_from, date_to] filter on a Date or DateTime column."""
+    clauses = []
+    if date_from is not None:
+        clauses.append(
+            column >= (datetime.combine(date_from, time.min) if is_datetime else date_from)
+        )
+    if date_to is not None:
+        if is_datetime:
+            clauses.append(column < datetime.combine(date_to + timedelta(days=1), time.min))
+        else:
+            clauses.append(column <= date_to)
+    return clauses
+
+
+# --- Bookings ---
+
+
+def serialize_booking(booking: Booking) -> dict:
+    customer, room = booking.customer, booking.room
+    return {
+        "id": public_id(BOOKING_PREFIX, booking.id),
+        "guestName": customer.name if customer else None,
+        "email": customer.email if customer else None,
+        "phone": customer.phone_number if customer else None,
+        "checkIn": _iso(booking.check_in_date),
+        "checkOut": _iso(booking.check_out_date),
+        "roomType": room.room_type if room else None,
+        "roomNumber": room.room_number if room else None,
+        "guests": booking.number_of_guests,
+        "totalAmount": booking.total_amount or 0,
+        "status": booking.status or "confirmed",
+        "paymentStatus": booking.payment_status or "pending",
+        "createdAt": _iso(booking.created_at),
+        "updatedAt": _iso(booking.updated_at or booking.created_at),
+    }
+
+
+def _bookings_query():
+    return select(Booking).options(joinedload(Booking.customer), joinedload(Booking.room))
+
+
+def list_bookings(
+    db: Session,
+    *,
+    status: str = None,
+    date_from: date = None,
+    date_to: date = None,
+    cursor: str = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> Page:
+    """Bookings, newest first. The date range applies to the check-in date."""
+    stmt = _bookings_query()
+    if status:
+        stmt = stmt.where(Booking.status == status)
+    stmt = stmt.where(*_date_range(Booking.check_in_date, date_from, date_to, is_datetime=False))
+    return _paginate(db, stmt, Booking, cursor, limit, serialize_booking)
+
+
+def get_booking(db: Session, booking_id) -> Optional[Booking]:
+    row_id = parse_id(BOOKING_PREFIX, booking_id)
+    return db.get(Booking, row_id) if row_id is not None else None
+
+
+def create_booking(db: Session, data: dict) -> BookingResult:
+    """
+    Books a room from the dashboard form. `roomNumber` picks a specific room, otherwise the
+    first free room of `roomType` (or of any type) that fits the guests is used.
+    """
+    if not data.get("guestName") or not data.get("phone"):
+        raise ValueError("guestName and phone are required")
+    check_in, check_out = parse_date(data.get("checkIn")), parse_date(data.get("checkOut"))
+    if check_in is None or check_out is None or check_out <= check_in:
+        raise ValueError("checkIn and checkOut are required, and checkOut must be after checkIn")
+    guests = int(data.get("guests") or 1)
+
+    room = get_room_by_number(db, str(data["roomNumber"])) if data.get("roomNumber") else None
+    if room is None:
+        free = get_available_rooms(db, check_in, check_out, guests)
+        wanted = (data.get("roomType") or "").lower()
+        matching = [r for r in free if wanted and r.room_type and r.room_type.lower() in wanted]
+        room = (matching or free or [None])[0]
+        if room is None:
+            return BookingResult()
+
+    total_amount = data.get("totalAmount") or room.price_per_night * (check_out - check_in).days
+    result = book_room(
+        db,
+        data.get("guestName"),
+        data.get("phone"),
+        room.id,
+        check_in,
+        check_out,
+        guests,
+        email=data.get("email"),
+        status=data.get("status", "confirmed"),
+        payment_status=data.get("paymentStatus", "pending"),
+        total_amount=total_amount,
+    )
+    if result.confirmed:
+        dashboard_stats.sync(db, force=True)
+    return result
+
+
+def update_booking(db: Session, booking_id, data: dict) -> Optional[Booking]:
+    """
+    Updates status, payment and guest details. Stay dates and rooms are not editable here,
+    a change of dates is a new booking. Raises BookingConflictError when reinstating a
+    cancelled booking whose room has been booked again in the meantime.
+    """
+    booking = get_booking(db, booking_id)
+    if booking is None:
+        return None
+
+    was_cancelled = booking.status == "cancelled"
+    before = None
+
+    def _write():
+        nonlocal before
+        before = dashboard_stats.contribution("bookings", booking)
+        fields = {
+            "status": "status",
+            "paymentStatus": "payment_status",
+            "totalAmount": "total_amount",
+            "guests": "number_of_guests",
+        }
+        for key, column in fields.items():
+            if key in data:
+                setattr(booking, column, data[key])
+        if booking.customer is not None:
+            if "guestName" in data:
+                booking.customer.name = data["guestName"]
+            if "email" in data:
+                booking.customer.email = data["email"]
+
+    if was_cancelled and data.get("status", "cancelled") != "cancelled":
+        # the room may have been booked again since the cancellation, the overlap check and
+        # the reinstatement run under the same write lock as book_room
+        conflicts = write_if_room_free(
+            db, booking.room_id, booking.check_in_date, booking.check_out_date, _write
+        )
+        if conflicts:
+            raise BookingConflictError(BookingResult(conflicts=conflicts))
+    else:
+        _write()
+        db.commit()
+    dashboard_stats.replace("bookings", before, booking)
+    dashboard_stats.save(db)
+
+    if not was_cancelled and booking.status == "cancelled":
+        availability_index.remove_booking(booking)
+    elif was_cancelled and booking.status != "cancelled":
+        availability_index.invalidate()
+    if booking.customer is not None:
+        invalidate_customer(booking.customer.phone_number)
+    return booking
+
+
+def delete_booking(db: Session, booking_id) -> bool:
+    booking = get_booking(db, booking_id)
+    if booking is None:
+        return False
+
+    occupied = booking.status != "cancelled"
+    phone_number = booking.customer.phone_number if booking.customer else None
+    before = dashboard_stats.contribution("bookings", booking)
+    db.delete(booking)
+    db.commit()
+    dashboard_stats.replace("bookings", before, None)
+    dashboard_stats.save(db)
+    if occupied:
+        availability_index.remove_booking(booking)
+    if phone_number:
+        invalidate_customer(phone_number)
+    return True
+
+
+# --- Restaurant orders ---
+
+
+def serialize_order(order: RestaurantOrder) -> dict:
+    return {
+        "id": public_id(ORDER_PREFIX, order.id),
+        "orderType": order.order_type,
+        "tableNumber": order.table_number,
+        "roomNumber": order.room_number,
+        "customerName": order.customer_name,
+        "items": order.items or [],
+        "totalAmount": order.total_amount,
+        "status": order.status,
+        "createdAt": _iso(order.created_at),
+        "updatedAt": _iso(order.updated_at or order.created_at),
+    }
+
+
+def list_orders(
+    db: Session,
+    *,
+    status: str = None,
+    date_from: date = None,
+    date_to: date = None,
+    cursor: str = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> Page:
+    stmt = select(RestaurantOrder)
+    if status:
+        stmt = stmt.where(RestaurantOrder.status == status)
+    stmt = stmt.where(
+        *_date_range(RestaurantOrder.created_at, date_from, date_to, is_datetime=True)
+    )
+    return _paginate(db, stmt, RestaurantOrder, cursor, limit, serialize_order)
+
+
+def get_order(db: Session, order_id) -> Optional[RestaurantOrder]:
+    row_id = parse_id(ORDER_PREFIX, order_id)
+    return db.get(RestaurantOrder, row_id) if row_id is not None else None
+
+
+def _order_total(items: list, fallback) -> float:
+    if items and all("price" in item and "quantity" in item for item in items):
+        return sum(item["price"] * item["quantity"] for item in items)
+    return fallback or 0
+
+
+def create_order(db: Session, data: dict) -> RestaurantOrder:
+    items = data.get("items") or []
+    order = RestaurantOrder(
+        order_type=data.get("orderType", "dine-in"),
+        table_number=data.get("tableNumber"),
+        room_number=data.get("roomNumber"),
+        customer_name=data.get("customerName"),
+        items=items,
+        total_amount=_order_total(items, data.get("totalAmount")),
+        status=data.get("status", "pending"),
+    )
+    db.add(order)
+    db.commit()
+    dashboard_stats.sync(db, force=True)
+    return order
+
+
+def update_order(db: Session, order_id, data: dict) -> Optional[RestaurantOrder]:
+    order = get_order(db, order_id)
+    if order is None:
+        return None
+
+    before = dashboard_stats.contribution("orders", order)
+    fields = {
+        "status": "status",
+        "orderType": "order_type",
+        "tableNumber": "table_number",
+        "roomNumber": "room_number",
+        "customerName": "customer_name",
+        "totalAmount": "total_amount",
+    }
+    for key, column in fields.items():
+        if key in data:
+            setattr(order, column, data[key])
+    if "items" in data:
+        order.items = data["items"]
+        order.total_amount = _order_total(order.items, data.get("totalAmount", order.total_amount))
+    db.commit()
+    dashboard_stats.replace("orders", before, order)
+    dashboard_stats.save(db)
+    return order
+
+
+# --- Call logs ---
+
+
+def serialize_call_log(call: CallLog) -> dict:
+    return {
+        "id": public_id(CALL_PREFIX, call.id),
+        "callerNumber": call.caller_number,
+        "callerName": call.caller_name,
+        "intent": call.intent,
+        "sentiment": call.sentiment,
+        "duration": call.duration,
+        "startTime": _iso(call.start_time),
+        "endTime": _iso(call.end_time),
+        "outcome": call.outcome,
+        "transcript": call.transcript,
+        "satisfaction": call.satisfaction,
+    }
+
+
+def list_call_logs(
+    db: Session,
+    *,
+    sentiment: str = None,
+    intent: str = None,
+    date_from: date = None,
+    date_to: date = None,
+    cursor: str = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> Page:
+    stmt = select(CallLog)
+    if sentiment:
+        stmt = stmt.where(CallLog.sentiment == sentiment)
+    if intent:
+        stmt = stmt.where(CallLog.intent == intent)
+    stmt = stmt.where(*_date_range(CallLog.start_time, date_from, date_to, is_datetime=True))
+    return _paginate(db, stmt, CallLog, cursor, limit, serialize_call_log)
+
+
+def create_call_log(db: Session, data: dict) -> CallLog:
+    def _dt(value):
+        return (
+            datetime.fromisoformat(value.replace("Z", "+00:00"))
+            if isinstance(value, str)
+            else value
+        )
+
+    call = CallLog(
+        call_session_id=data.get("callSessionId"),
+        caller_number=data.get("callerNumber"),
+        caller_name=data.get("callerName"),
+        intent=data.get("intent"),
+        sentiment=data.get("sentiment"),
+        duration=data.get("duration", 0),
+        start_time=_dt(data.get("startTime")),
+        end_time=_dt(data.get("endTime")),
+        outcome=data.get("outcome"),
+        transcript=data.get("transcript"),
+        satisfaction=data.get("satisfaction"),
+    )
+    db.add(call)
+    db.commit()
+    dashboard_stats.sync(db, force=True)
+    return call
+
+
+# --- Aggregates ---
+#
+# Served from the running counters in database/stats.py, none of these scan the tables.
+
+TIMEFRAME_DAYS = {"today": 1, "week": 7, "month": 30, "quarter": 90}
+
+
+def room_occupancy(db: Session, day: date) -> tuple[int, int]:
+    """(occupied rooms, total rooms) for the night of `day`, from the availability index."""
+    availability_index.sync(db)
+    total = availability_index.room_count
+    free = len(availability_index.available_rooms(day, day + timedelta(days=1), 1))
+    return total - free, total
+
+
+def _growth(current: float, previous: float) -> float:
+    return round((current - previous) / previous * 100, 1) if previous else 0.0
+
+
+def dashboard_totals(db: Session, today: date = None) -> dict:
+    """Counts and sums for the dashboard. `today` is a UTC date."""
+    dashboard_stats.sync(db)
+    stats = dashboard_stats
+    today = today or utcnow().date()
+
+    # month to date, against the same days of the previous month
+    month_start = today.replace(day=1)
+    previous_end = month_start - timedelta(days=1)
+    previous_start = previous_end.replace(day=1)
+    previous_same_day = min(previous_start + timedelta(days=today.day - 1), previous_end)
+    revenue_month = stats.days("revenue", month_start, today)
+    revenue_previous = stats.days("revenue", previous_start, previous_same_day)
+
+    calls = int(stats.total("calls"))
+    rated = stats.total("calls.rated")
+    occupied, total_rooms = room_occupancy(db, today)
+    return {
+        "totalBookings": int(stats.total("bookings")),
+        "todaysBookings": int(stats.day("bookings", today)),
+        "revenue": stats.total("revenue"),
+        "revenueToday": stats.day("revenue", today),
+        "revenueMonth": revenue_month,
+        "revenueGrowth": _growth(revenue_month, revenue_previous),
+        "totalCalls": calls,
+        "todaysCalls": int(stats.day("calls", today)),
+        "averageCallDuration": round(stats.total("calls.duration") / calls) if calls else 0,
+        "satisfactionScore": round(stats.total("calls.satisfaction") / rated, 1) if rated else 0,
+        "resolutionRate": round(stats.total("calls.resolved") / calls * 100, 1) if calls else 0,
+        "restaurantOrders": int(stats.total("orders")),
+        "pendingOrders": int(stats.total("orders.pending")),
+        "occupiedRooms": occupied,
+        "totalRooms": total_rooms,
+        "occupancyRate": round(occupied / total_rooms * 100, 1) if total_rooms else 0,
+    }
+
+
+def daily_series(metric: str, last: date, days: int = 7) -> list[dict]:
+    """[{"name": "Mon", "value": ...}, ...] for the `days` days ending on `last`."""
+    first = last - timedelta(days=days - 1)
+    label = "%a" if days <= 7 else "%d %b"
+    return [
+        {"name": day.strftime(label), "value": dashboard_stats.day(metric, day)}
+        for day in (first + timedelta(days=i) for i in range(days))
+    ]
+
+
+def sentiment_shares(counts: dict) -> dict:
+    """Sentiment counts as whole percentages."""
+    total = sum(counts.values())
+    return {
+        sentiment: round(counts.get(sentiment, 0) / total * 100) if total else 0
+        for sentiment in ("positive", "neutral", "negative")
+    }
+
+
+def call_breakdown(db: Session) -> dict:
+    """Call totals with per-sentiment and per-intent counts."""
+    dashboard_stats.sync(db)
+    stats = dashboard_stats
+    calls = int(stats.total("calls"))
+    rated = stats.total("calls.rated")
+    return {
+        "totalCalls": calls,
+        "avgDuration": stats.total("calls.duration") / calls if calls else 0,
+        "avgSatisfaction": stats.total("calls.satisfaction") / rated if rated else 0,
+        "resolutionRate": round(stats.total("calls.resolved") / calls * 100, 1) if calls else 0,
+        "sentimentBreakdown": {k: int(v) for k, v in stats.breakdown("calls.sentiment").items()},
+        "intentBreakdown": {k: int(v) for k, v in stats.breakdown("calls.intent").items()},
+    }
+
+
+def call_analytics(db: Session, timeframe: str = "today", today: date = None) -> dict:
+    """
+    Charts for the call analytics page: today's hourly call volume, the daily sentiment mix
+    and per-intent conversions over the timeframe (today, week, month or quarter).
+    """
+    days = TIMEFRAME_DAYS.get(timeframe)
+    if days is None:
+        raise ValueError(f"unknown timeframe {timeframe!r}")
+    dashboard_stats.sync(db)
+    stats = dashboard_stats
+    today = today or utcnow().date()
+    window = [today - timedelta(days=i) for i in range(days - 1, -1, -1)]
+
+    totals: dict[str, float] = {}
+    intents: dict[str, float] = {}
+    converted: dict[str, float] = {}
+    sentiment: dict[str, float] = {}
+    for day in window:
+        for metric in (
+            "calls",
+            "calls.duration",
+            "calls.rated",
+            "calls.satisfaction",
+            "calls.resolved",
+        ):
+            totals[metric] = totals.get(metric, 0) + stats.day(metric, day)
+        for counts, prefix in (
+            (intents, "calls.intent"),
+            (converted, "calls.converted"),
+            (sentiment, "calls.sentiment"),
+        ):
+            for key, value in stats.breakdown(prefix, period="day", bucket=day_key(day)).items():
+                counts[key] = counts.get(key, 0) + value
+
+    calls, rated = totals["calls"], totals["calls.rated"]
+    midnight = datetime.combine(today, time.min)
+    trend_days = window if days > 1 else [today - timedelta(days=i) for i in range(6, -1, -1)]
+    return {
+        "timeframe": timeframe,
+        "totalCalls": int(calls),
+        "avgDuration": round(totals["calls.duration"] / calls) if calls else 0,
+        "avgSatisfaction": round(totals["calls.satisfaction"] / rated, 1) if rated else 0,
+        "resolutionRate": round(totals["calls.resolved"] / calls * 100, 1) if calls else 0,
+        "sentimentBreakdown": sentiment_shares(sentiment),
+        "callVolume": [
+            {
+                "name": f"{hour:02d}:00",
+                "calls": int(stats.hour("calls", midnight + timedelta(hours=hour))),
+            }
+            for hour in range(24)
+        ],
+        "sentimentTrend": [
+            {
+                "name": day.strftime("%a" if len(trend_days) <= 7 else "%d %b"),
+                **sentiment_shares(
+                    stats.breakdown("calls.sentiment", period="day", bucket=day_key(day))
+                ),
+            }
+            for day in trend_days
+        ],
+        "conversionRates": [
+            {
+                "intent": intent,
+                "calls": int(count),
+                "conversions": int(converted.get(intent, 0)),
+                "rate": round(converted.get(intent, 0) / count * 100),
+            }
+            for intent, count in sorted(intents.items(), key=lambda item: -item[1])
+        ],
+    }
+
+
+# --- Demo data ---
+
+
+def seed_demo_data(db: Session) -> None:
+    """Fills an empty database with the sample rows the dashboard used to ship in memory."""
+    if db.scalar(select(func.count(Room.id))) == 0:
+        db.add_all(
+            [
+                Room(
+                    room_number="108", room_type="Standard Room", price_per_night=3000, capacity=2
+                ),
+                Room(room_number="205", room_type="Deluxe Suite", price_per_night=5000, capacity=3),
+                Room(
+                    room_number="301", room_type="Premium Suite", price_per_night=7500, capacity=4
+                ),
+            ]
+        )
+        db.commit()
+
+    if db.scalar(select(func.count(Booking.id))) == 0:
+        create_booking(
+            db,
+            {
+                "guestName": "Rajesh Sharma",
+                "email": "rajesh@example.com",
+                "phone": "+91 9876543210",
+                "checkIn": "2024-10-12",
+                "checkOut": "2024-10-15",
+                "roomNumber": "205",
+                "guests": 2,
+                "totalAmount": 15000,
+                "status": "confirmed",
+                "paymentStatus": "paid",
+            },
+        )
+        create_booking(
+            db,
+            {
+                "guestName": "Priya Patel",
+                "email": "priya@example.com",
+                "phone": "+91 9876543211",
+                "checkIn": "2024-10-13",
+                "checkOut": "2024-10-16",
+                "roomNumber": "108",
+                "guests": 1,
+                "totalAmount": 9000,
+                "status": "pending",
+                "paymentStatus": "pending",
+            },
+        )
+
+    if db.scalar(select(func.count(RestaurantOrder.id))) == 0:
+        create_order(
+            db,
+            {
+                "orderType": "dine-in",
+                "tableNumber": "8",
+                "customerName": "Anjali Singh",
+                "items": [
+                    {
+                        "id": "1",
+                        "name": "Butter Chicken",
+                        "quantity": 2,
+                        "price": 450,
+                        "category": "Main Course",
+                    },
+                    {
+                        "id": "2",
+                        "name": "Naan Bread",
+                        "quantity": 3,
+                        "price": 80,
+                        "category": "Bread",
+                    },
+                ],
+                "status": "preparing",
+            },
+        )
+
+    if db.scalar(select(func.count(CallLog.id))) == 0:
+        create_call_log(
+            db,
+            {
+                "callerNumber": "+91 9876543210",
+                "callerName": "Rahul Sharma",
+                "intent": "Booking Inquiry",
+                "sentiment": "positive",
+                "duration": 245,
+                "startTime": "2024-10-10T18:30:00Z",
+                "endTime": "2024-10-10T18:34:05Z",
+                "outcome": "booking_made",
+                "transcript": "Customer inquired about availability for weekend stay...",
+                "satisfaction": 4.5,
+            },
+        )
@@ -1,11 +1,16 @@
 # cf4/database/database.py
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy.orm import Session, joinedload
 from datetime import date
+from typing import Callable
 
 # Important: We are importing the classes and the SessionLocal from the models.py file
 # The '.' before 'models' is crucial because it tells Python to look in the same directory.
 from .models import Room, Booking, Customer, SessionLocal, CallSession, ConversationTurn
+from .availability import availability_index, overlapping_bookings, BookingResult, BookingConflictError
+from .cache import (
+    history_cache, customer_cache, turn_record, customer_record,
+    invalidate_session, invalidate_customer
+)
 
 def get_db():
     """
@@ -21,55 +26,92 @@ def get_db():
 def get_available_rooms(db: Session, check_in_date: date, check_out_date: date, num_guests: int):
     """
     Finds rooms that are not booked for the given dates and can accommodate the number of guests.
+
+    The lookup is served by the in-memory availability index, which is loaded from the
+    Booking table on first use and kept up to date by `create_booking`.
     """
-    # First, find all room IDs that are booked during the requested period.
-    # A room is considered booked if its booking period overlaps with the requested dates.
-    booked_room_ids = db.query(Booking.room_id).filter(
-        and_(
-            Booking.check_out_date > check_in_date,
-            Booking.check_in_date < check_out_date
-        )
-    ).all()
+    availability_index.sync(db)
+    return availability_index.available_rooms(check_in_date, check_out_date, num_guests)
+
+def write_if_room_free(db: Session, room_id: int, check_in_date: date, check_out_date: date, write: Callable[[], None]) -> list[tuple[date, date]]:
+    """
+    Calls `write` and commits, in a single transaction that first checks `room_id` is free
+    for [check_in_date, check_out_date). Returns the conflicting stays when it isn't, in
+    which case nothing is written.
+
+    The transaction starts with BEGIN IMMEDIATE, which takes SQLite's write lock before the
+    overlap check. Two workers trying to occupy the same room therefore run one after the
+    other, and the second one sees the first one's booking and gets a conflict instead of a
+    double booking.
+    """
+    if db.in_transaction():
+        db.commit() # BEGIN IMMEDIATE has to be the first statement of the transaction
+    db.connection(execution_options={"sqlite_begin": "IMMEDIATE"})
+    try:
+        conflicts = db.execute(overlapping_bookings(room_id, check_in_date, check_out_date)).all()
+        if conflicts:
+            db.rollback()
+            return [tuple(c) for c in conflicts]
+        write()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return []
+
+def book_room(db: Session, customer_name: str, phone_number: str, room_id: int, check_in_date: date, check_out_date: date, num_guests: int, call_session_id: int = None, *, email: str = None, **booking_fields) -> BookingResult:
+    """
+    Books a room in a single transaction, see `write_if_room_free`.
+    Extra keyword arguments (status, payment_status, total_amount) are set on the Booking.
+    """
+    booking = None
 
-    # The result is a list of tuples, so we extract the first element of each tuple.
-    booked_room_ids = [r_id for r_id, in booked_room_ids]
+    def _write():
+        nonlocal booking
+        # Find or create the customer, in the same transaction as the booking.
+        customer = db.query(Customer).filter(Customer.phone_number == phone_number).first()
+        if not customer:
+            customer = Customer(name=customer_name, phone_number=phone_number, email=email)
+            db.add(customer)
+            db.flush() # Flush to get the new customer's ID
+        elif email and not customer.email:
+            customer.email = email
 
-    # Now, find all rooms that are NOT in the booked list and have enough capacity.
-    available_rooms = db.query(Room).filter(
-        and_(
-            Room.id.notin_(booked_room_ids),
-            Room.capacity >= num_guests
+        booking = Booking(
+            customer_id=customer.id,
+            room_id=room_id,
+            call_session_id=call_session_id,
+            check_in_date=check_in_date,
+            check_out_date=check_out_date,
+            number_of_guests=num_guests,
+            **booking_fields
         )
-    ).all()
+        db.add(booking)
 
-    return available_rooms
+    conflicts = write_if_room_free(db, room_id, check_in_date, check_out_date, _write)
+    if conflicts:
+        availability_index.sync(db, force=True) # the index was stale, catch up now
+        alternatives = availability_index.available_rooms(check_in_date, check_out_date, num_guests)
+        return BookingResult(
+            conflicts=conflicts,
+            alternatives=[room for room in alternatives if room.id != room_id],
+        )
+
+    db.refresh(booking) # Refresh to get the new booking's ID
+    availability_index.add_booking(booking)
+    invalidate_customer(phone_number)
+    return BookingResult(booking=booking)
 
 def create_booking(db: Session, customer_name: str, phone_number: str, room_id: int, check_in_date: date, check_out_date: date, num_guests: int):
     """
     Creates a booking record in the database.
     It first finds or creates a customer based on the phone number.
+    Raises BookingConflictError if the room is already booked for those dates.
     """
-    # Check if a customer with this phone number already exists.
-    customer = db.query(Customer).filter(Customer.phone_number == phone_number).first()
-    if not customer:
-        # If not, create a new customer.
-        customer = Customer(name=customer_name, phone_number=phone_number)
-        db.add(customer)
-        db.commit()
-        db.refresh(customer) # Refresh to get the new customer's ID
-
-    # Create the new booking record.
-    booking = Booking(
-        customer_id=customer.id,
-        room_id=room_id,
-        check_in_date=check_in_date,
-        check_out_date=check_out_date,
-        number_of_guests=num_guests
-    )
-    db.add(booking)
-    db.commit()
-    db.refresh(booking) # Refresh to get the new booking's ID
-    return booking
+    result = book_room(db, customer_name, phone_number, room_id, check_in_date, check_out_date, num_guests)
+    if not result.confirmed:
+        raise BookingConflictError(result)
+    return result.booking
 
 def get_room_by_number(db: Session, room_number: str):
     """A helper function to find a room by its number."""
@@ -90,11 +132,33 @@ def log_conversation_turn(db: Session, session_id: int, speaker: str, text: str)
     turn = ConversationTurn(session_id=session_id, speaker=speaker, text=text)
     db.add(turn)
     db.commit()
+    invalidate_session(session_id)
 
 def get_conversation_history(db: Session, session_id: int):
-    """Retrieves all turns for a given session ID."""
-    return db.query(ConversationTurn).filter(ConversationTurn.session_id == session_id).order_by(ConversationTurn.timestamp).all()
+    """Retrieves all turns for a given session ID, as cached TurnRecord snapshots."""
+    history = history_cache.get(session_id)
+    if history is None:
+        turns = db.query(ConversationTurn).filter(ConversationTurn.session_id == session_id).order_by(ConversationTurn.timestamp).all()
+        history = tuple(turn_record(turn) for turn in turns)
+        if history:
+            history_cache.set(session_id, history)
+    return list(history)
 
 def find_customer_by_phone(db: Session, phone_number: str):
-    """Finds a customer by their phone number."""
-    return db.query(Customer).filter(Customer.phone_number == phone_number).first()
\ No newline at end of file
+    """
+    Finds a customer by their phone number, as a cached CustomerRecord.
+    The customer's bookings and their rooms are loaded in the same query.
+    """
+    record = customer_cache.get(phone_number)
+    if record is None:
+        customer = (
+            db.query(Customer)
+            .options(joinedload(Customer.bookings).joinedload(Booking.room))
+            .filter(Customer.phone_number == phone_number)
+            .first()
+        )
+        if customer is None:
+            return None
+        record = customer_record(customer)
+        customer_cache.set(phone_number, record)
+    return record
\ No newline at end of file
@@ -1,6 +1,6 @@
 # cf4/database/models.py
 import os
-from sqlalchemy import create_engine, Column, Integer, String, Date, ForeignKey, Float, DateTime
+from sqlalchemy import create_engine, event, inspect, text, Column, Index, Integer, String, Date, ForeignKey, Float, DateTime, JSON
 from sqlalchemy.orm import sessionmaker, relationship, declarative_base
 from sqlalchemy.sql import func
 
@@ -13,6 +13,7 @@ class Customer(Base):
     id = Column(Integer, primary_key=True)
     name = Column(String)
     phone_number = Column(String, unique=True, nullable=False)
+    email = Column(String, nullable=True)
     bookings = relationship("Booking", back_populates="customer")
 
 class Room(Base):
@@ -33,8 +34,20 @@ class Booking(Base):
     check_in_date = Column(Date, nullable=False)
     check_out_date = Column(Date, nullable=False)
     number_of_guests = Column(Integer, nullable=False)
+    # Fields managed from the admin dashboard
+    status = Column(String, default="confirmed") # confirmed | pending | cancelled | completed
+    payment_status = Column(String, default="pending") # paid | pending | failed
+    total_amount = Column(Float, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     customer = relationship("Customer", back_populates="bookings")
     room = relationship("Room", back_populates="bookings")
+    __table_args__ = (
+        Index("ix_bookings_call_session_id", "call_session_id"),
+        Index("ix_bookings_room_id_dates", "room_id", "check_in_date", "check_out_date"),
+        Index("ix_bookings_status_id", "status", "id"),
+        Index("ix_bookings_check_in_date", "check_in_date"),
+    )
 
 class CallSession(Base):
     __tablename__ = 'call_sessions'
@@ -51,6 +64,57 @@ class ConversationTurn(Base):
     text = Column(String)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
     session = relationship("CallSession", back_populates="turns")
+    __table_args__ = (
+        Index("ix_conversation_turns_session_id_timestamp", "session_id", "timestamp"),
+    )
+
+class RestaurantOrder(Base):
+    __tablename__ = 'restaurant_orders'
+    id = Column(Integer, primary_key=True)
+    order_type = Column(String, default="dine-in") # dine-in | room-service | takeaway
+    table_number = Column(String, nullable=True)
+    room_number = Column(String, nullable=True)
+    customer_name = Column(String, nullable=True)
+    items = Column(JSON, nullable=False, default=list)
+    total_amount = Column(Float, nullable=False, default=0)
+    status = Column(String, default="pending") # pending | preparing | ready | served | billed
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    __table_args__ = (
+        Index("ix_restaurant_orders_status_id", "status", "id"),
+        Index("ix_restaurant_orders_created_at", "created_at"),
+    )
+
+class CallLog(Base):
+    __tablename__ = 'call_logs'
+    id = Column(Integer, primary_key=True)
+    call_session_id = Column(Integer, ForeignKey('call_sessions.id'), nullable=True)
+    caller_number = Column(String, nullable=True)
+    caller_name = Column(String, nullable=True)
+    intent = Column(String, nullable=True)
+    sentiment = Column(String, nullable=True) # positive | neutral | negative
+    duration = Column(Integer, default=0) # seconds
+    start_time = Column(DateTime(timezone=True), server_default=func.now())
+    end_time = Column(DateTime(timezone=True), nullable=True)
+    outcome = Column(String, nullable=True)
+    transcript = Column(String, nullable=True)
+    satisfaction = Column(Float, nullable=True)
+    __table_args__ = (
+        Index("ix_call_logs_sentiment_id", "sentiment", "id"),
+        Index("ix_call_logs_start_time", "start_time"),
+    )
+
+class StatsRollup(Base):
+    """
+    Materialized dashboard counters (see database/stats.py), so they survive a restart.
+    period is "total", "hour" or "day"; bucket is "" for totals, "2024-10-12T18" for an
+    hour and "2024-10-12" for a day. period "watermark" holds the last row id counted per table.
+    """
+    __tablename__ = 'stats_rollups'
+    period = Column(String, primary_key=True)
+    bucket = Column(String, primary_key=True)
+    metric = Column(String, primary_key=True)
+    value = Column(Float, nullable=False, default=0)
 
 # --- NEW AND IMPROVED DATABASE CONNECTION ---
 
@@ -62,9 +126,66 @@ db_path = os.path.join(BASE_DIR, "hotel_agent.db")
 
 # The new, robust DATABASE_URL
 DATABASE_URL = f"sqlite:///{db_path}"
+# Same file, opened through aiosqlite for the async data-access layer (see async_database.py)
+ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{db_path}"
+
+# Connection pool settings shared by the sync and the async engine. SQLite only allows one
+# writer at a time, so a few connections are enough; extra ones just wait on the file lock.
+POOL_SETTINGS = {
+    "pool_size": 5,
+    "max_overflow": 5,
+    "pool_timeout": 10,
+    "pool_recycle": 1800,
+}
 
-engine = create_engine(DATABASE_URL)
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Configures every new SQLite connection:
+    - WAL lets readers run while a writer commits, instead of blocking on the whole file
+    - synchronous=NORMAL only fsyncs at checkpoints, which is safe in WAL mode
+    - busy_timeout waits for the write lock instead of failing with "database is locked"
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+    # Let SQLAlchemy emit BEGIN itself (see _begin_transaction) instead of the sqlite3
+    # driver, which delays it until the first write and can't do BEGIN IMMEDIATE.
+    dbapi_connection.isolation_level = None
+
+def _begin_transaction(conn):
+    """
+    Starts every transaction explicitly. Pass execution_options={"sqlite_begin": "IMMEDIATE"}
+    to take the write lock up front, so that reads made inside the transaction (e.g. the
+    overlap check in book_room) can't be invalidated by another process before commit.
+    """
+    mode = conn.get_execution_options().get("sqlite_begin", "DEFERRED")
+    conn.exec_driver_sql(f"BEGIN {mode}")
+
+def configure_sqlite_engine(sync_engine):
+    """Attaches the connection and transaction handlers above to an engine."""
+    event.listen(sync_engine, "connect", _set_sqlite_pragmas)
+    event.listen(sync_engine, "begin", _begin_transaction)
+    return sync_engine
+
+engine = configure_sqlite_engine(create_engine(DATABASE_URL, **POOL_SETTINGS))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Processes forked from an initialized one (the agent's "zygote" context) get their own pooled
+# connections instead of reusing the parent's sqlite handles
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
+
+def create_async_db_engine():
+    """
+    Creates the async engine used by the voice agent tools.
+    It should be created once per worker process (in prewarm) and shared by every call.
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **POOL_SETTINGS)
+    configure_sqlite_engine(async_engine.sync_engine)
+    return async_engine
 
 def init_db():
     """Creates all the tables in the database."""
@@ -72,7 +193,49 @@ def init_db():
     # Ensure the directory exists
     os.makedirs(os.path.dirname(db_path), exist_ok=True)
     Base.metadata.create_all(bind=engine)
+    migrate_columns()
+    migrate_indexes()
     print("Database initialized successfully.")
 
+def migrate_columns(bind=None):
+    """
+    Adds the columns declared on the models that are missing from existing tables, and fills
+    them with the column's default where it has a constant one. Like migrate_indexes, this
+    only ever adds things and is safe to run on every startup.
+    """
+    bind = bind or engine
+    insp = inspect(bind)
+    existing_tables = set(insp.get_table_names())
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {column["name"] for column in insp.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                # SQLite can't ADD COLUMN with a non-constant default (e.g. CURRENT_TIMESTAMP),
+                # so columns are added bare and constant defaults are backfilled below
+                column_type = column.type.compile(dialect=bind.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'))
+                if column.default is not None and column.default.is_scalar:
+                    conn.execute(
+                        table.update().where(column.is_(None)).values({column.name: column.default.arg})
+                    )
+
+def migrate_indexes(bind=None):
+    """
+    Creates the indexes declared on the models that are missing from an existing database.
+    create_all() only adds indexes together with new tables, so databases created before an
+    index was declared need this step. It is safe to run on every startup.
+    """
+    bind = bind or engine
+    existing_tables = set(inspect(bind).get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+
 if __name__ == "__main__":
     init_db()
\ No newline at end of file
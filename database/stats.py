@@ -0,0 +1,423 @@
+# cf4/database/stats.py
+#
+# Running counters behind /api/dashboard/stats and /api/calls/analytics. Every booking,
+# restaurant order and call log contributes a handful of metrics (counts, revenue, call
+# duration, sentiment, ...) to a grand total and to the hour and day it happened in, so the
+# dashboard reads a few dict entries instead of aggregating the tables on every poll.
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from .models import Booking, CallLog, RestaurantOrder, StatsRollup
+
+logger = logging.getLogger("dashboard-stats")
+
+TOTAL, HOUR, DAY, WATERMARK = "total", "hour", "day", "watermark"
+
+# call outcomes that count as "resolved" (and as a conversion for the call's intent)
+RESOLVED_OUTCOMES = frozenset({"booking_made", "order_placed", "resolved", "completed", "handled"})
+
+
+def _utc(value) -> Optional[datetime]:
+    """Naive UTC, which is what SQLite's CURRENT_TIMESTAMP stores."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def hour_key(when: datetime) -> str:
+    return when.strftime("%Y-%m-%dT%H")
+
+
+def day_key(when) -> str:
+    return when.strftime("%Y-%m-%d")
+
+
+# --- What each row adds to the counters ---
+
+
+def _booking_metrics(row) -> dict:
+    status = row.status or "confirmed"
+    metrics = {"bookings": 1, f"bookings.{status}": 1}
+    if status != "cancelled":
+        metrics["revenue"] = row.total_amount or 0
+    return metrics
+
+
+def _order_metrics(row) -> dict:
+    status = row.status or "pending"
+    metrics = {"orders": 1, f"orders.{status}": 1}
+    if status != "cancelled":
+        metrics["orders.revenue"] = row.total_amount or 0
+    return metrics
+
+
+def _call_metrics(row) -> dict:
+    metrics = {"calls": 1, "calls.duration": row.duration or 0}
+    if row.satisfaction is not None:
+        metrics["calls.rated"] = 1
+        metrics["calls.satisfaction"] = row.satisfaction
+    resolved = row.outcome in RESOLVED_OUTCOMES
+    if resolved:
+        metrics["calls.resolved"] = 1
+    if row.sentiment:
+        metrics[f"calls.sentiment.{row.sentiment}"] = 1
+    if row.intent:
+        metrics[f"calls.intent.{row.intent}"] = 1
+        if resolved:
+            metrics[f"calls.converted.{row.intent}"] = 1
+    return metrics
+
+
+@dataclass(frozen=True)
+class _Source:
+    model: type
+    columns: tuple
+    time_column: str
+    metrics: Callable[[object], dict]
+
+
+SOURCES = {
+    "bookings": _Source(
+        Booking,
+        (Booking.id, Booking.status, Booking.total_amount, Booking.created_at),
+        "created_at",
+        _booking_metrics,
+    ),
+    "orders": _Source(
+        RestaurantOrder,
+        (
+            RestaurantOrder.id,
+            RestaurantOrder.status,
+            RestaurantOrder.total_amount,
+            RestaurantOrder.created_at,
+        ),
+        "created_at",
+        _order_metrics,
+    ),
+    "calls": _Source(
+        CallLog,
+        (
+            CallLog.id,
+            CallLog.intent,
+            CallLog.sentiment,
+            CallLog.duration,
+            CallLog.satisfaction,
+            CallLog.outcome,
+            CallLog.start_time,
+        ),
+        "start_time",
+        _call_metrics,
+    ),
+}
+
+
+@dataclass(frozen=True)
+class Contribution:
+    """What one row currently adds to the counters, taken before the row is changed."""
+
+    when: Optional[datetime]
+    metrics: dict
+
+
+class StatsAggregator:
+    """
+    Dashboard counters kept up to date incrementally.
+
+    Rows inserted by this or any other process are counted by `sync`, which only reads rows
+    with an id above the last one counted (at most once every `max_staleness` seconds, or
+    right away with `force=True`). Updates and deletes made through the dashboard are applied
+    as a diff: take `contribution()` before changing the row and pass it to `replace()` after
+    the commit. Everything is recounted from the tables every `reload_interval` seconds, which
+    also catches changes made behind the dashboard's back.
+
+    Hourly buckets are kept for `hour_retention`, daily ones for `day_retention`; older rows
+    only count towards the totals. With `persist=True` the counters are also written to the
+    stats_rollups table after every change and read back on startup, so a restart doesn't
+    have to aggregate the full tables again.
+    """
+
+    def __init__(
+        self,
+        *,
+        persist: bool = False,
+        max_staleness: float = 2.0,
+        reload_interval: float = 3600.0,
+        hour_retention: timedelta = timedelta(days=7),
+        day_retention: timedelta = timedelta(days=400),
+    ) -> None:
+        self.persist = persist
+        self._max_staleness = max_staleness
+        self._reload_interval = reload_interval
+        self._hour_retention = hour_retention
+        self._day_retention = day_retention
+        self._lock = threading.RLock()
+        self._totals: dict[str, float] = {}
+        self._hours: dict[str, dict[str, float]] = {}
+        self._days: dict[str, dict[str, float]] = {}
+        self._watermarks = dict.fromkeys(SOURCES, 0)
+        self._dirty: set[tuple[str, str]] = set()  # (period, bucket) to write on save()
+        self._last_sync = 0.0
+        self._last_load = 0.0
+        self._loaded = False
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def invalidate(self) -> None:
+        """Forces a recount from the tables on the next `sync`."""
+        self._loaded = False
+        self._last_load = 0.0
+
+    # --- Loading ---
+
+    def load(self, db: Session) -> None:
+        """Restores the persisted counters if there are any, otherwise recounts everything."""
+        if self.persist and self._restore(db):
+            self.sync(db, force=True)
+        else:
+            self.rebuild(db)
+
+    def rebuild(self, db: Session) -> None:
+        """Recounts every row of the source tables."""
+        with self._lock:
+            self._reset_locked()
+            for kind, source in SOURCES.items():
+                for row in db.execute(select(*source.columns)).yield_per(10_000):
+                    self._count_locked(kind, row)
+            self._mark_all_dirty_locked()
+            self._last_sync = self._last_load = time.monotonic()
+            self._loaded = True
+
+        if self.persist:
+            # a recount replaces the materialized rows, including buckets that no longer exist
+            db.execute(delete(StatsRollup))
+            self.save(db)
+
+    def _restore(self, db: Session) -> bool:
+        rows = db.execute(
+            select(StatsRollup.period, StatsRollup.bucket, StatsRollup.metric, StatsRollup.value)
+        ).all()
+        if not any(period == WATERMARK for period, _, _, _ in rows):
+            return False
+
+        hour_cutoff, day_cutoff = self._cutoffs()
+        with self._lock:
+            self._reset_locked()
+            for period, bucket, metric, value in rows:
+                if period == WATERMARK:
+                    if bucket in self._watermarks:
+                        self._watermarks[bucket] = int(value)
+                elif period == TOTAL:
+                    self._totals[metric] = value
+                elif period == HOUR and bucket >= hour_cutoff:
+                    self._hours.setdefault(bucket, {})[metric] = value
+                elif period == DAY and bucket >= day_cutoff:
+                    self._days.setdefault(bucket, {})[metric] = value
+            self._last_sync = self._last_load = time.monotonic()
+            self._loaded = True
+        return True
+
+    def sync(self, db: Session, *, force: bool = False) -> None:
+        """Loads the counters if needed, then counts rows written since the last sync."""
+        now = time.monotonic()
+        if not self._loaded:
+            self.load(db)
+            return
+        if now - self._last_load >= self._reload_interval:
+            self.rebuild(db)
+            return
+
+        if not force and now - self._last_sync < self._max_staleness:
+            return
+
+        new_rows = {
+            kind: db.execute(
+                select(*source.columns)
+                .where(source.model.id > self._watermarks[kind])
+                .order_by(source.model.id)
+            ).all()
+            for kind, source in SOURCES.items()
+        }
+        with self._lock:
+            for kind, rows in new_rows.items():
+                for row in rows:
+                    if row.id > self._watermarks[kind]:
+                        self._count_locked(kind, row)
+            self._last_sync = now
+
+        if any(new_rows.values()):
+            self.save(db)
+
+    # --- Updates ---
+
+    def contribution(self, kind: str, row) -> Optional[Contribution]:
+        """
+        What `row` currently adds to the counters, or None if it hasn't been counted yet
+        (in which case `sync` will count it as it is once it gets there).
+        """
+        if not self._loaded or row.id > self._watermarks[kind]:
+            return None
+        source = SOURCES[kind]
+        return Contribution(
+            when=_utc(getattr(row, source.time_column)), metrics=source.metrics(row)
+        )
+
+    def replace(self, kind: str, before: Optional[Contribution], row) -> None:
+        """Swaps the old contribution of an updated row for its new one. `row=None` for a delete."""
+        if before is None or not self._loaded:
+            return
+
+        source = SOURCES[kind]
+        with self._lock:
+            self._apply_locked(before.when, before.metrics, -1)
+            if row is not None:
+                self._apply_locked(_utc(getattr(row, source.time_column)), source.metrics(row), 1)
+
+    def save(self, db: Session) -> None:
+        """Writes the buckets changed since the last save to stats_rollups."""
+        if not self.persist:
+            return
+
+        with self._lock:
+            if not self._dirty:
+                return
+            values = []
+            for period, bucket in self._dirty:
+                metrics = self._bucket_locked(period, bucket, create=False) or {}
+                values.extend(
+                    {"period": period, "bucket": bucket, "metric": metric, "value": value}
+                    for metric, value in metrics.items()
+                )
+            values.extend(
+                {"period": WATERMARK, "bucket": kind, "metric": "id", "value": last_id}
+                for kind, last_id in self._watermarks.items()
+            )
+            self._dirty.clear()
+
+        hour_cutoff, day_cutoff = self._cutoffs()
+        try:
+            stmt = sqlite_insert(StatsRollup)
+            db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[StatsRollup.period, StatsRollup.bucket, StatsRollup.metric],
+                    set_={"value": stmt.excluded.value},
+                ),
+                values,
+            )
+            db.execute(
+                delete(StatsRollup).where(
+                    StatsRollup.period == HOUR, StatsRollup.bucket < hour_cutoff
+                )
+            )
+            db.execute(
+                delete(StatsRollup).where(
+                    StatsRollup.period == DAY, StatsRollup.bucket < day_cutoff
+                )
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            # the in-memory counters are still right, the next recount rewrites the table
+            logger.exception("failed to persist dashboard stats")
+            self._last_load = 0.0
+
+    # --- Reads ---
+
+    def total(self, metric: str) -> float:
+        return self._totals.get(metric, 0)
+
+    def hour(self, metric: str, when: datetime) -> float:
+        return self._hours.get(hour_key(when), {}).get(metric, 0)
+
+    def day(self, metric: str, when) -> float:
+        return self._days.get(day_key(when), {}).get(metric, 0)
+
+    def days(self, metric: str, first: date, last: date) -> float:
+        """Sum of the daily buckets from `first` to `last`, inclusive."""
+        total, current = 0.0, first
+        while current <= last:
+            total += self.day(metric, current)
+            current += timedelta(days=1)
+        return total
+
+    def breakdown(self, prefix: str, *, period: str = TOTAL, bucket: str = "") -> dict[str, float]:
+        """e.g. breakdown("calls.sentiment") -> {"positive": 12, "neutral": 3}"""
+        prefix += "."
+        with self._lock:
+            metrics = self._bucket_locked(period, bucket, create=False) or {}
+            return {m[len(prefix) :]: v for m, v in metrics.items() if m.startswith(prefix) and v}
+
+    # --- Internals ---
+
+    def _cutoffs(self) -> tuple[str, str]:
+        now = utcnow()
+        return hour_key(now - self._hour_retention), day_key(now - self._day_retention)
+
+    def _reset_locked(self) -> None:
+        self._totals, self._hours, self._days = {}, {}, {}
+        self._watermarks = dict.fromkeys(SOURCES, 0)
+        self._dirty.clear()
+
+    def _mark_all_dirty_locked(self) -> None:
+        self._dirty.add((TOTAL, ""))
+        self._dirty.update((HOUR, bucket) for bucket in self._hours)
+        self._dirty.update((DAY, bucket) for bucket in self._days)
+
+    def _count_locked(self, kind: str, row) -> None:
+        source = SOURCES[kind]
+        self._apply_locked(_utc(getattr(row, source.time_column)), source.metrics(row), 1)
+        self._watermarks[kind] = max(self._watermarks[kind], row.id)
+
+    def _bucket_locked(self, period: str, bucket: str, *, create: bool) -> Optional[dict]:
+        if period == TOTAL:
+            return self._totals
+        buckets = self._hours if period == HOUR else self._days
+        metrics = buckets.get(bucket)
+        if metrics is None and create:
+            metrics = buckets[bucket] = {}
+            self._prune_locked()
+        return metrics
+
+    def _apply_locked(self, when: Optional[datetime], metrics: dict, sign: int) -> None:
+        targets = [(TOTAL, "")]
+        if when is not None:
+            hour_cutoff, day_cutoff = self._cutoffs()
+            if hour_key(when) >= hour_cutoff:
+                targets.append((HOUR, hour_key(when)))
+            if day_key(when) >= day_cutoff:
+                targets.append((DAY, day_key(when)))
+
+        for period, bucket in targets:
+            counters = self._bucket_locked(period, bucket, create=True)
+            for metric, value in metrics.items():
+                counters[metric] = counters.get(metric, 0) + sign * value
+            self._dirty.add((period, bucket))
+
+    def _prune_locked(self) -> None:
+        # only runs when a new bucket is created, i.e. about once an hour
+        hour_cutoff, day_cutoff = self._cutoffs()
+        for buckets, cutoff in ((self._hours, hour_cutoff), (self._days, day_cutoff)):
+            for bucket in [b for b in buckets if b < cutoff]:
+                del buckets[bucket]
+
+
+# Shared by the dashboard servers. Set `dashboard_stats.persist = True` before the first
+# request to keep the counters in the stats_rollups table.
+dashboard_stats = StatsAggregator()
@@ -1,331 +1,315 @@
 # Enhanced Hotel Backend API Server
 # This file extends your existing server.py with additional endpoints for the admin dashboard
+#
+# An ASGI app (Starlette), run by uvicorn on a single long-lived event loop. The LiveKit
+# client is created once at startup and shared by every request; database work runs on the
+# threadpool so a slow SQLite write never stalls the loop.
 
 import os
-import uuid
 import logging
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-try:
-    from livekit import api
-except ImportError:
-    # Fallback if livekit api module structure is different
-    import livekit
-    api = None
-    print("Warning: LiveKit API not available, running in mock mode")
+import contextlib
+from datetime import datetime
+
+import uvicorn
 from dotenv import load_dotenv
-from datetime import datetime, timedelta
-import random
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from database.models import SessionLocal, init_db
+from database.availability import BookingConflictError
+from database.dashboard import seed_demo_data
+from database.stats import dashboard_stats
+from database import dashboard
+from live_feed import CALL_UPDATED, CALL_ENDED, EVENT_TYPES, live_calls
+from token_service import RoomPool, TokenService
+from livekit import api
 
 # Load environment variables
 load_dotenv()
 
-app = Flask(__name__)
-CORS(app, origins=["http://localhost:3000"])  # Allow dashboard to access API
-
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
-livekit_api = None
-
-# Mock data storage (in production, use a proper database)
-bookings_db = [
-    {
-        "id": "BK001",
-        "guestName": "Rajesh Sharma",
-        "email": "rajesh@example.com",
-        "phone": "+91 9876543210",
-        "checkIn": "2024-10-12",
-        "checkOut": "2024-10-15",
-        "roomType": "Deluxe Suite",
-        "roomNumber": "205",
-        "guests": 2,
-        "totalAmount": 15000,
-        "status": "confirmed",
-        "paymentStatus": "paid",
-        "createdAt": "2024-10-10T10:30:00Z"
-    },
-    {
-        "id": "BK002",
-        "guestName": "Priya Patel",
-        "email": "priya@example.com",
-        "phone": "+91 9876543211",
-        "checkIn": "2024-10-13",
-        "checkOut": "2024-10-16",
-        "roomType": "Standard Room",
-        "roomNumber": "108",
-        "guests": 1,
-        "totalAmount": 9000,
-        "status": "pending",
-        "paymentStatus": "pending",
-        "createdAt": "2024-10-10T14:20:00Z"
-    }
-]
-
-restaurant_orders_db = [
-    {
-        "id": "ORD001",
-        "tableNumber": "8",
-        "customerName": "Anjali Singh",
-        "roomNumber": None,
-        "items": [
-            {"id": "1", "name": "Butter Chicken", "quantity": 2, "price": 450, "category": "Main Course"},
-            {"id": "2", "name": "Naan Bread", "quantity": 3, "price": 80, "category": "Bread"}
-        ],
-        "totalAmount": 1130,
-        "status": "preparing",
-        "orderType": "dine-in",
-        "createdAt": "2024-10-10T18:30:00Z"
-    }
-]
-
-call_logs_db = [
-    {
-        "id": "CALL001",
-        "callerNumber": "+91 9876543210",
-        "callerName": "Rahul Sharma",
-        "intent": "Booking Inquiry",
-        "sentiment": "positive",
-        "duration": 245,
-        "startTime": "2024-10-10T18:30:00Z",
-        "endTime": "2024-10-10T18:34:05Z",
-        "outcome": "booking_made",
-        "transcript": "Customer inquired about availability for weekend stay..."
+tokens = TokenService.from_env()
+# ROOM_POOL_SIZE rooms are created ahead of time, so /create_token doesn't wait on LiveKit
+rooms = RoomPool(tokens, size=int(os.environ.get("ROOM_POOL_SIZE", "0")))
+
+# Bookings, restaurant orders and call logs live in the hotel database (database/models.py).
+# Create the tables, and the demo rows on a fresh database, before serving requests.
+# DASHBOARD_STATS_PERSIST=1 keeps the dashboard counters in SQLite across restarts.
+dashboard_stats.persist = os.environ.get("DASHBOARD_STATS_PERSIST") == "1"
+init_db()
+with SessionLocal() as db:
+    seed_demo_data(db)
+    dashboard_stats.sync(db)
+
+def error(message, status_code):
+    return JSONResponse({"error": message}, status_code=status_code)
+
+async def in_db(fnc, *args):
+    """Runs fnc(db, *args) with its own session on the threadpool."""
+    def _run():
+        with SessionLocal() as db:
+            return fnc(db, *args)
+    return await run_in_threadpool(_run)
+
+async def json_body(request: Request) -> dict:
+    try:
+        data = await request.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+def page_args(request: Request, **filters):
+    """Reads the pagination (cursor, limit) and date-range query parameters."""
+    return {
+        "cursor": request.query_params.get("cursor"),
+        "limit": request.query_params.get("limit", dashboard.DEFAULT_PAGE_SIZE),
+        "date_from": dashboard.parse_date(request.query_params.get("startDate")),
+        "date_to": dashboard.parse_date(request.query_params.get("endDate")),
+        **filters,
     }
-]
-
-live_calls_db = []
 
 # Existing LiveKit endpoint
-@app.route("/create_token", methods=["POST"])
-async def create_token():
-    global livekit_api
+async def create_token(request: Request):
+    if not tokens.configured:
+        logging.error("LiveKit server credentials are not configured")
+        return error("LiveKit server credentials are not configured", 500)
 
-    if livekit_api is None:
-        LIVEKIT_URL = os.environ.get("LIVEKIT_URL")
-        LIVEKIT_API_KEY = os.environ.get("LIVEKIT_API_KEY")
-        LIVEKIT_API_SECRET = os.environ.get("LIVEKIT_API_SECRET")
-
-        if not all([LIVEKIT_URL, LIVEKIT_API_KEY, LIVEKIT_API_SECRET]):
-            logging.error("LiveKit server credentials are not configured")
-            return jsonify({"error": "LiveKit server credentials are not configured"}), 500
-
-        http_url = LIVEKIT_URL.replace("wss://", "https://").replace("ws://", "http://")
-        livekit_api = api.LiveKitAPI(http_url, LIVEKIT_API_KEY, LIVEKIT_API_SECRET)
-
-    data = request.get_json()
+    data = await json_body(request)
     user_name = data.get("name")
     if not user_name:
-        return jsonify({"error": "Name is required"}), 400
+        return error("Name is required", 400)
 
     try:
-        room_name = f"agent-demo-{uuid.uuid4().hex[:8]}"
-        logging.info(f"Creating new session for '{user_name}' in room '{room_name}'")
-        
-        await livekit_api.room.create_room(api.CreateRoomRequest(name=room_name))
-        logging.info(f"Room '{room_name}' created.")
-
-        token = (
-            api.AccessToken(os.environ.get("LIVEKIT_API_KEY"), os.environ.get("LIVEKIT_API_SECRET"))
-            .with_identity(user_name)
-            .with_name(user_name)
-            .with_grants(api.VideoGrants(room_join=True, room=room_name))
-            .to_jwt()
-        )
+        room_name = (await rooms.acquire()).name
+        logging.info(f"Created new session for '{user_name}' in room '{room_name}'")
+
+        token = tokens.mint(user_name, room_name)
 
         try:
-            await livekit_api.agent_dispatch.create_dispatch(
-                room=room_name,
-                agent_name="my-agent"
+            await tokens.api.agent_dispatch.create_dispatch(
+                api.CreateAgentDispatchRequest(room=room_name, agent_name="my-agent")
             )
             logging.info(f"Agent dispatched successfully to room '{room_name}'.")
         except Exception as dispatch_error:
             logging.warning(f"Agent dispatch failed (agent may join automatically): {dispatch_error}")
-        
-        return jsonify({"token": token, "livekit_url": os.environ.get("LIVEKIT_URL")})
-    
+
+        return JSONResponse({"token": token, "livekit_url": tokens.url})
+
     except Exception as e:
         logging.error(f"An error occurred in create_token: {e}", exc_info=True)
-        return jsonify({"error": "Failed to set up agent session."}), 500
+        return error("Failed to set up agent session.", 500)
 
 # Dashboard Statistics
-@app.route("/api/dashboard/stats", methods=["GET"])
-def get_dashboard_stats():
+async def get_dashboard_stats(request: Request):
+    totals = await in_db(dashboard.dashboard_totals)
     stats = {
-        "totalBookings": len(bookings_db),
-        "todaysBookings": len([b for b in bookings_db if b["createdAt"].startswith("2024-10-10")]),
-        "revenue": sum(b["totalAmount"] for b in bookings_db),
-        "occupancyRate": 87,
-        "totalCalls": len(call_logs_db) + 89,  # Including historical calls
-        "todaysCalls": len([c for c in call_logs_db if c["startTime"].startswith("2024-10-10")]) + 12,
-        "averageCallDuration": 225,
-        "conversionRate": 68,
-        "activeRooms": 44,
-        "totalRooms": 50,
-        "restaurantOrders": len(restaurant_orders_db),
-        "pendingOrders": len([o for o in restaurant_orders_db if o["status"] == "pending"])
+        "totalBookings": totals["totalBookings"],
+        "todaysBookings": totals["todaysBookings"],
+        "revenue": totals["revenue"],
+        "occupancyRate": totals["occupancyRate"],
+        "totalCalls": totals["totalCalls"],
+        "todaysCalls": totals["todaysCalls"],
+        "averageCallDuration": totals["averageCallDuration"],
+        "conversionRate": totals["resolutionRate"],
+        "activeRooms": totals["occupiedRooms"],
+        "totalRooms": totals["totalRooms"],
+        "restaurantOrders": totals["restaurantOrders"],
+        "pendingOrders": totals["pendingOrders"]
     }
-    return jsonify(stats)
+    return JSONResponse(stats)
 
 # Bookings Management
-@app.route("/api/bookings", methods=["GET"])
-def get_bookings():
-    return jsonify(bookings_db)
-
-@app.route("/api/bookings", methods=["POST"])
-def create_booking():
-    data = request.get_json()
-    booking = {
-        "id": f"BK{len(bookings_db) + 1:03d}",
-        "guestName": data.get("guestName"),
-        "email": data.get("email"),
-        "phone": data.get("phone"),
-        "checkIn": data.get("checkIn"),
-        "checkOut": data.get("checkOut"),
-        "roomType": data.get("roomType"),
-        "roomNumber": f"{random.randint(100, 500)}",
-        "guests": data.get("guests", 1),
-        "totalAmount": data.get("totalAmount", 5000),
-        "status": "confirmed",
-        "paymentStatus": "pending",
-        "createdAt": datetime.now().isoformat()
-    }
-    bookings_db.append(booking)
-    return jsonify(booking), 201
-
-@app.route("/api/bookings/<booking_id>", methods=["PUT"])
-def update_booking(booking_id):
-    data = request.get_json()
-    for booking in bookings_db:
-        if booking["id"] == booking_id:
-            booking.update(data)
-            return jsonify(booking)
-    return jsonify({"error": "Booking not found"}), 404
-
-@app.route("/api/bookings/<booking_id>", methods=["DELETE"])
-def delete_booking(booking_id):
-    global bookings_db
-    bookings_db = [b for b in bookings_db if b["id"] != booking_id]
-    return jsonify({"message": "Booking deleted successfully"})
+async def get_bookings(request: Request):
+    try:
+        args = page_args(request, status=request.query_params.get("status"))
+    except ValueError:
+        return error("Invalid date", 400)
+    return JSONResponse(await in_db(lambda db: dashboard.list_bookings(db, **args).to_dict()))
+
+async def create_booking(request: Request):
+    data = await json_body(request)
+
+    def _create(db):
+        try:
+            result = dashboard.create_booking(db, data)
+        except ValueError as e:
+            return error(str(e), 400)
+        if not result.confirmed:
+            return JSONResponse({
+                "error": "No room available for those dates",
+                "conflicts": [[str(d) for d in c] for c in result.conflicts],
+                "alternatives": [room.room_number for room in result.alternatives],
+            }, status_code=409)
+        return JSONResponse(dashboard.serialize_booking(result.booking), status_code=201)
+
+    return await in_db(_create)
+
+async def update_booking(request: Request):
+    booking_id = request.path_params["booking_id"]
+    data = await json_body(request)
+
+    def _update(db):
+        try:
+            booking = dashboard.update_booking(db, booking_id, data)
+        except BookingConflictError as e:
+            return JSONResponse({"error": "The room has been booked again for those dates",
+                                 "conflicts": [[str(d) for d in c] for c in e.result.conflicts]}, status_code=409)
+        if booking is None:
+            return error("Booking not found", 404)
+        return JSONResponse(dashboard.serialize_booking(booking))
+
+    return await in_db(_update)
+
+async def delete_booking(request: Request):
+    if not await in_db(dashboard.delete_booking, request.path_params["booking_id"]):
+        return error("Booking not found", 404)
+    return JSONResponse({"message": "Booking deleted successfully"})
 
 # Restaurant Management
-@app.route("/api/restaurant/orders", methods=["GET"])
-def get_restaurant_orders():
-    return jsonify(restaurant_orders_db)
-
-@app.route("/api/restaurant/orders", methods=["POST"])
-def create_restaurant_order():
-    data = request.get_json()
-    order = {
-        "id": f"ORD{len(restaurant_orders_db) + 1:03d}",
-        "tableNumber": data.get("tableNumber"),
-        "customerName": data.get("customerName"),
-        "roomNumber": data.get("roomNumber"),
-        "items": data.get("items", []),
-        "totalAmount": sum(item["price"] * item["quantity"] for item in data.get("items", [])),
-        "status": "pending",
-        "orderType": data.get("orderType", "dine-in"),
-        "createdAt": datetime.now().isoformat()
-    }
-    restaurant_orders_db.append(order)
-    return jsonify(order), 201
-
-@app.route("/api/restaurant/orders/<order_id>/status", methods=["PATCH"])
-def update_order_status(order_id):
-    data = request.get_json()
-    status = data.get("status")
-    
-    for order in restaurant_orders_db:
-        if order["id"] == order_id:
-            order["status"] = status
-            return jsonify(order)
-    return jsonify({"error": "Order not found"}), 404
+async def get_restaurant_orders(request: Request):
+    try:
+        args = page_args(request, status=request.query_params.get("status"))
+    except ValueError:
+        return error("Invalid date", 400)
+    return JSONResponse(await in_db(lambda db: dashboard.list_orders(db, **args).to_dict()))
+
+async def create_restaurant_order(request: Request):
+    data = await json_body(request)
+    order = await in_db(lambda db: dashboard.serialize_order(dashboard.create_order(db, {**data, "status": "pending"})))
+    return JSONResponse(order, status_code=201)
+
+async def update_order_status(request: Request):
+    order_id = request.path_params["order_id"]
+    data = await json_body(request)
+
+    def _update(db):
+        order = dashboard.update_order(db, order_id, {"status": data.get("status")})
+        return dashboard.serialize_order(order) if order is not None else None
+
+    order = await in_db(_update)
+    if order is None:
+        return error("Order not found", 404)
+    return JSONResponse(order)
 
 # Call Analytics
-@app.route("/api/calls/logs", methods=["GET"])
-def get_call_logs():
-    # Add some filtering logic based on query parameters
-    start_date = request.args.get("startDate")
-    end_date = request.args.get("endDate")
-    sentiment = request.args.get("sentiment")
-    intent = request.args.get("intent")
-    
-    filtered_logs = call_logs_db
-    
-    if sentiment:
-        filtered_logs = [log for log in filtered_logs if log["sentiment"] == sentiment]
-    if intent:
-        filtered_logs = [log for log in filtered_logs if log["intent"] == intent]
-    
-    return jsonify(filtered_logs)
-
-@app.route("/api/calls/analytics/<timeframe>", methods=["GET"])
-def get_call_analytics(timeframe):
-    # Generate mock analytics data based on timeframe
-    analytics = {
-        "callVolume": [
-            {"name": f"{i:02d}:00", "calls": random.randint(0, 35)} 
-            for i in range(24)
-        ],
-        "sentimentTrend": [
-            {
-                "name": day,
-                "positive": random.randint(75, 95),
-                "neutral": random.randint(5, 20),
-                "negative": random.randint(1, 10)
-            }
-            for day in ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
-        ],
-        "conversionRates": [
-            {"intent": "Booking Inquiry", "calls": 145, "conversions": 89, "rate": 61},
-            {"intent": "Room Service", "calls": 67, "conversions": 67, "rate": 100},
-            {"intent": "Restaurant", "calls": 34, "conversions": 32, "rate": 94},
-            {"intent": "Complaint", "calls": 12, "conversions": 11, "rate": 92},
-            {"intent": "General Info", "calls": 89, "conversions": 23, "rate": 26}
-        ]
-    }
-    return jsonify(analytics)
+async def get_call_logs(request: Request):
+    try:
+        args = page_args(
+            request,
+            sentiment=request.query_params.get("sentiment"),
+            intent=request.query_params.get("intent"),
+        )
+    except ValueError:
+        return error("Invalid date", 400)
+    return JSONResponse(await in_db(lambda db: dashboard.list_call_logs(db, **args).to_dict()))
+
+async def get_call_analytics(request: Request):
+    try:
+        return JSONResponse(await in_db(dashboard.call_analytics, request.path_params["timeframe"]))
+    except ValueError as e:
+        return error(str(e), 400)
 
 # Live Calls Management
-@app.route("/api/calls/live", methods=["GET"])
-def get_live_calls():
-    return jsonify(live_calls_db)
-
-@app.route("/api/calls/<call_id>/answer", methods=["POST"])
-def answer_call(call_id):
-    for call in live_calls_db:
-        if call["id"] == call_id:
-            call["status"] = "active"
-            return jsonify({"message": "Call answered successfully"})
-    return jsonify({"error": "Call not found"}), 404
-
-@app.route("/api/calls/<call_id>/end", methods=["POST"])
-def end_call(call_id):
-    global live_calls_db
-    live_calls_db = [call for call in live_calls_db if call["id"] != call_id]
-    return jsonify({"message": "Call ended successfully"})
-
-@app.route("/api/calls/<call_id>/hold", methods=["POST"])
-def hold_call(call_id):
-    for call in live_calls_db:
-        if call["id"] == call_id:
-            call["status"] = "on_hold"
-            return jsonify({"message": "Call put on hold"})
-    return jsonify({"error": "Call not found"}), 404
+# Calls are published by the agent worker and pushed to dashboards by live_feed/broker.py
+async def get_live_calls(request: Request):
+    return JSONResponse(live_calls.calls())
+
+async def stream_live_calls(request: Request):
+    """Server-Sent Events: a snapshot of the live calls, then call_started/updated/ended deltas."""
+    return StreamingResponse(
+        live_calls.astream(request.headers.get("last-event-id")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def publish_live_call_events(request: Request):
+    """Receives batches of call events from the agent worker (live_feed/publisher.py)."""
+    token = os.environ.get("LIVE_FEED_TOKEN")
+    if token and request.headers.get("authorization") != f"Bearer {token}":
+        return error("Unauthorized", 401)
+    events = (await json_body(request)).get("events") or []
+    if any(event.get("type") not in EVENT_TYPES or not event.get("callId") for event in events):
+        return error("Invalid live call event", 400)
+    for event in events:
+        live_calls.publish(event["type"], str(event["callId"]), event.get("data"))
+    return JSONResponse({"published": len(events)})
+
+async def answer_call(request: Request):
+    call_id = request.path_params["call_id"]
+    if live_calls.get(call_id) is None:
+        return error("Call not found", 404)
+    live_calls.publish(CALL_UPDATED, call_id, {"status": "active"})
+    return JSONResponse({"message": "Call answered successfully"})
+
+async def end_call(request: Request):
+    call_id = request.path_params["call_id"]
+    live_calls.publish(CALL_ENDED, call_id, {"status": "ended", "endTime": datetime.now().isoformat()})
+    return JSONResponse({"message": "Call ended successfully"})
+
+async def hold_call(request: Request):
+    call_id = request.path_params["call_id"]
+    if live_calls.get(call_id) is None:
+        return error("Call not found", 404)
+    live_calls.publish(CALL_UPDATED, call_id, {"status": "on_hold"})
+    return JSONResponse({"message": "Call put on hold"})
 
 # Health check endpoint
-@app.route("/api/health", methods=["GET"])
-def health_check():
-    return jsonify({
+async def health_check(request: Request):
+    return JSONResponse({
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
         "services": {
             "database": "connected",
-            "livekit": "connected" if livekit_api else "disconnected"
+            "livekit": "connected" if tokens.connected else "disconnected"
         }
     })
 
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    await tokens.start()
+    rooms.start()
+    try:
+        yield
+    finally:
+        live_calls.close()
+        await rooms.aclose()
+        await tokens.aclose()
+
+routes = [
+    Route("/create_token", create_token, methods=["POST"]),
+    Route("/api/dashboard/stats", get_dashboard_stats, methods=["GET"]),
+    Route("/api/bookings", get_bookings, methods=["GET"]),
+    Route("/api/bookings", create_booking, methods=["POST"]),
+    Route("/api/bookings/{booking_id}", update_booking, methods=["PUT"]),
+    Route("/api/bookings/{booking_id}", delete_booking, methods=["DELETE"]),
+    Route("/api/restaurant/orders", get_restaurant_orders, methods=["GET"]),
+    Route("/api/restaurant/orders", create_restaurant_order, methods=["POST"]),
+    Route("/api/restaurant/orders/{order_id}/status", update_order_status, methods=["PATCH"]),
+    Route("/api/calls/logs", get_call_logs, methods=["GET"]),
+    Route("/api/calls/analytics/{timeframe}", get_call_analytics, methods=["GET"]),
+    Route("/api/calls/live", get_live_calls, methods=["GET"]),
+    Route("/api/calls/live/stream", stream_live_calls, methods=["GET"]),
+    Route("/api/calls/live/events", publish_live_call_events, methods=["POST"]),
+    Route("/api/calls/{call_id}/answer", answer_call, methods=["POST"]),
+    Route("/api/calls/{call_id}/end", end_call, methods=["POST"]),
+    Route("/api/calls/{call_id}/hold", hold_call, methods=["POST"]),
+    Route("/api/health", health_check, methods=["GET"]),
+]
+
+app = Starlette(
+    routes=routes,
+    middleware=[Middleware(CORSMiddleware, allow_origins=["http://localhost:3000"], allow_methods=["*"], allow_headers=["*"])],  # Allow dashboard to access API
+    lifespan=lifespan,
+)
+
 if __name__ == "__main__":
     print("Starting Enhanced Hotel Backend Server...")
     print("Dashboard API endpoints available at http://localhost:5000/api/")
     print("LiveKit token endpoint available at http://localhost:5000/create_token")
-    app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=5000)
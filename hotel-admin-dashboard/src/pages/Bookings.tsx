@@ -99,13 +99,17 @@ const Bookings: React.FC = () => {
     totalAmount: 0
   });
 
-  // Fetch bookings from backend
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+
+  // Fetch the first page of bookings from the backend; the status filter is applied server-side
   useEffect(() => {
     const fetchBookings = async () => {
       try {
         setLoading(true);
-        const data = await getBookings();
-        setBookings(data);
+        const page = await getBookings({ status: statusFilter === 'all' ? undefined : statusFilter });
+        setBookings(page.items);
+        setNextCursor(page.nextCursor);
       } catch (error) {
         console.error('Failed to fetch bookings:', error);
         // Use mock data as fallback
@@ -126,13 +130,30 @@ const Bookings: React.FC = () => {
             createdAt: '2024-10-10T10:30:00Z',
           }
         ]);
+        setNextCursor(null);
       } finally {
         setLoading(false);
       }
     };
 
     fetchBookings();
-  }, []);
+  }, [statusFilter]);
+
+  // Append the next page of bookings
+  const loadMoreBookings = async () => {
+    if (!nextCursor) return;
+    try {
+      setLoadingMore(true);
+      const page = await getBookings({
+        cursor: nextCursor,
+        status: statusFilter === 'all' ? undefined : statusFilter,
+      });
+      setBookings(prev => [...prev, ...page.items]);
+      setNextCursor(page.nextCursor);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
 
   // Handle booking creation
   const handleCreateBooking = async () => {
@@ -398,6 +419,17 @@ const Bookings: React.FC = () => {
             </tbody>
           </table>
         </div>
+        {nextCursor && (
+          <div className="px-6 py-4 border-t border-gray-200 text-center">
+            <button
+              onClick={loadMoreBookings}
+              disabled={loadingMore}
+              className="btn-secondary"
+            >
+              {loadingMore ? 'Loading...' : 'Load more'}
+            </button>
+          </div>
+        )}
       </div>
 
       {/* New Booking Modal */}
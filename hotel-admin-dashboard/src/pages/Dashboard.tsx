@@ -284,14 +284,14 @@ const Dashboard: React.FC = () => {
             <ResponsiveContainer width="100%" height={300}>
               <PieChart>
                 <Pie
-                  data={sentimentData}
+                  data={dashboardData?.chartData?.sentiment || sentimentData}
                   cx="50%"
                   cy="50%"
                   outerRadius={100}
                   dataKey="value"
                   label={({ name, value }) => `${name}: ${value}%`}
                 >
-                  {sentimentData.map((entry, index) => (
+                  {(dashboardData?.chartData?.sentiment || sentimentData).map((entry: any, index: number) => (
                     <Cell key={`cell-${index}`} fill={entry.color} />
                   ))}
                 </Pie>
@@ -14,40 +14,33 @@ import {
   Users,
   Activity
 } from 'lucide-react';
+import { answerCall, holdCall, endCall as endCallRequest } from '../services/api';
+import { LiveCall } from '../types';
 
-// Mock data for live calls
-const initialLiveCalls = [
-  {
-    id: 'live-1',
-    callerNumber: '+91 98765 43210',
-    callerName: 'Rajesh Kumar',
-    intent: 'Booking Inquiry',
-    sentiment: 'positive',
-    duration: 125,
-    startTime: new Date(Date.now() - 125000).toISOString(),
-    status: 'active',
-  },
-  {
-    id: 'live-2',
-    callerNumber: '+91 98765 43211',
-    callerName: 'Priya Sharma',
-    intent: 'Room Service',
-    sentiment: 'neutral',
-    duration: 87,
-    startTime: new Date(Date.now() - 87000).toISOString(),
-    status: 'active',
-  },
-  {
-    id: 'live-3',
-    callerNumber: '+91 98765 43212',
-    callerName: 'Waiting...',
-    intent: 'Unknown',
-    sentiment: 'neutral',
-    duration: 23,
-    startTime: new Date(Date.now() - 23000).toISOString(),
-    status: 'on_hold',
-  },
-];
+const MAX_MESSAGES = 20;
+
+// Shapes an event payload from /api/calls/live/stream into a LiveCall
+const toLiveCall = (data: any): LiveCall => ({
+  callerNumber: '',
+  callerName: 'Incoming Call...',
+  intent: 'Unknown',
+  sentiment: 'neutral',
+  status: 'active',
+  messages: [],
+  ...data,
+  startTime: data.startTime || new Date().toISOString(),
+  duration: data.startTime ? Math.max(0, Math.floor((Date.now() - Date.parse(data.startTime)) / 1000)) : 0,
+});
+
+// Same rule as merge_delta in live_feed/broker.py: messages are appended, everything else is replaced
+const mergeDelta = (call: LiveCall, delta: any): LiveCall => {
+  const { messages, ...rest } = delta;
+  return {
+    ...call,
+    ...rest,
+    messages: messages ? [...(call.messages || []), ...messages].slice(-MAX_MESSAGES) : call.messages,
+  };
+};
 
 const formatDuration = (seconds: number) => {
   const minutes = Math.floor(seconds / 60);
@@ -74,15 +67,43 @@ const getStatusColor = (status: string) => {
 };
 
 const LiveCalls: React.FC = () => {
-  const [liveCalls, setLiveCalls] = useState(initialLiveCalls);
+  const [liveCalls, setLiveCalls] = useState<LiveCall[]>([]);
   const [selectedCall, setSelectedCall] = useState<string | null>(null);
   const [isListening, setIsListening] = useState(false);
   const [isMuted, setIsMuted] = useState(false);
 
-  // Simulate real-time updates
+  // Calls are pushed by the backend over Server-Sent Events: a snapshot when we connect,
+  // then call_started / call_updated / call_ended deltas. EventSource reconnects on its own
+  // and resumes from the last event id it saw.
+  useEffect(() => {
+    const source = new EventSource('/api/calls/live/stream');
+    source.addEventListener('snapshot', (e) => {
+      setLiveCalls(JSON.parse((e as MessageEvent).data).calls.map(toLiveCall));
+    });
+    source.addEventListener('call_started', (e) => {
+      const call = toLiveCall(JSON.parse((e as MessageEvent).data));
+      setLiveCalls(prev => [...prev.filter(c => c.id !== call.id), call]);
+    });
+    source.addEventListener('call_updated', (e) => {
+      const delta = JSON.parse((e as MessageEvent).data);
+      setLiveCalls(prev =>
+        prev.some(c => c.id === delta.id)
+          ? prev.map(c => (c.id === delta.id ? mergeDelta(c, delta) : c))
+          : [...prev, toLiveCall(delta)]
+      );
+    });
+    source.addEventListener('call_ended', (e) => {
+      const { id } = JSON.parse((e as MessageEvent).data);
+      setLiveCalls(prev => prev.filter(c => c.id !== id));
+      setSelectedCall(prev => (prev === id ? null : prev));
+    });
+    return () => source.close();
+  }, []);
+
+  // Durations tick locally, the server only sends changes
   useEffect(() => {
     const interval = setInterval(() => {
-      setLiveCalls(prev => 
+      setLiveCalls(prev =>
         prev.map(call => ({
           ...call,
           duration: call.duration + 1,
@@ -93,34 +114,6 @@ const LiveCalls: React.FC = () => {
     return () => clearInterval(interval);
   }, []);
 
-  // Simulate random call events
-  useEffect(() => {
-    const eventInterval = setInterval(() => {
-      if (Math.random() > 0.8) {
-        // Simulate new call
-        const newCall = {
-          id: `live-${Date.now()}`,
-          callerNumber: `+91 ${Math.floor(Math.random() * 10000000000)}`,
-          callerName: 'Incoming Call...',
-          intent: 'Unknown',
-          sentiment: 'neutral' as const,
-          duration: 0,
-          startTime: new Date().toISOString(),
-          status: 'on_hold' as const,
-        };
-        
-        setLiveCalls(prev => [...prev, newCall]);
-        
-        // Remove the call after some time (simulate call end)
-        setTimeout(() => {
-          setLiveCalls(prev => prev.filter(call => call.id !== newCall.id));
-        }, Math.random() * 30000 + 10000);
-      }
-    }, 10000);
-
-    return () => clearInterval(eventInterval);
-  }, []);
-
   const stats = {
     activeCalls: liveCalls.filter(call => call.status === 'active').length,
     waitingCalls: liveCalls.filter(call => call.status === 'on_hold').length,
@@ -136,9 +129,11 @@ const LiveCalls: React.FC = () => {
           : call
       )
     );
+    (action === 'answer' ? answerCall(callId) : holdCall(callId)).catch(console.error);
   };
 
   const endCall = (callId: string) => {
+    endCallRequest(callId).catch(console.error);
     setLiveCalls(prev => prev.filter(call => call.id !== callId));
     if (selectedCall === callId) {
       setSelectedCall(null);
@@ -367,14 +362,17 @@ const LiveCalls: React.FC = () => {
                   <h4 className="font-medium text-gray-900 mb-3">Live Transcript</h4>
                   <div className="bg-gray-50 rounded-lg p-4 h-32 overflow-y-auto text-sm">
                     <div className="space-y-2">
-                      <div className="text-blue-600 font-medium">Customer:</div>
-                      <div className="text-gray-700 mb-2">
-                        Hello, I would like to make a reservation for this weekend...
-                      </div>
-                      <div className="text-green-600 font-medium">Agent:</div>
-                      <div className="text-gray-700">
-                        Of course! I'd be happy to help you with a reservation. What dates were you looking for?
-                      </div>
+                      {(call.messages || []).map((message, index) => (
+                        <div key={index}>
+                          <div className={`${message.role === 'user' ? 'text-blue-600' : 'text-green-600'} font-medium`}>
+                            {message.role === 'user' ? 'Customer:' : 'Agent:'}
+                          </div>
+                          <div className="text-gray-700 mb-2">{message.text}</div>
+                        </div>
+                      ))}
+                      {call.liveTranscript && !call.transcriptFinal && (
+                        <div className="text-gray-400 italic">{call.liveTranscript}</div>
+                      )}
                     </div>
                   </div>
                   
@@ -1,5 +1,7 @@
 import api from '../lib/api';
-import { DashboardStats, Booking, CallLog, LiveCall, RestaurantOrder } from '../types';
+import { DashboardStats, Booking, CallLog, CallAnalyticsSummary, LiveCall, RestaurantOrder, Page, PageParams } from '../types';
+
+const emptyPage = <T>(): Page<T> => ({ items: [], nextCursor: null });
 
 // Dashboard API
 export const getDashboardStats = async (): Promise<DashboardStats> => {
@@ -27,13 +29,13 @@ export const getDashboardStats = async (): Promise<DashboardStats> => {
 };
 
 // Bookings API
-export const getBookings = async (): Promise<Booking[]> => {
+export const getBookings = async (params?: PageParams): Promise<Page<Booking>> => {
   try {
-    const response = await api.get('/api/bookings');
+    const response = await api.get('/api/bookings', { params });
     return response.data;
   } catch (error) {
     // Mock data for demo
-    return [];
+    return emptyPage<Booking>();
   }
 };
 
@@ -64,12 +66,12 @@ export const deleteBooking = async (id: string): Promise<void> => {
 };
 
 // Restaurant API
-export const getRestaurantOrders = async (): Promise<RestaurantOrder[]> => {
+export const getRestaurantOrders = async (params?: PageParams): Promise<Page<RestaurantOrder>> => {
   try {
-    const response = await api.get('/api/restaurant/orders');
+    const response = await api.get('/api/restaurant/orders', { params });
     return response.data;
   } catch (error) {
-    return [];
+    return emptyPage<RestaurantOrder>();
   }
 };
 
@@ -92,21 +94,19 @@ export const updateOrderStatus = async (id: string, status: string): Promise<Res
 };
 
 // Call Analytics API
-export const getCallLogs = async (filters?: {
-  startDate?: string;
-  endDate?: string;
+export const getCallLogs = async (filters?: PageParams & {
   sentiment?: string;
   intent?: string;
-}): Promise<CallLog[]> => {
+}): Promise<Page<CallLog>> => {
   try {
     const response = await api.get('/api/calls/logs', { params: filters });
     return response.data;
   } catch (error) {
-    return [];
+    return emptyPage<CallLog>();
   }
 };
 
-export const getCallAnalytics = async (timeframe: string = 'today') => {
+export const getCallAnalytics = async (timeframe: string = 'today'): Promise<CallAnalyticsSummary | null> => {
   try {
     const response = await api.get(`/api/calls/analytics/${timeframe}`);
     return response.data;
@@ -15,6 +15,21 @@ export interface Booking {
   updatedAt: string;
 }
 
+// One page of a cursor-paginated list endpoint. Pass `nextCursor` back as `cursor`
+// to get the following page; it is null on the last page.
+export interface Page<T> {
+  items: T[];
+  nextCursor: string | null;
+}
+
+export interface PageParams {
+  cursor?: string;
+  limit?: number;
+  status?: string;
+  startDate?: string;
+  endDate?: string;
+}
+
 export interface Room {
   id: string;
   number: string;
@@ -72,6 +87,11 @@ export interface LiveCall {
   duration: number;
   startTime: string;
   status: 'active' | 'on_hold' | 'transferring';
+  agentState?: string;
+  userState?: string;
+  liveTranscript?: string;
+  transcriptFinal?: boolean;
+  messages?: { role: 'user' | 'assistant'; text: string; time: number }[];
 }
 
 export interface DashboardStats {
@@ -89,6 +109,18 @@ export interface DashboardStats {
   pendingOrders: number;
 }
 
+export interface CallAnalyticsSummary {
+  timeframe: string;
+  totalCalls: number;
+  avgDuration: number;
+  avgSatisfaction: number;
+  resolutionRate: number;
+  sentimentBreakdown: { positive: number; neutral: number; negative: number };
+  callVolume: { name: string; calls: number }[];
+  sentimentTrend: { name: string; positive: number; neutral: number; negative: number }[];
+  conversionRates: { intent: string; calls: number; conversions: number; rate: number }[];
+}
+
 export interface MenuItem {
   id: string;
   name: string;
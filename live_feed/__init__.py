@@ -0,0 +1,26 @@
+# cf4/live_feed/__init__.py
+#
+# Live call feed: the agent worker publishes call events (live_feed.publisher), the dashboard
+# server fans them out to every connected dashboard over SSE (live_feed.broker).
+# The publisher needs aiohttp and is only imported by the agent.
+from .broker import (
+    CALL_ENDED,
+    CALL_STARTED,
+    CALL_UPDATED,
+    EVENT_TYPES,
+    LiveCallBroker,
+    live_calls,
+    merge_delta,
+    sse,
+)
+
+__all__ = [
+    "CALL_STARTED",
+    "CALL_UPDATED",
+    "CALL_ENDED",
+    "EVENT_TYPES",
+    "LiveCallBroker",
+    "live_calls",
+    "merge_delta",
+    "sse",
+]
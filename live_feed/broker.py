@@ -0,0 +1,231 @@
+# cf4/live_feed/broker.py
+#
+# Fan-out of live call events to dashboard clients over Server-Sent Events.
+#
+# Every event is encoded once and appended to a shared, bounded log. Subscribers only keep
+# the sequence number of the last event they sent and wait on a single condition variable
+# (threaded servers) or on one asyncio.Event per loop (ASGI servers), so a publish costs the
+# same with 1 or 500 dashboards connected, and nothing polls.
+import asyncio
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Iterator
+from typing import Optional
+
+CALL_STARTED = "call_started"
+CALL_UPDATED = "call_updated"
+CALL_ENDED = "call_ended"
+EVENT_TYPES = (CALL_STARTED, CALL_UPDATED, CALL_ENDED)
+
+MAX_MESSAGES = 20  # transcript lines kept per live call
+
+
+def merge_delta(state: dict, delta: dict) -> dict:
+    """
+    Applies a call_updated delta to a call's state, in place. Every key overwrites the old
+    value except "messages", whose entries are appended (keeping the last MAX_MESSAGES).
+    """
+    for key, value in delta.items():
+        if key == "messages":
+            state["messages"] = (state.get("messages", []) + list(value))[-MAX_MESSAGES:]
+        else:
+            state[key] = value
+    return state
+
+
+def sse(event: str, data, event_id: Optional[int] = None) -> str:
+    lines = [] if event_id is None else [f"id: {event_id}"]
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+class LiveCallBroker:
+    """
+    Current state of every live call, plus the recent events that changed it.
+
+    `publish` applies call_started / call_updated / call_ended events (from the agent worker,
+    or from the dashboard's own end/hold actions). `stream` yields SSE text for one client:
+    a snapshot of all live calls first, then every event after it. A client that reconnects
+    with Last-Event-ID gets only what it missed, as long as it's still in the last `history`
+    events; otherwise, and whenever a client falls that far behind, it gets a new snapshot.
+    """
+
+    def __init__(self, history: int = 1024, heartbeat: float = 15.0) -> None:
+        self._heartbeat = heartbeat
+        self._cond = threading.Condition()
+        self._calls: dict[str, dict] = {}
+        self._log: deque[tuple[int, str]] = deque(maxlen=history)  # (seq, encoded event)
+        self._seq = 0
+        self._loop_waiters: dict[asyncio.AbstractEventLoop, asyncio.Event] = {}
+        self._subscribers = 0
+        self._closed = False
+
+    @property
+    def subscriber_count(self) -> int:
+        return self._subscribers
+
+    def calls(self) -> list[dict]:
+        with self._cond:
+            return [dict(call) for call in self._calls.values()]
+
+    def get(self, call_id: str) -> Optional[dict]:
+        with self._cond:
+            call = self._calls.get(call_id)
+            return dict(call) if call is not None else None
+
+    def publish(self, event_type: str, call_id: str, data: Optional[dict] = None) -> int:
+        """Applies an event and wakes up every subscriber. Returns its sequence number."""
+        if event_type not in EVENT_TYPES:
+            raise ValueError(f"unknown live call event {event_type!r}")
+        data = dict(data or {})
+        data.pop("id", None)
+
+        with self._cond:
+            if event_type == CALL_STARTED:
+                call = self._calls[call_id] = merge_delta(
+                    {"id": call_id, "status": "active", "startTime": _now_iso(), "messages": []},
+                    data,
+                )
+                payload = dict(call)
+            elif event_type == CALL_UPDATED:
+                # an update for a call we haven't seen (e.g. the server restarted mid-call) creates it
+                call = self._calls.setdefault(
+                    call_id, {"id": call_id, "status": "active", "messages": []}
+                )
+                merge_delta(call, data)
+                payload = {"id": call_id, **data}
+            else:
+                call = self._calls.pop(call_id, None)
+                if call is None:
+                    return self._seq
+                payload = {"id": call_id, **data}
+
+            self._seq += 1
+            self._log.append((self._seq, sse(event_type, payload, self._seq)))
+            self._cond.notify_all()
+            self._wake_loops_locked()
+            return self._seq
+
+    def snapshot(self) -> tuple[int, str]:
+        with self._cond:
+            return self._snapshot_locked()
+
+    def _snapshot_locked(self) -> tuple[int, str]:
+        return self._seq, sse("snapshot", {"calls": list(self._calls.values())}, self._seq)
+
+    def _events_after(self, seq: int) -> Optional[list[str]]:
+        """Encoded events newer than `seq`, or None if some of them already left the log."""
+        if seq == self._seq:
+            return []
+        if seq > self._seq or not self._log or self._log[0][0] > seq + 1:
+            return None
+        # the log is ordered by seq, so the missed events are its tail
+        missed = itertools.islice(reversed(self._log), self._seq - seq)
+        return [event for _, event in missed][::-1]
+
+    def _resume_locked(self, last_event_id: Optional[str]) -> tuple[int, list[str]]:
+        if last_event_id and last_event_id.isdigit():
+            pending = self._events_after(int(last_event_id))
+            if pending is not None:
+                return self._seq, pending
+        seq, snapshot = self._snapshot_locked()
+        return seq, [snapshot]
+
+    def _catch_up_locked(self, seq: int) -> tuple[int, list[str]]:
+        pending = self._events_after(seq)
+        if pending is None:  # fell behind the log
+            seq, snapshot = self._snapshot_locked()
+            return seq, [snapshot]
+        return self._seq, pending
+
+    def stream(self, last_event_id: Optional[str] = None) -> Iterator[str]:
+        """
+        SSE text for one subscriber, for threaded servers. Runs until the client goes away
+        or `close` is called.
+        """
+        with self._cond:
+            self._subscribers += 1
+            seq, pending = self._resume_locked(last_event_id)
+        try:
+            yield "retry: 2000\n\n"
+            while True:
+                yield from pending
+
+                with self._cond:
+                    if not self._cond.wait_for(
+                        lambda seq=seq: self._seq != seq or self._closed, self._heartbeat
+                    ):
+                        pending = [": keepalive\n\n"]
+                        continue
+                    if self._closed:
+                        return
+                    seq, pending = self._catch_up_locked(seq)
+        finally:
+            with self._cond:
+                self._subscribers -= 1
+
+    async def astream(self, last_event_id: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        `stream` for ASGI servers. Waiting subscribers cost no thread: every publish sets
+        one asyncio.Event per event loop, which wakes all of that loop's subscribers.
+        """
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            self._subscribers += 1
+            seq, pending = self._resume_locked(last_event_id)
+        try:
+            yield "retry: 2000\n\n"
+            while True:
+                for event in pending:
+                    yield event
+
+                with self._cond:
+                    if self._closed:
+                        return
+                    if self._seq == seq:
+                        wakeup = self._loop_waiters.setdefault(loop, asyncio.Event())
+                    else:
+                        wakeup = None
+                        seq, pending = self._catch_up_locked(seq)
+                if wakeup is None:
+                    continue
+
+                try:
+                    await asyncio.wait_for(wakeup.wait(), self._heartbeat)
+                except asyncio.TimeoutError:
+                    pending = [": keepalive\n\n"]
+                    continue
+                with self._cond:
+                    if self._closed:
+                        return
+                    seq, pending = self._catch_up_locked(seq)
+        finally:
+            with self._cond:
+                self._subscribers -= 1
+
+    def _wake_loops_locked(self) -> None:
+        # hand the current Event of every loop back to that loop to be set; subscribers that
+        # start waiting after this get a new one
+        waiters, self._loop_waiters = self._loop_waiters, {}
+        for loop, wakeup in waiters.items():
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(wakeup.set)
+
+    def close(self) -> None:
+        """Ends every open stream."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            self._wake_loops_locked()
+
+
+def _now_iso() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+# One broker per dashboard server process
+live_calls = LiveCallBroker()
@@ -0,0 +1,169 @@
+# cf4/live_feed/publisher.py
+#
+# Agent worker side of the live call feed: turns AgentSession events into call_started /
+# call_updated / call_ended events and sends them to the dashboard server's broker.
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+import aiohttp
+
+from .broker import CALL_ENDED, CALL_STARTED, CALL_UPDATED, merge_delta
+
+logger = logging.getLogger("live-feed")
+
+
+class LiveCallPublisher:
+    """
+    Sends live call events to `url` (the dashboard's POST /api/calls/live/events).
+
+    `publish` never waits on the network. Events are queued and POSTed as one batch every
+    `flush_interval` seconds; consecutive updates of the same call are merged first, so a
+    burst of interim transcripts costs a single request. The feed is best effort: when the
+    dashboard server is down the batch is dropped, the next call_updated recreates the call
+    on the dashboard.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        *,
+        token: Optional[str] = None,
+        flush_interval: float = 0.25,
+        max_pending: int = 256,
+        timeout: float = 2.0,
+    ) -> None:
+        self._url = url
+        self._headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self._flush_interval = flush_interval
+        self._max_pending = max_pending
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._pending: list[dict] = []
+        self._wakeup = asyncio.Event()
+        self._http: Optional[aiohttp.ClientSession] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self._warned = False
+        self._open_calls: set[str] = set()
+        self.sent_events = 0
+        self.dropped_events = 0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._http = aiohttp.ClientSession(timeout=self._timeout)
+            self._task = asyncio.create_task(self._run(), name="LiveCallPublisher._run")
+
+    def publish(self, event_type: str, call_id: str, **data) -> None:
+        if self._closed:
+            return
+
+        last = self._pending[-1] if self._pending else None
+        if (
+            event_type == CALL_UPDATED
+            and last is not None
+            and last["callId"] == call_id
+            and last["type"] in (CALL_STARTED, CALL_UPDATED)
+        ):
+            merge_delta(last["data"], data)
+            return
+
+        if event_type == CALL_ENDED:
+            self._open_calls.discard(call_id)
+        else:
+            self._open_calls.add(call_id)
+        self._pending.append({"type": event_type, "callId": call_id, "data": data})
+        if len(self._pending) > self._max_pending:
+            del self._pending[0]
+            self.dropped_events += 1
+        if event_type != CALL_UPDATED:
+            self._wakeup.set()  # starts and ends go out right away
+
+    def attach(self, session, call_id: str, **call_info) -> None:
+        """
+        Publishes call_started now, then forwards the session's state changes, transcripts
+        and conversation items as call_updated, and its close as call_ended.
+        """
+        self.publish(CALL_STARTED, call_id, **call_info)
+
+        @session.on("agent_state_changed")
+        def _on_agent_state(ev):
+            self.publish(CALL_UPDATED, call_id, agentState=ev.new_state)
+
+        @session.on("user_state_changed")
+        def _on_user_state(ev):
+            self.publish(CALL_UPDATED, call_id, userState=ev.new_state)
+
+        @session.on("user_input_transcribed")
+        def _on_transcribed(ev):
+            self.publish(
+                CALL_UPDATED, call_id, liveTranscript=ev.transcript, transcriptFinal=ev.is_final
+            )
+
+        @session.on("conversation_item_added")
+        def _on_item(ev):
+            text = ev.item.text_content if ev.item.type == "message" else None
+            if not text or ev.item.role not in ("user", "assistant"):
+                return
+            message = {"role": ev.item.role, "text": text, "time": ev.created_at}
+            self.publish(CALL_UPDATED, call_id, messages=[message])
+
+        @session.on("close")
+        def _on_close(ev):
+            self.publish(
+                CALL_ENDED,
+                call_id,
+                reason=str(ev.reason.value),
+                endTime=datetime.now(timezone.utc).isoformat(),
+            )
+
+    async def flush(self) -> None:
+        if not self._pending or self._http is None:
+            return
+
+        batch, self._pending = self._pending, []
+        try:
+            async with self._http.post(
+                self._url, json={"events": batch}, headers=self._headers
+            ) as resp:
+                resp.raise_for_status()
+            self.sent_events += len(batch)
+            self._warned = False
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.dropped_events += len(batch)
+            if not self._warned:  # once per outage, not once per batch
+                logger.warning(
+                    "live call feed unavailable, dropping events", extra={"error": str(e)}
+                )
+                self._warned = True
+
+    async def aclose(self) -> None:
+        """Ends calls still open, sends whatever is queued and closes the HTTP session."""
+        for call_id in list(self._open_calls):
+            self.publish(
+                CALL_ENDED,
+                call_id,
+                reason="shutdown",
+                endTime=datetime.now(timezone.utc).isoformat(),
+            )
+        self._closed = True
+        if self._task is not None:
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+        if self._http is not None:
+            await self._http.close()
+            self._http = None
+
+    async def _run(self) -> None:
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if not self._closed:
+                await self.flush()
@@ -91,6 +91,7 @@ from .voice.run_result import (
     mock_tools,
 )
 from .worker import (
+    JobCostLoadCalc,
     SimulateJobInfo,
     Worker,
     WorkerOptions,
@@ -117,6 +118,7 @@ __all__ = [
     "WorkerOptions",
     "WorkerType",
     "WorkerPermissions",
+    "JobCostLoadCalc",
     "JobProcess",
     "JobContext",
     "JobRequest",
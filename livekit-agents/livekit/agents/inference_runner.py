@@ -16,6 +16,13 @@ _RunnersDict = dict[str, type["_InferenceRunner"]]
 class _InferenceRunner(ABC, _RunnerMeta):
     registered_runners: _RunnersDict = {}
 
+    # when the runner implements run_batch, the requests pending when a batch starts (those
+    # that arrived while the previous one was running) and the ones arriving within
+    # BATCH_WINDOW seconds are run together, up to MAX_BATCH_SIZE of them. a window adds its
+    # duration to the latency when the process isn't busy
+    BATCH_WINDOW: ClassVar[float] = 0.0
+    MAX_BATCH_SIZE: ClassVar[int] = 16
+
     @classmethod
     def register_runner(cls, runner_class: type[_InferenceRunner]) -> None:
         if threading.current_thread() != threading.main_thread():
@@ -35,3 +42,14 @@ class _InferenceRunner(ABC, _RunnerMeta):
     def run(self, data: bytes) -> bytes | None:
         """Run inference on the given data."""
         ...
+
+    def run_batch(self, data: list[bytes]) -> list[bytes | None]:
+        """Run inference on several inputs at once, returns one result per input.
+
+        Optional: the inference process only batches the requests of runners overriding it.
+        If it raises, the requests of the batch are retried one by one with `run`."""
+        return [self.run(d) for d in data]
+
+    @classmethod
+    def supports_batching(cls) -> bool:
+        return cls.run_batch is not _InferenceRunner.run_batch and cls.MAX_BATCH_SIZE > 1
@@ -1,21 +1,33 @@
 from . import (
     channel,
+    idle_autoscaler,
+    inference_pool,
     inference_proc_executor,
     job_executor,
     job_proc_executor,
+    job_shared_proc_executor,
     job_thread_executor,
+    loop_profiler,
     proc_pool,
     proto,
+    resource_usage,
+    zygote_proc,
 )
 
 __all__ = [
     "channel",
+    "idle_autoscaler",
+    "inference_pool",
     "inference_proc_executor",
     "job_executor",
     "job_proc_executor",
+    "job_shared_proc_executor",
     "job_thread_executor",
+    "loop_profiler",
     "proc_pool",
     "proto",
+    "resource_usage",
+    "zygote_proc",
 ]
 
 # Cleanup docs of unexported modules
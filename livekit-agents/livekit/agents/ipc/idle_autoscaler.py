@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import math
+import time
+from collections import deque
+
+from .. import utils
+from ..telemetry import metrics
+
+ARRIVAL_WINDOW = 16  # number of recent arrivals the arrival rate is estimated from
+MIN_RATE_SPAN = 1.0  # seconds, so that two jobs arriving together aren't a rate of 1000/s
+SCALE_DOWN_DELAY = 120.0  # seconds the pool stays sized for a burst after it ended
+EVALUATE_INTERVAL = 5.0  # re-evaluated this often while no job arrives, for the rate to decay
+
+
+class IdleAutoscaler:
+    """Sizes the idle process pool of a ProcPool from the job arrival rate.
+
+    A job arriving while the pool is being replenished waits for a cold process. The pool keeps
+    the smallest number of idle processes for which the number of jobs arriving during one
+    spawn (Poisson, with the current arrival rate) doesn't exceed it with probability
+    `warm_hit_target`. The result is bounded by `min_idle` and by how many idle processes fit
+    in `memory_budget_mb`, and only decreases once it stayed lower for SCALE_DOWN_DELAY."""
+
+    def __init__(
+        self,
+        *,
+        min_idle: int,
+        max_idle: int,
+        warm_hit_target: float,
+        memory_budget_mb: float = 0.0,
+    ) -> None:
+        if not 0.0 < warm_hit_target < 1.0:
+            raise ValueError(f"warm_hit_target must be between 0 and 1, got {warm_hit_target}")
+
+        self._min_idle = min_idle
+        self._max_idle = max(max_idle, min_idle)
+        self._warm_hit_target = warm_hit_target
+        self._memory_budget_mb = memory_budget_mb
+
+        self._arrivals: deque[float] = deque(maxlen=ARRIVAL_WINDOW)
+        self._spawn_time = utils.MovingAverage(8)
+        self._proc_memory_mb = utils.ExpFilter(alpha=0.7)
+
+        self._target = min_idle
+        self._target_time = 0.0
+
+    @property
+    def max_idle(self) -> int:
+        """the most idle processes the memory budget allows"""
+        memory_mb = self._proc_memory_mb.filtered()
+        if self._memory_budget_mb <= 0 or memory_mb <= 0:
+            return self._max_idle
+
+        fit = math.floor(self._memory_budget_mb / memory_mb)
+        return max(self._min_idle, min(self._max_idle, fit))
+
+    def on_job_arrival(self, now: float | None = None) -> None:
+        self._arrivals.append(time.monotonic() if now is None else now)
+
+    def on_process_ready(self, spawn_time: float, memory_mb: float | None = None) -> None:
+        """a process finished initializing `spawn_time` seconds after it was requested"""
+        self._spawn_time.add_sample(spawn_time)
+        if memory_mb is not None:
+            self._proc_memory_mb.apply(1.0, memory_mb)
+
+    def arrival_rate(self, now: float | None = None) -> float:
+        """jobs per second, the highest rate over the windows ending now and starting at one
+        of the recent arrivals: a burst shows up after a couple of jobs, and the rate decays
+        as soon as they stop arriving"""
+        now = time.monotonic() if now is None else now
+        min_span = max(self._spawn_time.get_avg(), MIN_RATE_SPAN)
+        return max(
+            (k / max(now - t, min_span) for k, t in enumerate(reversed(self._arrivals), 1)),
+            default=0.0,
+        )
+
+    def target(self, now: float | None = None) -> int:
+        """number of idle processes to keep warm"""
+        now = time.monotonic() if now is None else now
+        rate = self.arrival_rate(now)
+        spawn_time = self._spawn_time.get_avg()
+        max_idle = self.max_idle
+
+        needed = _poisson_quantile(rate * spawn_time, self._warm_hit_target, max_idle)
+        needed = min(max(needed, self._min_idle), max_idle)
+
+        if needed >= self._target or now - self._target_time >= SCALE_DOWN_DELAY:
+            self._target = needed
+            self._target_time = now
+        self._target = min(self._target, max_idle)  # the budget applies right away
+
+        metrics.idle_autoscaler_updated(
+            target=self._target,
+            max_idle=max_idle,
+            arrival_rate=rate,
+            spawn_time=spawn_time,
+            proc_memory_mb=max(self._proc_memory_mb.filtered(), 0.0),
+        )
+        return self._target
+
+
+def _poisson_quantile(mean: float, p: float, limit: int) -> int:
+    """smallest k such that P(X <= k) >= p for X ~ Poisson(mean), capped at limit"""
+    if mean <= 0:
+        return 0
+
+    pmf = math.exp(-mean)
+    cdf = pmf
+    k = 0
+    while cdf < p and k < limit:
+        k += 1
+        pmf *= mean / k
+        cdf += pmf
+    return k
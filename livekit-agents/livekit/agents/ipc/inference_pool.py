@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import itertools
+import time
+from multiprocessing.context import BaseContext
+from typing import Any
+
+from ..inference_runner import _RunnersDict
+from ..log import logger
+from ..telemetry import metrics
+from ..utils import aio, log_exceptions
+from .inference_proc_executor import InferenceProcExecutor
+
+RESTART_BACKOFF = (0.5, 30.0)  # seconds, doubled after each restart of a process that crashed
+STABLE_UPTIME = 60.0  # a process running this long resets the restart backoff
+
+
+class _Shard:
+    def __init__(self, index: int) -> None:
+        self.index = index
+        self.executor: InferenceProcExecutor | None = None
+        self.ready = False
+        self.pending: dict[int, float] = {}  # request -> start time
+        self.first_attempt = asyncio.Event()  # set once the first process initialized (or not)
+
+    @property
+    def outstanding(self) -> int:
+        return len(self.pending)
+
+    def oldest_request(self, now: float) -> float:
+        return max((now - t for t in self.pending.values()), default=0.0)
+
+
+class InferencePool:
+    """Runs the inference runners in `num_processes` processes.
+
+    Each request goes to the process with the fewest outstanding requests. Between processes
+    that are equally loaded, the one that served the previous request of the same method is
+    preferred, so that at low load a runner keeps running where its model is hot.
+
+    A process that exits (crash, memory limit, ping timeout) or has a request outstanding for
+    longer than `stuck_timeout` (e.g. a runner blocked in a native call, which the pings don't
+    detect since they are answered by the event loop) is taken out of the routing, its
+    requests fail, and it is restarted with a backoff."""
+
+    def __init__(
+        self,
+        *,
+        num_processes: int,
+        runners: _RunnersDict,
+        initialize_timeout: float,
+        close_timeout: float,
+        memory_warn_mb: float,
+        memory_limit_mb: float,
+        ping_interval: float,
+        ping_timeout: float,
+        high_ping_threshold: float,
+        mp_ctx: BaseContext,
+        loop: asyncio.AbstractEventLoop,
+        http_proxy: str | None,
+        shm_ring_size: int = 0,
+        stuck_timeout: float = 30.0,
+    ) -> None:
+        if num_processes < 1:
+            raise ValueError("num_processes must be at least 1")
+
+        self._stuck_timeout = stuck_timeout
+        self._executor_kwargs: dict[str, Any] = {
+            "runners": runners,
+            "initialize_timeout": initialize_timeout,
+            "close_timeout": close_timeout,
+            "memory_warn_mb": memory_warn_mb,
+            "memory_limit_mb": memory_limit_mb,
+            "ping_interval": ping_interval,
+            "ping_timeout": ping_timeout,
+            "high_ping_threshold": high_ping_threshold,
+            "mp_ctx": mp_ctx,
+            "loop": loop,
+            "http_proxy": http_proxy,
+            "shm_ring_size": shm_ring_size,
+        }
+        self._health_interval = ping_interval
+
+        self._shards = [_Shard(i) for i in range(num_processes)]
+        self._affinity: dict[str, _Shard] = {}  # method -> shard of its last request
+        self._request_ids = itertools.count()
+        self._shard_tasks: list[asyncio.Task[None]] = []
+        self._health_atask: asyncio.Task[None] | None = None
+        self._kill_tasks: set[asyncio.Task[None]] = set()
+        self._closing = False
+        self._close_ev = asyncio.Event()
+
+    @property
+    def num_processes(self) -> int:
+        return len(self._shards)
+
+    @property
+    def processes(self) -> list[InferenceProcExecutor]:
+        return [s.executor for s in self._shards if s.executor is not None and s.ready]
+
+    @property
+    def started(self) -> bool:
+        return bool(self._shard_tasks)
+
+    async def start(self) -> None:
+        if self.started:
+            raise RuntimeError("pool already started")
+
+        self._shard_tasks = [asyncio.create_task(self._shard_task(s)) for s in self._shards]
+        self._health_atask = asyncio.create_task(self._health_task())
+
+    async def initialize(self) -> None:
+        """wait for every process to be initialized once, fails if none could be"""
+        await asyncio.gather(*(s.first_attempt.wait() for s in self._shards))
+        if not any(s.ready for s in self._shards):
+            raise RuntimeError("no inference process could be initialized")
+
+    def is_alive(self) -> bool:
+        return any(s.ready for s in self._shards)
+
+    async def aclose(self) -> None:
+        if not self.started:
+            return
+
+        self._closing = True
+        self._close_ev.set()
+        if self._health_atask is not None:
+            await aio.cancel_and_wait(self._health_atask)
+
+        await asyncio.gather(*(s.executor.aclose() for s in self._shards if s.executor is not None))
+        await asyncio.gather(*self._shard_tasks, return_exceptions=True)
+
+    async def do_inference(self, method: str, data: bytes) -> bytes | None:
+        shard = self._select(method)
+        if shard is None or shard.executor is None:
+            raise RuntimeError("no inference process available")
+
+        request = next(self._request_ids)
+        shard.pending[request] = time.monotonic()
+        metrics.inference_outstanding(process=shard.index, count=shard.outstanding)
+        try:
+            return await shard.executor.do_inference(method, data)
+        finally:
+            shard.pending.pop(request, None)
+            metrics.inference_outstanding(process=shard.index, count=shard.outstanding)
+
+    def _select(self, method: str) -> _Shard | None:
+        ready = [s for s in self._shards if s.ready]
+        if not ready:
+            return None
+
+        shard = min(ready, key=lambda s: s.outstanding)
+        preferred = self._affinity.get(method)
+        if preferred is not None and preferred.ready and preferred.outstanding <= shard.outstanding:
+            return preferred
+
+        self._affinity[method] = shard
+        return shard
+
+    async def _shard_task(self, shard: _Shard) -> None:
+        backoff = RESTART_BACKOFF[0]
+        while not self._closing:
+            executor = InferenceProcExecutor(**self._executor_kwargs)
+            shard.executor = executor
+            started_at = time.monotonic()
+            try:
+                await executor.start()
+                await executor.initialize()
+            except Exception:
+                logger.exception("failed to initialize inference process", extra=self._extra(shard))
+                if executor.started:
+                    await executor.kill()
+            else:
+                shard.ready = not self._closing
+            finally:
+                shard.first_attempt.set()
+
+            if self._closing:
+                await executor.aclose()  # started while the pool was closing
+            if executor.started:
+                await executor.join()
+            shard.ready = False
+            shard.pending.clear()
+            metrics.inference_outstanding(process=shard.index, count=0)
+
+            if self._closing:
+                break
+
+            if time.monotonic() - started_at > STABLE_UPTIME:
+                backoff = RESTART_BACKOFF[0]
+
+            reason = "evicted" if executor.killed else "exited"
+            logger.warning(
+                "inference process stopped, restarting it",
+                extra={"reason": reason, "exitcode": executor.exitcode, **self._extra(shard)},
+            )
+            metrics.inference_proc_restarted(reason=reason)
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._close_ev.wait(), backoff)
+            backoff = min(backoff * 2, RESTART_BACKOFF[1])
+
+    @log_exceptions(logger=logger)
+    async def _health_task(self) -> None:
+        while True:
+            await asyncio.sleep(self._health_interval)
+            now = time.monotonic()
+            for shard in self._shards:
+                if not shard.ready or shard.executor is None:
+                    continue
+
+                stuck_for = shard.oldest_request(now)
+                if stuck_for > self._stuck_timeout:
+                    logger.error(
+                        "inference process is stuck, killing it",
+                        extra={"stuck_for": round(stuck_for, 1), **self._extra(shard)},
+                    )
+                    shard.ready = False  # stop routing to it right away
+                    task = asyncio.create_task(shard.executor.kill())
+                    self._kill_tasks.add(task)
+                    task.add_done_callback(self._kill_tasks.discard)
+
+    def _extra(self, shard: _Shard) -> dict[str, Any]:
+        extra: dict[str, Any] = {"inference_process": shard.index}
+        if shard.executor is not None:
+            extra.update(shard.executor.logging_extra())
+        return extra
@@ -30,6 +30,7 @@ class InferenceProcExecutor(SupervisedProc):
         mp_ctx: BaseContext,
         loop: asyncio.AbstractEventLoop,
         http_proxy: str | None,
+        shm_ring_size: int = 0,
     ) -> None:
         super().__init__(
             initialize_timeout=initialize_timeout,
@@ -42,6 +43,7 @@ class InferenceProcExecutor(SupervisedProc):
             mp_ctx=mp_ctx,
             loop=loop,
             http_proxy=http_proxy,
+            shm_ring_size=shm_ring_size,
         )
 
         self._runners = runners
@@ -60,35 +62,52 @@ class InferenceProcExecutor(SupervisedProc):
             name="inference_proc",
         )
 
+    @property
+    def outstanding_requests(self) -> int:
+        return len(self._active_requests)
+
     @log_exceptions(logger=logger)
     async def _main_task(self, ipc_ch: aio.ChanReceiver[channel.Message]) -> None:
-        async for msg in ipc_ch:
-            if isinstance(msg, proto.InferenceResponse):
-                fut = self._active_requests.pop(msg.request_id, None)
-                if fut is None:
-                    logger.warning(
-                        "received unexpected inference response",
-                        extra={"request_id": msg.request_id},
-                    )
-                    return
-
-                with contextlib.suppress(asyncio.InvalidStateError):
-                    fut.set_result(msg)
+        try:
+            async for msg in ipc_ch:
+                if isinstance(msg, proto.InferenceResponse):
+                    fut = self._active_requests.pop(msg.request_id, None)
+                    if fut is None:
+                        logger.warning(
+                            "received unexpected inference response",
+                            extra={"request_id": msg.request_id},
+                        )
+                        continue
+
+                    with contextlib.suppress(asyncio.InvalidStateError):
+                        fut.set_result(msg)
+        finally:
+            # the process exited, its requests won't be answered
+            for fut in self._active_requests.values():
+                if not fut.done():
+                    fut.set_exception(RuntimeError("inference process exited"))
+            self._active_requests.clear()
 
     async def do_inference(self, method: str, data: bytes) -> bytes | None:
         if not self.started:
             raise RuntimeError("process not started")
 
+        if self._exitcode is not None:
+            raise RuntimeError("inference process exited")
+
         request_id = shortuuid("inference_req_")
         fut = asyncio.Future[proto.InferenceResponse]()
-
-        await channel.asend_message(
-            self._pch,
-            proto.InferenceRequest(request_id=request_id, method=method, data=data),
-        )
-
+        # registered before sending, the response can arrive while _send() waits for the drain
         self._active_requests[request_id] = fut
 
+        try:
+            await self._send(
+                proto.InferenceRequest(request_id=request_id, method=method, data=data)
+            )
+        except Exception:
+            self._active_requests.pop(request_id, None)
+            raise
+
         inf_resp = await fut
         if inf_resp.error:
             raise RuntimeError(f"inference of {method} failed: {inf_resp.error}")
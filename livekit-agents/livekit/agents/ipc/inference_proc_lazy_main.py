@@ -95,13 +95,30 @@ class _InferenceProc:
 
     @log_exceptions(logger=logger)
     async def entrypoint(self, cch: aio.ChanReceiver[Message]) -> None:
-        async for msg in cch:
-            if isinstance(msg, proto.InferenceRequest):
-                await self._handle_inference_request(msg)
+        # requests of the runners implementing run_batch are queued for their batch task
+        batch_queues = {
+            method: asyncio.Queue[proto.InferenceRequest]()
+            for method, runner in self._runners.items()
+            if runner.supports_batching()
+        }
+        batch_tasks = [
+            asyncio.create_task(self._batch_task(method, queue))
+            for method, queue in batch_queues.items()
+        ]
 
-            if isinstance(msg, proto.ShutdownRequest):
-                await self._client.send(proto.Exiting(reason=msg.reason))
-                break
+        try:
+            async for msg in cch:
+                if isinstance(msg, proto.InferenceRequest):
+                    if msg.method in batch_queues:
+                        batch_queues[msg.method].put_nowait(msg)
+                    else:
+                        await self._handle_inference_request(msg)
+
+                if isinstance(msg, proto.ShutdownRequest):
+                    await self._client.send(proto.Exiting(reason=msg.reason))
+                    break
+        finally:
+            await aio.cancel_and_wait(*batch_tasks)
 
     async def _handle_inference_request(self, msg: proto.InferenceRequest) -> None:
         loop = asyncio.get_running_loop()
@@ -125,3 +142,52 @@ class _InferenceProc:
             await self._client.send(
                 proto.InferenceResponse(request_id=msg.request_id, error=str(e))
             )
+
+    @log_exceptions(logger=logger)
+    async def _batch_task(self, method: str, queue: asyncio.Queue[proto.InferenceRequest]) -> None:
+        """a batch starts with the first pending request and is closed BATCH_WINDOW seconds
+        later or once it has MAX_BATCH_SIZE requests. the requests arriving while a batch runs
+        are pending for the next one"""
+        loop = asyncio.get_running_loop()
+        runner = self._runners[method]
+        window = runner.BATCH_WINDOW
+        max_size = runner.MAX_BATCH_SIZE
+
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + window
+            while len(batch) < max_size:
+                if not queue.empty():
+                    batch.append(queue.get_nowait())
+                    continue
+
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._run_batch(method, batch)
+
+    async def _run_batch(self, method: str, batch: list[proto.InferenceRequest]) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(
+                self._executor, self._runners[method].run_batch, [msg.data for msg in batch]
+            )
+            if len(results) != len(batch):
+                raise RuntimeError(f"run_batch returned {len(results)} results for {len(batch)}")
+        except Exception:
+            logger.exception(
+                "error running batched inference, retrying the requests one by one",
+                extra={"method": method, "batch_size": len(batch)},
+            )
+            for msg in batch:
+                await self._handle_inference_request(msg)
+            return
+
+        for msg, data in zip(batch, results):
+            await self._client.send(proto.InferenceResponse(request_id=msg.request_id, data=data))
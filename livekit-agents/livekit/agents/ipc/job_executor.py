@@ -4,6 +4,7 @@ from enum import Enum
 from typing import Any, Protocol
 
 from ..job import RunningJobInfo
+from .resource_usage import JobUsage
 
 
 class JobExecutor(Protocol):
@@ -25,6 +26,9 @@ class JobExecutor(Protocol):
     @property
     def status(self) -> JobStatus: ...
 
+    @property
+    def usage(self) -> JobUsage: ...
+
     async def start(self) -> None: ...
 
     async def join(self) -> None: ...
@@ -35,6 +39,8 @@ class JobExecutor(Protocol):
 
     async def launch_job(self, info: RunningJobInfo) -> None: ...
 
+    async def assign_job(self, url: str, token: str) -> None: ...
+
     def logging_extra(self) -> dict[str, Any]: ...
 
 
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
 import asyncio
-import multiprocessing as mp
+import dataclasses
 import socket
+import time
 from collections.abc import Awaitable
 from multiprocessing.context import BaseContext
 from typing import Any, Callable
@@ -11,11 +12,12 @@ from ..job import JobContext, JobProcess, RunningJobInfo
 from ..log import logger
 from ..telemetry import metrics
 from ..utils import aio, log_exceptions, shortuuid
-from . import channel, proto
+from . import channel, proto, resource_usage
 from .inference_executor import InferenceExecutor
 from .job_executor import JobStatus
 from .job_proc_lazy_main import ProcStartArgs, proc_main
-from .supervised_proc import SupervisedProc
+from .supervised_proc import SupervisedProc, _ProcessHandle
+from .zygote_proc import Zygote
 
 
 class ProcJobExecutor(SupervisedProc):
@@ -35,6 +37,13 @@ class ProcJobExecutor(SupervisedProc):
         http_proxy: str | None,
         mp_ctx: BaseContext,
         loop: asyncio.AbstractEventLoop,
+        zygote: Zygote | None = None,
+        shm_ring_size: int = 0,
+        usage_interval: float = 5.0,
+        loop_stall_threshold: float = 0.0,
+        loop_stall_profile_dir: str | None = None,
+        log_rate_limit: float = 0.0,
+        log_debug_sample_rate: float = 1.0,
     ) -> None:
         super().__init__(
             initialize_timeout=initialize_timeout,
@@ -47,6 +56,12 @@ class ProcJobExecutor(SupervisedProc):
             mp_ctx=mp_ctx,
             loop=loop,
             http_proxy=http_proxy,
+            shm_ring_size=shm_ring_size,
+            usage_interval=usage_interval,
+            loop_stall_threshold=loop_stall_threshold,
+            loop_stall_profile_dir=loop_stall_profile_dir,
+            log_rate_limit=log_rate_limit,
+            log_debug_sample_rate=log_debug_sample_rate,
         )
 
         self._user_args: Any | None = None
@@ -55,7 +70,11 @@ class ProcJobExecutor(SupervisedProc):
         self._initialize_process_fnc = initialize_process_fnc
         self._job_entrypoint_fnc = job_entrypoint_fnc
         self._inference_executor = inference_executor
+        self._zygote = zygote
+        self._forked = zygote is not None
         self._inference_tasks: list[asyncio.Task[None]] = []
+        self._usage = resource_usage.JobUsage()
+        self._job_cpu_offset = 0.0  # CPU the process used before the job (prewarm)
         self._id = shortuuid("PCEXEC_")
 
     @property
@@ -81,7 +100,15 @@ class ProcJobExecutor(SupervisedProc):
     def running_job(self) -> RunningJobInfo | None:
         return self._running_job
 
-    def _create_process(self, cch: socket.socket, log_cch: socket.socket) -> mp.Process:
+    @property
+    def usage(self) -> resource_usage.JobUsage:
+        return self._usage
+
+    def _create_process(self, cch: socket.socket, log_cch: socket.socket) -> _ProcessHandle:
+        if self._zygote is not None:
+            # forked from the prewarmed zygote, which has its own user_arguments
+            return self._zygote.process(cch, log_cch)
+
         proc_args = ProcStartArgs(
             initialize_process_fnc=self._initialize_process_fnc,
             job_entrypoint_fnc=self._job_entrypoint_fnc,
@@ -100,6 +127,9 @@ class ProcJobExecutor(SupervisedProc):
             async for msg in ipc_ch:
                 if isinstance(msg, proto.InferenceRequest):
                     self._inference_tasks.append(asyncio.create_task(self._do_inference_task(msg)))
+
+                if isinstance(msg, proto.FirstAudioPublished):
+                    _report_first_audio(self._running_job, self.logging_extra())
         finally:
             await aio.cancel_and_wait(*self._inference_tasks)
 
@@ -110,30 +140,11 @@ class ProcJobExecutor(SupervisedProc):
         finally:
             if self._running_job:
                 metrics.job_ended()
+                self._usage.end()
                 self._job_status = JobStatus.SUCCESS if self.exitcode == 0 else JobStatus.FAILED
 
     async def _do_inference_task(self, inf_req: proto.InferenceRequest) -> None:
-        if self._inference_executor is None:
-            logger.warning("inference request received but no inference executor")
-            await channel.asend_message(
-                self._pch,
-                proto.InferenceResponse(
-                    request_id=inf_req.request_id, error="no inference executor"
-                ),
-            )
-            return
-
-        try:
-            inf_res = await self._inference_executor.do_inference(inf_req.method, inf_req.data)
-            await channel.asend_message(
-                self._pch,
-                proto.InferenceResponse(request_id=inf_req.request_id, data=inf_res),
-            )
-        except Exception as e:
-            await channel.asend_message(
-                self._pch,
-                proto.InferenceResponse(request_id=inf_req.request_id, error=str(e)),
-            )
+        await _forward_inference(self, self._inference_executor, inf_req)
 
     async def launch_job(self, info: RunningJobInfo) -> None:
         """start/assign a job to the process"""
@@ -146,11 +157,30 @@ class ProcJobExecutor(SupervisedProc):
         metrics.job_started()
         self._job_status = JobStatus.RUNNING
         self._running_job = info
+        self._job_cpu_offset = self._cpu_time()
+        self._usage.started_at = time.time()
 
         start_req = proto.StartJobRequest()
         start_req.running_job = info
         await channel.asend_message(self._pch, start_req)
 
+    async def assign_job(self, url: str, token: str) -> None:
+        """send the assignment of a job launched before the server assigned it"""
+        if self._running_job is None:
+            raise RuntimeError("no job launched")
+
+        self._running_job = dataclasses.replace(self._running_job, url=url, token=token)
+        await self._send(proto.JobAssigned(job_id=self._running_job.job.id, url=url, token=token))
+
+    def _on_usage(self, usage: resource_usage.ProcUsage) -> None:
+        if self._running_job is not None and self._usage.ended_at is None:
+            self._usage.add_sample(
+                cpu_time=max(usage.cpu_time - self._job_cpu_offset, 0.0),
+                cpu_cores=usage.cpu_cores,
+                memory_mb=self._memory_mb(usage),
+                loop_lag=usage.loop_lag,
+            )
+
     def logging_extra(self) -> dict[str, Any]:
         extra = super().logging_extra()
 
@@ -158,3 +188,36 @@ class ProcJobExecutor(SupervisedProc):
             extra["job_id"] = self._running_job.job.id
 
         return extra
+
+
+async def _forward_inference(
+    proc: SupervisedProc,
+    inference_executor: InferenceExecutor | None,
+    inf_req: proto.InferenceRequest,
+) -> None:
+    """runs an InferenceRequest of a job process and sends back the InferenceResponse"""
+    if inference_executor is None:
+        logger.warning("inference request received but no inference executor")
+        await proc._send(
+            proto.InferenceResponse(request_id=inf_req.request_id, error="no inference executor")
+        )
+        return
+
+    try:
+        inf_res = await inference_executor.do_inference(inf_req.method, inf_req.data)
+        await proc._send(proto.InferenceResponse(request_id=inf_req.request_id, data=inf_res))
+    except Exception as e:
+        await proc._send(proto.InferenceResponse(request_id=inf_req.request_id, error=str(e)))
+
+
+def _report_first_audio(info: RunningJobInfo | None, extra: dict[str, Any]) -> None:
+    """the agent of a job published its first audio frame"""
+    if info is None or not info.request_received_at:
+        return  # e.g. simulated jobs
+
+    delay = time.time() - info.request_received_at
+    metrics.job_first_audio(delay=delay)
+    logger.info(
+        "first audio frame published",
+        extra={"request_to_first_audio": round(delay, 3), **extra},
+    )
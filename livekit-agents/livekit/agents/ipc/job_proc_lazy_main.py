@@ -22,10 +22,20 @@ if current_process().name == "job_proc":
 
 
 import asyncio
+import collections.abc
 import contextlib
+import contextvars
+import dataclasses
+import logging
+import os
+import select
+import signal
 import socket
+import threading
+import time
+from collections.abc import Awaitable, Coroutine, Generator
 from dataclasses import dataclass
-from typing import Any, Callable, cast
+from typing import Any, Callable, Optional, cast
 
 from opentelemetry import trace
 
@@ -35,15 +45,28 @@ from ..cli import cli
 from ..job import JobContext, JobExecutorType, JobProcess, _JobContextVar
 from ..log import logger
 from ..telemetry import trace_types, tracer
-from ..utils import aio, http_context, log_exceptions, shortuuid
-from .channel import Message
+from ..utils import aio, http_context, log_exceptions, shortuuid, time_ms
+from ..utils.aio import duplex_unix
+from .channel import Message, recv_message, send_message
 from .inference_executor import InferenceExecutor
+from .log_queue import LogQueueHandler
+from .loop_profiler import LoopStallProfiler
 from .proc_client import _ProcClient
 from .proto import (
+    IPC_MESSAGES,
     Exiting,
+    FirstAudioPublished,
+    ForkedProcExited,
     InferenceRequest,
     InferenceResponse,
     InitializeRequest,
+    InitializeResponse,
+    JobAssigned,
+    JobEnded,
+    JobUsageReport,
+    PingRequest,
+    PongResponse,
+    ShutdownJobRequest,
     ShutdownRequest,
     StartJobRequest,
 )
@@ -56,17 +79,29 @@ class ProcStartArgs:
     mp_cch: socket.socket
     log_cch: socket.socket
     user_arguments: Any | None = None
+    max_jobs: int = 1  # > 1 runs a _SharedJobProc
 
 
-def proc_main(args: ProcStartArgs) -> None:
+def proc_main(args: ProcStartArgs, prewarmed: JobProcess | None = None) -> None:
     from .proc_client import _ProcClient
 
-    job_proc = _JobProc(
-        args.initialize_process_fnc,
-        args.job_entrypoint_fnc,
-        JobExecutorType.PROCESS,
-        args.user_arguments,
-    )
+    job_proc: _JobProc
+    if args.max_jobs > 1:
+        job_proc = _SharedJobProc(
+            args.initialize_process_fnc,
+            args.job_entrypoint_fnc,
+            args.max_jobs,
+            args.user_arguments,
+            prewarmed=prewarmed,
+        )
+    else:
+        job_proc = _JobProc(
+            args.initialize_process_fnc,
+            args.job_entrypoint_fnc,
+            JobExecutorType.PROCESS,
+            args.user_arguments,
+            prewarmed=prewarmed,
+        )
 
     client = _ProcClient(
         args.mp_cch,
@@ -83,6 +118,165 @@ def proc_main(args: ProcStartArgs) -> None:
     client.run()
 
 
+def zygote_main(args: ProcStartArgs, fork_cch: socket.socket) -> None:
+    """main function of a zygote process: runs initialize_process_fnc once, then forks a job
+    process from itself for each pair of channels received on fork_cch. the job processes
+    share the pages of the zygote (loaded models, imported modules) until they write to them"""
+    zygote = _Zygote(args, fork_cch)
+    forked = zygote.run()
+    if forked is None:
+        return  # the zygote is exiting
+
+    # we're now in a forked job process
+    mp_cch, log_cch = forked
+    proc_main(dataclasses.replace(args, mp_cch=mp_cch, log_cch=log_cch), prewarmed=zygote.job_proc)
+
+
+class _Zygote:
+    def __init__(self, args: ProcStartArgs, fork_cch: socket.socket) -> None:
+        self._args = args
+        self._fork_cch = fork_cch
+        self._cch = duplex_unix._Duplex.open(args.mp_cch)
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._log_handler: LogQueueHandler | None = None
+        self._job_proc: JobProcess | None = None
+
+    @property
+    def job_proc(self) -> JobProcess:
+        assert self._job_proc is not None
+        return self._job_proc
+
+    def run(self) -> tuple[socket.socket, socket.socket] | None:
+        """returns the channels of the job process when returning in a forked process"""
+        # forking a process that has other threads running isn't safe, so logs are sent from
+        # the thread emitting them
+        self._log_handler = LogQueueHandler(
+            duplex_unix._Duplex.open(self._args.log_cch), threaded=False
+        )
+        root_logger = logging.getLogger()
+        root_logger.setLevel(logging.NOTSET)
+        root_logger.addHandler(self._log_handler)
+
+        try:
+            if not self._initialize():
+                return None
+
+            return self._serve()
+        except duplex_unix.DuplexClosed:
+            return None
+        finally:
+            self._close()
+
+    def _initialize(self) -> bool:
+        init_req = recv_message(self._cch, IPC_MESSAGES)
+        assert isinstance(init_req, InitializeRequest), (
+            "first message must be proto.InitializeRequest"
+        )
+
+        try:
+            self._job_proc = JobProcess(
+                executor_type=(
+                    JobExecutorType.SHARED_PROCESS
+                    if self._args.max_jobs > 1
+                    else JobExecutorType.PROCESS
+                ),
+                user_arguments=self._args.user_arguments,
+                http_proxy=init_req.http_proxy or None,
+            )
+            self._args.initialize_process_fnc(self._job_proc)
+        except Exception as e:
+            send_message(self._cch, InitializeResponse(error=str(e)))
+            return False
+
+        send_message(self._cch, InitializeResponse())
+
+        threads = [t.name for t in threading.enumerate() if t is not threading.current_thread()]
+        if threads:
+            logger.warning(
+                "initialize_process_fnc left threads running in the zygote, the job processes "
+                "forked from it won't have them",
+                extra={"threads": threads},
+            )
+        return True
+
+    def _serve(self) -> tuple[socket.socket, socket.socket] | None:
+        # SIGCHLD only wakes up select, the exited processes are reaped by _reap
+        self._wakeup_w.setblocking(False)
+        signal.set_wakeup_fd(self._wakeup_w.fileno())
+        signal.signal(signal.SIGCHLD, lambda *_: None)
+
+        while True:
+            readable, _, _ = select.select(
+                [self._args.mp_cch, self._fork_cch, self._wakeup_r], [], []
+            )
+
+            if self._wakeup_r in readable:
+                self._wakeup_r.recv(4096)
+
+            self._reap()
+
+            if self._fork_cch in readable:
+                forked = self._fork()
+                if forked is not None:
+                    return forked
+
+            if self._args.mp_cch in readable:
+                msg = recv_message(self._cch, IPC_MESSAGES)
+                if isinstance(msg, PingRequest):
+                    send_message(
+                        self._cch, PongResponse(last_timestamp=msg.timestamp, timestamp=time_ms())
+                    )
+                if isinstance(msg, ShutdownRequest):
+                    # the job processes forked from here keep running
+                    return None
+
+    def _fork(self) -> tuple[socket.socket, socket.socket] | None:
+        msg, fds, _, _ = socket.recv_fds(self._fork_cch, 1, 2)
+        if not msg or len(fds) != 2:
+            raise duplex_unix.DuplexClosed()
+
+        pid = os.fork()
+        if pid == 0:
+            self._close()
+            return socket.socket(fileno=fds[0]), socket.socket(fileno=fds[1])
+
+        for fd in fds:
+            os.close(fd)
+
+        self._fork_cch.sendall(pid.to_bytes(4, "big"))
+        logger.debug("forked job process", extra={"forked_pid": pid})
+        return None
+
+    def _reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+
+            if pid == 0:
+                return
+
+            send_message(
+                self._cch,
+                ForkedProcExited(pid=pid, exitcode=os.waitstatus_to_exitcode(status)),
+            )
+
+    def _close(self) -> None:
+        # also runs in every forked process, which must not keep the zygote's channels open
+        signal.set_wakeup_fd(-1)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        if self._log_handler is not None:
+            logging.getLogger().removeHandler(self._log_handler)
+            self._log_handler.close()
+            self._log_handler = None
+
+        self._cch.close()
+        self._fork_cch.close()
+        self._wakeup_r.close()
+        self._wakeup_w.close()
+
+
 class _InfClient(InferenceExecutor):
     def __init__(self, proc_client: _ProcClient) -> None:
         self._client = proc_client
@@ -91,13 +285,13 @@ class _InfClient(InferenceExecutor):
     async def do_inference(self, method: str, data: bytes) -> bytes | None:
         request_id = shortuuid("inference_job_")
         fut = asyncio.Future[InferenceResponse]()
+        # registered before sending, the response can arrive while send() waits for the drain
+        self._active_requests[request_id] = fut
 
         await self._client.send(
             InferenceRequest(request_id=request_id, method=method, data=data),
         )
 
-        self._active_requests[request_id] = fut
-
         inf_resp = await fut
         if inf_resp.error:
             raise RuntimeError(f"inference of {method} failed: {inf_resp.error}")
@@ -120,71 +314,93 @@ class _ShutdownInfo:
     reason: str
 
 
-class _JobProc:
-    def __init__(
-        self,
-        initialize_process_fnc: Callable[[JobProcess], Any],
-        job_entrypoint_fnc: Callable[[JobContext], Any],
-        executor_type: JobExecutorType,
-        user_arguments: Any | None = None,
-    ) -> None:
-        self._executor_type = executor_type
-        self._user_arguments = user_arguments
-        self._initialize_process_fnc = initialize_process_fnc
-        self._job_entrypoint_fnc = job_entrypoint_fnc
-        self._job_task: asyncio.Task[None] | None = None
+class _JobUsage:
+    __slots__ = ("job_id", "cpu_time")
 
-        # used to warn users if both connect and shutdown are not called inside the job_entry
-        self._ctx_connect_called = False
-        self._ctx_shutdown_called = False
+    def __init__(self, job_id: str) -> None:
+        self.job_id = job_id
+        self.cpu_time = 0.0
 
-    @property
-    def has_running_job(self) -> bool:
-        return self._job_task is not None
 
-    def initialize(self, init_req: InitializeRequest, client: _ProcClient) -> None:
-        self._client = client
-        self._inf_client = _InfClient(client)
-        self._job_proc = JobProcess(
-            executor_type=self._executor_type,
-            user_arguments=self._user_arguments,
-            http_proxy=init_req.http_proxy or None,
-        )
-        self._initialize_process_fnc(self._job_proc)
+# set inside a job's task when its process runs several jobs, read by _metered_task_factory
+_JobUsageVar = contextvars.ContextVar[Optional[_JobUsage]]("agents_job_usage", default=None)
 
-    @log_exceptions(logger=logger)
-    async def entrypoint(self, cch: aio.ChanReceiver[Message]) -> None:
-        self._exit_proc_flag = asyncio.Event()
-        self._shutdown_fut: asyncio.Future[_ShutdownInfo] = asyncio.Future()
+# the job whose task is running a step, read by the LoopStallProfiler thread to attribute stalls
+_stepping_usage: _JobUsage | None = None
 
-        @log_exceptions(logger=logger)
-        async def _read_ipc_task() -> None:
-            async for msg in cch:
-                if isinstance(msg, StartJobRequest):
-                    if self.has_running_job:
-                        logger.warning("trying to start a new job while one is already running")
-                        continue
 
-                    self._start_job(msg)
-                if isinstance(msg, ShutdownRequest):
-                    if not self.has_running_job:
-                        self._exit_proc_flag.set()
-                        break  # exit immediately
+class _MeteredCoroutine(collections.abc.Coroutine):
+    """wraps the coroutine of a task, adding the CPU time of each step to usage.cpu_time"""
 
-                    with contextlib.suppress(asyncio.InvalidStateError):
-                        self._shutdown_fut.set_result(
-                            _ShutdownInfo(reason=msg.reason, user_initiated=False)
-                        )
+    __slots__ = ("_coro", "_usage")
 
-                if isinstance(msg, InferenceResponse):
-                    self._inf_client._on_inference_response(msg)
+    def __init__(self, coro: Coroutine[Any, Any, Any], usage: _JobUsage) -> None:
+        self._coro = coro
+        self._usage = usage
 
-        read_task = asyncio.create_task(_read_ipc_task(), name="job_ipc_read")
+    def send(self, value: Any) -> Any:
+        global _stepping_usage
+        prev, _stepping_usage = _stepping_usage, self._usage
+        start = time.thread_time()
+        try:
+            return self._coro.send(value)
+        finally:
+            self._usage.cpu_time += time.thread_time() - start
+            _stepping_usage = prev
+
+    def throw(self, *args: Any) -> Any:
+        global _stepping_usage
+        prev, _stepping_usage = _stepping_usage, self._usage
+        start = time.thread_time()
+        try:
+            return self._coro.throw(*args)
+        finally:
+            self._usage.cpu_time += time.thread_time() - start
+            _stepping_usage = prev
 
-        await self._exit_proc_flag.wait()
-        await aio.cancel_and_wait(read_task)
+    def close(self) -> None:
+        self._coro.close()
+
+    def __await__(self) -> Generator[Any, None, Any]:
+        return self._coro.__await__()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._coro, name)  # cr_frame, __qualname__, ... for task reprs
+
+
+def _metered_task_factory(
+    loop: asyncio.AbstractEventLoop, coro: Coroutine[Any, Any, Any], **kwargs: Any
+) -> asyncio.Task[Any]:
+    # tasks inherit the context of the code creating them, so every task spawned by a job
+    # (directly or not) is accounted to it. time spent in plain loop callbacks or in
+    # executor threads isn't.
+    usage = _JobUsageVar.get()
+    if usage is not None:
+        coro = _MeteredCoroutine(coro, usage)
+    return asyncio.Task(coro, loop=loop, **kwargs)
+
+
+class _RunningJob:
+    """a job started in this process: its room, JobContext and the task running the entrypoint"""
+
+    def __init__(
+        self,
+        msg: StartJobRequest,
+        *,
+        job_proc: JobProcess,
+        job_entrypoint_fnc: Callable[[JobContext], Any],
+        inf_client: _InfClient,
+        client: _ProcClient,
+    ) -> None:
+        self._job_entrypoint_fnc = job_entrypoint_fnc
+        self._shutdown_fut: asyncio.Future[_ShutdownInfo] = asyncio.Future()
+        self.usage = _JobUsage(msg.running_job.job.id)
+        self.entrypoint_error: BaseException | None = None
+
+        # used to warn users if both connect and shutdown are not called inside the job_entry
+        self._ctx_connect_called = False
+        self._ctx_shutdown_called = False
 
-    def _start_job(self, msg: StartJobRequest) -> None:
         if cli.CLI_ARGUMENTS is not None and cli.CLI_ARGUMENTS.console:
             from .mock_room import create_mock_room
 
@@ -194,40 +410,49 @@ class _JobProc:
 
         @self._room.on("disconnected")
         def _on_room_disconnected(*args: Any) -> None:
-            with contextlib.suppress(asyncio.InvalidStateError):
-                self._shutdown_fut.set_result(
-                    _ShutdownInfo(user_initiated=False, reason="room disconnected")
-                )
+            self.shutdown("room disconnected")
 
         def _on_ctx_connect() -> None:
             self._ctx_connect_called = True
 
         def _on_ctx_shutdown(reason: str) -> None:
             self._ctx_shutdown_called = True
-
-            with contextlib.suppress(asyncio.InvalidStateError):
-                self._shutdown_fut.set_result(_ShutdownInfo(user_initiated=True, reason=reason))
+            self.shutdown(reason, user_initiated=True)
 
         self._room._info.name = msg.running_job.job.room.name
 
         self._job_ctx = JobContext(
-            proc=self._job_proc,
+            proc=job_proc,
             info=msg.running_job,
             room=self._room,
             on_connect=_on_ctx_connect,
             on_shutdown=_on_ctx_shutdown,
-            inference_executor=self._inf_client,
+            inference_executor=inf_client,
+            on_first_audio=lambda: client.send(FirstAudioPublished(job_id=self.id)),
         )
 
-        self._job_task = asyncio.create_task(self._run_job_task(), name="job_task")
+    @property
+    def id(self) -> str:
+        return self._job_ctx.job.id
 
-        def _exit_proc_cb(_: asyncio.Task[None]) -> None:
-            self._exit_proc_flag.set()
+    @property
+    def shutdown_reason(self) -> str:
+        if not self._shutdown_fut.done():
+            return ""
+        return self._shutdown_fut.result().reason
 
-        self._job_task.add_done_callback(_exit_proc_cb)
+    def assign(self, msg: JobAssigned) -> None:
+        self._job_ctx._on_assigned(msg.url, msg.token)
+
+    def shutdown(self, reason: str, *, user_initiated: bool = False) -> None:
+        with contextlib.suppress(asyncio.InvalidStateError):
+            self._shutdown_fut.set_result(
+                _ShutdownInfo(user_initiated=user_initiated, reason=reason)
+            )
 
-    async def _run_job_task(self) -> None:
+    async def run(self, on_exiting: Callable[[str], Awaitable[None]] | None = None) -> None:
         job_ctx_token = _JobContextVar.set(self._job_ctx)
+        usage_token = _JobUsageVar.set(self.usage)
         http_context._new_session_ctx()
 
         @tracer.start_as_current_span("job_entrypoint")
@@ -259,6 +484,7 @@ class _JobProc:
 
         def log_exception(t: asyncio.Task[Any]) -> None:
             if not t.cancelled() and t.exception():
+                self.entrypoint_error = t.exception()
                 logger.error(
                     "unhandled exception while running the job task",
                     exc_info=t.exception(),
@@ -274,33 +500,302 @@ class _JobProc:
 
         job_entry_task.add_done_callback(log_exception)
 
-        shutdown_info = await self._shutdown_fut
-        logger.debug(
-            "shutting down job task",
-            extra={
-                "reason": shutdown_info.reason,
-                "user_initiated": shutdown_info.user_initiated,
-            },
+        try:
+            shutdown_info = await self._shutdown_fut
+            logger.debug(
+                "shutting down job task",
+                extra={
+                    "reason": shutdown_info.reason,
+                    "user_initiated": shutdown_info.user_initiated,
+                },
+            )
+
+            if on_exiting is not None:
+                await on_exiting(shutdown_info.reason)
+            await self._room.disconnect()
+
+            try:
+                shutdown_tasks = []
+                for callback in self._job_ctx._shutdown_callbacks:
+                    shutdown_tasks.append(
+                        asyncio.create_task(
+                            callback(shutdown_info.reason), name="job_shutdown_callback"
+                        )
+                    )
+
+                await asyncio.gather(*shutdown_tasks)
+            except Exception:
+                logger.exception("error while shutting down the job")
+        finally:
+            await aio.cancel_and_wait(job_entry_task, warn_unconnected_task)
+            await http_context._close_http_ctx()
+            _JobUsageVar.reset(usage_token)
+            _JobContextVar.reset(job_ctx_token)
+
+
+class _JobProc:
+    def __init__(
+        self,
+        initialize_process_fnc: Callable[[JobProcess], Any],
+        job_entrypoint_fnc: Callable[[JobContext], Any],
+        executor_type: JobExecutorType,
+        user_arguments: Any | None = None,
+        *,
+        prewarmed: JobProcess | None = None,
+    ) -> None:
+        self._executor_type = executor_type
+        self._user_arguments = user_arguments
+        self._initialize_process_fnc = initialize_process_fnc
+        self._job_entrypoint_fnc = job_entrypoint_fnc
+        self._prewarmed = prewarmed
+        self._job: _RunningJob | None = None
+        self._job_task: asyncio.Task[None] | None = None
+        self._profiler: LoopStallProfiler | None = None
+
+    @property
+    def has_running_job(self) -> bool:
+        return self._job_task is not None
+
+    def initialize(self, init_req: InitializeRequest, client: _ProcClient) -> None:
+        self._client = client
+        self._inf_client = _InfClient(client)
+        self._init_req = init_req
+        client.set_log_limits(
+            rate_limit=init_req.log_rate_limit,
+            debug_sample_rate=init_req.log_debug_sample_rate,
+            job_id_fnc=self._current_job_id,
         )
+        if self._prewarmed is not None:
+            # forked from a zygote, which already ran initialize_process_fnc
+            self._job_proc = self._prewarmed
+            return
 
-        await self._client.send(Exiting(reason=shutdown_info.reason))
-        await self._room.disconnect()
+        self._job_proc = JobProcess(
+            executor_type=self._executor_type,
+            user_arguments=self._user_arguments,
+            http_proxy=init_req.http_proxy or None,
+        )
+        self._initialize_process_fnc(self._job_proc)
 
+    @log_exceptions(logger=logger)
+    async def entrypoint(self, cch: aio.ChanReceiver[Message]) -> None:
+        self._exit_proc_flag = asyncio.Event()
+        self._start_profiler()
+
+        @log_exceptions(logger=logger)
+        async def _read_ipc_task() -> None:
+            async for msg in cch:
+                if isinstance(msg, StartJobRequest):
+                    if self.has_running_job:
+                        logger.warning("trying to start a new job while one is already running")
+                        continue
+
+                    self._start_job(msg)
+                if isinstance(msg, ShutdownRequest):
+                    if self._job is None:
+                        self._exit_proc_flag.set()
+                        break  # exit immediately
+
+                    self._job.shutdown(msg.reason)
+
+                if isinstance(msg, JobAssigned) and self._job is not None:
+                    self._job.assign(msg)
+
+                if isinstance(msg, InferenceResponse):
+                    self._inf_client._on_inference_response(msg)
+
+        read_task = asyncio.create_task(_read_ipc_task(), name="job_ipc_read")
+
+        await self._exit_proc_flag.wait()
+        await aio.cancel_and_wait(read_task)
+        if self._profiler is not None:
+            self._profiler.stop()
+        await self._run_shutdown_callbacks()
+
+    async def _run_shutdown_callbacks(self) -> None:
         try:
-            shutdown_tasks = []
-            for callback in self._job_ctx._shutdown_callbacks:
-                shutdown_tasks.append(
-                    asyncio.create_task(
-                        callback(shutdown_info.reason), name="job_shutdown_callback"
+            await asyncio.gather(*(callback() for callback in self._job_proc._shutdown_callbacks))
+        except Exception:
+            logger.exception("error while shutting down the process")
+
+    def _start_profiler(self) -> None:
+        if self._init_req.loop_stall_threshold <= 0:
+            return
+
+        self._profiler = LoopStallProfiler(
+            asyncio.get_running_loop(),
+            threshold=self._init_req.loop_stall_threshold,
+            job_id_fnc=self._current_job_id,
+            profile_dir=self._init_req.loop_stall_profile_dir or None,
+        )
+        self._profiler.start()
+
+    def _current_job_id(self) -> str | None:
+        """called by the profiler thread while the loop is blocked, and for the logs"""
+        return self._job.id if self._job is not None else None
+
+    def _start_job(self, msg: StartJobRequest) -> None:
+        self._job = _RunningJob(
+            msg,
+            job_proc=self._job_proc,
+            job_entrypoint_fnc=self._job_entrypoint_fnc,
+            inf_client=self._inf_client,
+            client=self._client,
+        )
+
+        async def _on_exiting(reason: str) -> None:
+            await self._client.send(Exiting(reason=reason))
+
+        self._job_task = asyncio.create_task(self._job.run(_on_exiting), name="job_task")
+
+        def _exit_proc_cb(_: asyncio.Task[None]) -> None:
+            if self._profiler is not None and self._job is not None:
+                self._profiler.job_ended(self._job.id)
+            self._exit_proc_flag.set()
+
+        self._job_task.add_done_callback(_exit_proc_cb)
+
+
+class _SharedJobProc(_JobProc):
+    """runs up to `max_jobs` jobs at the same time, each one in its own task.
+
+    a job failing (an exception in its entrypoint or in its shutdown callbacks) only ends that
+    job; the process keeps serving the others until the main process asks it to shut down"""
+
+    def __init__(
+        self,
+        initialize_process_fnc: Callable[[JobProcess], Any],
+        job_entrypoint_fnc: Callable[[JobContext], Any],
+        max_jobs: int,
+        user_arguments: Any | None = None,
+        *,
+        prewarmed: JobProcess | None = None,
+    ) -> None:
+        super().__init__(
+            initialize_process_fnc,
+            job_entrypoint_fnc,
+            JobExecutorType.SHARED_PROCESS,
+            user_arguments,
+            prewarmed=prewarmed,
+        )
+        self._max_jobs = max_jobs
+        self._jobs: dict[str, tuple[_RunningJob, asyncio.Task[None]]] = {}
+        self._closing = False
+
+    @property
+    def has_running_job(self) -> bool:
+        return len(self._jobs) > 0
+
+    @log_exceptions(logger=logger)
+    async def entrypoint(self, cch: aio.ChanReceiver[Message]) -> None:
+        self._exit_proc_flag = asyncio.Event()
+        asyncio.get_running_loop().set_task_factory(_metered_task_factory)  # type: ignore[arg-type]
+        self._start_profiler()
+
+        @log_exceptions(logger=logger)
+        async def _read_ipc_task() -> None:
+            async for msg in cch:
+                if isinstance(msg, StartJobRequest):
+                    job_id = msg.running_job.job.id
+                    if self._closing or len(self._jobs) >= self._max_jobs:
+                        logger.warning(
+                            "trying to start a new job while the process is full",
+                            extra={"job_id": job_id, "max_jobs": self._max_jobs},
+                        )
+                        await self._client.send(JobEnded(job_id=job_id, error="process is full"))
+                        continue
+
+                    self._start_job(msg)
+
+                if isinstance(msg, ShutdownJobRequest):
+                    entry = self._jobs.get(msg.job_id)
+                    if entry is not None:
+                        job, job_task = entry
+                        if msg.force:
+                            job_task.cancel()
+                        else:
+                            job.shutdown(msg.reason)
+
+                if isinstance(msg, JobAssigned):
+                    entry = self._jobs.get(msg.job_id)
+                    if entry is not None:
+                        entry[0].assign(msg)
+
+                if isinstance(msg, ShutdownRequest):
+                    self._closing = True
+                    if not self._jobs:
+                        self._exit_proc_flag.set()
+                        break  # exit immediately
+
+                    for job, _ in self._jobs.values():
+                        job.shutdown(msg.reason)
+
+                if isinstance(msg, InferenceResponse):
+                    self._inf_client._on_inference_response(msg)
+
+                if isinstance(msg, PingRequest) and self._jobs:
+                    await self._client.send(
+                        JobUsageReport(
+                            cpu_times={
+                                job_id: job.usage.cpu_time
+                                for job_id, (job, _) in self._jobs.items()
+                            }
+                        )
                     )
-                )
 
-            await asyncio.gather(*shutdown_tasks)
-        except Exception:
-            logger.exception("error while shutting down the job")
+        read_task = asyncio.create_task(_read_ipc_task(), name="job_ipc_read")
+
+        await self._exit_proc_flag.wait()
+        await aio.cancel_and_wait(read_task)
+        if self._profiler is not None:
+            self._profiler.stop()
+        await self._run_shutdown_callbacks()
+
+    def _current_job_id(self) -> str | None:
+        # the jobs share the loop, the stall (or log) is attributed to the job whose task is
+        # running
+        usage = _stepping_usage
+        return usage.job_id if usage is not None else None
 
-        await http_context._close_http_ctx()
-        _JobContextVar.reset(job_ctx_token)
+    def _start_job(self, msg: StartJobRequest) -> None:
+        job = _RunningJob(
+            msg,
+            job_proc=self._job_proc,
+            job_entrypoint_fnc=self._job_entrypoint_fnc,
+            inf_client=self._inf_client,
+            client=self._client,
+        )
+        job_task = asyncio.create_task(self._run_job(job), name=f"job_task_{job.id}")
+        self._jobs[job.id] = (job, job_task)
+
+    async def _run_job(self, job: _RunningJob) -> None:
+        error = ""
+        try:
+            await job.run()
+        except asyncio.CancelledError:
+            error = "job cancelled"
+        except Exception as e:
+            logger.exception("error while running the job", extra={"job_id": job.id})
+            error = repr(e)
+        finally:
+            del self._jobs[job.id]
+            if self._profiler is not None:
+                self._profiler.job_ended(job.id)
+
+        if not error and job.entrypoint_error is not None:
+            error = repr(job.entrypoint_error)
+
+        await self._client.send(
+            JobEnded(
+                job_id=job.id,
+                reason=job.shutdown_reason,
+                error=error,
+                cpu_time=job.usage.cpu_time,
+            )
+        )
+
+        if self._closing and not self._jobs:
+            self._exit_proc_flag.set()
 
 
 @dataclass
@@ -0,0 +1,412 @@
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import socket
+import time
+from collections.abc import Awaitable
+from multiprocessing.context import BaseContext
+from typing import Any, Callable
+
+from ..job import JobContext, JobProcess, RunningJobInfo
+from ..log import logger
+from ..telemetry import metrics
+from ..utils import aio, log_exceptions, shortuuid
+from ..utils.aio import duplex_unix
+from . import channel, proto, resource_usage
+from .inference_executor import InferenceExecutor
+from .job_executor import JobStatus
+from .job_proc_executor import _forward_inference, _report_first_audio
+from .job_proc_lazy_main import ProcStartArgs, proc_main
+from .supervised_proc import SupervisedProc, _ProcessHandle
+from .zygote_proc import Zygote
+
+
+class SharedJobProc(SupervisedProc):
+    """A job process running up to `max_jobs` jobs concurrently, as asyncio tasks.
+
+    The process is prewarmed once and its jobs share it (and whatever `prewarm_fnc` loaded).
+    ProcPool hands out one SharedJobExecutor per job slot. Memory limits and ping timeouts
+    are enforced on the whole process by SupervisedProc: when it is killed, every job it
+    was running fails."""
+
+    def __init__(
+        self,
+        *,
+        initialize_process_fnc: Callable[[JobProcess], Any],
+        job_entrypoint_fnc: Callable[[JobContext], Awaitable[None]],
+        inference_executor: InferenceExecutor | None,
+        max_jobs: int,
+        initialize_timeout: float,
+        close_timeout: float,
+        memory_warn_mb: float,
+        memory_limit_mb: float,
+        ping_interval: float,
+        ping_timeout: float,
+        high_ping_threshold: float,
+        http_proxy: str | None,
+        mp_ctx: BaseContext,
+        loop: asyncio.AbstractEventLoop,
+        zygote: Zygote | None = None,
+        shm_ring_size: int = 0,
+        usage_interval: float = 5.0,
+        loop_stall_threshold: float = 0.0,
+        loop_stall_profile_dir: str | None = None,
+        log_rate_limit: float = 0.0,
+        log_debug_sample_rate: float = 1.0,
+    ) -> None:
+        super().__init__(
+            initialize_timeout=initialize_timeout,
+            close_timeout=close_timeout,
+            memory_warn_mb=memory_warn_mb,
+            memory_limit_mb=memory_limit_mb,
+            ping_interval=ping_interval,
+            ping_timeout=ping_timeout,
+            high_ping_threshold=high_ping_threshold,
+            mp_ctx=mp_ctx,
+            loop=loop,
+            http_proxy=http_proxy,
+            shm_ring_size=shm_ring_size,
+            usage_interval=usage_interval,
+            loop_stall_threshold=loop_stall_threshold,
+            loop_stall_profile_dir=loop_stall_profile_dir,
+            log_rate_limit=log_rate_limit,
+            log_debug_sample_rate=log_debug_sample_rate,
+        )
+
+        self._user_args: Any | None = None
+        self._initialize_process_fnc = initialize_process_fnc
+        self._job_entrypoint_fnc = job_entrypoint_fnc
+        self._inference_executor = inference_executor
+        self._zygote = zygote
+        self._forked = zygote is not None
+        self._inference_tasks: list[asyncio.Task[None]] = []
+        self._max_jobs = max_jobs
+        self._slots: dict[str, SharedJobExecutor] = {}
+        self._jobs: dict[str, SharedJobExecutor] = {}  # by job id
+        self._start_atask: asyncio.Task[None] | None = None
+        self._init_atask: asyncio.Task[None] | None = None
+        self._close_atask: asyncio.Task[None] | None = None
+        self._id = shortuuid("SHPROC_")
+
+    @property
+    def id(self) -> str:
+        return self._id
+
+    @property
+    def max_jobs(self) -> int:
+        return self._max_jobs
+
+    @property
+    def user_arguments(self) -> Any | None:
+        return self._user_args
+
+    @user_arguments.setter
+    def user_arguments(self, value: Any | None) -> None:
+        self._user_args = value
+
+    @property
+    def slots(self) -> list[SharedJobExecutor]:
+        return list(self._slots.values())
+
+    @property
+    def running_jobs(self) -> int:
+        return len(self._jobs)
+
+    @property
+    def accepting(self) -> bool:
+        return (
+            not self._closing
+            and self._close_atask is None
+            and self._exitcode is None
+            and len(self._slots) < self._max_jobs
+        )
+
+    def reserve(self) -> SharedJobExecutor:
+        """reserve a job slot in this process"""
+        if not self.accepting:
+            raise RuntimeError("process is full or closing")
+
+        slot = SharedJobExecutor(self)
+        self._slots[slot.id] = slot
+        return slot
+
+    async def start_once(self) -> None:
+        if self._start_atask is None:
+            self._start_atask = asyncio.create_task(self.start())
+        await asyncio.shield(self._start_atask)
+
+    async def initialize_once(self) -> None:
+        await self.start_once()
+        if self._init_atask is None:
+            self._init_atask = asyncio.create_task(self.initialize())
+        await asyncio.shield(self._init_atask)
+
+    @property
+    def initialized(self) -> bool:
+        return self._initialize_fut.done() and self._initialize_fut.exception() is None
+
+    async def aclose(self) -> None:
+        self._closing = True
+        if self._start_atask is not None:
+            await asyncio.shield(self._start_atask)  # wait for the process to exist
+        await super().aclose()
+        for slot in list(self._slots.values()):
+            slot._on_proc_closed(self.exitcode)
+
+    def _release(self, slot: SharedJobExecutor) -> None:
+        self._slots.pop(slot.id, None)
+        if slot.running_job is not None:
+            self._jobs.pop(slot.running_job.job.id, None)
+
+        if (
+            not self._slots
+            and self.started
+            and self._exitcode is None
+            and self._close_atask is None
+            and not self._closing
+        ):
+            # nothing is running nor reserved here anymore, the pool spawns new processes as
+            # needed
+            self._close_atask = asyncio.create_task(self.aclose())
+
+    async def _launch_job(self, slot: SharedJobExecutor, info: RunningJobInfo) -> None:
+        self._jobs[info.job.id] = slot
+        start_req = proto.StartJobRequest()
+        start_req.running_job = info
+        await channel.asend_message(self._pch, start_req)
+
+    async def _shutdown_job(self, job_id: str, *, force: bool = False) -> None:
+        try:
+            await channel.asend_message(
+                self._pch, proto.ShutdownJobRequest(job_id=job_id, force=force)
+            )
+        except duplex_unix.DuplexClosed:
+            pass
+
+    def _create_process(self, cch: socket.socket, log_cch: socket.socket) -> _ProcessHandle:
+        if self._zygote is not None:
+            # forked from the prewarmed zygote, which has its own user_arguments
+            return self._zygote.process(cch, log_cch)
+
+        proc_args = ProcStartArgs(
+            initialize_process_fnc=self._initialize_process_fnc,
+            job_entrypoint_fnc=self._job_entrypoint_fnc,
+            log_cch=log_cch,
+            mp_cch=cch,
+            user_arguments=self._user_args,
+            max_jobs=self._max_jobs,
+        )
+
+        return self._mp_ctx.Process(  # type: ignore
+            target=proc_main, args=(proc_args,), name="job_proc"
+        )
+
+    @log_exceptions(logger=logger)
+    async def _main_task(self, ipc_ch: aio.ChanReceiver[channel.Message]) -> None:
+        try:
+            async for msg in ipc_ch:
+                if isinstance(msg, proto.InferenceRequest):
+                    self._inference_tasks.append(
+                        asyncio.create_task(_forward_inference(self, self._inference_executor, msg))
+                    )
+
+                if isinstance(msg, proto.JobUsageReport):
+                    for job_id, cpu_time in msg.cpu_times.items():
+                        slot = self._jobs.get(job_id)
+                        if slot is not None:
+                            slot._reported_cpu_time = cpu_time
+
+                if isinstance(msg, proto.FirstAudioPublished):
+                    slot = self._jobs.get(msg.job_id)
+                    if slot is not None:
+                        _report_first_audio(slot.running_job, slot.logging_extra())
+
+                if isinstance(msg, proto.JobEnded):
+                    slot = self._jobs.get(msg.job_id)
+                    if slot is not None:
+                        slot._on_job_ended(msg)
+        finally:
+            await aio.cancel_and_wait(*self._inference_tasks)
+
+    @log_exceptions(logger=logger)
+    async def _supervise_task(self) -> None:
+        try:
+            await super()._supervise_task()
+        finally:
+            for slot in list(self._slots.values()):
+                slot._on_proc_closed(self.exitcode)
+
+    def _on_usage(self, usage: resource_usage.ProcUsage) -> None:
+        # the CPU time of each job is the one the process reported after the last ping, the
+        # memory and the loop are shared by all the jobs
+        memory_mb = self._memory_mb(usage)
+        for slot in self._jobs.values():
+            slot._add_usage_sample(memory_mb=memory_mb, loop_lag=usage.loop_lag)
+
+    def logging_extra(self) -> dict[str, Any]:
+        extra = super().logging_extra()
+        extra["running_jobs"] = len(self._jobs)
+        return extra
+
+
+class SharedJobExecutor:
+    """One job slot of a SharedJobProc, the JobExecutor ProcPool and the Worker see.
+
+    Closing it only shuts down its own job: the job is asked to shut down, and cancelled
+    if it doesn't finish within the close timeout."""
+
+    def __init__(self, proc: SharedJobProc) -> None:
+        self._proc = proc
+        self._id = shortuuid("SHEXEC_")
+        self._running_job: RunningJobInfo | None = None
+        self._job_status: JobStatus | None = None
+        self._join_fut = asyncio.Future[None]()
+        self._usage = resource_usage.JobUsage()
+        self._reported_cpu_time = 0.0
+        self._cpu_rate = resource_usage.CpuRate()
+
+    @property
+    def id(self) -> str:
+        return self._id
+
+    @property
+    def proc(self) -> SharedJobProc:
+        return self._proc
+
+    @property
+    def pid(self) -> int | None:
+        return self._proc.pid
+
+    @property
+    def exitcode(self) -> int | None:
+        return self._proc.exitcode
+
+    @property
+    def started(self) -> bool:
+        return self._proc.started
+
+    @property
+    def user_arguments(self) -> Any | None:
+        return self._proc.user_arguments
+
+    @user_arguments.setter
+    def user_arguments(self, value: Any | None) -> None:
+        # only used by the process if it isn't started yet
+        self._proc.user_arguments = value
+
+    @property
+    def running_job(self) -> RunningJobInfo | None:
+        return self._running_job
+
+    @property
+    def status(self) -> JobStatus:
+        if self._job_status is None:
+            raise RuntimeError("job status not available")
+
+        return self._job_status
+
+    @property
+    def usage(self) -> resource_usage.JobUsage:
+        return self._usage
+
+    async def start(self) -> None:
+        await self._proc.start_once()
+
+    async def initialize(self) -> None:
+        await self._proc.initialize_once()
+
+    async def join(self) -> None:
+        await asyncio.shield(self._join_fut)
+
+    async def launch_job(self, info: RunningJobInfo) -> None:
+        """start/assign a job to the slot"""
+        if self._running_job is not None:
+            raise RuntimeError("slot already has a running job")
+
+        if not self._proc.initialized:
+            raise RuntimeError("process not initialized")
+
+        if self._join_fut.done():
+            raise RuntimeError("slot is closed")
+
+        metrics.job_started()
+        self._job_status = JobStatus.RUNNING
+        self._running_job = info
+        self._usage.started_at = time.time()
+        await self._proc._launch_job(self, info)
+
+    async def assign_job(self, url: str, token: str) -> None:
+        """send the assignment of a job launched before the server assigned it"""
+        if self._running_job is None:
+            raise RuntimeError("no job launched")
+
+        self._running_job = dataclasses.replace(self._running_job, url=url, token=token)
+        await self._proc._send(
+            proto.JobAssigned(job_id=self._running_job.job.id, url=url, token=token)
+        )
+
+    async def aclose(self) -> None:
+        if self._join_fut.done():
+            return
+
+        if self._running_job is None:
+            self._finish(None)
+            return
+
+        job_id = self._running_job.job.id
+        await self._proc._shutdown_job(job_id)
+        try:
+            await asyncio.wait_for(self.join(), timeout=self._proc._opts.close_timeout)
+            return
+        except asyncio.TimeoutError:
+            logger.error("job did not exit in time, cancelling it", extra=self.logging_extra())
+
+        await self._proc._shutdown_job(job_id, force=True)
+        try:
+            await asyncio.wait_for(self.join(), timeout=5)
+        except asyncio.TimeoutError:
+            logger.error("job did not exit after being cancelled", extra=self.logging_extra())
+            self._finish(JobStatus.FAILED)
+
+    def _add_usage_sample(self, *, memory_mb: float, loop_lag: float) -> None:
+        self._usage.add_sample(
+            cpu_time=self._reported_cpu_time,
+            cpu_cores=self._cpu_rate.update(self._reported_cpu_time),
+            memory_mb=memory_mb,
+            loop_lag=loop_lag,
+        )
+
+    def _on_job_ended(self, msg: proto.JobEnded) -> None:
+        self._usage.cpu_time = msg.cpu_time
+        if msg.error:
+            logger.error(
+                "job failed",
+                extra={"error": msg.error, "reason": msg.reason, **self.logging_extra()},
+            )
+        else:
+            logger.info("job exited", extra={"reason": msg.reason, **self.logging_extra()})
+        self._finish(JobStatus.FAILED if msg.error else JobStatus.SUCCESS)
+
+    def _on_proc_closed(self, exitcode: int | None) -> None:
+        # the process exited (or was killed) with this slot still open
+        self._finish(JobStatus.FAILED if self._running_job is not None else None)
+
+    def _finish(self, status: JobStatus | None) -> None:
+        if self._join_fut.done():
+            return
+
+        if self._running_job is not None:
+            metrics.job_ended()
+            self._job_status = status
+            self._usage.end()
+        self._proc._release(self)
+        self._join_fut.set_result(None)
+
+    def logging_extra(self) -> dict[str, Any]:
+        extra = self._proc.logging_extra()
+        if self._running_job:
+            extra["job_id"] = self._running_job.job.id
+            extra.update(self._usage.logging_extra())
+
+        return extra
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import asyncio
 import contextlib
+import dataclasses
 import socket
 import threading
 import time
@@ -13,9 +14,10 @@ from .. import utils
 from ..job import JobContext, JobProcess, RunningJobInfo
 from ..log import logger
 from ..utils.aio import duplex_unix
-from . import channel, job_proc_lazy_main, proto
+from . import channel, job_proc_lazy_main, proto, resource_usage
 from .inference_executor import InferenceExecutor
 from .job_executor import JobStatus
+from .job_proc_executor import _report_first_audio
 
 
 @dataclass
@@ -27,6 +29,9 @@ class _ProcOpts:
     ping_interval: float
     high_ping_threshold: float
     http_proxy: str | None
+    usage_interval: float
+    loop_stall_threshold: float
+    loop_stall_profile_dir: str | None
 
 
 class ThreadJobExecutor:
@@ -42,6 +47,9 @@ class ThreadJobExecutor:
         high_ping_threshold: float,
         http_proxy: str | None,
         loop: asyncio.AbstractEventLoop,
+        usage_interval: float = 5.0,
+        loop_stall_threshold: float = 0.0,
+        loop_stall_profile_dir: str | None = None,
     ) -> None:
         self._loop = loop
         self._opts = _ProcOpts(
@@ -52,6 +60,9 @@ class ThreadJobExecutor:
             ping_interval=ping_interval,
             high_ping_threshold=high_ping_threshold,
             http_proxy=http_proxy,
+            usage_interval=usage_interval,
+            loop_stall_threshold=loop_stall_threshold,
+            loop_stall_profile_dir=loop_stall_profile_dir,
         )
 
         self._user_args: Any | None = None
@@ -65,6 +76,8 @@ class ThreadJobExecutor:
 
         self._inference_executor = inference_executor
         self._inference_tasks: list[asyncio.Task[None]] = []
+        self._usage = resource_usage.JobUsage()
+        self._loop_lag = 0.0
         self._id = utils.shortuuid("THEXEC_")
 
     @property
@@ -94,6 +107,12 @@ class ThreadJobExecutor:
     def running_job(self) -> RunningJobInfo | None:
         return self._running_job
 
+    @property
+    def usage(self) -> resource_usage.JobUsage:
+        """the memory of the thread can't be told apart from the worker's, only CPU and loop
+        lag are measured"""
+        return self._usage
+
     async def start(self) -> None:
         if self.started:
             raise RuntimeError("runner already started")
@@ -144,7 +163,12 @@ class ThreadJobExecutor:
 
     async def initialize(self) -> None:
         await channel.asend_message(
-            self._pch, proto.InitializeRequest(http_proxy=self._opts.http_proxy or "")
+            self._pch,
+            proto.InitializeRequest(
+                http_proxy=self._opts.http_proxy or "",
+                loop_stall_threshold=self._opts.loop_stall_threshold,
+                loop_stall_profile_dir=self._opts.loop_stall_profile_dir or "",
+            ),
         )
 
         try:
@@ -232,11 +256,22 @@ class ThreadJobExecutor:
 
         self._running_job = info
         self._job_status = JobStatus.RUNNING
+        self._usage.started_at = time.time()
 
         start_req = proto.StartJobRequest()
         start_req.running_job = info
         await channel.asend_message(self._pch, start_req)
 
+    async def assign_job(self, url: str, token: str) -> None:
+        """send the assignment of a job launched before the server assigned it"""
+        if self._running_job is None:
+            raise RuntimeError("no job launched")
+
+        self._running_job = dataclasses.replace(self._running_job, url=url, token=token)
+        await channel.asend_message(
+            self._pch, proto.JobAssigned(job_id=self._running_job.job.id, url=url, token=token)
+        )
+
     @utils.log_exceptions(logger=logger)
     async def _main_task(self) -> None:
         try:
@@ -248,10 +283,12 @@ class ThreadJobExecutor:
 
         ping_task = asyncio.create_task(self._ping_task())
         monitor_task = asyncio.create_task(self._monitor_task())
+        usage_task = asyncio.create_task(self._usage_task())
 
         await self._join_fut
-        await utils.aio.cancel_and_wait(ping_task, monitor_task)
+        await utils.aio.cancel_and_wait(ping_task, monitor_task, usage_task)
         await utils.aio.cancel_and_wait(*self._inference_tasks)
+        self._usage.end()
 
         with contextlib.suppress(duplex_unix.DuplexClosed):
             await self._pch.aclose()
@@ -268,6 +305,7 @@ class ThreadJobExecutor:
 
             if isinstance(msg, proto.PongResponse):
                 delay = utils.time_ms() - msg.timestamp
+                self._loop_lag = delay / 1000
                 if delay > self._opts.high_ping_threshold * 1000:
                     logger.warning(
                         "job executor is unresponsive",
@@ -280,6 +318,9 @@ class ThreadJobExecutor:
             if isinstance(msg, proto.InferenceRequest):
                 self._inference_tasks.append(asyncio.create_task(self._do_inference_task(msg)))
 
+            if isinstance(msg, proto.FirstAudioPublished):
+                _report_first_audio(self._running_job, self.logging_extra())
+
     @utils.log_exceptions(logger=logger)
     async def _ping_task(self) -> None:
         ping_interval = utils.aio.interval(self._opts.ping_interval)
@@ -290,6 +331,24 @@ class ThreadJobExecutor:
             except utils.aio.duplex_unix.DuplexClosed:
                 break
 
+    @utils.log_exceptions(logger=logger)
+    async def _usage_task(self) -> None:
+        sampler = resource_usage.ThreadSampler(self._thread)
+        cpu_offset = 0.0  # CPU the thread used before the job (prewarm)
+        while True:
+            await asyncio.sleep(self._opts.usage_interval)
+            usage = sampler.sample(loop_lag=self._loop_lag)
+            if self._usage.started_at is None:
+                cpu_offset = usage.cpu_time
+                continue
+
+            self._usage.add_sample(
+                cpu_time=max(usage.cpu_time - cpu_offset, 0.0),
+                cpu_cores=usage.cpu_cores,
+                memory_mb=0.0,
+                loop_lag=usage.loop_lag,
+            )
+
     def logging_extra(self) -> dict[str, Any]:
         extra: dict[str, Any] = {
             "tid": self._thread.native_id,
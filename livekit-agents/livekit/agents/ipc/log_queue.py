@@ -1,16 +1,104 @@
 from __future__ import annotations
 
-import copy
+import collections
+import contextlib
+import json
 import logging
-import pickle
-import queue
+import os
+import random
+import struct
 import sys
 import threading
-from typing import Callable, Optional
+import time
+from typing import Any, Callable
 
 from .. import utils
 from ..utils.aio import duplex_unix
 
+# a batch is the pid of the job process followed by its records. a record is _RECORD (created,
+# levelno, lineno and the length of each string) followed by the utf-8 name, message (with the
+# formatted exception), pathname, funcName and the extra fields as a JSON object (empty when
+# the record has none)
+_BATCH = struct.Struct("<I")
+_RECORD = struct.Struct("<dBIIIIII")
+
+BATCH_WINDOW = 0.005  # seconds the records are coalesced for before sending them
+MAX_BATCH_SIZE = 256 * 1024  # bytes, sent right away when reached
+MAX_QUEUED = 4096  # records waiting to be sent, new ones are dropped past it
+LOW_SEVERITY_QUEUED = MAX_QUEUED // 4  # records below WARNING are dropped past it
+DROPS_REPORT_INTERVAL = 5.0
+
+_STANDARD_ATTRS = frozenset(logging.makeLogRecord({}).__dict__) | {"message", "asctime"}
+_IGNORED_ATTRS = frozenset({"websocket"})  # added by the websockets library, not serializable
+
+
+def _encode_record(record: logging.LogRecord, msg: str) -> bytes:
+    extra = {
+        key: value
+        for key, value in record.__dict__.items()
+        if key not in _STANDARD_ATTRS and key not in _IGNORED_ATTRS and not key.startswith("_")
+    }
+    name = record.name.encode()
+    msg_b = msg.encode(errors="replace")
+    pathname = record.pathname.encode(errors="replace")
+    func_name = (record.funcName or "").encode()
+    extra_b = b""
+    if extra:
+        try:
+            extra_b = json.dumps(extra, default=str).encode()
+        except (TypeError, ValueError):  # e.g. dict keys that aren't strings
+            extra_b = json.dumps({key: str(value) for key, value in extra.items()}).encode()
+    return b"".join(
+        (
+            _RECORD.pack(
+                record.created,
+                record.levelno,
+                record.lineno,
+                len(name),
+                len(msg_b),
+                len(pathname),
+                len(func_name),
+                len(extra_b),
+            ),
+            name,
+            msg_b,
+            pathname,
+            func_name,
+            extra_b,
+        )
+    )
+
+
+def _decode_batch(data: bytes) -> tuple[int, list[tuple[Any, ...]]]:
+    """returns the pid and (created, levelno, lineno, name, msg, pathname, funcName, extra)
+    of each record, extra is left encoded"""
+    view = memoryview(data)
+    (pid,) = _BATCH.unpack_from(view)
+    offset = _BATCH.size
+    records = []
+    while offset < len(view):
+        created, levelno, lineno, *lengths = _RECORD.unpack_from(view, offset)
+        offset += _RECORD.size
+        fields = []
+        for length in lengths:
+            fields.append(view[offset : offset + length])
+            offset += length
+
+        name, msg, pathname, func_name, extra = fields
+        records.append(
+            (
+                created,
+                levelno,
+                lineno,
+                str(name, "utf-8"),
+                str(msg, "utf-8"),
+                str(pathname, "utf-8"),
+                str(func_name, "utf-8"),
+                extra,
+            )
+        )
+    return pid, records
+
 
 class LogQueueListener:
     def __init__(
@@ -50,59 +138,206 @@ class LogQueueListener:
             except utils.aio.duplex_unix.DuplexClosed:
                 break
 
-            record = pickle.loads(data)
-            self.handle(record)
+            pid, records = _decode_batch(data)
+            for created, levelno, lineno, name, msg, pathname, func_name, extra in records:
+                # the records of disabled loggers are skipped before building them
+                lger = logging.getLogger(name)
+                if not lger.isEnabledFor(levelno):
+                    continue
+
+                record = lger.makeRecord(
+                    name, levelno, pathname, lineno, msg, (), None, func_name or None
+                )
+                record.created = created
+                record.msecs = (created - int(created)) * 1000
+                record.relativeCreated = (created - logging._startTime) * 1000  # type: ignore[attr-defined]
+                record.process = pid
+                if extra:
+                    record.__dict__.update(json.loads(str(extra, "utf-8")))
+
+                self._prepare_fnc(record)
+                lger.callHandlers(record)
+
+
+class _RateLimiter:
+    """token bucket of the records below WARNING of each job"""
+
+    MAX_BUCKETS = 64
+
+    def __init__(self, rate: float) -> None:
+        self._rate = rate
+        self._burst = max(rate, 1.0)
+        self._buckets: dict[str | None, tuple[float, float]] = {}  # key -> (tokens, updated_at)
+
+    def admit(self, key: str | None) -> bool:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (self._burst, now))
+        tokens = min(self._burst, tokens + (now - updated_at) * self._rate)
+        if len(self._buckets) >= self.MAX_BUCKETS and key not in self._buckets:
+            # jobs that ended: their buckets are full again
+            full_since = now - self._burst / self._rate
+            self._buckets = {k: v for k, v in self._buckets.items() if v[1] > full_since}
+
+        if tokens < 1.0:
+            self._buckets[key] = (tokens, now)
+            return False
+
+        self._buckets[key] = (tokens - 1.0, now)
+        return True
 
 
 class LogQueueHandler(logging.Handler):
-    _sentinal = None
+    def __init__(
+        self,
+        duplex: utils.aio.duplex_unix._Duplex,
+        *,
+        threaded: bool = True,
+        batch_window: float = BATCH_WINDOW,
+    ) -> None:
+        """threaded=False sends the records from the thread logging them, for processes that
+        must stay single-threaded (the zygote, which forks job processes).
 
-    def __init__(self, duplex: utils.aio.duplex_unix._Duplex) -> None:
+        Otherwise the records are encoded by the thread logging them, then sent in batches by
+        a thread that coalesces them for `batch_window` seconds. The records are never waited
+        for: when the parent doesn't read them fast enough, the records below WARNING are
+        dropped first, then all of them, and the number of dropped records is logged."""
         super().__init__()
         self._duplex = duplex
-        self._send_q = queue.SimpleQueue[Optional[bytes]]()
-        self._send_thread = threading.Thread(target=self._forward_logs, name="ipc_log_forwarder")
-        self._send_thread.start()
+        self._batch_window = batch_window
+        self._pid = os.getpid()
+        self._cond = threading.Condition(threading.Lock())
+        self._queue: collections.deque[bytes] = collections.deque()
+        self._queued_size = 0
+        self._closing = False
+        self._dropped = 0
+        self._rate_limited: collections.Counter[str] = collections.Counter()
+
+        self._rate_limiter: _RateLimiter | None = None
+        self._debug_sample_rate = 1.0
+        self._job_id_fnc: Callable[[], str | None] = lambda: None
+
+        self._send_thread: threading.Thread | None = None
+        if threaded:
+            self._send_thread = threading.Thread(
+                target=self._forward_logs, name="ipc_log_forwarder"
+            )
+            self._send_thread.start()
+
+    def set_limits(
+        self,
+        *,
+        rate_limit: float,
+        debug_sample_rate: float,
+        job_id_fnc: Callable[[], str | None],
+    ) -> None:
+        """rate_limit: records below WARNING a job can log per second, 0 = unlimited.
+        debug_sample_rate: fraction of the DEBUG records sent.
+        job_id_fnc: job of the records that don't have a job_id field"""
+        self._rate_limiter = _RateLimiter(rate_limit) if rate_limit > 0 else None
+        self._debug_sample_rate = debug_sample_rate
+        self._job_id_fnc = job_id_fnc
 
     def _forward_logs(self) -> None:
+        last_report = time.monotonic()
         while True:
-            serialized_record = self._send_q.get()
-            if serialized_record is None:
-                break
+            with self._cond:
+                while not self._queue and not self._closing:
+                    self._cond.wait()
+
+                if self._closing and not self._queue:
+                    break
+
+                if not self._closing and self._queued_size < MAX_BATCH_SIZE:
+                    # coalesce the records logged in the meantime
+                    self._cond.wait(self._batch_window)
+
+                batch = list(self._queue)
+                self._queue.clear()
+                self._queued_size = 0
+
+                now = time.monotonic()
+                if (self._dropped or self._rate_limited) and (
+                    now - last_report > DROPS_REPORT_INTERVAL or self._closing
+                ):
+                    batch.append(self._drops_record())
+                    last_report = now
 
             try:
-                self._duplex.send_bytes(serialized_record)
+                self._duplex.send_bytes(_BATCH.pack(self._pid) + b"".join(batch))
             except duplex_unix.DuplexClosed:
                 break
 
         self._duplex.close()
 
+    def _drops_record(self) -> bytes:
+        record = logging.LogRecord(
+            "livekit.agents",
+            logging.WARNING,
+            __file__,
+            0,
+            "log records of the job process were dropped",
+            None,
+            None,
+        )
+        record.backpressure = self._dropped
+        record.rate_limited = dict(self._rate_limited)
+        self._dropped = 0
+        self._rate_limited.clear()
+        return _encode_record(record, record.getMessage())
+
+    def _admit(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        if record.levelno <= logging.DEBUG and self._debug_sample_rate < 1.0:
+            if random.random() >= self._debug_sample_rate:
+                return False
+
+        if self._rate_limiter is not None:
+            job_id = getattr(record, "job_id", None) or self._job_id_fnc()
+            if not self._rate_limiter.admit(job_id):
+                with self._cond:
+                    self._rate_limited[job_id or ""] += 1
+                return False
+
+        return True
+
     def emit(self, record: logging.LogRecord) -> None:
         try:
             # Check if Python is shutting down
             if sys.is_finalizing():
                 return
 
-            # from https://github.com/python/cpython/blob/91b7f2e7f6593acefda4fa860250dd87d6f849bf/Lib/logging/handlers.py#L1453
-            msg = self.format(record)
-            record = copy.copy(record)
-            record.message = msg
-            record.msg = msg
-            record.args = None
-            record.exc_info = None
-            record.exc_text = None
-            record.stack_info = None
+            if not self._admit(record):
+                return
+
+            data = _encode_record(record, self.format(record))
+            if self._send_thread is None:
+                with contextlib.suppress(duplex_unix.DuplexClosed):
+                    self._duplex.send_bytes(_BATCH.pack(self._pid) + data)
+                return
 
-            # https://websockets.readthedocs.io/en/stable/topics/logging.html#logging-to-json
-            # webosckets library add "websocket" attribute to log records, which is not pickleable
-            if hasattr(record, "websocket"):
-                record.websocket = None
+            with self._cond:
+                queued = len(self._queue)
+                if queued >= MAX_QUEUED or (
+                    queued >= LOW_SEVERITY_QUEUED and record.levelno < logging.WARNING
+                ):
+                    self._dropped += 1
+                    return
 
-            self._send_q.put_nowait(pickle.dumps(record))
+                self._queue.append(data)
+                self._queued_size += len(data)
+                if queued == 0 or self._queued_size >= MAX_BATCH_SIZE:
+                    self._cond.notify()
 
         except Exception:
             self.handleError(record)
 
     def close(self) -> None:
         super().close()
-        self._send_q.put_nowait(self._sentinal)
+        if self._send_thread is None:
+            self._duplex.close()
+        else:
+            with self._cond:
+                self._closing = True
+                self._cond.notify()
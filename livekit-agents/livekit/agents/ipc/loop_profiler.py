@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import functools
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from types import FrameType
+from typing import Callable
+
+from ..log import logger
+
+MAX_STACK_DEPTH = 64
+TOP_CALL_SITES = 5
+CALL_SITE_FRAMES = 6  # innermost frames of a stack shown in the logs
+
+_Stack = tuple[str, ...]  # frame labels, outermost first
+
+
+@dataclass
+class _JobStalls:
+    count: int = 0
+    stalled_time: float = 0.0
+    longest: float = 0.0
+    samples: collections.Counter[_Stack] = field(default_factory=collections.Counter)
+
+
+class LoopStallProfiler:
+    """Finds what blocks an event loop.
+
+    A callback scheduled on the loop every `threshold / 2` seconds marks it as alive. A
+    sampling thread checks it every `sample_interval` seconds: when the callback is late by
+    more than `threshold`, the loop is stalled and the stack of the loop's thread is sampled
+    (sys._current_frames) until the callback runs again.
+
+    Each stall is logged when it ends, with the stack sampled the most, and attributed to the
+    job `job_id_fnc` returns while the loop is blocked. `job_ended` logs the call sites that
+    blocked the loop of a job the longest, and writes all its samples as collapsed stacks
+    (`<job_id>.collapsed`, for flamegraph.pl or speedscope) when `profile_dir` is set."""
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        *,
+        threshold: float,
+        job_id_fnc: Callable[[], str | None],
+        profile_dir: str | None = None,
+        sample_interval: float = 0.01,
+    ) -> None:
+        self._loop = loop
+        self._threshold = threshold
+        self._tick_interval = threshold / 2
+        self._sample_interval = sample_interval
+        self._job_id_fnc = job_id_fnc
+        self._profile_dir = profile_dir
+        self._jobs: dict[str, _JobStalls] = {}
+        self._lock = threading.Lock()
+        self._stop_ev = threading.Event()
+        self._due = 0.0  # when the next tick should run, written by the loop thread only
+        self._tick_handle: asyncio.TimerHandle | None = None
+        self._thread: threading.Thread | None = None
+        self._loop_thread_id = 0
+
+    def start(self) -> None:
+        """must be called from the thread running the loop"""
+        self._loop_thread_id = threading.get_ident()
+        self._tick()
+        self._thread = threading.Thread(
+            target=self._sample_thread, daemon=True, name="loop_stall_profiler"
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_ev.set()
+        if self._tick_handle is not None:
+            self._tick_handle.cancel()
+        if self._thread is not None:
+            self._thread.join()
+
+    def job_ended(self, job_id: str) -> None:
+        with self._lock:
+            stalls = self._jobs.pop(job_id, None)
+
+        if stalls is None:
+            return
+
+        # the stalled time is split between the stacks by number of samples, the sampling
+        # thread doesn't wake up exactly every sample_interval
+        total_samples = sum(stalls.samples.values())
+        call_sites = [
+            {
+                "stack": list(stack[-CALL_SITE_FRAMES:]),
+                "stalled_time": round(stalls.stalled_time * count / total_samples, 3),
+            }
+            for stack, count in stalls.samples.most_common(TOP_CALL_SITES)
+        ]
+        logger.warning(
+            "the event loop of the job was blocked",
+            extra={
+                "job_id": job_id,
+                "stalls": stalls.count,
+                "stalled_time": round(stalls.stalled_time, 3),
+                "longest_stall": round(stalls.longest, 3),
+                "call_sites": call_sites,
+            },
+        )
+
+        if self._profile_dir and stalls.samples:
+            path = os.path.join(self._profile_dir, f"{job_id}.collapsed")
+            try:
+                os.makedirs(self._profile_dir, exist_ok=True)
+                with open(path, "w") as f:
+                    for stack, count in stalls.samples.items():
+                        f.write(f"{';'.join(stack)} {count}\n")
+            except OSError:
+                logger.exception("failed to write the stall profile", extra={"path": path})
+
+    def _tick(self) -> None:
+        self._due = time.monotonic() + self._tick_interval
+        self._tick_handle = self._loop.call_later(self._tick_interval, self._tick)
+
+    def _sample_thread(self) -> None:
+        stall_due: float | None = None  # due time of the tick the current stall is delaying
+        job_id: str | None = None
+        samples: collections.Counter[_Stack] = collections.Counter()
+
+        while not self._stop_ev.wait(self._sample_interval):
+            due = self._due
+            if stall_due is not None and due != stall_due:
+                # the tick ran, it was late by the time the loop was blocked
+                self._on_stall(job_id, due - self._tick_interval - stall_due, samples)
+                stall_due = None
+
+            if time.monotonic() - due <= self._threshold:
+                continue
+
+            if stall_due is None:
+                stall_due, job_id, samples = due, self._job_id_fnc(), collections.Counter()
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                samples[_stack(frame)] += 1
+            del frame
+
+    def _on_stall(
+        self, job_id: str | None, duration: float, samples: collections.Counter[_Stack]
+    ) -> None:
+        with self._lock:
+            stalls = self._jobs.setdefault(job_id or "", _JobStalls())
+            stalls.count += 1
+            stalls.stalled_time += duration
+            stalls.longest = max(stalls.longest, duration)
+            stalls.samples.update(samples)
+
+        stack = samples.most_common(1)[0][0] if samples else ()
+        logger.warning(
+            "event loop stalled",
+            extra={
+                "job_id": job_id,
+                "duration": round(duration, 3),
+                "stack": list(stack[-CALL_SITE_FRAMES:]),
+            },
+        )
+
+
+def _stack(frame: FrameType | None) -> _Stack:
+    labels: list[str] = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        labels.append(f"{code.co_name} ({_short_path(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    labels.reverse()
+    return tuple(labels)
+
+
+@functools.lru_cache(maxsize=4096)
+def _short_path(filename: str) -> str:
+    """path relative to the sys.path entry containing it, e.g. sqlalchemy/orm/session.py"""
+    best = filename
+    for entry in sys.path:
+        if entry and filename.startswith(entry + os.sep):
+            rel = filename[len(entry) + 1 :]
+            if len(rel) < len(best):
+                best = rel
+    return best.replace(";", "_")
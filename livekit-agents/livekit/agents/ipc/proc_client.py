@@ -10,6 +10,7 @@ from typing import Callable
 
 from ..log import logger
 from ..utils import aio, log_exceptions, time_ms
+from . import shm_ring
 from .channel import Message, arecv_message, asend_message, recv_message, send_message
 from .log_queue import LogQueueHandler
 from .proto import (
@@ -35,6 +36,8 @@ class _ProcClient:
         self._main_task_fnc = main_task_fnc
         self._initialized = False
         self._log_handler: LogQueueHandler | None = None
+        self._shm_rx: shm_ring.ShmRing | None = None
+        self._shm_tx: shm_ring.ShmRing | None = None
 
     def initialize_logger(self) -> None:
         if self._log_cch is None:
@@ -47,6 +50,19 @@ class _ProcClient:
         self._log_handler = LogQueueHandler(log_cch)
         root_logger.addHandler(self._log_handler)
 
+    def set_log_limits(
+        self,
+        *,
+        rate_limit: float,
+        debug_sample_rate: float,
+        job_id_fnc: Callable[[], str | None],
+    ) -> None:
+        """see LogQueueHandler.set_limits, no-op without log channel"""
+        if self._log_handler is not None:
+            self._log_handler.set_limits(
+                rate_limit=rate_limit, debug_sample_rate=debug_sample_rate, job_id_fnc=job_id_fnc
+            )
+
     def initialize(self) -> None:
         try:
             cch = aio.duplex_unix._Duplex.open(self._mp_cch)
@@ -58,6 +74,10 @@ class _ProcClient:
 
             self._init_req = first_req
             try:
+                if first_req.shm_to_child:
+                    self._shm_rx = shm_ring.ShmRing.attach(first_req.shm_to_child)
+                    self._shm_tx = shm_ring.ShmRing.attach(first_req.shm_from_child)
+
                 self._initialize_fnc(self._init_req, self)
                 send_message(cch, InitializeResponse())
             except Exception as e:
@@ -96,6 +116,7 @@ class _ProcClient:
             loop.run_until_complete(loop.shutdown_default_executor())
 
     async def send(self, msg: Message) -> None:
+        shm_ring.put_payload(self._shm_tx, msg)
         await asend_message(self._acch, msg)
 
     async def _monitor_task(self) -> None:
@@ -117,6 +138,8 @@ class _ProcClient:
                     with contextlib.suppress(aio.SleepFinished):
                         ping_timeout.reset()
 
+                    shm_ring.take_payload(self._shm_rx, msg)
+
                     if isinstance(msg, PingRequest):
                         await asend_message(
                             self._acch,
@@ -159,3 +182,7 @@ class _ProcClient:
                 await aio.cancel_and_wait(health_check_task)
         finally:
             await self._acch.aclose()
+            for ring in (self._shm_rx, self._shm_tx):
+                if ring is not None:
+                    ring.close()
+            self._shm_rx = self._shm_tx = None
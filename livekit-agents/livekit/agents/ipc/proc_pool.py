@@ -1,17 +1,29 @@
 from __future__ import annotations
 
 import asyncio
+import contextlib
 import math
+import time
 from collections.abc import Awaitable
 from multiprocessing.context import BaseContext
 from typing import Any, Callable, Literal
 
+import psutil
+
 from .. import utils
 from ..job import JobContext, JobExecutorType, JobProcess, RunningJobInfo
 from ..log import logger
+from ..telemetry import metrics
 from ..utils import aio
 from ..utils.hw.cpu import get_cpu_monitor
-from . import inference_executor, job_proc_executor, job_thread_executor
+from . import (
+    idle_autoscaler,
+    inference_executor,
+    job_proc_executor,
+    job_shared_proc_executor,
+    job_thread_executor,
+    zygote_proc,
+)
 from .job_executor import JobExecutor
 
 EventTypes = Literal[
@@ -41,6 +53,16 @@ class ProcPool(utils.EventEmitter[EventTypes]):
         memory_limit_mb: float,
         http_proxy: str | None,
         loop: asyncio.AbstractEventLoop,
+        jobs_per_process: int = 1,
+        use_zygote: bool = False,
+        warm_hit_target: float = 0.0,
+        idle_memory_budget_mb: float = 0.0,
+        inference_shm_size: int = 0,
+        usage_interval: float = 5.0,
+        loop_stall_threshold: float = 0.0,
+        loop_stall_profile_dir: str | None = None,
+        log_rate_limit: float = 0.0,
+        log_debug_sample_rate: float = 1.0,
     ) -> None:
         super().__init__()
         self._job_executor_type = job_executor_type
@@ -56,10 +78,32 @@ class ProcPool(utils.EventEmitter[EventTypes]):
         self._default_num_idle_processes = num_idle_processes
         self._http_proxy = http_proxy
         self._target_idle_processes = num_idle_processes
+        self._jobs_per_process = jobs_per_process
+        self._inference_shm_size = inference_shm_size
+        self._usage_interval = usage_interval
+        self._loop_stall_threshold = loop_stall_threshold
+        self._loop_stall_profile_dir = loop_stall_profile_dir
+        self._log_rate_limit = log_rate_limit
+        self._log_debug_sample_rate = log_debug_sample_rate
+        self._zygote: zygote_proc.Zygote | None = None
+        if use_zygote and job_executor_type != JobExecutorType.THREAD:
+            self._zygote = zygote_proc.Zygote(
+                initialize_process_fnc=initialize_process_fnc,
+                job_entrypoint_fnc=job_entrypoint_fnc,
+                max_jobs=(
+                    jobs_per_process if job_executor_type == JobExecutorType.SHARED_PROCESS else 1
+                ),
+                initialize_timeout=initialize_timeout,
+                close_timeout=close_timeout,
+                http_proxy=http_proxy,
+                mp_ctx=mp_ctx,
+                loop=loop,
+            )
 
         self._init_sem = asyncio.Semaphore(MAX_CONCURRENT_INITIALIZATIONS)
         self._warmed_proc_queue = asyncio.Queue[JobExecutor]()
         self._executors: list[JobExecutor] = []
+        self._shared_procs: list[job_shared_proc_executor.SharedJobProc] = []
         self._spawn_tasks: set[asyncio.Task[None]] = set()
         self._monitor_tasks: set[asyncio.Task[None]] = set()
         self._started = False
@@ -67,6 +111,19 @@ class ProcPool(utils.EventEmitter[EventTypes]):
 
         self._idle_ready = asyncio.Event()
         self._jobs_waiting_for_process = 0
+        self._wakeup = asyncio.Event()  # the main task re-evaluates the idle processes
+        self._close_tasks: set[asyncio.Task[None]] = set()
+
+        # with a warm_hit_target, num_idle_processes is only the minimum kept warm
+        self._autoscaler: idle_autoscaler.IdleAutoscaler | None = None
+        if warm_hit_target > 0:
+            self._autoscaler = idle_autoscaler.IdleAutoscaler(
+                min_idle=num_idle_processes,
+                max_idle=2 * math.ceil(get_cpu_monitor().cpu_count()),
+                warm_hit_target=warm_hit_target,
+                memory_budget_mb=idle_memory_budget_mb,
+            )
+            self._target_idle_processes = self._autoscaler.max_idle
 
     @property
     def processes(self) -> list[JobExecutor]:
@@ -96,32 +153,54 @@ class ProcPool(utils.EventEmitter[EventTypes]):
         self._closed = True
         await aio.cancel_and_wait(self._main_atask)
 
-    async def launch_job(self, info: RunningJobInfo) -> None:
+    async def launch_job(self, info: RunningJobInfo) -> JobExecutor:
+        if self._autoscaler is not None:
+            self._autoscaler.on_job_arrival()
+
+        metrics.job_dispatched(warm=not self._warmed_proc_queue.empty())
         self._jobs_waiting_for_process += 1
         if (
             self._warmed_proc_queue.empty()
             and len(self._spawn_tasks) < self._jobs_waiting_for_process
         ):
             # spawn a new process if there are no idle processes
-            task = asyncio.create_task(self._proc_spawn_task())
-            self._spawn_tasks.add(task)
-            task.add_done_callback(self._spawn_tasks.discard)
+            self._spawn()
 
         proc = await self._warmed_proc_queue.get()
         self._jobs_waiting_for_process -= 1
+        self._wakeup.set()
 
         await proc.launch_job(info)
         self.emit("process_job_launched", proc)
+        return proc
 
     def set_target_idle_processes(self, num_idle_processes: int) -> None:
-        self._target_idle_processes = num_idle_processes
+        if num_idle_processes != self._target_idle_processes:
+            self._target_idle_processes = num_idle_processes
+            self._wakeup.set()
 
     @property
     def target_idle_processes(self) -> int:
         return self._target_idle_processes
 
+    @property
+    def max_idle_processes(self) -> int:
+        """the most idle processes the pool would keep warm, before the target set with
+        set_target_idle_processes is applied"""
+        if self._autoscaler is not None:
+            return self._autoscaler.max_idle
+
+        return self._default_num_idle_processes
+
+    def _spawn(self) -> None:
+        task = asyncio.create_task(self._proc_spawn_task())
+        self._spawn_tasks.add(task)
+        task.add_done_callback(self._spawn_tasks.discard)
+        task.add_done_callback(lambda _: self._wakeup.set())
+
     @utils.log_exceptions(logger=logger)
     async def _proc_spawn_task(self) -> None:
+        spawn_start = time.perf_counter()
         proc: JobExecutor
         if self._job_executor_type == JobExecutorType.THREAD:
             proc = job_thread_executor.ThreadJobExecutor(
@@ -134,6 +213,9 @@ class ProcPool(utils.EventEmitter[EventTypes]):
                 high_ping_threshold=0.5,
                 http_proxy=self._http_proxy,
                 loop=self._loop,
+                usage_interval=self._usage_interval,
+                loop_stall_threshold=self._loop_stall_threshold,
+                loop_stall_profile_dir=self._loop_stall_profile_dir,
             )
         elif self._job_executor_type == JobExecutorType.PROCESS:
             proc = job_proc_executor.ProcJobExecutor(
@@ -150,7 +232,16 @@ class ProcPool(utils.EventEmitter[EventTypes]):
                 memory_warn_mb=self._memory_warn_mb,
                 memory_limit_mb=self._memory_limit_mb,
                 http_proxy=self._http_proxy,
+                zygote=self._zygote,
+                shm_ring_size=self._inference_shm_size,
+                usage_interval=self._usage_interval,
+                loop_stall_threshold=self._loop_stall_threshold,
+                loop_stall_profile_dir=self._loop_stall_profile_dir,
+                log_rate_limit=self._log_rate_limit,
+                log_debug_sample_rate=self._log_debug_sample_rate,
             )
+        elif self._job_executor_type == JobExecutorType.SHARED_PROCESS:
+            proc = self._reserve_shared_slot()
         else:
             raise ValueError(f"unsupported job executor: {self._job_executor_type}")
 
@@ -161,6 +252,17 @@ class ProcPool(utils.EventEmitter[EventTypes]):
                 return
 
             self.emit("process_created", proc)
+            if self._zygote is not None:
+                # initialize_process_fnc only runs in the zygote, job processes are forked from it
+                if self._zygote.user_arguments is None:
+                    self._zygote.user_arguments = proc.user_arguments
+                try:
+                    await self._zygote.ready()
+                except Exception:
+                    await proc.aclose()
+                    self._executors.remove(proc)
+                    raise
+
             await proc.start()
             self.emit("process_started", proc)
             try:
@@ -169,6 +271,10 @@ class ProcPool(utils.EventEmitter[EventTypes]):
                 # neither be used to launch jobs
 
                 self.emit("process_ready", proc)
+                if self._autoscaler is not None:
+                    self._autoscaler.on_process_ready(
+                        time.perf_counter() - spawn_start, self._proc_memory_mb(proc)
+                    )
                 self._warmed_proc_queue.put_nowait(proc)
                 if self._warmed_proc_queue.qsize() >= self._default_num_idle_processes:
                     self._idle_ready.set()
@@ -179,6 +285,62 @@ class ProcPool(utils.EventEmitter[EventTypes]):
         self._monitor_tasks.add(monitor_task)
         monitor_task.add_done_callback(self._monitor_tasks.discard)
 
+    def _reserve_shared_slot(self) -> job_shared_proc_executor.SharedJobExecutor:
+        # with JobExecutorType.SHARED_PROCESS, the "processes" of the pool are job slots.
+        # new slots go to the busiest process that has room, so that the others can drain
+        # and exit
+        self._shared_procs = [p for p in self._shared_procs if p.accepting or p.slots]
+        candidates = [p for p in self._shared_procs if p.accepting]
+        if candidates:
+            shared_proc = max(candidates, key=lambda p: len(p.slots))
+        else:
+            shared_proc = job_shared_proc_executor.SharedJobProc(
+                initialize_process_fnc=self._initialize_process_fnc,
+                job_entrypoint_fnc=self._job_entrypoint_fnc,
+                initialize_timeout=self._initialize_timeout,
+                close_timeout=self._close_timeout,
+                inference_executor=self._inf_executor,
+                max_jobs=self._jobs_per_process,
+                mp_ctx=self._mp_ctx,
+                loop=self._loop,
+                ping_interval=2.5,
+                ping_timeout=60,
+                high_ping_threshold=0.5,
+                # the limits are per job, the process runs up to jobs_per_process of them
+                memory_warn_mb=self._memory_warn_mb * self._jobs_per_process,
+                memory_limit_mb=self._memory_limit_mb * self._jobs_per_process,
+                http_proxy=self._http_proxy,
+                zygote=self._zygote,
+                shm_ring_size=self._inference_shm_size,
+                usage_interval=self._usage_interval,
+                loop_stall_threshold=self._loop_stall_threshold,
+                loop_stall_profile_dir=self._loop_stall_profile_dir,
+                log_rate_limit=self._log_rate_limit,
+                log_debug_sample_rate=self._log_debug_sample_rate,
+            )
+            self._shared_procs.append(shared_proc)
+
+        return shared_proc.reserve()
+
+    def _proc_memory_mb(self, proc: JobExecutor) -> float | None:
+        """memory of a freshly initialized process, for the memory budget of the autoscaler"""
+        if self._job_executor_type == JobExecutorType.THREAD:
+            return None
+
+        pid = getattr(proc, "pid", None)
+        if pid is None:
+            return None
+
+        try:
+            p = psutil.Process(pid)
+            # forked processes share most of their memory with the zygote
+            memory = p.memory_full_info().uss if self._zygote is not None else p.memory_info().rss
+        except (psutil.Error, OSError):
+            return None
+
+        # the slots of a shared process split its memory
+        return memory / (1024 * 1024) / self._jobs_per_process
+
     @utils.log_exceptions(logger=logger)
     async def _monitor_process_task(self, proc: JobExecutor) -> None:
         try:
@@ -186,24 +348,45 @@ class ProcPool(utils.EventEmitter[EventTypes]):
             self.emit("process_closed", proc)
         finally:
             self._executors.remove(proc)
+            self._wakeup.set()
+
+    def _idle_target(self) -> int:
+        if self._autoscaler is not None:
+            num_idle = self._autoscaler.target()
+        else:
+            num_idle = self._default_num_idle_processes
+
+        return min(self._target_idle_processes, num_idle)
 
     @utils.log_exceptions(logger=logger)
     async def _main_task(self) -> None:
         try:
             while not self._closed:
+                self._wakeup.clear()
+                target = self._idle_target()
                 current_pending = self._warmed_proc_queue.qsize() + len(self._spawn_tasks)
-                to_spawn = (
-                    min(self._target_idle_processes, self._default_num_idle_processes)
-                    - current_pending
-                )
 
-                for _ in range(to_spawn):
-                    task = asyncio.create_task(self._proc_spawn_task())
-                    self._spawn_tasks.add(task)
-                    task.add_done_callback(self._spawn_tasks.discard)
+                for _ in range(target - current_pending):
+                    self._spawn()
+
+                # the autoscaler lowered the target: close the idle processes that are left over
+                while self._autoscaler is not None and self._warmed_proc_queue.qsize() > target:
+                    proc = self._warmed_proc_queue.get_nowait()
+                    task = asyncio.create_task(proc.aclose())
+                    self._close_tasks.add(task)
+                    task.add_done_callback(self._close_tasks.discard)
 
-                await asyncio.sleep(0.1)
+                # woken up by the pool events, and periodically for the arrival rate to decay
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(
+                        self._wakeup.wait(),
+                        idle_autoscaler.EVALUATE_INTERVAL if self._autoscaler else None,
+                    )
         except asyncio.CancelledError:
             await asyncio.gather(*[proc.aclose() for proc in self._executors])
             await asyncio.gather(*self._spawn_tasks)
+            await asyncio.gather(*self._close_tasks)
+            await asyncio.gather(*[proc.aclose() for proc in self._shared_procs])
             await asyncio.gather(*self._monitor_tasks)
+            if self._zygote is not None:
+                await self._zygote.aclose()
@@ -22,6 +22,15 @@ class InitializeRequest:
     # if ping is higher than this, process is considered unresponsive
     high_ping_threshold: float = 0
     http_proxy: str = ""  # empty = None
+    # shared memory rings carrying the inference payloads (see shm_ring), empty = disabled
+    shm_to_child: str = ""
+    shm_from_child: str = ""
+    # job processes: profile the event loop stalls longer than this (see loop_profiler), 0 = off
+    loop_stall_threshold: float = 0
+    loop_stall_profile_dir: str = ""  # empty = no collapsed stack files
+    # job processes: records below WARNING each job can log per second, 0 = unlimited
+    log_rate_limit: float = 0
+    log_debug_sample_rate: float = 1.0  # fraction of the DEBUG records sent to the worker
 
     def write(self, b: io.BytesIO) -> None:
         channel.write_bool(b, self.asyncio_debug)
@@ -29,6 +38,12 @@ class InitializeRequest:
         channel.write_float(b, self.ping_timeout)
         channel.write_float(b, self.high_ping_threshold)
         channel.write_string(b, self.http_proxy)
+        channel.write_string(b, self.shm_to_child)
+        channel.write_string(b, self.shm_from_child)
+        channel.write_float(b, self.loop_stall_threshold)
+        channel.write_string(b, self.loop_stall_profile_dir)
+        channel.write_float(b, self.log_rate_limit)
+        channel.write_float(b, self.log_debug_sample_rate)
 
     def read(self, b: io.BytesIO) -> None:
         self.asyncio_debug = channel.read_bool(b)
@@ -36,6 +51,12 @@ class InitializeRequest:
         self.ping_timeout = channel.read_float(b)
         self.high_ping_threshold = channel.read_float(b)
         self.http_proxy = channel.read_string(b)
+        self.shm_to_child = channel.read_string(b)
+        self.shm_from_child = channel.read_string(b)
+        self.loop_stall_threshold = channel.read_float(b)
+        self.loop_stall_profile_dir = channel.read_string(b)
+        self.log_rate_limit = channel.read_float(b)
+        self.log_debug_sample_rate = channel.read_float(b)
 
 
 @dataclass
@@ -100,6 +121,7 @@ class StartJobRequest:
         channel.write_string(b, self.running_job.url)
         channel.write_string(b, self.running_job.token)
         channel.write_string(b, self.running_job.worker_id)
+        channel.write_double(b, self.running_job.request_received_at)
 
     def read(self, b: io.BytesIO) -> None:
         job = agent.Job()
@@ -114,6 +136,7 @@ class StartJobRequest:
             url=channel.read_string(b),
             token=channel.read_string(b),
             worker_id=channel.read_string(b),
+            request_received_at=channel.read_double(b),
         )
 
 
@@ -154,16 +177,17 @@ class InferenceRequest:
     method: str = ""
     request_id: str = ""
     data: bytes = b""
+    shm_ref: tuple[int, int] | None = None  # (position, size) of data in the shared memory ring
 
     def write(self, b: io.BytesIO) -> None:
         channel.write_string(b, self.method)
         channel.write_string(b, self.request_id)
-        channel.write_bytes(b, self.data)
+        _write_payload(b, self.data, self.shm_ref)
 
     def read(self, b: io.BytesIO) -> None:
         self.method = channel.read_string(b)
         self.request_id = channel.read_string(b)
-        self.data = channel.read_bytes(b)
+        self.data, self.shm_ref = _read_payload(b)
 
 
 @dataclass
@@ -174,22 +198,160 @@ class InferenceResponse:
     request_id: str = ""
     data: bytes | None = None
     error: str = ""
+    shm_ref: tuple[int, int] | None = None  # (position, size) of data in the shared memory ring
 
     def write(self, b: io.BytesIO) -> None:
         channel.write_string(b, self.request_id)
         channel.write_bool(b, self.data is not None)
         if self.data is not None:
-            channel.write_bytes(b, self.data)
+            _write_payload(b, self.data, self.shm_ref)
         channel.write_string(b, self.error)
 
     def read(self, b: io.BytesIO) -> None:
         self.request_id = channel.read_string(b)
         has_data = channel.read_bool(b)
         if has_data:
-            self.data = channel.read_bytes(b)
+            self.data, self.shm_ref = _read_payload(b)
         self.error = channel.read_string(b)
 
 
+@dataclass
+class ShutdownJobRequest:
+    """sent by the main process to a shared job process (JobExecutorType.SHARED_PROCESS) to
+    shut down one of its jobs. when `force` is set, the job task is cancelled"""
+
+    MSG_ID: ClassVar[int] = 9
+    job_id: str = ""
+    reason: str = ""
+    force: bool = False
+
+    def write(self, b: io.BytesIO) -> None:
+        channel.write_string(b, self.job_id)
+        channel.write_string(b, self.reason)
+        channel.write_bool(b, self.force)
+
+    def read(self, b: io.BytesIO) -> None:
+        self.job_id = channel.read_string(b)
+        self.reason = channel.read_string(b)
+        self.force = channel.read_bool(b)
+
+
+@dataclass
+class JobEnded:
+    """sent by a shared job process when one of its jobs finished. error is empty if the job
+    ended cleanly"""
+
+    MSG_ID: ClassVar[int] = 10
+    job_id: str = ""
+    reason: str = ""
+    error: str = ""
+    cpu_time: float = 0.0  # seconds of CPU spent in the job's tasks
+
+    def write(self, b: io.BytesIO) -> None:
+        channel.write_string(b, self.job_id)
+        channel.write_string(b, self.reason)
+        channel.write_string(b, self.error)
+        channel.write_double(b, self.cpu_time)
+
+    def read(self, b: io.BytesIO) -> None:
+        self.job_id = channel.read_string(b)
+        self.reason = channel.read_string(b)
+        self.error = channel.read_string(b)
+        self.cpu_time = channel.read_double(b)
+
+
+@dataclass
+class ForkedProcExited:
+    """sent by a zygote process when one of the job processes it forked exited. like
+    multiprocessing, a negative exitcode is the signal that killed the process"""
+
+    MSG_ID: ClassVar[int] = 11
+    pid: int = 0
+    exitcode: int = 0
+
+    def write(self, b: io.BytesIO) -> None:
+        channel.write_int(b, self.pid)
+        channel.write_bool(b, self.exitcode < 0)
+        channel.write_int(b, abs(self.exitcode))
+
+    def read(self, b: io.BytesIO) -> None:
+        self.pid = channel.read_int(b)
+        signaled = channel.read_bool(b)
+        self.exitcode = -channel.read_int(b) if signaled else channel.read_int(b)
+
+
+@dataclass
+class JobUsageReport:
+    """sent by a shared job process after each ping, the CPU seconds spent so far in the
+    tasks of each of its running jobs"""
+
+    MSG_ID: ClassVar[int] = 12
+    cpu_times: dict[str, float] = field(default_factory=dict)
+
+    def write(self, b: io.BytesIO) -> None:
+        channel.write_int(b, len(self.cpu_times))
+        for job_id, cpu_time in self.cpu_times.items():
+            channel.write_string(b, job_id)
+            channel.write_double(b, cpu_time)
+
+    def read(self, b: io.BytesIO) -> None:
+        self.cpu_times = {}
+        for _ in range(channel.read_int(b)):
+            job_id = channel.read_string(b)
+            self.cpu_times[job_id] = channel.read_double(b)
+
+
+@dataclass
+class JobAssigned:
+    """sent by the main process when the server assigned a job that was started before its
+    assignment (WorkerOptions.pipelined_accept), JobContext.connect() waits for it"""
+
+    MSG_ID: ClassVar[int] = 13
+    job_id: str = ""
+    url: str = ""
+    token: str = ""
+
+    def write(self, b: io.BytesIO) -> None:
+        channel.write_string(b, self.job_id)
+        channel.write_string(b, self.url)
+        channel.write_string(b, self.token)
+
+    def read(self, b: io.BytesIO) -> None:
+        self.job_id = channel.read_string(b)
+        self.url = channel.read_string(b)
+        self.token = channel.read_string(b)
+
+
+@dataclass
+class FirstAudioPublished:
+    """sent by a job process when the agent of a job published its first audio frame"""
+
+    MSG_ID: ClassVar[int] = 14
+    job_id: str = ""
+
+    def write(self, b: io.BytesIO) -> None:
+        channel.write_string(b, self.job_id)
+
+    def read(self, b: io.BytesIO) -> None:
+        self.job_id = channel.read_string(b)
+
+
+def _write_payload(b: io.BytesIO, data: bytes, shm_ref: tuple[int, int] | None) -> None:
+    channel.write_bool(b, shm_ref is not None)
+    if shm_ref is not None:
+        channel.write_long(b, shm_ref[0])
+        channel.write_int(b, shm_ref[1])
+    else:
+        channel.write_bytes(b, data)
+
+
+def _read_payload(b: io.BytesIO) -> tuple[bytes, tuple[int, int] | None]:
+    if channel.read_bool(b):
+        return b"", (channel.read_long(b), channel.read_int(b))
+
+    return channel.read_bytes(b), None
+
+
 IPC_MESSAGES = {
     InitializeRequest.MSG_ID: InitializeRequest,
     InitializeResponse.MSG_ID: InitializeResponse,
@@ -200,4 +362,10 @@ IPC_MESSAGES = {
     Exiting.MSG_ID: Exiting,
     InferenceRequest.MSG_ID: InferenceRequest,
     InferenceResponse.MSG_ID: InferenceResponse,
+    ShutdownJobRequest.MSG_ID: ShutdownJobRequest,
+    JobEnded.MSG_ID: JobEnded,
+    ForkedProcExited.MSG_ID: ForkedProcExited,
+    JobUsageReport.MSG_ID: JobUsageReport,
+    JobAssigned.MSG_ID: JobAssigned,
+    FirstAudioPublished.MSG_ID: FirstAudioPublished,
 }
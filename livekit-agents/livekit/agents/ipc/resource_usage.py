@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+
+import psutil
+
+from ..telemetry import metrics
+
+
+@dataclass
+class ProcUsage:
+    """one sample of the resources used by a job process, job thread or inference process"""
+
+    cpu_time: float
+    """CPU seconds (user + system) used since the process or thread started"""
+    cpu_cores: float
+    """CPU used since the previous sample, in cores"""
+    rss_mb: float
+    """0 for threads, their memory can't be told apart from the worker's"""
+    uss_mb: float | None
+    """memory only this process uses, None when it can't be measured"""
+    loop_lag: float
+    """seconds, round trip of the last ping through the event loop running the job(s)"""
+
+
+@dataclass
+class JobUsage:
+    cpu_time: float = 0.0
+    """CPU seconds spent by the job. For shared processes, in the asyncio tasks of the job"""
+    cpu_cores: float = 0.0
+    """CPU the job used over the last sample interval, in cores"""
+    memory_mb: float = 0.0
+    """memory of the process running the job (USS for processes forked from a zygote, RSS
+    otherwise), shared by the jobs of a shared process. 0 for thread executors"""
+    peak_memory_mb: float = 0.0
+    loop_lag: float = 0.0
+    """last ping round trip through the event loop running the job"""
+    max_loop_lag: float = 0.0
+    started_at: float | None = None
+    ended_at: float | None = None
+
+    @property
+    def avg_cpu_cores(self) -> float:
+        """CPU used since the job started, in cores"""
+        if self.started_at is None:
+            return 0.0
+
+        duration = (self.ended_at or time.time()) - self.started_at
+        return self.cpu_time / duration if duration > 0 else 0.0
+
+    def add_sample(
+        self, *, cpu_time: float, cpu_cores: float, memory_mb: float, loop_lag: float
+    ) -> None:
+        self.cpu_time = cpu_time
+        self.cpu_cores = cpu_cores
+        self.memory_mb = memory_mb
+        self.peak_memory_mb = max(self.peak_memory_mb, memory_mb)
+        self.loop_lag = loop_lag
+        self.max_loop_lag = max(self.max_loop_lag, loop_lag)
+        metrics.job_usage_sampled(cpu_cores=cpu_cores, loop_lag=loop_lag)
+
+    def end(self) -> None:
+        if self.started_at is None or self.ended_at is not None:
+            return
+
+        self.ended_at = time.time()
+        metrics.job_usage_ended(
+            cpu_time=self.cpu_time,
+            avg_cpu_cores=self.avg_cpu_cores,
+            peak_memory_mb=self.peak_memory_mb,
+        )
+
+    def logging_extra(self) -> dict[str, float]:
+        return {
+            "cpu_time": round(self.cpu_time, 3),
+            "peak_memory_mb": round(self.peak_memory_mb, 1),
+            "max_loop_lag": round(self.max_loop_lag, 3),
+        }
+
+
+class CpuRate:
+    """cores used between two readings of a CPU time counter"""
+
+    def __init__(self) -> None:
+        self._last: tuple[float, float] | None = None  # (monotonic time, cpu_time)
+
+    @property
+    def last_cpu_time(self) -> float:
+        return self._last[1] if self._last is not None else 0.0
+
+    def update(self, cpu_time: float) -> float:
+        now = time.monotonic()
+        last, self._last = self._last, (now, cpu_time)
+        if last is None or now <= last[0]:
+            return 0.0
+        return max(cpu_time - last[1], 0.0) / (now - last[0])
+
+
+class ProcSampler:
+    def __init__(self, pid: int) -> None:
+        self._proc = psutil.Process(pid)
+        self._cpu_rate = CpuRate()
+
+    def sample(self, *, loop_lag: float) -> ProcUsage:
+        """raises psutil.Error if the process is gone"""
+        cpu = self._proc.cpu_times()
+        cpu_time = cpu.user + cpu.system
+        try:
+            mem = self._proc.memory_full_info()
+            rss, uss = mem.rss, mem.uss
+        except psutil.AccessDenied:
+            rss, uss = self._proc.memory_info().rss, None
+
+        return ProcUsage(
+            cpu_time=cpu_time,
+            cpu_cores=self._cpu_rate.update(cpu_time),
+            rss_mb=rss / (1024 * 1024),
+            uss_mb=uss / (1024 * 1024) if uss is not None else None,
+            loop_lag=loop_lag,
+        )
+
+
+class ThreadSampler:
+    """CPU of one thread of the current process (a ThreadJobExecutor)"""
+
+    def __init__(self, thread: threading.Thread) -> None:
+        self._thread = thread
+        self._cpu_rate = CpuRate()
+
+    def sample(self, *, loop_lag: float) -> ProcUsage:
+        cpu_time = self._thread_cpu_time()
+        return ProcUsage(
+            cpu_time=cpu_time,
+            cpu_cores=self._cpu_rate.update(cpu_time),
+            rss_mb=0.0,
+            uss_mb=None,
+            loop_lag=loop_lag,
+        )
+
+    def _thread_cpu_time(self) -> float:
+        if hasattr(time, "pthread_getcpuclockid") and self._thread.ident is not None:
+            try:
+                return time.clock_gettime(time.pthread_getcpuclockid(self._thread.ident))
+            except OSError:
+                pass  # the thread exited
+
+        for t in psutil.Process().threads():
+            if t.id == self._thread.native_id:
+                return t.user_time + t.system_time
+        return self._cpu_rate.last_cpu_time
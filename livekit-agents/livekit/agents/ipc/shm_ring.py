@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import struct
+import sys
+from multiprocessing import shared_memory
+
+from ..log import logger
+from . import proto
+
+_HEADER = struct.Struct("<Q")  # read position, written by the consumer
+
+
+class ShmRing:
+    """A single-producer single-consumer byte ring in shared memory, used to move the
+    payloads of InferenceRequest/InferenceResponse between two processes while only a
+    (position, size) reference goes through the IPC socket.
+
+    The producer writes a payload and sends its reference on the socket without yielding in
+    between, and the consumer reads the references in the order it receives them: the ring
+    doesn't need any lock. The consumer publishes how far it read, a producer seeing a stale
+    value just finds the ring fuller than it is (payloads that don't fit are sent inline)."""
+
+    def __init__(self, shm: shared_memory.SharedMemory, *, owner: bool) -> None:
+        assert shm.buf is not None
+        self._shm = shm
+        self._buf = shm.buf
+        self._owner = owner
+        self._capacity = shm.size - _HEADER.size
+        self._write_pos = 0
+
+    @staticmethod
+    def create(size: int) -> ShmRing:
+        return ShmRing(
+            shared_memory.SharedMemory(create=True, size=size + _HEADER.size), owner=True
+        )
+
+    @staticmethod
+    def attach(name: str) -> ShmRing:
+        return ShmRing(shared_memory.SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def write(self, data: bytes) -> int | None:
+        """copy data into the ring, returns its position or None if the ring is full"""
+        size = len(data)
+        pos = self._write_pos
+        offset = pos % self._capacity
+        if offset + size > self._capacity:
+            pos += self._capacity - offset  # payloads are contiguous, skip the end of the ring
+            offset = 0
+
+        (read_pos,) = _HEADER.unpack_from(self._buf, 0)
+        if pos + size - read_pos > self._capacity:
+            return None
+
+        start = _HEADER.size + offset
+        self._buf[start : start + size] = data
+        self._write_pos = pos + size
+        return pos
+
+    def read(self, pos: int, size: int) -> bytes:
+        start = _HEADER.size + pos % self._capacity
+        data = bytes(self._buf[start : start + size])
+        _HEADER.pack_into(self._buf, 0, pos + size)
+        return data
+
+    def unlink(self) -> None:
+        """remove the name of the ring once both processes mapped it, the memory is released
+        when both are closed"""
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+            self._owner = False
+
+    def close(self) -> None:
+        self.unlink()
+        self._shm.close()
+
+
+def create_pair(size: int) -> tuple[ShmRing, ShmRing] | None:
+    """the (to child, from child) rings of a supervised process, None if they can't be used"""
+    if size <= 0 or sys.platform == "win32":
+        return None
+
+    try:
+        to_child = ShmRing.create(size)
+    except OSError:
+        logger.warning("couldn't create the shared memory rings, using the IPC socket")
+        return None
+
+    try:
+        return to_child, ShmRing.create(size)
+    except OSError:
+        to_child.close()
+        logger.warning("couldn't create the shared memory rings, using the IPC socket")
+        return None
+
+
+def put_payload(ring: ShmRing | None, msg: object) -> None:
+    """move the payload of an inference message into the ring, if it fits"""
+    if ring is None:
+        return
+
+    if isinstance(msg, (proto.InferenceRequest, proto.InferenceResponse)) and msg.data:
+        pos = ring.write(msg.data)
+        if pos is not None:
+            msg.shm_ref = (pos, len(msg.data))
+            msg.data = b""
+
+
+def take_payload(ring: ShmRing | None, msg: object) -> None:
+    """resolve the payload of a received inference message. must be called in the order the
+    messages are received"""
+    if isinstance(msg, (proto.InferenceRequest, proto.InferenceResponse)) and msg.shm_ref:
+        if ring is None:
+            raise RuntimeError("received a shared memory reference without a ring")
+
+        msg.data = ring.read(*msg.shm_ref)
+        msg.shm_ref = None
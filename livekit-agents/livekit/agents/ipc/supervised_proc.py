@@ -3,7 +3,6 @@ from __future__ import annotations
 import asyncio
 import contextlib
 import logging
-import multiprocessing as mp
 import socket
 import sys
 import threading
@@ -11,7 +10,7 @@ import time
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from multiprocessing.context import BaseContext
-from typing import Any
+from typing import Any, Protocol
 
 import psutil
 
@@ -19,7 +18,7 @@ from ..log import logger
 from ..telemetry import metrics
 from ..utils import aio, log_exceptions, time_ms
 from ..utils.aio import duplex_unix
-from . import channel, proto
+from . import channel, proto, resource_usage, shm_ring
 from .log_queue import LogQueueListener
 
 
@@ -33,6 +32,33 @@ class _ProcOpts:
     ping_timeout: float
     high_ping_threshold: float
     http_proxy: str | None
+    usage_interval: float
+    loop_stall_threshold: float
+    loop_stall_profile_dir: str | None
+    log_rate_limit: float
+    log_debug_sample_rate: float
+
+
+class _ProcessHandle(Protocol):
+    """the part of multiprocessing.Process used to supervise a process (see zygote_proc)"""
+
+    @property
+    def pid(self) -> int | None: ...
+
+    @property
+    def exitcode(self) -> int | None: ...
+
+    def start(self) -> None: ...
+
+    def join(self, timeout: float | None = None) -> None: ...
+
+    def is_alive(self) -> bool: ...
+
+    def kill(self) -> None: ...
+
+    def terminate(self) -> None: ...
+
+    def close(self) -> None: ...
 
 
 class SupervisedProc(ABC):
@@ -49,9 +75,17 @@ class SupervisedProc(ABC):
         http_proxy: str | None,
         mp_ctx: BaseContext,
         loop: asyncio.AbstractEventLoop,
+        shm_ring_size: int = 0,
+        usage_interval: float = 5.0,
+        loop_stall_threshold: float = 0.0,
+        loop_stall_profile_dir: str | None = None,
+        log_rate_limit: float = 0.0,
+        log_debug_sample_rate: float = 1.0,
     ) -> None:
         self._loop = loop
         self._mp_ctx = mp_ctx
+        self._shm_ring_size = shm_ring_size
+        self._shm_rings: tuple[shm_ring.ShmRing, shm_ring.ShmRing] | None = None
         self._opts = _ProcOpts(
             initialize_timeout=initialize_timeout,
             close_timeout=close_timeout,
@@ -61,10 +95,20 @@ class SupervisedProc(ABC):
             ping_timeout=ping_timeout,
             high_ping_threshold=high_ping_threshold,
             http_proxy=http_proxy,
+            usage_interval=usage_interval,
+            loop_stall_threshold=loop_stall_threshold,
+            loop_stall_profile_dir=loop_stall_profile_dir,
+            log_rate_limit=log_rate_limit,
+            log_debug_sample_rate=log_debug_sample_rate,
         )
 
         self._exitcode: int | None = None
         self._pid: int | None = None
+        # processes forked from a zygote share most of their pages with it (and with each
+        # other), their memory limits apply to the pages they don't share (USS), not to RSS
+        self._forked = False
+        self._loop_lag = 0.0
+        self._proc_usage: resource_usage.ProcUsage | None = None
 
         self._supervise_atask: asyncio.Task[None] | None = None
         self._closing = False
@@ -73,7 +117,7 @@ class SupervisedProc(ABC):
         self._lock = asyncio.Lock()
 
     @abstractmethod
-    def _create_process(self, cch: socket.socket, log_cch: socket.socket) -> mp.Process: ...
+    def _create_process(self, cch: socket.socket, log_cch: socket.socket) -> _ProcessHandle: ...
 
     @abstractmethod
     async def _main_task(self, ipc_ch: aio.ChanReceiver[channel.Message]) -> None: ...
@@ -94,6 +138,11 @@ class SupervisedProc(ABC):
     def started(self) -> bool:
         return self._supervise_atask is not None
 
+    @property
+    def proc_usage(self) -> resource_usage.ProcUsage | None:
+        """the last sample of the resources used by the process"""
+        return self._proc_usage
+
     async def start(self) -> None:
         """start the supervised process"""
         if self.started:
@@ -111,6 +160,8 @@ class SupervisedProc(ABC):
                 setattr(record, key, value)
 
         async with self._lock:
+            self._start_time = time.perf_counter()
+            self._shm_rings = shm_ring.create_pair(self._shm_ring_size)
             mp_pch, mp_cch = socket.socketpair()
             mp_log_pch, mp_log_cch = socket.socketpair()
 
@@ -159,6 +210,12 @@ class SupervisedProc(ABC):
                 ping_timeout=self._opts.ping_timeout,
                 high_ping_threshold=self._opts.high_ping_threshold,
                 http_proxy=self._opts.http_proxy or "",
+                shm_to_child=self._shm_rings[0].name if self._shm_rings else "",
+                shm_from_child=self._shm_rings[1].name if self._shm_rings else "",
+                loop_stall_threshold=self._opts.loop_stall_threshold,
+                loop_stall_profile_dir=self._opts.loop_stall_profile_dir or "",
+                log_rate_limit=self._opts.log_rate_limit,
+                log_debug_sample_rate=self._opts.log_debug_sample_rate,
             ),
         )
 
@@ -181,13 +238,15 @@ class SupervisedProc(ABC):
 
             elapsed_time = time.perf_counter() - start_time
             metrics.proc_initialized(time_elapsed=elapsed_time)
-            logger.info(
-                "process initialized",
-                extra={
-                    **self.logging_extra(),
-                    "elapsed_time": round(elapsed_time, 2),
-                },
-            )
+            extra = {
+                **self.logging_extra(),
+                "elapsed_time": round(elapsed_time, 2),
+                "startup_time": round(time.perf_counter() - self._start_time, 3),
+            }
+            if self._forked and self._pid:
+                with contextlib.suppress(psutil.Error):
+                    extra.update(_memory_split_mb(self._pid))
+            logger.info("process initialized", extra=extra)
         except asyncio.TimeoutError:
             self._initialize_fut.set_exception(
                 asyncio.TimeoutError("process initialization timed out")
@@ -198,6 +257,11 @@ class SupervisedProc(ABC):
             # should be channel.ChannelClosed most of the time (or init_res error)
             self._initialize_fut.set_exception(e)
             raise
+        finally:
+            # the process mapped the rings while initializing
+            if self._shm_rings:
+                for ring in self._shm_rings:
+                    ring.unlink()
 
     async def aclose(self) -> None:
         """attempt to gracefully close the supervised process"""
@@ -272,17 +336,19 @@ class SupervisedProc(ABC):
         ping_task = asyncio.create_task(self._ping_pong_task(pong_timeout))
         read_ipc_task.add_done_callback(lambda _: ipc_ch.close())
 
-        memory_monitor_task: asyncio.Task[None] | None = None
-        if self._opts.memory_limit_mb > 0 or self._opts.memory_warn_mb > 0:
-            memory_monitor_task = asyncio.create_task(self._memory_monitor_task())
+        usage_monitor_task = asyncio.create_task(self._usage_monitor_task())
 
         await self._join_fut
         self._exitcode = self._proc.exitcode
         self._proc.close()
         await aio.cancel_and_wait(ping_task, read_ipc_task, main_task)
 
-        if memory_monitor_task is not None:
-            await aio.cancel_and_wait(memory_monitor_task)
+        await aio.cancel_and_wait(usage_monitor_task)
+
+        if self._shm_rings:
+            for ring in self._shm_rings:
+                ring.close()
+            self._shm_rings = None
 
         with contextlib.suppress(duplex_unix.DuplexClosed):
             await self._pch.aclose()
@@ -305,6 +371,7 @@ class SupervisedProc(ABC):
 
             if isinstance(msg, proto.PongResponse):
                 delay = time_ms() - msg.timestamp
+                self._loop_lag = delay / 1000
                 if delay > self._opts.high_ping_threshold * 1000:
                     logger.warning(
                         "process is unresponsive",
@@ -314,6 +381,8 @@ class SupervisedProc(ABC):
                 with contextlib.suppress(aio.SleepFinished):
                     pong_timeout.reset()
 
+            shm_ring.take_payload(self._shm_rings[1] if self._shm_rings else None, msg)
+
             if isinstance(msg, proto.Exiting):
                 logger.info(
                     "process exiting",
@@ -322,6 +391,12 @@ class SupervisedProc(ABC):
 
             ipc_ch.send_nowait(msg)
 
+    async def _send(self, msg: channel.Message) -> None:
+        """send a message to the process, the payload of inference messages goes through the
+        shared memory ring when there is one"""
+        shm_ring.put_payload(self._shm_rings[0] if self._shm_rings else None, msg)
+        await channel.asend_message(self._pch, msg)
+
     @log_exceptions(logger=logger)
     async def _ping_pong_task(self, pong_timeout: aio.Sleep) -> None:
         ping_interval = aio.interval(self._opts.ping_interval)
@@ -349,19 +424,24 @@ class SupervisedProc(ABC):
             await aio.cancel_and_wait(*tasks)
 
     @log_exceptions(logger=logger)
-    async def _memory_monitor_task(self) -> None:
-        """Monitor memory usage and kill the process if it exceeds the limit."""
+    async def _usage_monitor_task(self) -> None:
+        """Sample the CPU and memory usage of the process, kill it if it exceeds the memory
+        limit."""
+        sampler: resource_usage.ProcSampler | None = None
         while not self._closing and not self._kill_sent:
             try:
                 if not self._pid:
-                    await asyncio.sleep(5)
+                    await asyncio.sleep(self._opts.usage_interval)
                     continue
 
-                # get process memory info
-                process = psutil.Process(self._pid)
-                memory_info = process.memory_info()
-                memory_mb = memory_info.rss / (1024 * 1024)  # Convert to MB
+                if sampler is None:
+                    sampler = resource_usage.ProcSampler(self._pid)
+
+                usage = sampler.sample(loop_lag=self._loop_lag)
+                self._proc_usage = usage
+                self._on_usage(usage)
 
+                memory_mb = self._memory_mb(usage)
                 if self._opts.memory_limit_mb > 0 and memory_mb > self._opts.memory_limit_mb:
                     logger.error(
                         "process exceeded memory limit, killing process",
@@ -403,7 +483,27 @@ class SupervisedProc(ABC):
                     extra=self.logging_extra(),
                 )
 
-            await asyncio.sleep(5)  # check every 5 seconds
+            await asyncio.sleep(self._opts.usage_interval)
+
+    def _memory_mb(self, usage: resource_usage.ProcUsage) -> float:
+        """the memory the limits apply to"""
+        if self._forked and usage.uss_mb is not None:
+            return usage.uss_mb
+        return usage.rss_mb
+
+    def _cpu_time(self) -> float:
+        """CPU seconds used by the process so far"""
+        if not self._pid:
+            return 0.0
+        try:
+            cpu = psutil.Process(self._pid).cpu_times()
+        except psutil.Error:
+            return self._proc_usage.cpu_time if self._proc_usage else 0.0
+        return cpu.user + cpu.system
+
+    def _on_usage(self, usage: resource_usage.ProcUsage) -> None:  # noqa: B027
+        """called with each sample of the usage monitor"""
+        pass
 
     def logging_extra(self) -> dict[str, Any]:
         extra: dict[str, Any] = {
@@ -411,3 +511,14 @@ class SupervisedProc(ABC):
         }
 
         return extra
+
+
+def _memory_split_mb(pid: int) -> dict[str, float]:
+    """RSS of a process, split into the pages it shares with other processes (for a process
+    forked from a zygote, mostly with the zygote) and the ones only it uses"""
+    mem = psutil.Process(pid).memory_full_info()
+    return {
+        "rss_mb": round(mem.rss / (1024 * 1024), 1),
+        "shared_mb": round((mem.rss - mem.uss) / (1024 * 1024), 1),
+        "private_mb": round(mem.uss / (1024 * 1024), 1),
+    }
@@ -0,0 +1,302 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import multiprocessing as mp
+import os
+import signal
+import socket
+import threading
+import time
+from collections.abc import Awaitable
+from multiprocessing.context import BaseContext
+from typing import Any, Callable
+
+import psutil
+
+from ..job import JobContext, JobProcess
+from ..log import logger
+from ..utils import aio, log_exceptions
+from ..utils.aio import duplex_unix
+from . import channel, proto
+from .job_proc_lazy_main import ProcStartArgs, zygote_main
+from .supervised_proc import SupervisedProc
+
+
+class ZygoteProc(SupervisedProc):
+    """The prewarmed process job processes are forked from (multiprocessing_context="zygote").
+
+    initialize_process_fnc runs once, in the zygote. Each job process is then a fork of it: it
+    starts in milliseconds, already initialized, and shares the memory of the zygote (loaded
+    models, imported modules) copy-on-write. The job processes are supervised by their own
+    ProcJobExecutor/SharedJobProc, through a ForkedProc."""
+
+    def __init__(
+        self,
+        *,
+        initialize_process_fnc: Callable[[JobProcess], Any],
+        job_entrypoint_fnc: Callable[[JobContext], Awaitable[None]],
+        max_jobs: int,
+        initialize_timeout: float,
+        close_timeout: float,
+        ping_interval: float,
+        ping_timeout: float,
+        high_ping_threshold: float,
+        http_proxy: str | None,
+        mp_ctx: BaseContext,
+        loop: asyncio.AbstractEventLoop,
+    ) -> None:
+        super().__init__(
+            initialize_timeout=initialize_timeout,
+            close_timeout=close_timeout,
+            memory_warn_mb=0,
+            memory_limit_mb=0,
+            ping_interval=ping_interval,
+            ping_timeout=ping_timeout,
+            high_ping_threshold=high_ping_threshold,
+            mp_ctx=mp_ctx,
+            loop=loop,
+            http_proxy=http_proxy,
+        )
+
+        self._user_args: Any | None = None
+        self._initialize_process_fnc = initialize_process_fnc
+        self._job_entrypoint_fnc = job_entrypoint_fnc
+        self._max_jobs = max_jobs
+        self._fork_lock = threading.Lock()
+        self._children_lock = threading.Lock()
+        self._children: dict[int, ForkedProc] = {}
+        self._early_exits: dict[int, int] = {}  # exit codes received before `_fork` returned
+
+    @property
+    def initialized(self) -> bool:
+        return self._initialize_fut.done() and self._initialize_fut.exception() is None
+
+    @property
+    def alive(self) -> bool:
+        return self.started and self._exitcode is None and not self._closing
+
+    @property
+    def user_arguments(self) -> Any | None:
+        return self._user_args
+
+    @user_arguments.setter
+    def user_arguments(self, value: Any | None) -> None:
+        self._user_args = value
+
+    async def start(self) -> None:
+        await super().start()
+        self._fork_cch.close()  # the zygote has its own copy
+
+    def _create_process(self, cch: socket.socket, log_cch: socket.socket) -> mp.Process:
+        self._fork_pch, self._fork_cch = socket.socketpair()
+        self._fork_pch.settimeout(10)
+
+        proc_args = ProcStartArgs(
+            initialize_process_fnc=self._initialize_process_fnc,
+            job_entrypoint_fnc=self._job_entrypoint_fnc,
+            log_cch=log_cch,
+            mp_cch=cch,
+            user_arguments=self._user_args,
+            max_jobs=self._max_jobs,
+        )
+
+        return self._mp_ctx.Process(  # type: ignore
+            target=zygote_main, args=(proc_args, self._fork_cch), name="job_proc"
+        )
+
+    def _fork(self, proc: ForkedProc) -> int:
+        """asks the zygote to fork, runs in the thread starting the ForkedProc"""
+        with self._fork_lock:
+            try:
+                socket.send_fds(
+                    self._fork_pch, [b"\x01"], [proc._cch.fileno(), proc._log_cch.fileno()]
+                )
+                pid = int.from_bytes(duplex_unix._read_exactly(self._fork_pch, 4), "big")
+            except (OSError, EOFError) as e:
+                raise RuntimeError("the zygote process isn't running") from e
+
+        with self._children_lock:
+            exitcode = self._early_exits.pop(pid, None)
+            if exitcode is None:
+                self._children[pid] = proc
+            else:
+                proc._set_exitcode(exitcode)
+
+        return pid
+
+    def _on_forked_exit(self, pid: int, exitcode: int) -> None:
+        with self._children_lock:
+            proc = self._children.pop(pid, None)
+            if proc is None:
+                self._early_exits[pid] = exitcode
+                return
+
+        proc._set_exitcode(exitcode)
+
+    @log_exceptions(logger=logger)
+    async def _main_task(self, ipc_ch: aio.ChanReceiver[channel.Message]) -> None:
+        async for msg in ipc_ch:
+            if isinstance(msg, proto.ForkedProcExited):
+                self._on_forked_exit(msg.pid, msg.exitcode)
+
+    @log_exceptions(logger=logger)
+    async def _supervise_task(self) -> None:
+        try:
+            await super()._supervise_task()
+        finally:
+            with self._fork_lock:
+                self._fork_pch.close()
+
+            with self._children_lock:
+                orphans, self._children = list(self._children.values()), {}
+            for proc in orphans:
+                proc._orphaned = True
+
+            if orphans:
+                logger.warning(
+                    "zygote exited before the processes forked from it",
+                    extra={"orphans": [p.pid for p in orphans], **self.logging_extra()},
+                )
+
+    def logging_extra(self) -> dict[str, Any]:
+        extra = super().logging_extra()
+        extra["zygote"] = True
+        return extra
+
+
+class Zygote:
+    """The zygote of a ProcPool: the ZygoteProc job processes are currently forked from. A new
+    one is started when the previous one exited or failed to initialize.
+
+    All the job processes share the JobProcess of the zygote, so its `user_arguments` are
+    used for all of them."""
+
+    def __init__(
+        self,
+        *,
+        initialize_process_fnc: Callable[[JobProcess], Any],
+        job_entrypoint_fnc: Callable[[JobContext], Awaitable[None]],
+        max_jobs: int,
+        initialize_timeout: float,
+        close_timeout: float,
+        http_proxy: str | None,
+        mp_ctx: BaseContext,
+        loop: asyncio.AbstractEventLoop,
+    ) -> None:
+        self._initialize_process_fnc = initialize_process_fnc
+        self._job_entrypoint_fnc = job_entrypoint_fnc
+        self._max_jobs = max_jobs
+        self._initialize_timeout = initialize_timeout
+        self._close_timeout = close_timeout
+        self._http_proxy = http_proxy
+        self._mp_ctx = mp_ctx
+        self._loop = loop
+        self._proc: ZygoteProc | None = None
+        self._lock = asyncio.Lock()
+        self.user_arguments: Any | None = None
+
+    @property
+    def proc(self) -> ZygoteProc | None:
+        return self._proc
+
+    async def ready(self) -> None:
+        """starts and initializes a zygote process if there isn't a running one"""
+        async with self._lock:
+            if self._proc is not None and self._proc.alive and self._proc.initialized:
+                return
+
+            if self._proc is not None:
+                await self._proc.aclose()  # exited, or its initialization failed
+
+            self._proc = ZygoteProc(
+                initialize_process_fnc=self._initialize_process_fnc,
+                job_entrypoint_fnc=self._job_entrypoint_fnc,
+                max_jobs=self._max_jobs,
+                initialize_timeout=self._initialize_timeout,
+                close_timeout=self._close_timeout,
+                ping_interval=2.5,
+                ping_timeout=60,
+                high_ping_threshold=0.5,
+                http_proxy=self._http_proxy,
+                mp_ctx=self._mp_ctx,
+                loop=self._loop,
+            )
+            self._proc.user_arguments = self.user_arguments
+            await self._proc.start()
+            await self._proc.initialize()
+
+    def process(self, cch: socket.socket, log_cch: socket.socket) -> ForkedProc:
+        """a job process running proc_main with the given channels once started. `ready`
+        must have been awaited before"""
+        if self._proc is None:
+            raise RuntimeError("zygote not started")
+
+        return ForkedProc(self._proc, cch, log_cch)
+
+    async def aclose(self) -> None:
+        async with self._lock:
+            if self._proc is not None:
+                await self._proc.aclose()
+
+
+class ForkedProc:
+    """The handle of a job process forked by a ZygoteProc. It has the part of the
+    multiprocessing.Process interface SupervisedProc uses: the zygote reports the exit code
+    of the process, which is its child."""
+
+    def __init__(self, zygote: ZygoteProc, cch: socket.socket, log_cch: socket.socket) -> None:
+        self._zygote = zygote
+        self._cch = cch
+        self._log_cch = log_cch
+        self._pid: int | None = None
+        self._exitcode: int | None = None
+        self._exited = threading.Event()
+        self._orphaned = False
+
+    @property
+    def pid(self) -> int | None:
+        return self._pid
+
+    @property
+    def exitcode(self) -> int | None:
+        return self._exitcode
+
+    def start(self) -> None:
+        if self._pid is not None:
+            raise RuntimeError("process already started")
+
+        self._pid = self._zygote._fork(self)
+
+    def join(self, timeout: float | None = None) -> None:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._exited.wait(0.5):
+            if self._orphaned and self._pid is not None and not psutil.pid_exists(self._pid):
+                # the zygote exited first, nobody can tell the exit code of the process anymore
+                self._set_exitcode(1)
+            elif deadline is not None and time.monotonic() >= deadline:
+                return
+
+    def is_alive(self) -> bool:
+        return self._pid is not None and not self._exited.is_set()
+
+    def kill(self) -> None:
+        self._send_signal(signal.SIGKILL)
+
+    def terminate(self) -> None:
+        self._send_signal(signal.SIGTERM)
+
+    def close(self) -> None:
+        pass
+
+    def _send_signal(self, sig: int) -> None:
+        if not self.is_alive():
+            return
+
+        assert self._pid is not None
+        with contextlib.suppress(ProcessLookupError):
+            os.kill(self._pid, sig)
+
+    def _set_exitcode(self, exitcode: int) -> None:
+        self._exitcode = exitcode
+        self._exited.set()
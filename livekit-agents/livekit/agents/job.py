@@ -16,6 +16,7 @@ from __future__ import annotations
 
 import asyncio
 import contextvars
+import dataclasses
 import functools
 import inspect
 import logging
@@ -55,6 +56,8 @@ get_current_job_context = get_job_context
 class JobExecutorType(Enum):
     PROCESS = "process"
     THREAD = "thread"
+    SHARED_PROCESS = "shared_process"
+    """several jobs per process, see WorkerOptions.jobs_per_process"""
 
 
 class AutoSubscribe(str, Enum):
@@ -78,7 +81,10 @@ class RunningJobInfo:
     job: agent.Job
     url: str
     token: str
+    """empty until the server assigned the job, with ``WorkerOptions.pipelined_accept``"""
     worker_id: str
+    request_received_at: float = 0.0
+    """time.time() when the worker received the job request, 0 if the job wasn't requested"""
 
 
 DEFAULT_PARTICIPANT_KINDS: list[rtc.ParticipantKind.ValueType] = [
@@ -102,12 +108,18 @@ class JobContext:
         on_connect: Callable[[], None],
         on_shutdown: Callable[[str], None],
         inference_executor: InferenceExecutor,
+        on_first_audio: Callable[[], Coroutine[None, None, None]] | None = None,
     ) -> None:
         self._proc = proc
         self._info = info
         self._room = room
         self._on_connect = on_connect
         self._on_shutdown = on_shutdown
+        self._on_first_audio = on_first_audio
+        self._first_audio_published = False
+        self._assigned = asyncio.Event()
+        if info.token:
+            self._assigned.set()
         self._shutdown_callbacks: list[Callable[[str], Coroutine[None, None, None]]] = []
         self._participant_entrypoints: list[
             tuple[
@@ -260,6 +272,9 @@ class JobContext:
     ) -> None:
         """Connect to the room. This method should be called only once.
 
+        With ``WorkerOptions.pipelined_accept``, the entrypoint starts before the server
+        assigned the job: this waits for the assignment, and connects as soon as it arrives.
+
         Args:
             e2ee: End-to-end encryption options. If provided, the Agent will utilize end-to-end encryption. Note: clients will also need to handle E2EE.
             auto_subscribe: Whether to automatically subscribe to tracks. Default is AutoSubscribe.SUBSCRIBE_ALL.
@@ -269,6 +284,7 @@ class JobContext:
             if self._connected:
                 return
 
+            await self._assigned.wait()
             room_options = rtc.RoomOptions(
                 e2ee=e2ee,
                 auto_subscribe=auto_subscribe == AutoSubscribe.SUBSCRIBE_ALL,
@@ -436,6 +452,21 @@ class JobContext:
     def token_claims(self) -> Claims:
         return api.TokenVerifier().verify(self._info.token, verify_signature=False)
 
+    def _on_assigned(self, url: str, token: str) -> None:
+        self._info = dataclasses.replace(self._info, url=url, token=token)
+        self._assigned.set()
+
+    def _on_audio_published(self) -> None:
+        """called each time the agent publishes audio in the room, the first one is reported
+        to the worker"""
+        if self._first_audio_published or self._on_first_audio is None:
+            return
+
+        self._first_audio_published = True
+        task = asyncio.create_task(self._on_first_audio())
+        self._pending_tasks.append(task)
+        task.add_done_callback(lambda _: self._pending_tasks.remove(task))
+
 
 def _apply_auto_subscribe_opts(room: rtc.Room, auto_subscribe: AutoSubscribe) -> None:
     if auto_subscribe not in (AutoSubscribe.AUDIO_ONLY, AutoSubscribe.VIDEO_ONLY):
@@ -469,6 +500,7 @@ class JobProcess:
         self._userdata: dict[str, Any] = {}
         self._user_arguments = user_arguments
         self._http_proxy: str | None = http_proxy
+        self._shutdown_callbacks: list[Callable[[], Coroutine[None, None, None]]] = []
 
     @property
     def executor_type(self) -> JobExecutorType:
@@ -490,6 +522,13 @@ class JobProcess:
     def http_proxy(self) -> str | None:
         return self._http_proxy
 
+    def add_shutdown_callback(self, callback: Callable[[], Coroutine[None, None, None]]) -> None:
+        """
+        Add a callback to be called when the process is shutting down, after its last job
+        ended (e.g. to flush what the jobs it ran buffered in `userdata`).
+        """
+        self._shutdown_callbacks.append(callback)
+
 
 class JobRequest:
     def __init__(
@@ -86,6 +86,10 @@ class EOUMetrics(BaseModel):
     last_speaking_time: float
     """The time the user stopped speaking."""
 
+    model_variant: str | None = None
+    """Variant of the turn detector model used on this host (e.g. its optimizations), when the
+    turn detector reports one."""
+
     speech_id: str | None = None
 
     metadata: Metadata | None = None
@@ -58,6 +58,7 @@ def log_metrics(metrics: AgentMetrics, *, logger: logging.Logger | None = None)
             | {
                 "end_of_utterance_delay": round(metrics.end_of_utterance_delay, 2),
                 "transcription_delay": round(metrics.transcription_delay, 2),
+                "model_variant": metrics.model_variant,
             },
         )
     elif isinstance(metrics, STTMetrics):
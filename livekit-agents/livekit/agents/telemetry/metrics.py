@@ -20,6 +20,92 @@ CHILD_PROC_GAUGE = prometheus_client.Gauge(
     "lk_agents_child_process_count", "Total number of child processes", ["nodename"]
 )
 
+IDLE_PROC_TARGET_GAUGE = prometheus_client.Gauge(
+    "lk_agents_idle_process_target", "Idle processes the pool keeps warm", ["nodename"]
+)
+
+IDLE_PROC_MAX_GAUGE = prometheus_client.Gauge(
+    "lk_agents_idle_process_max",
+    "Most idle processes the memory budget allows",
+    ["nodename"],
+)
+
+JOB_ARRIVAL_RATE_GAUGE = prometheus_client.Gauge(
+    "lk_agents_job_arrival_rate", "Estimated job arrivals per second", ["nodename"]
+)
+
+PROC_SPAWN_TIME_GAUGE = prometheus_client.Gauge(
+    "lk_agents_proc_spawn_seconds",
+    "Smoothed time from requesting a process to it being ready",
+    ["nodename"],
+)
+
+IDLE_PROC_MEMORY_GAUGE = prometheus_client.Gauge(
+    "lk_agents_idle_process_memory_mb",
+    "Smoothed memory of a freshly initialized process",
+    ["nodename"],
+)
+
+JOB_DISPATCH_COUNTER = prometheus_client.Counter(
+    "lk_agents_job_dispatch",
+    "Jobs launched, by whether an idle process was ready for them",
+    ["nodename", "warm"],
+)
+
+JOB_FIRST_AUDIO_TIME = prometheus_client.Histogram(
+    "lk_agents_job_first_audio_seconds",
+    "Time from the job request to the first audio frame published by the agent",
+    ["nodename"],
+    buckets=[0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5, 10],
+)
+
+INFERENCE_OUTSTANDING_GAUGE = prometheus_client.Gauge(
+    "lk_agents_inference_outstanding_requests",
+    "Inference requests waiting for a response, by inference process",
+    ["nodename", "process"],
+)
+
+INFERENCE_PROC_RESTART_COUNTER = prometheus_client.Counter(
+    "lk_agents_inference_process_restarts",
+    "Inference processes restarted, by reason",
+    ["nodename", "reason"],
+)
+
+JOB_CPU_SECONDS = prometheus_client.Histogram(
+    "lk_agents_job_cpu_seconds",
+    "CPU seconds used by a job, observed when it ends",
+    ["nodename"],
+    buckets=[1, 5, 15, 30, 60, 120, 300, 600, 1800],
+)
+
+JOB_AVG_CPU_CORES = prometheus_client.Histogram(
+    "lk_agents_job_avg_cpu_cores",
+    "CPU used by a job over its whole duration, in cores, observed when it ends",
+    ["nodename"],
+    buckets=[0.01, 0.025, 0.05, 0.1, 0.2, 0.35, 0.5, 1, 2],
+)
+
+JOB_PEAK_MEMORY_MB = prometheus_client.Histogram(
+    "lk_agents_job_peak_memory_mb",
+    "Peak memory of the process running a job, observed when it ends",
+    ["nodename"],
+    buckets=[50, 100, 200, 300, 500, 750, 1000, 2000, 4000],
+)
+
+JOB_CPU_CORES = prometheus_client.Histogram(
+    "lk_agents_job_cpu_cores",
+    "CPU used by a running job between two samples, in cores",
+    ["nodename"],
+    buckets=[0.01, 0.025, 0.05, 0.1, 0.2, 0.35, 0.5, 1, 2],
+)
+
+JOB_LOOP_LAG = prometheus_client.Histogram(
+    "lk_agents_job_loop_lag_seconds",
+    "Ping round trip through the event loop running a job, sampled",
+    ["nodename"],
+    buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5],
+)
+
 
 CHILD_PROC_GAUGE.labels(nodename=utils.nodename()).set_function(
     lambda: len(psutil.Process(os.getpid()).children(recursive=True))
@@ -36,3 +122,49 @@ def job_ended() -> None:
 
 def proc_initialized(*, time_elapsed: float) -> None:
     PROC_INITIALIZE_TIME.labels(nodename=utils.nodename()).observe(time_elapsed)
+
+
+def job_first_audio(*, delay: float) -> None:
+    JOB_FIRST_AUDIO_TIME.labels(nodename=utils.nodename()).observe(delay)
+
+
+def job_dispatched(*, warm: bool) -> None:
+    JOB_DISPATCH_COUNTER.labels(nodename=utils.nodename(), warm=str(warm).lower()).inc()
+
+
+def idle_autoscaler_updated(
+    *,
+    target: int,
+    max_idle: int,
+    arrival_rate: float,
+    spawn_time: float,
+    proc_memory_mb: float,
+) -> None:
+    nodename = utils.nodename()
+    IDLE_PROC_TARGET_GAUGE.labels(nodename=nodename).set(target)
+    IDLE_PROC_MAX_GAUGE.labels(nodename=nodename).set(max_idle)
+    JOB_ARRIVAL_RATE_GAUGE.labels(nodename=nodename).set(arrival_rate)
+    PROC_SPAWN_TIME_GAUGE.labels(nodename=nodename).set(spawn_time)
+    IDLE_PROC_MEMORY_GAUGE.labels(nodename=nodename).set(proc_memory_mb)
+
+
+def inference_outstanding(*, process: int, count: int) -> None:
+    INFERENCE_OUTSTANDING_GAUGE.labels(nodename=utils.nodename(), process=str(process)).set(count)
+
+
+def inference_proc_restarted(*, reason: str) -> None:
+    INFERENCE_PROC_RESTART_COUNTER.labels(nodename=utils.nodename(), reason=reason).inc()
+
+
+def job_usage_sampled(*, cpu_cores: float, loop_lag: float) -> None:
+    nodename = utils.nodename()
+    JOB_CPU_CORES.labels(nodename=nodename).observe(cpu_cores)
+    JOB_LOOP_LAG.labels(nodename=nodename).observe(loop_lag)
+
+
+def job_usage_ended(*, cpu_time: float, avg_cpu_cores: float, peak_memory_mb: float) -> None:
+    nodename = utils.nodename()
+    JOB_CPU_SECONDS.labels(nodename=nodename).observe(cpu_time)
+    JOB_AVG_CPU_CORES.labels(nodename=nodename).observe(avg_cpu_cores)
+    if peak_memory_mb > 0:
+        JOB_PEAK_MEMORY_MB.labels(nodename=nodename).observe(peak_memory_mb)
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import asyncio
 import ctypes
+import weakref
 from collections.abc import AsyncGenerator
 from typing import Union
 
@@ -56,6 +57,8 @@ class AudioByteStream:
         sample_rate: int,
         num_channels: int,
         samples_per_channel: int | None = None,
+        *,
+        frame_pool_size: int = 0,
     ) -> None:
         """
         Initialize an AudioByteStream instance.
@@ -65,6 +68,11 @@ class AudioByteStream:
             num_channels (int): The number of audio channels.
             samples_per_channel (int, optional): The number of samples per channel in each frame.
                 If None, defaults to `sample_rate // 10` (i.e., 100ms of audio data).
+            frame_pool_size (int, optional): If set, the data of the frames is copied into a
+                pool of this many preallocated buffers, in turn. A buffer is reused once the
+                frame using it has been released, otherwise it is replaced by a new one, so the
+                data of a frame must not be used after the frame itself. Defaults to 0 (a new
+                buffer for each frame).
 
         The constructor sets up the internal buffer and calculates the size of each frame in bytes.
         The frame size is determined by the number of channels, samples per channel, and the size
@@ -78,8 +86,18 @@ class AudioByteStream:
 
         self._bytes_per_sample = num_channels * ctypes.sizeof(ctypes.c_int16)
         self._bytes_per_frame = samples_per_channel * self._bytes_per_sample
+        self._samples_per_channel = samples_per_channel
+
+        # the frames are sliced from _buf at a read cursor, the data read is deleted from it once
+        # per push (deleting from the start of a bytearray only moves its start, so it doesn't
+        # copy the rest of the data, nor reallocates it in steady state)
         self._buf = bytearray()
 
+        self._pool = [bytearray(self._bytes_per_frame) for _ in range(frame_pool_size)]
+        # the frame last handed out with each buffer of the pool, to know when it is released
+        self._pool_frames: list[weakref.ref[rtc.AudioFrame] | None] = [None] * frame_pool_size
+        self._pool_index = 0
+
     def push(self, data: bytes | memoryview) -> list[rtc.AudioFrame]:
         """
         Add audio data to the buffer and retrieve fixed-size frames.
@@ -102,19 +120,20 @@ class AudioByteStream:
         self._buf.extend(data)
 
         frames = []
-        while len(self._buf) >= self._bytes_per_frame:
-            frame_data = self._buf[: self._bytes_per_frame]
-            self._buf = self._buf[self._bytes_per_frame :]
-
-            frames.append(
-                rtc.AudioFrame(
-                    data=frame_data,
-                    sample_rate=self._sample_rate,
-                    num_channels=self._num_channels,
-                    samples_per_channel=len(frame_data) // self._bytes_per_sample,
-                )
-            )
-
+        frame_size = self._bytes_per_frame
+        offset = 0
+        end = len(self._buf) - frame_size
+        if self._pool:
+            with memoryview(self._buf) as view:
+                while offset <= end:
+                    frames.append(self._new_frame(view[offset : offset + frame_size]))
+                    offset += frame_size
+        else:
+            while offset <= end:
+                frames.append(self._new_frame(self._buf[offset : offset + frame_size]))
+                offset += frame_size
+
+        del self._buf[:offset]
         return frames
 
     write = push  # Alias for the push method.
@@ -138,7 +157,7 @@ class AudioByteStream:
         if len(self._buf) == 0:
             return []
 
-        if len(self._buf) % (2 * self._num_channels) != 0:
+        if len(self._buf) % self._bytes_per_sample != 0:
             logger.warning("AudioByteStream: incomplete frame during flush, dropping")
             return []
 
@@ -147,7 +166,7 @@ class AudioByteStream:
                 data=self._buf.copy(),
                 sample_rate=self._sample_rate,
                 num_channels=self._num_channels,
-                samples_per_channel=len(self._buf) // 2,
+                samples_per_channel=len(self._buf) // self._bytes_per_sample,
             )
         ]
         self._buf.clear()
@@ -156,6 +175,30 @@ class AudioByteStream:
     def clear(self) -> None:
         self._buf.clear()
 
+    def _new_frame(self, data: bytearray | memoryview) -> rtc.AudioFrame:
+        """a frame of data (the size of a frame), copied into a buffer of the pool if any"""
+        index = self._pool_index
+        frame_data: bytearray | memoryview
+        if self._pool:
+            frame_data = self._pool[index]
+            last_frame = self._pool_frames[index]
+            if last_frame is not None and last_frame() is not None:
+                frame_data = self._pool[index] = bytearray(self._bytes_per_frame)
+            frame_data[:] = data
+            self._pool_index = (index + 1) % len(self._pool)
+        else:
+            frame_data = data
+
+        frame = rtc.AudioFrame(
+            data=frame_data,
+            sample_rate=self._sample_rate,
+            num_channels=self._num_channels,
+            samples_per_channel=self._samples_per_channel,
+        )
+        if self._pool:
+            self._pool_frames[index] = weakref.ref(frame)
+        return frame
+
 
 async def audio_frames_from_file(
     file_path: str, sample_rate: int = 48000, num_channels: int = 1
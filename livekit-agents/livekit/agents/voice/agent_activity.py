@@ -1420,12 +1420,14 @@ class AgentActivity(RecognitionHooks):
             await speech_handle.interrupt()
 
         metadata: Metadata | None = None
+        model_variant: str | None = None
         if isinstance(self.turn_detection, str):
             metadata = Metadata(model_name="unknown", model_provider=self.turn_detection)
         elif self.turn_detection is not None:
             metadata = Metadata(
                 model_name=self.turn_detection.model, model_provider=self.turn_detection.provider
             )
+            model_variant = getattr(self.turn_detection, "model_variant", None)
 
         eou_metrics = EOUMetrics(
             timestamp=time.time(),
@@ -1434,6 +1436,7 @@ class AgentActivity(RecognitionHooks):
             on_user_turn_completed_delay=callback_duration,
             speech_id=speech_handle.id,
             last_speaking_time=info.last_speaking_time,
+            model_variant=model_variant,
             metadata=metadata,
         )
         self._session.emit("metrics_collected", MetricsCollectedEvent(metrics=eou_metrics))
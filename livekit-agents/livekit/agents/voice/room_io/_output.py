@@ -5,6 +5,7 @@ import asyncio
 from livekit import rtc
 
 from ... import utils
+from ...job import get_job_context
 from ...log import logger
 from ...types import (
     ATTRIBUTE_PUBLISH_ON_BEHALF,
@@ -53,6 +54,7 @@ class _ParticipantAudioOutput(io.AudioOutput):
         self._forwarding_task: asyncio.Task[None] | None = None
 
         self._pushed_duration: float = 0.0
+        self._first_frame_published = False
 
         self._playback_enabled = asyncio.Event()
         self._playback_enabled.set()
@@ -183,6 +185,12 @@ class _ParticipantAudioOutput(io.AudioOutput):
                 continue
 
             await self._audio_source.capture_frame(frame)
+            if not self._first_frame_published:
+                self._first_frame_published = True
+                try:
+                    get_job_context()._on_audio_published()
+                except RuntimeError:
+                    pass  # not running in a job
 
     def _on_reconnected(self) -> None:
         if self._republish_task:
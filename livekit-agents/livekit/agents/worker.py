@@ -22,16 +22,20 @@ import json
 import math
 import multiprocessing as mp
 import os
+import statistics
 import sys
 import threading
+import time
+from collections import deque
 from collections.abc import Awaitable
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from enum import Enum
 from typing import Any, Callable, Generic, Literal, TypeVar
 from urllib.parse import urljoin, urlparse
 
 import aiohttp
 import jwt
+import psutil
 from aiohttp import web
 
 from livekit import api, rtc
@@ -110,6 +114,62 @@ class _DefaultLoadCalc:
         return cls._instance._m_avg.get_avg()
 
 
+class JobCostLoadCalc:
+    """A ``load_fnc`` computing the load from what the running jobs cost.
+
+    Each running job counts for the CPU it uses now, or for what a typical job uses on average
+    if that is more (the median of the jobs that ran for at least ``TYPICAL_MIN_DURATION``), so
+    that a job that just started and hasn't ramped up yet already counts as a full one. The
+    CPU used outside of the jobs (the worker, the inference processes) is added, and the load
+    is the highest of that CPU over the number of CPUs and the fraction of memory in use.
+
+    The CPU of the jobs is sampled every ``WorkerOptions.usage_sample_interval`` seconds."""
+
+    TYPICAL_MIN_DURATION = 30.0
+    MAX_HISTORY = 100
+
+    _instance: JobCostLoadCalc | None = None
+
+    def __init__(self) -> None:
+        self._cpu_count = get_cpu_monitor().cpu_count()
+        self._finished: deque[float] = deque(maxlen=self.MAX_HISTORY)  # avg cores of past jobs
+        self._running: dict[str, ipc.resource_usage.JobUsage] = {}
+
+    @classmethod
+    def get_load(cls, worker: Worker) -> float:
+        if cls._instance is None:
+            cls._instance = JobCostLoadCalc()
+
+        return cls._instance._get_load(worker)
+
+    def _get_load(self, worker: Worker) -> float:
+        running = worker._load_job_usage
+        for job_id, usage in self._running.items():
+            if job_id not in running and self._is_typical(usage):
+                self._finished.append(usage.avg_cpu_cores)
+        self._running = running
+
+        samples = list(self._finished)
+        samples.extend(u.avg_cpu_cores for u in running.values() if self._is_typical(u))
+        typical_cores = statistics.median(samples) if samples else 0.0
+
+        jobs_cores = sum(u.cpu_cores for u in running.values())
+        machine_cores = _DefaultLoadCalc.get_load(worker) * self._cpu_count
+        base_cores = max(machine_cores - jobs_cores, 0.0)
+        expected_cores = base_cores + sum(max(u.cpu_cores, typical_cores) for u in running.values())
+
+        mem = psutil.virtual_memory()
+        memory_load = 1 - mem.available / mem.total
+        return min(max(expected_cores / self._cpu_count, memory_load), 1.0)
+
+    def _is_typical(self, usage: ipc.resource_usage.JobUsage) -> bool:
+        if usage.started_at is None:
+            return False
+
+        end = usage.ended_at or time.time()
+        return end - usage.started_at >= self.TYPICAL_MIN_DURATION
+
+
 @dataclass
 class WorkerPermissions:
     can_publish: bool = True
@@ -159,7 +219,14 @@ class WorkerOptions:
     load_fnc: Callable[[Worker], float] | Callable[[], float] = _DefaultLoadCalc.get_load
     """Called to determine the current load of the worker. Should return a value between 0 and 1."""
     job_executor_type: JobExecutorType = _default_job_executor_type
-    """Which executor to use to run jobs. (currently thread or process are supported)"""
+    """Which executor to use to run jobs. (currently thread, process or shared_process are supported)"""  # noqa: E501
+    jobs_per_process: int = 4
+    """With ``JobExecutorType.SHARED_PROCESS``, the maximum number of jobs a process runs at the same time.
+
+    Each job is an asyncio task of the process, which is prewarmed once for all of them. A job
+    failing only ends that job, but the memory limits and the ping timeout apply to the whole
+    process (the limits are scaled by jobs_per_process). ``num_idle_processes`` then counts
+    idle job slots rather than processes."""  # noqa: E501
     load_threshold: float | _WorkerEnvOption[float] = _default_load_threshold
     """When the load exceeds this threshold, the worker will be marked as unavailable.
 
@@ -178,7 +245,65 @@ class WorkerOptions:
     num_idle_processes: int | _WorkerEnvOption[int] = _WorkerEnvOption(
         dev_default=0, prod_default=min(math.ceil(get_cpu_monitor().cpu_count()), 4)
     )
-    """Number of idle processes to keep warm."""
+    """Number of idle processes to keep warm.
+
+    With ``idle_warm_hit_target``, the minimum number of idle processes kept warm."""
+    idle_warm_hit_target: float = 0.0
+    """Enables the idle process autoscaler when set, e.g. to 0.95.
+
+    The number of idle processes then follows the job arrival rate: enough of them are kept
+    warm for a job to find one ready with this probability while the pool is being
+    replenished, taking the time a process needs to start and prewarm into account. The pool
+    shrinks back (down to ``num_idle_processes``) a couple of minutes after a burst."""
+    idle_memory_budget_mb: float = 0
+    """With ``idle_warm_hit_target``, the memory the idle processes may use in total.
+
+    Defaults to 0 (no budget, at most twice the number of CPUs)."""
+    num_inference_processes: int | _WorkerEnvOption[int] = _WorkerEnvOption(
+        dev_default=1, prod_default=max(1, math.ceil(get_cpu_monitor().cpu_count()) // 8)
+    )
+    """Number of processes running the inference runners (e.g. the turn detector).
+
+    Each request goes to the process with the fewest requests in flight. A process that
+    crashes or gets stuck is restarted while the others keep serving. Defaults to one process
+    per 8 CPUs in production (the turn detector uses up to 4 threads per process)."""
+    inference_shm_kb: int = 0
+    """Size in KB of the shared memory rings carrying inference payloads (e.g. the chat context
+    sent to the turn detector) between the job processes, the worker and the inference process.
+
+    Each process gets one ring per direction, payloads that don't fit are sent over the IPC
+    socket. Defaults to 0 (disabled, everything goes over the IPC sockets)."""
+    pipelined_accept: bool = False
+    """Start the jobs while the server confirms their assignment.
+
+    The job takes a warm process and its entrypoint starts as soon as ``request_fnc`` accepts
+    it, ``JobContext.connect()`` (also called by ``AgentSession.start()``) waits for the
+    assignment and connects the moment the token arrives. Building the ``AgentSession`` and
+    prewarming the STT, LLM and TTS connections then overlap the assignment round trip.
+    The code an entrypoint runs before connecting must not assume the job is assigned: when
+    the assignment times out, the job is shut down."""
+    usage_sample_interval: float = 5.0
+    """Interval in seconds at which the CPU, memory and event loop lag of each job are sampled.
+
+    See ``Worker.job_usage`` and ``JobCostLoadCalc``."""
+    loop_stall_threshold: float = 0.0
+    """Profiles the event loop of the jobs when set, e.g. to 0.1.
+
+    A thread samples the stack of the loop while it is blocked for longer than this many
+    seconds. Each stall is logged with the stack it was stuck in, and the call sites that
+    blocked a job the longest are logged when it ends. Defaults to 0 (disabled)."""
+    loop_stall_profile_dir: str | None = None
+    """With ``loop_stall_threshold``, a directory where the stacks sampled during the stalls of
+    each job are written when it ends (``<job_id>.collapsed``, for flamegraph.pl or
+    speedscope)."""
+    log_rate_limit: float = 0.0
+    """Maximum number of records below WARNING each job can log per second, e.g. 200.
+
+    The records of the job processes are sent to the worker in batches. The records over the
+    limit are dropped, and their number is logged. Defaults to 0 (unlimited)."""
+    log_debug_sample_rate: float = 1.0
+    """Fraction of the DEBUG records of the job processes sent to the worker, e.g. 0.1 to
+    keep one in ten at high load. Defaults to 1 (all of them)."""
     shutdown_process_timeout: float = 60.0
     """Maximum amount of time to wait for a job to shut down gracefully"""
     initialize_process_timeout: float = 10.0
@@ -219,17 +344,34 @@ class WorkerOptions:
 
     By default it uses ``HTTP_PROXY`` or ``HTTPS_PROXY`` from environment
     """
-    multiprocessing_context: Literal["spawn", "forkserver"] = (
+    multiprocessing_context: Literal["spawn", "forkserver", "zygote"] = (
         "spawn" if not sys.platform.startswith("linux") else "forkserver"
     )
     """The multiprocessing context to use.
 
     By default it uses "spawn" on all platforms, but "forkserver" on Linux.
+
+    "zygote" (not available on Windows) starts one process with "forkserver", runs
+    `prewarm_fnc` in it once, and forks the job processes from it: they start in milliseconds
+    and share the models loaded by `prewarm_fnc` copy-on-write. `prewarm_fnc` must not leave
+    threads running or connections open that the job processes would share. Memory limits then
+    apply to the memory a job process doesn't share (USS).
     """
     prometheus_port: NotGivenOr[int] = NOT_GIVEN
     """When enabled, will expose prometheus metrics on :{prometheus_port}/metrics"""
 
     def validate_config(self, devmode: bool) -> None:
+        if self.jobs_per_process < 1:
+            raise ValueError(f"jobs_per_process must be at least 1, got {self.jobs_per_process}")
+
+        if not 0 <= self.idle_warm_hit_target < 1:
+            raise ValueError(
+                f"idle_warm_hit_target must be between 0 and 1, got {self.idle_warm_hit_target}"
+            )
+
+        if self.multiprocessing_context == "zygote" and sys.platform.startswith("win"):
+            raise ValueError('multiprocessing_context="zygote" requires os.fork')
+
         load_threshold = _WorkerEnvOption.getvalue(self.load_threshold, devmode)
         if load_threshold > 1 and not devmode:
             logger.warning(
@@ -278,7 +420,10 @@ class Worker(utils.EventEmitter[EventTypes]):
         os.environ["LIVEKIT_API_KEY"] = opts.api_key
         os.environ["LIVEKIT_API_SECRET"] = opts.api_secret
 
-        if opts.job_memory_limit_mb > 0 and opts.job_executor_type != JobExecutorType.PROCESS:
+        if opts.job_memory_limit_mb > 0 and opts.job_executor_type not in (
+            JobExecutorType.PROCESS,
+            JobExecutorType.SHARED_PROCESS,
+        ):
             logger.warning(
                 "max_job_memory_usage is only supported for process-based job executors, "
                 "ignoring max_job_memory_usage"
@@ -311,11 +456,19 @@ class Worker(utils.EventEmitter[EventTypes]):
         self._devmode = devmode
         self._register = register
 
-        self._mp_ctx = mp.get_context(self._opts.multiprocessing_context)
+        # the zygote itself is started with forkserver
+        self._mp_ctx = mp.get_context(
+            "forkserver"
+            if self._opts.multiprocessing_context == "zygote"
+            else self._opts.multiprocessing_context
+        )
 
-        self._inference_executor: ipc.inference_proc_executor.InferenceProcExecutor | None = None
+        self._inference_executor: ipc.inference_pool.InferencePool | None = None
         if len(_InferenceRunner.registered_runners) > 0:
-            self._inference_executor = ipc.inference_proc_executor.InferenceProcExecutor(
+            self._inference_executor = ipc.inference_pool.InferencePool(
+                num_processes=_WorkerEnvOption.getvalue(
+                    opts.num_inference_processes, self._devmode
+                ),
                 runners=_InferenceRunner.registered_runners,
                 initialize_timeout=opts.initialize_process_timeout,
                 close_timeout=5,
@@ -327,6 +480,7 @@ class Worker(utils.EventEmitter[EventTypes]):
                 mp_ctx=self._mp_ctx,
                 loop=self._loop,
                 http_proxy=opts.http_proxy or None,
+                shm_ring_size=opts.inference_shm_kb * 1024,
             )
 
         self._proc_pool = ipc.proc_pool.ProcPool(
@@ -342,6 +496,20 @@ class Worker(utils.EventEmitter[EventTypes]):
             memory_warn_mb=opts.job_memory_warn_mb,
             memory_limit_mb=opts.job_memory_limit_mb,
             http_proxy=opts.http_proxy or None,
+            jobs_per_process=(
+                opts.jobs_per_process
+                if opts.job_executor_type == JobExecutorType.SHARED_PROCESS
+                else 1
+            ),
+            use_zygote=opts.multiprocessing_context == "zygote",
+            warm_hit_target=opts.idle_warm_hit_target,
+            idle_memory_budget_mb=opts.idle_memory_budget_mb,
+            inference_shm_size=opts.inference_shm_kb * 1024 if self._inference_executor else 0,
+            usage_interval=opts.usage_sample_interval,
+            loop_stall_threshold=opts.loop_stall_threshold,
+            loop_stall_profile_dir=opts.loop_stall_profile_dir,
+            log_rate_limit=opts.log_rate_limit,
+            log_debug_sample_rate=opts.log_debug_sample_rate,
         )
 
         self._previous_status = agent.WorkerStatus.WS_AVAILABLE
@@ -356,7 +524,7 @@ class Worker(utils.EventEmitter[EventTypes]):
 
         async def health_check(_: Any) -> web.Response:
             if self._inference_executor and not self._inference_executor.is_alive():
-                return web.Response(status=503, text="inference process not running")
+                return web.Response(status=503, text="no inference process running")
 
             return web.Response(text="OK")
 
@@ -385,6 +553,8 @@ class Worker(utils.EventEmitter[EventTypes]):
         self._load_task: asyncio.Task[None] | None = None
 
         self._worker_load: float = 0.0
+        # a copy of job_usage taken on the event loop for the load_fnc, which runs in a thread
+        self._load_job_usage: dict[str, ipc.resource_usage.JobUsage] = {}
 
     @property
     def worker_info(self) -> WorkerInfo:
@@ -399,13 +569,16 @@ class Worker(utils.EventEmitter[EventTypes]):
             extra={"version": __version__, "rtc-version": rtc.__version__},
         )
 
-        if self._opts.multiprocessing_context == "forkserver":
+        if self._opts.multiprocessing_context in ("forkserver", "zygote"):
             plugin_packages = [p.package for p in Plugin.registered_plugins] + ["av"]
             logger.info("preloading plugins", extra={"packages": plugin_packages})
             self._mp_ctx.set_forkserver_preload(plugin_packages)
 
         if self._inference_executor is not None:
-            logger.info("starting inference executor")
+            logger.info(
+                "starting inference processes",
+                extra={"num_processes": self._inference_executor.num_processes},
+            )
             await self._inference_executor.start()
             await self._inference_executor.initialize()
 
@@ -447,12 +620,13 @@ class Worker(utils.EventEmitter[EventTypes]):
 
                     return self._opts.load_fnc(self)  # type: ignore
 
+                self._load_job_usage = {
+                    job_id: replace(usage) for job_id, usage in self.job_usage.items()
+                }
                 self._worker_load = await asyncio.get_event_loop().run_in_executor(None, load_fnc)
 
                 load_threshold = _WorkerEnvOption.getvalue(self._opts.load_threshold, self._devmode)
-                default_num_idle_processes = _WorkerEnvOption.getvalue(
-                    self._opts.num_idle_processes, self._devmode
-                )
+                max_idle_processes = self._proc_pool.max_idle_processes
 
                 if not math.isinf(load_threshold):
                     active_jobs = len(self.active_jobs)
@@ -461,11 +635,11 @@ class Worker(utils.EventEmitter[EventTypes]):
                         if job_load > 0.0:
                             available_load = max(load_threshold - self._worker_load, 0.0)
                             available_job = min(
-                                math.ceil(available_load / job_load), default_num_idle_processes
+                                math.ceil(available_load / job_load), max_idle_processes
                             )
                             self._proc_pool.set_target_idle_processes(available_job)
                     else:
-                        self._proc_pool.set_target_idle_processes(default_num_idle_processes)
+                        self._proc_pool.set_target_idle_processes(max_idle_processes)
 
         tasks = []
         self._load_task = asyncio.create_task(_load_task(), name="load_task")
@@ -492,6 +666,17 @@ class Worker(utils.EventEmitter[EventTypes]):
     def active_jobs(self) -> list[RunningJobInfo]:
         return [proc.running_job for proc in self._proc_pool.processes if proc.running_job]
 
+    @property
+    def job_usage(self) -> dict[str, ipc.resource_usage.JobUsage]:
+        """CPU, memory and event loop lag of the running jobs, by job id
+
+        The usage is updated by the event loop, read it from there."""
+        return {
+            proc.running_job.job.id: proc.usage
+            for proc in self._proc_pool.processes
+            if proc.running_job
+        }
+
     async def drain(self, timeout: int | None = None) -> None:
         """When timeout isn't None, it will raise asyncio.TimeoutError if the processes didn't finish in time."""  # noqa: E501
         if self._draining:
@@ -825,6 +1010,7 @@ class Worker(utils.EventEmitter[EventTypes]):
         """Ask the user if they want to accept this job and forward the answer to the server.
         If we get the job assigned, we start a new process."""
 
+        received_at = time.time()
         answered = False
 
         async def _on_reject() -> None:
@@ -853,6 +1039,21 @@ class Worker(utils.EventEmitter[EventTypes]):
             wait_assignment = asyncio.Future[agent.JobAssignment]()
             self._pending_assignments[job_req.id] = wait_assignment
 
+            running_info = RunningJobInfo(
+                accept_arguments=args,
+                job=msg.job,
+                url="",
+                token="",
+                worker_id=self._id,
+                request_received_at=received_at,
+            )
+
+            launch_task: asyncio.Task[ipc.job_executor.JobExecutor] | None = None
+            if self._opts.pipelined_accept:
+                # take a warm process and start the entrypoint during the assignment round
+                # trip, JobContext.connect() waits for the token
+                launch_task = asyncio.create_task(self._proc_pool.launch_job(running_info))
+
             # the job was accepted by the user, wait for the server assignment
             try:
                 await asyncio.wait_for(wait_assignment, ASSIGNMENT_TIMEOUT)
@@ -861,18 +1062,19 @@ class Worker(utils.EventEmitter[EventTypes]):
                     f"assignment for job {job_req.id} timed out",
                     extra={"job_request": job_req, "agent_name": self._opts.agent_name},
                 )
+                if launch_task is not None:
+                    executor = await launch_task
+                    await executor.aclose()
                 raise AssignmentTimeoutError() from None
 
             job_assign = wait_assignment.result()
-            running_info = RunningJobInfo(
-                accept_arguments=args,
-                job=msg.job,
-                url=job_assign.url or self._opts.ws_url,
-                token=job_assign.token,
-                worker_id=self._id,
-            )
-
-            await self._proc_pool.launch_job(running_info)
+            url = job_assign.url or self._opts.ws_url
+            if launch_task is not None:
+                executor = await launch_task
+                await executor.assign_job(url, job_assign.token)
+            else:
+                running_info.url, running_info.token = url, job_assign.token
+                await self._proc_pool.launch_job(running_info)
 
         job_req = JobRequest(job=msg.job, on_reject=_on_reject, on_accept=_on_accept)
 
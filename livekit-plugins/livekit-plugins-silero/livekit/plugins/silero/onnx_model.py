@@ -1,7 +1,10 @@
 # mypy: disable-error-code=unused-ignore
 
 import atexit
+import concurrent.futures
 import importlib.resources
+import threading
+import time
 from contextlib import ExitStack
 
 import numpy as np
@@ -70,10 +73,13 @@ class OnnxModel:
     def context_size(self) -> int:
         return self._context_size
 
-    def __call__(self, x: np.ndarray) -> float:
+    def _fill_input(self, x: np.ndarray) -> None:
         self._input_buffer[:, : self._context_size] = self._context
         self._input_buffer[:, self._context_size :] = x
 
+    def __call__(self, x: np.ndarray) -> float:
+        self._fill_input(x)
+
         ort_inputs = {
             "input": self._input_buffer,
             "state": self._rnn_state,
@@ -82,3 +88,96 @@ class OnnxModel:
         out, self._state = self._sess.run(None, ort_inputs)
         self._context = self._input_buffer[:, -self._context_size :]  # type: ignore
         return out.item()  # type: ignore
+
+
+def run_batch(models: list[OnnxModel], windows: list[np.ndarray]) -> list[float]:
+    """Runs one window of each model in a single call, the models share their session and
+    sample rate. Gives the same probabilities as calling each model with its window: the
+    inputs and the RNN states of the models are stacked along the batch dimension, and their
+    states and contexts are updated the same way."""
+    for model, x in zip(models, windows):
+        model._fill_input(x)
+
+    ort_inputs = {
+        "input": np.concatenate([m._input_buffer for m in models]),
+        "state": np.concatenate([m._rnn_state for m in models], axis=1),
+        "sr": models[0]._sample_rate_nd,
+    }
+    out, state = models[0]._sess.run(None, ort_inputs)
+    for i, model in enumerate(models):
+        model._state = state[:, i : i + 1]
+        model._context = model._input_buffer[:, -model._context_size :]  # type: ignore
+    return out[:, 0].tolist()  # type: ignore
+
+
+class BatchedInference:
+    """Runs the windows of concurrent streams together, in one thread.
+
+    A batch is run when every stream added has a window pending, or `max_delay` seconds after
+    its first window, whichever comes first. Thread-safe, the streams can run on different
+    event loops (e.g. thread job executors)."""
+
+    def __init__(self, *, max_delay: float, max_batch_size: int = 64) -> None:
+        self._max_delay = max_delay
+        self._max_batch_size = max_batch_size
+        self._cond = threading.Condition()
+        self._pending: list[tuple[OnnxModel, np.ndarray, concurrent.futures.Future[float]]] = []
+        self._num_streams = 0
+        self._thread: threading.Thread | None = None
+
+    def add_stream(self) -> None:
+        with self._cond:
+            self._num_streams += 1
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, daemon=True, name="silero_vad_batch"
+                )
+                self._thread.start()
+
+    def remove_stream(self) -> None:
+        with self._cond:
+            self._num_streams -= 1
+            self._cond.notify()
+
+    def submit(self, model: OnnxModel, x: np.ndarray) -> concurrent.futures.Future[float]:
+        """x must not be modified until the future is done"""
+        fut = concurrent.futures.Future[float]()
+        with self._cond:
+            self._pending.append((model, x, fut))
+            self._cond.notify()
+        return fut
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and self._num_streams > 0:
+                    self._cond.wait()
+
+                if not self._pending:
+                    self._thread = None  # no stream left, restarted by add_stream
+                    return
+
+                deadline = time.monotonic() + self._max_delay
+                while len(self._pending) < min(self._num_streams, self._max_batch_size):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                batch = self._pending[: self._max_batch_size]
+                del self._pending[: self._max_batch_size]
+
+            # the windows of the streams that stopped waiting aren't run
+            batch = [req for req in batch if req[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                probs = run_batch([m for m, _, _ in batch], [x for _, x, _ in batch])
+            except Exception as e:
+                for _, _, fut in batch:
+                    fut.set_exception(e)
+                continue
+
+            for (_, _, fut), p in zip(batch, probs):
+                fut.set_result(p)
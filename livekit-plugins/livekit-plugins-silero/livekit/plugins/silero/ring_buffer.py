@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import numpy as np
+
+_INT16_MAX = np.float32(np.iinfo(np.int16).max)
+
+
+class SampleRing:
+    """int16 mono samples in a preallocated ring buffer.
+
+    Samples are read from the oldest. When a write doesn't fit, the oldest samples are
+    overwritten, or the ring grows when `grow` is set (it never shrinks, so in steady state
+    nothing is allocated)."""
+
+    def __init__(self, capacity: int, *, grow: bool = False) -> None:
+        self._buf = np.zeros(max(capacity, 1), dtype=np.int16)
+        self._capacity = capacity
+        self._grow = grow
+        self._start = 0  # index of the oldest sample
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def resize(self, capacity: int) -> None:
+        """keeps the latest samples that fit"""
+        kept = self.peek(min(self._len, capacity), latest=True).copy()
+        self._buf = np.zeros(max(capacity, 1), dtype=np.int16)
+        self._capacity = capacity
+        self._buf[: len(kept)] = kept
+        self._start, self._len = 0, len(kept)
+
+    def write(self, samples: np.ndarray) -> int:
+        """returns the number of the oldest samples that were overwritten"""
+        n = len(samples)
+        if self._len + n > self._capacity and self._grow:
+            self.resize(max(self._len + n, self._capacity * 2))
+
+        if n >= self._capacity:
+            # only the latest samples fit
+            overwritten = self._len + n - self._capacity
+            if self._capacity > 0:
+                self._buf[: self._capacity] = samples[n - self._capacity :]
+            self._start, self._len = 0, self._capacity
+            return overwritten
+
+        overwritten = max(self._len + n - self._capacity, 0)
+        if overwritten:
+            self.consume(overwritten)
+
+        end = (self._start + self._len) % self._capacity
+        first = min(n, self._capacity - end)
+        self._buf[end : end + first] = samples[:first]
+        self._buf[: n - first] = samples[first:]
+        self._len += n
+        return overwritten
+
+    def write_from(self, other: SampleRing, n: int) -> int:
+        """moves the n oldest samples of another ring into this one, returns the number of
+        samples overwritten"""
+        first, second = other._segments(n)
+        overwritten = self.write(first) + self.write(second)
+        other.consume(n)
+        return overwritten
+
+    def consume(self, n: int) -> None:
+        """drops the n oldest samples"""
+        n = max(min(n, self._len), 0)
+        self._start = (self._start + n) % self._capacity if self._capacity else 0
+        self._len -= n
+
+    def keep_last(self, n: int) -> None:
+        self.consume(self._len - n)
+
+    def peek(self, n: int, *, latest: bool = False) -> np.ndarray:
+        """the n oldest (or latest) samples, a view when they are contiguous in the ring"""
+        first, second = self._segments(n, latest=latest)
+        if not len(second):
+            return first
+        return np.concatenate((first, second))
+
+    def read_f32(self, out: np.ndarray) -> None:
+        """converts the len(out) oldest samples to float32 (-1.0 to 1.0) into out, without
+        consuming them"""
+        first, second = self._segments(len(out))
+        # cast then divided in place, np.divide(int16, ..., dtype=float32) allocates a buffer
+        # for the cast
+        out[: len(first)] = first
+        out[len(first) :] = second
+        np.divide(out, _INT16_MAX, out=out)
+
+    def _segments(self, n: int, *, latest: bool = False) -> tuple[np.ndarray, np.ndarray]:
+        n = min(n, self._len)
+        start = self._start + self._len - n if latest else self._start
+        start = start % self._capacity if self._capacity else 0
+        first = min(n, self._capacity - start)
+        return self._buf[start : start + first], self._buf[: n - first]
@@ -34,6 +34,7 @@ from livekit.agents.utils import is_given
 
 from . import onnx_model
 from .log import logger
+from .ring_buffer import SampleRing
 
 SLOW_INFERENCE_THRESHOLD = 0.2  # late by 200ms
 
@@ -66,6 +67,7 @@ class VAD(agents.vad.VAD):
         activation_threshold: float = 0.5,
         sample_rate: Literal[8000, 16000] = 16000,
         force_cpu: bool = True,
+        max_batch_delay: float | None = None,
         # deprecated
         padding_duration: NotGivenOr[float] = NOT_GIVEN,
     ) -> VAD:
@@ -99,10 +101,11 @@ class VAD(agents.vad.VAD):
             min_speech_duration (float): Minimum duration of speech to start a new speech chunk.
             min_silence_duration (float): At the end of each speech, wait this duration before ending the speech.
             prefix_padding_duration (float): Duration of padding to add to the beginning of each speech chunk.
-            max_buffered_speech (float): Maximum duration of speech to keep in the buffer (in seconds).
+            max_buffered_speech (float): Maximum duration of speech to keep in the buffer (in seconds), the start of a longer speech is dropped.
             activation_threshold (float): Threshold to consider a frame as speech.
             sample_rate (Literal[8000, 16000]): Sample rate for the inference (only 8KHz and 16KHz are supported).
             force_cpu (bool): Force the use of CPU for inference.
+            max_batch_delay (float | None): Run the inference of the concurrent streams of this VAD in one batch, waiting at most this many seconds (e.g. 0.005) for the windows of the other streams. Reduces the CPU used per stream when many sessions share a process. By default, each stream runs its own inference.
             padding_duration (float | None): **Deprecated**. Use `prefix_padding_duration` instead.
 
         Returns:
@@ -129,17 +132,21 @@ class VAD(agents.vad.VAD):
             activation_threshold=activation_threshold,
             sample_rate=sample_rate,
         )
-        return cls(session=session, opts=opts)
+        return cls(session=session, opts=opts, max_batch_delay=max_batch_delay)
 
     def __init__(
         self,
         *,
         session: onnxruntime.InferenceSession,
         opts: _VADOptions,
+        max_batch_delay: float | None = None,
     ) -> None:
         super().__init__(capabilities=agents.vad.VADCapabilities(update_interval=0.032))
         self._onnx_session = session
         self._opts = opts
+        self._batch: onnx_model.BatchedInference | None = None
+        if max_batch_delay is not None:
+            self._batch = onnx_model.BatchedInference(max_delay=max_batch_delay)
         self._streams = weakref.WeakSet[VADStream]()
 
     @property
@@ -163,6 +170,7 @@ class VAD(agents.vad.VAD):
             onnx_model.OnnxModel(
                 onnx_session=self._onnx_session, sample_rate=self._opts.sample_rate
             ),
+            self._batch,
         )
         self._streams.add(stream)
         return stream
@@ -185,7 +193,7 @@ class VAD(agents.vad.VAD):
             min_speech_duration (float): Minimum duration of speech to start a new speech chunk.
             min_silence_duration (float): At the end of each speech, wait this duration before ending the speech.
             prefix_padding_duration (float): Duration of padding to add to the beginning of each speech chunk.
-            max_buffered_speech (float): Maximum duration of speech to keep in the buffer (in seconds).
+            max_buffered_speech (float): Maximum duration of speech to keep in the buffer (in seconds), the start of a longer speech is dropped.
             activation_threshold (float): Threshold to consider a frame as speech.
         """  # noqa: E501
         if is_given(min_speech_duration):
@@ -210,17 +218,29 @@ class VAD(agents.vad.VAD):
 
 
 class VADStream(agents.vad.VADStream):
-    def __init__(self, vad: VAD, opts: _VADOptions, model: onnx_model.OnnxModel) -> None:
+    def __init__(
+        self,
+        vad: VAD,
+        opts: _VADOptions,
+        model: onnx_model.OnnxModel,
+        batch: onnx_model.BatchedInference | None = None,
+    ) -> None:
         super().__init__(vad)
         self._opts, self._model = opts, model
         self._loop = asyncio.get_event_loop()
 
-        self._executor = ThreadPoolExecutor(max_workers=1)
-        self._task.add_done_callback(lambda _: self._executor.shutdown(wait=False))
+        self._batch = batch
+        self._executor: ThreadPoolExecutor | None = None
+        if batch is not None:
+            batch.add_stream()
+            self._task.add_done_callback(lambda _: batch.remove_stream())
+        else:
+            executor = self._executor = ThreadPoolExecutor(max_workers=1)
+            self._task.add_done_callback(lambda _: executor.shutdown(wait=False))
         self._exp_filter = utils.ExpFilter(alpha=0.35)
 
         self._input_sample_rate = 0
-        self._speech_buffer: np.ndarray | None = None
+        self._speech_buffer: SampleRing | None = None
         self._speech_buffer_max_reached = False
         self._prefix_padding_samples = 0  # (input_sample_rate)
 
@@ -242,7 +262,7 @@ class VADStream(agents.vad.VADStream):
             min_speech_duration (float): Minimum duration of speech to start a new speech chunk.
             min_silence_duration (float): At the end of each speech, wait this duration before ending the speech.
             prefix_padding_duration (float): Duration of padding to add to the beginning of each speech chunk.
-            max_buffered_speech (float): Maximum duration of speech to keep in the buffer (in seconds).
+            max_buffered_speech (float): Maximum duration of speech to keep in the buffer (in seconds), the start of a longer speech is dropped.
             activation_threshold (float): Threshold to consider a frame as speech.
         """  # noqa: E501
         old_max_buffered_speech = self._opts.max_buffered_speech
@@ -276,7 +296,6 @@ class VADStream(agents.vad.VADStream):
     @agents.utils.log_exceptions(logger=logger)
     async def _main_task(self) -> None:
         inference_f32_data = np.empty(self._model.window_size_samples, dtype=np.float32)
-        speech_buffer_index: int = 0
 
         # "pub_" means public, these values are exposed to the users through events
         pub_speaking = False
@@ -288,8 +307,9 @@ class VADStream(agents.vad.VADStream):
         speech_threshold_duration = 0.0
         silence_threshold_duration = 0.0
 
-        input_frames: list[rtc.AudioFrame] = []
-        inference_frames: list[rtc.AudioFrame] = []
+        # samples waiting for inference, at the input sample rate and at the model's one
+        input_ring = SampleRing(self._model.window_size_samples * 8, grow=True)
+        inference_ring = SampleRing(self._model.window_size_samples * 2, grow=True)
         resampler: rtc.AudioResampler | None = None
 
         # used to avoid drift when the sample_rate ratio is not an integer
@@ -309,10 +329,9 @@ class VADStream(agents.vad.VADStream):
                     self._opts.prefix_padding_duration * self._input_sample_rate
                 )
 
-                self._speech_buffer = np.empty(
+                self._speech_buffer = SampleRing(
                     int(self._opts.max_buffered_speech * self._input_sample_rate)
-                    + self._prefix_padding_samples,
-                    dtype=np.int16,
+                    + self._prefix_padding_samples
                 )
 
                 if self._input_sample_rate != self._opts.sample_rate:
@@ -330,38 +349,31 @@ class VADStream(agents.vad.VADStream):
 
             assert self._speech_buffer is not None
 
-            input_frames.append(input_frame)
+            input_ring.write(np.frombuffer(input_frame.data, dtype=np.int16))
             if resampler is not None:
                 # the resampler may have a bit of latency, but it is OK to ignore since it should be
                 # negligible
-                inference_frames.extend(resampler.push(input_frame))
+                for frame in resampler.push(input_frame):
+                    inference_ring.write(np.frombuffer(frame.data, dtype=np.int16))
             else:
-                inference_frames.append(input_frame)
+                inference_ring.write(np.frombuffer(input_frame.data, dtype=np.int16))
 
-            while True:
+            while len(inference_ring) >= self._model.window_size_samples:
                 start_time = time.perf_counter()
 
-                available_inference_samples = sum(
-                    [frame.samples_per_channel for frame in inference_frames]
-                )
-                if available_inference_samples < self._model.window_size_samples:
-                    break  # not enough samples to run inference
-
-                input_frame = utils.combine_frames(input_frames)
-                inference_frame = utils.combine_frames(inference_frames)
-
                 # convert data to f32
-                np.divide(
-                    inference_frame.data[: self._model.window_size_samples],
-                    np.iinfo(np.int16).max,
-                    out=inference_f32_data,
-                    dtype=np.float32,
-                )
+                inference_ring.read_f32(inference_f32_data)
+                inference_ring.consume(self._model.window_size_samples)
 
                 # run the inference
-                p = await self._loop.run_in_executor(
-                    self._executor, self._model, inference_f32_data
-                )
+                if self._batch is not None:
+                    p = await asyncio.wrap_future(
+                        self._batch.submit(self._model, inference_f32_data)
+                    )
+                else:
+                    p = await self._loop.run_in_executor(
+                        self._executor, self._model, inference_f32_data
+                    )
                 p = self._exp_filter.apply(exp=1.0, sample=p)
 
                 window_duration = self._model.window_size_samples / self._opts.sample_rate
@@ -376,19 +388,21 @@ class VADStream(agents.vad.VADStream):
                 to_copy_int = int(to_copy)
                 input_copy_remaining_fract = to_copy - to_copy_int
 
-                # copy the inference window to the speech buffer
-                available_space = len(self._speech_buffer) - speech_buffer_index
-                to_copy_buffer = min(to_copy_int, available_space)
-                if to_copy_buffer > 0:
-                    self._speech_buffer[
-                        speech_buffer_index : speech_buffer_index + to_copy_buffer
-                    ] = input_frame.data[:to_copy_buffer]
-                    speech_buffer_index += to_copy_buffer
-                elif not self._speech_buffer_max_reached:
-                    # reached self._opts.max_buffered_speech (padding is included)
+                # the input samples of the inference window
+                window_frame = rtc.AudioFrame(
+                    data=input_ring.peek(to_copy_int).tobytes(),
+                    sample_rate=self._input_sample_rate,
+                    num_channels=1,
+                    samples_per_channel=min(to_copy_int, len(input_ring)),
+                )
+
+                # move them to the speech buffer, the start of the speech is overwritten past
+                # max_buffered_speech (padding is included)
+                overwritten = self._speech_buffer.write_from(input_ring, to_copy_int)
+                if overwritten and not self._speech_buffer_max_reached:
                     self._speech_buffer_max_reached = True
                     logger.warning(
-                        "max_buffered_speech reached, ignoring further data for the current speech input"  # noqa: E501
+                        "max_buffered_speech reached, dropping the start of the current speech input"  # noqa: E501
                     )
 
                 inference_duration = time.perf_counter() - start_time
@@ -403,30 +417,25 @@ class VADStream(agents.vad.VADStream):
                     )
 
                 def _reset_write_cursor() -> None:
-                    nonlocal speech_buffer_index
                     assert self._speech_buffer is not None
 
-                    if speech_buffer_index <= self._prefix_padding_samples:
+                    if len(self._speech_buffer) <= self._prefix_padding_samples:
                         return
 
-                    padding_data = self._speech_buffer[
-                        speech_buffer_index - self._prefix_padding_samples : speech_buffer_index
-                    ]
-
+                    # only keep the prefix padding
                     self._speech_buffer_max_reached = False
-                    self._speech_buffer[: self._prefix_padding_samples] = padding_data
-                    speech_buffer_index = self._prefix_padding_samples
+                    self._speech_buffer.keep_last(self._prefix_padding_samples)
 
                 def _copy_speech_buffer() -> rtc.AudioFrame:
                     # copy the data from speech_buffer
                     assert self._speech_buffer is not None
-                    speech_data = self._speech_buffer[:speech_buffer_index].tobytes()  # noqa: B023
+                    speech_data = self._speech_buffer.peek(len(self._speech_buffer))
 
                     return rtc.AudioFrame(
                         sample_rate=self._input_sample_rate,
                         num_channels=1,
-                        samples_per_channel=speech_buffer_index,  # noqa: B023
-                        data=speech_data,
+                        samples_per_channel=len(speech_data),
+                        data=speech_data.tobytes(),
                     )
 
                 if pub_speaking:
@@ -443,14 +452,7 @@ class VADStream(agents.vad.VADStream):
                         speech_duration=pub_speech_duration,
                         probability=p,
                         inference_duration=inference_duration,
-                        frames=[
-                            rtc.AudioFrame(
-                                data=input_frame.data[:to_copy_int].tobytes(),
-                                sample_rate=self._input_sample_rate,
-                                num_channels=1,
-                                samples_per_channel=to_copy_int,
-                            )
-                        ],
+                        frames=[window_frame],
                         speaking=pub_speaking,
                         raw_accumulated_silence=silence_threshold_duration,
                         raw_accumulated_speech=speech_threshold_duration,
@@ -507,30 +509,3 @@ class VADStream(agents.vad.VADStream):
                         )
 
                         _reset_write_cursor()
-
-                # remove the frames that were used for inference from the input and inference frames
-                input_frames = []
-                inference_frames = []
-
-                # add the remaining data
-                if len(input_frame.data) - to_copy_int > 0:
-                    data = input_frame.data[to_copy_int:].tobytes()
-                    input_frames.append(
-                        rtc.AudioFrame(
-                            data=data,
-                            sample_rate=self._input_sample_rate,
-                            num_channels=1,
-                            samples_per_channel=len(data) // 2,
-                        )
-                    )
-
-                if len(inference_frame.data) - self._model.window_size_samples > 0:
-                    data = inference_frame.data[self._model.window_size_samples :].tobytes()
-                    inference_frames.append(
-                        rtc.AudioFrame(
-                            data=data,
-                            sample_rate=self._opts.sample_rate,
-                            num_channels=1,
-                            samples_per_channel=len(data) // 2,
-                        )
-                    )
@@ -34,10 +34,14 @@ class EOUPlugin(Plugin):
 
         from .base import _download_from_hf_hub
         from .models import HG_MODEL, MODEL_REVISIONS, ONNX_FILENAME
+        from .variants import build_optimized_models
 
         for revision in MODEL_REVISIONS.values():
             AutoTokenizer.from_pretrained(HG_MODEL, revision=revision)
-            _download_from_hf_hub(HG_MODEL, ONNX_FILENAME, subfolder="onnx", revision=revision)
+            model_path = _download_from_hf_hub(
+                HG_MODEL, ONNX_FILENAME, subfolder="onnx", revision=revision
+            )
+            build_optimized_models(model_path)
             _download_from_hf_hub(HG_MODEL, "languages.json", revision=revision)
 
 
@@ -2,25 +2,40 @@ from __future__ import annotations
 
 import asyncio
 import json
-import math
 import re
+import struct
+import threading
 import time
 import unicodedata
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 from typing import Any
 
+import numpy as np
+
 from livekit.agents import llm
 from livekit.agents.inference_runner import _InferenceRunner
 from livekit.agents.ipc.inference_executor import InferenceExecutor
 from livekit.agents.job import get_job_context
-from livekit.agents.utils import hw
 
+from . import variants
 from .log import logger
 from .models import HG_MODEL, MODEL_REVISIONS, ONNX_FILENAME, EOUModelType
 
 MAX_HISTORY_TOKENS = 128
 MAX_HISTORY_TURNS = 6
 
+# texts tokenized and predictions kept by the runners, shared by the sessions of the process
+TOKEN_CACHE_SIZE = 512
+RESULT_CACHE_SIZE = 256
+
+# binary inference payloads (see _encode_chat_ctx), rather than JSON
+_ROLES = ("user", "assistant")
+_TURN_HEADER = struct.Struct("<BI")  # role index, content length
+# eou_probability, duration and length of the model variant, followed by the model variant and
+# the input text
+_RESULT_HEADER = struct.Struct("<ddB")
+
 
 def _download_from_hf_hub(repo_id: str, filename: str, **kwargs: Any) -> str:
     from huggingface_hub import hf_hub_download
@@ -33,6 +48,10 @@ class _EUORunnerBase(_InferenceRunner):
     def __init__(self, model_type: EOUModelType):
         super().__init__()
         self._model_revision = MODEL_REVISIONS[model_type]
+        self._cache_lock = threading.Lock()
+        self._token_cache: OrderedDict[str, list[int]] = OrderedDict()
+        self._result_cache: OrderedDict[tuple[int, ...], float] = OrderedDict()
+        self._turn_token_lstrips = False
 
     def _normalize_text(self, text: str) -> str:
         if not text:
@@ -77,7 +96,6 @@ class _EUORunnerBase(_InferenceRunner):
         return text  # type: ignore
 
     def initialize(self) -> None:
-        import onnxruntime as ort  # type: ignore
         from huggingface_hub import errors
         from transformers import AutoTokenizer  # type: ignore
 
@@ -89,22 +107,14 @@ class _EUORunnerBase(_InferenceRunner):
                 revision=self._model_revision,
                 local_files_only=True,
             )
-            sess_options = ort.SessionOptions()
-            sess_options.intra_op_num_threads = max(
-                1, min(math.ceil(hw.get_cpu_monitor().cpu_count()) // 2, 4)
-            )
-            sess_options.inter_op_num_threads = 1
-            sess_options.add_session_config_entry("session.dynamic_block_base", "4")
-            self._session = ort.InferenceSession(
-                local_path_onnx, providers=["CPUExecutionProvider"], sess_options=sess_options
-            )
-
             self._tokenizer = AutoTokenizer.from_pretrained(
                 HG_MODEL,
                 revision=self._model_revision,
                 local_files_only=True,
                 truncation_side="left",
             )
+            self._turn_token_lstrips = _lstrips(self._tokenizer, "<|im_start|>")
+            self._session, self._variant = self._load_session(local_path_onnx)
 
         except (errors.LocalEntryNotFoundError, OSError):
             logger.error(
@@ -117,34 +127,104 @@ class _EUORunnerBase(_InferenceRunner):
                 f"Could not find model {HG_MODEL} with revision {self._model_revision}."
             ) from None
 
-    def run(self, data: bytes) -> bytes | None:
-        data_json = json.loads(data)
-        chat_ctx = data_json.get("chat_ctx", None)
+    def _load_session(self, model_path: str) -> tuple[Any, str]:
+        """the session of the model variant picked for this host (see variants.py), or of
+        the original model when the optimized ones can't be built"""
+        try:
+            variants.build_optimized_models(model_path)
+            inputs = [
+                np.array(self._tokenize(self._format_chat_ctx(chat_ctx)), dtype=np.int64)
+                for chat_ctx in variants.load_validation_set()
+            ]
+            variant = variants.select_variant(model_path, inputs)
+            return variants.new_session(model_path, variant), variant.name
+        except Exception as e:
+            logger.warning(
+                "failed to load the optimized turn detector model, using the original one",
+                exc_info=e,
+            )
 
-        if not chat_ctx:
-            raise ValueError("chat_ctx is required on the inference input data")
+        variant = variants.ModelVariant(variants.ORIGINAL, variants.default_threads())
+        return variants.new_session(model_path, variant), variant.name
 
+    def run(self, data: bytes) -> bytes | None:
+        return self.run_batch([data])[0]
+
+    def run_batch(self, data: list[bytes]) -> list[bytes | None]:
+        chat_ctxs = [self._parse_chat_ctx(d) for d in data]
         start_time = time.perf_counter()
 
-        text = self._format_chat_ctx(chat_ctx)
-        inputs = self._tokenizer(
-            text,
-            add_special_tokens=False,
-            return_tensors="np",
-            max_length=MAX_HISTORY_TOKENS,
-            truncation=True,
-        )
-        # Run inference
-        outputs = self._session.run(None, {"input_ids": inputs["input_ids"].astype("int64")})
-        eou_probability = outputs[0].flatten()[-1]
-        end_time = time.perf_counter()
+        texts = [self._format_chat_ctx(chat_ctx) for chat_ctx in chat_ctxs]
+        input_ids = [tuple(self._tokenize(text)) for text in texts]
+
+        # the model doesn't take an attention mask, so the inputs can't be padded: the ones
+        # with the same number of tokens are run together (most conversations are truncated
+        # to MAX_HISTORY_TOKENS). the inputs already predicted (the EOU detection runs again
+        # while the user speaks, often on the same transcript) aren't run again
+        probabilities: dict[tuple[int, ...], float] = {}
+        by_length: dict[int, list[tuple[int, ...]]] = {}
+        with self._cache_lock:
+            for ids in input_ids:
+                if ids in probabilities:
+                    continue
+                if (p := self._result_cache.get(ids)) is not None:
+                    self._result_cache.move_to_end(ids)
+                    probabilities[ids] = p
+                elif ids not in by_length.get(len(ids), ()):
+                    by_length.setdefault(len(ids), []).append(ids)
+
+        for batch in by_length.values():
+            outputs = variants.predict(self._session, np.array(batch, dtype=np.int64))
+            for ids, p in zip(batch, outputs):
+                probabilities[ids] = float(p)
+
+        with self._cache_lock:
+            for batch in by_length.values():
+                for ids in batch:
+                    _cache_put(self._result_cache, ids, probabilities[ids], RESULT_CACHE_SIZE)
+        duration = round(time.perf_counter() - start_time, 3)
+
+        return [
+            _encode_result(probabilities[ids], duration, self._variant, text)
+            for ids, text in zip(input_ids, texts)
+        ]
+
+    def _tokenize(self, text: str) -> list[int]:
+        """token ids of the last MAX_HISTORY_TOKENS of a formatted conversation.
+
+        The text is tokenized in two parts, split before the last turn: the turns before it
+        don't change while the user is speaking, their ids come from the cache. The ids are
+        the same as when tokenizing the whole text, the tokenizer splits the text on the
+        special tokens (<|im_start|>) before tokenizing it. When <|im_start|> takes the
+        whitespace before it (lstrip), that whitespace goes with it in the last part."""
+        ix = text.rfind("<|im_start|>")
+        if ix > 0 and self._turn_token_lstrips:
+            ix = len(text[:ix].rstrip())
+        ids: list[int] = []
+        for part in (text[:ix], text[ix:]) if ix > 0 else (text,):
+            with self._cache_lock:
+                part_ids = self._token_cache.get(part)
+                if part_ids is not None:
+                    self._token_cache.move_to_end(part)
+
+            if part_ids is None:
+                part_ids = self._tokenizer(part, add_special_tokens=False)["input_ids"]
+                with self._cache_lock:
+                    _cache_put(self._token_cache, part, part_ids, TOKEN_CACHE_SIZE)
+
+            ids.extend(part_ids)
+        return ids[-MAX_HISTORY_TOKENS:]
+
+    def _parse_chat_ctx(self, data: bytes) -> list[dict[str, Any]]:
+        if data[:1] == b"{":
+            chat_ctx = json.loads(data).get("chat_ctx", None)
+        else:
+            chat_ctx = _decode_chat_ctx(data)
 
-        result: dict[str, Any] = {
-            "eou_probability": float(eou_probability),
-            "input": text,
-            "duration": round(end_time - start_time, 3),
-        }
-        return json.dumps(result).encode()
+        if not chat_ctx:
+            raise ValueError("chat_ctx is required on the inference input data")
+
+        return chat_ctx  # type: ignore
 
 
 class EOUModelBase(ABC):
@@ -161,6 +241,7 @@ class EOUModelBase(ABC):
         self._executor = inference_executor or get_job_context().inference_executor
         self._unlikely_threshold = unlikely_threshold
         self._languages: dict[str, Any] = {}
+        self._model_variant: str | None = None
 
         if load_languages:
             config_fname = _download_from_hf_hub(
@@ -180,6 +261,13 @@ class EOUModelBase(ABC):
     def provider(self) -> str:
         return "livekit"
 
+    @property
+    def model_variant(self) -> str | None:
+        """Variant of the model the inference process picked on this host, e.g. "extended-t2"
+        (graph optimizations and number of threads), or "original". None until the first
+        prediction."""
+        return self._model_variant
+
     @abstractmethod
     def _inference_method(self) -> str: ...
 
@@ -232,18 +320,74 @@ class EOUModelBase(ABC):
                 )
 
         messages = messages[-MAX_HISTORY_TURNS:]
-        json_data = json.dumps({"chat_ctx": messages}).encode()
 
         result = await asyncio.wait_for(
-            self._executor.do_inference(self._inference_method(), json_data),
+            self._executor.do_inference(self._inference_method(), _encode_chat_ctx(messages)),
             timeout=timeout,
         )
 
         assert result is not None, "end_of_utterance prediction should always returns a result"
 
-        result_json: dict[str, Any] = json.loads(result.decode())
+        eou_probability, duration, self._model_variant, text = _decode_result(result)
         logger.debug(
             "eou prediction",
-            extra=result_json,
+            extra={
+                "eou_probability": eou_probability,
+                "input": text,
+                "duration": duration,
+                "model_variant": self._model_variant,
+            },
         )
-        return result_json["eou_probability"]  # type: ignore
+        return eou_probability
+
+
+def _lstrips(tokenizer: Any, token: str) -> bool:
+    """whether the added `token` of the tokenizer takes the whitespace before it"""
+    added_tokens = getattr(tokenizer, "added_tokens_decoder", {})
+    return any(t.content == token and t.lstrip for t in added_tokens.values())
+
+
+def _cache_put(cache: OrderedDict[Any, Any], key: Any, value: Any, max_size: int) -> None:
+    cache[key] = value
+    cache.move_to_end(key)
+    if len(cache) > max_size:
+        cache.popitem(last=False)
+
+
+def _encode_chat_ctx(messages: list[dict[str, Any]]) -> bytes:
+    parts = [len(messages).to_bytes(1, "little")]
+    for msg in messages:
+        content = msg["content"].encode()
+        parts.append(_TURN_HEADER.pack(_ROLES.index(msg["role"]), len(content)))
+        parts.append(content)
+    return b"".join(parts)
+
+
+def _decode_chat_ctx(data: bytes) -> list[dict[str, Any]]:
+    messages = []
+    offset = 1
+    for _ in range(data[0] if data else 0):
+        role, length = _TURN_HEADER.unpack_from(data, offset)
+        offset += _TURN_HEADER.size
+        content = data[offset : offset + length].decode()
+        offset += length
+        messages.append({"role": _ROLES[role], "content": content})
+    return messages
+
+
+def _encode_result(eou_probability: float, duration: float, variant: str, text: str) -> bytes:
+    variant_b = variant.encode()
+    return (
+        _RESULT_HEADER.pack(eou_probability, duration, len(variant_b)) + variant_b + text.encode()
+    )
+
+
+def _decode_result(data: bytes) -> tuple[float, float, str, str]:
+    eou_probability, duration, variant_len = _RESULT_HEADER.unpack_from(data)
+    variant_end = _RESULT_HEADER.size + variant_len
+    return (
+        eou_probability,
+        duration,
+        data[_RESULT_HEADER.size : variant_end].decode(),
+        data[variant_end:].decode(),
+    )
@@ -0,0 +1 @@
+"""Used by importlib.resources and setuptools"""
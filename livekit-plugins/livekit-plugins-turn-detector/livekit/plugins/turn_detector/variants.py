@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import contextlib
+import importlib.resources
+import json
+import math
+import os
+import platform
+import statistics
+import time
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+from filelock import FileLock
+
+from livekit.agents.utils import hw
+
+from .log import logger
+
+# env var forcing a variant (e.g. "extended-t2"), skipping the calibration
+VARIANT_ENV = "LIVEKIT_TURN_DETECTOR_VARIANT"
+
+ACCURACY_BUDGET = 0.02  # max difference with the EOU probabilities of the original model
+CALIBRATION_TIME_BUDGET = 4.0  # seconds, the variants not benchmarked in time are skipped
+CALIBRATION_RUNS = 3  # timed passes over the validation set, after a warmup one
+# seconds a process waits for the calibration of another one before giving up
+CALIBRATION_LOCK_TIMEOUT = 2 * CALIBRATION_TIME_BUDGET
+
+# the model as downloaded, optimized by onnxruntime when its session starts
+ORIGINAL = "original"
+# graph optimizations applied to the serialized models. ORT_ENABLE_ALL only adds layout
+# optimizations, they don't apply to this model and make the serialized model hardware specific
+OPTIMIZATION_LEVELS = ("basic", "extended")
+_CALIBRATION_FILE = "calibration.json"
+
+
+@dataclass(frozen=True)
+class ModelVariant:
+    optimization: str
+    threads: int  # intra-op threads of the session
+
+    @property
+    def name(self) -> str:
+        return f"{self.optimization}-t{self.threads}"
+
+    @staticmethod
+    def parse(name: str) -> ModelVariant:
+        optimization, _, threads = name.rpartition("-t")
+        if (
+            optimization not in (ORIGINAL, *OPTIMIZATION_LEVELS)
+            or not threads.isdigit()
+            or threads == "0"
+        ):
+            raise ValueError(f"invalid turn detector model variant: {name!r}")
+        return ModelVariant(optimization, int(threads))
+
+
+def load_validation_set() -> list[list[dict[str, Any]]]:
+    """conversations the variants are compared on, in the inference input format"""
+    res = importlib.resources.files("livekit.plugins.turn_detector.resources") / "validation.json"
+    return json.loads(res.read_text(encoding="utf-8"))  # type: ignore[no-any-return]
+
+
+def optimized_model_path(model_path: str, optimization: str) -> str:
+    """the optimized models are stored next to the original, per onnxruntime version"""
+    import onnxruntime as ort  # type: ignore
+
+    stem, ext = os.path.splitext(os.path.basename(model_path))
+    return os.path.join(
+        _optimized_dir(model_path), f"{stem}.{optimization}.ort{ort.__version__}{ext}"
+    )
+
+
+def build_optimized_models(model_path: str) -> None:
+    """serializes the model with each optimization level, so the sessions don't optimize it
+    again when they start"""
+    import onnxruntime as ort
+
+    for optimization in OPTIMIZATION_LEVELS:
+        path = optimized_model_path(model_path, optimization)
+        if os.path.exists(path):
+            continue
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        sess_options = ort.SessionOptions()
+        sess_options.graph_optimization_level = getattr(
+            ort.GraphOptimizationLevel, f"ORT_ENABLE_{optimization.upper()}"
+        )
+        sess_options.optimized_model_filepath = tmp_path
+        ort.InferenceSession(
+            model_path, providers=["CPUExecutionProvider"], sess_options=sess_options
+        )
+        # the processes building the models at the same time don't see partial files
+        os.replace(tmp_path, path)
+
+
+def new_session(model_path: str, variant: ModelVariant) -> Any:
+    import onnxruntime as ort
+
+    sess_options = ort.SessionOptions()
+    if variant.optimization != ORIGINAL:
+        # the optimized models are run as they were serialized
+        sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        model_path = optimized_model_path(model_path, variant.optimization)
+    sess_options.intra_op_num_threads = variant.threads
+    sess_options.inter_op_num_threads = 1
+    sess_options.add_session_config_entry("session.dynamic_block_base", "4")
+    return ort.InferenceSession(
+        model_path, providers=["CPUExecutionProvider"], sess_options=sess_options
+    )
+
+
+def default_threads() -> int:
+    return max(1, min(math.ceil(hw.get_cpu_monitor().cpu_count()) // 2, 4))
+
+
+def select_variant(model_path: str, inputs: list[np.ndarray]) -> ModelVariant:
+    """the variant forced by VARIANT_ENV, or the one calibrated on this host.
+
+    The calibration runs once per host (its result is stored next to the optimized models),
+    and benchmarks the variants on the token ids of the validation set. The inference
+    processes starting together wait for the calibration of the first one, under a file
+    lock, instead of benchmarking at the same time."""
+    if forced := os.getenv(VARIANT_ENV):
+        return ModelVariant.parse(forced)
+
+    calibration_path = os.path.join(_optimized_dir(model_path), _CALIBRATION_FILE)
+    host = _host_key()
+    if variant := _saved_variant(calibration_path, host):
+        return variant
+
+    os.makedirs(_optimized_dir(model_path), exist_ok=True)
+    with FileLock(f"{calibration_path}.lock", timeout=CALIBRATION_LOCK_TIMEOUT):
+        if variant := _saved_variant(calibration_path, host):
+            return variant
+
+        variant = calibrate(model_path, inputs)
+        calibrations = _read_calibrations(calibration_path)
+        calibrations[host] = variant.name
+        tmp_path = f"{calibration_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(calibrations, f)
+            os.replace(tmp_path, calibration_path)
+        except OSError:
+            logger.warning("failed to save the calibration of the turn detector", exc_info=True)
+
+    return variant
+
+
+def calibrate(model_path: str, inputs: list[np.ndarray]) -> ModelVariant:
+    """the fastest variant whose predictions are within ACCURACY_BUDGET of the original
+    model's.
+
+    The original model and the optimization levels are compared with the default number of
+    threads, then the fastest of them with the other numbers of threads, within
+    CALIBRATION_TIME_BUDGET."""
+    started_at = time.perf_counter()
+    threads = default_threads()
+    latencies: dict[ModelVariant, float] = {}
+    reference_probs: np.ndarray | None = None
+
+    def benchmark_all(variants: list[ModelVariant]) -> bool:
+        nonlocal reference_probs
+        for i, variant in enumerate(variants):
+            if latencies and time.perf_counter() - started_at > CALIBRATION_TIME_BUDGET:
+                logger.warning(
+                    "turn detector calibration time budget exceeded",
+                    extra={"skipped": [v.name for v in variants[i:]]},
+                )
+                return False
+
+            latency, probs = _benchmark(model_path, variant, inputs)
+            if reference_probs is None:  # the original model
+                reference_probs = probs
+            elif (error := float(np.max(np.abs(probs - reference_probs)))) > ACCURACY_BUDGET:
+                logger.debug(
+                    "turn detector variant over the accuracy budget",
+                    extra={"variant": variant.name, "error": round(error, 4)},
+                )
+                continue
+
+            latencies[variant] = latency
+        return True
+
+    if benchmark_all(
+        [ModelVariant(optimization, threads) for optimization in (ORIGINAL, *OPTIMIZATION_LEVELS)]
+    ):
+        fastest = min(latencies, key=latencies.__getitem__)
+        max_threads = max(1, math.floor(hw.get_cpu_monitor().cpu_count()))
+        benchmark_all(
+            [
+                ModelVariant(fastest.optimization, n)
+                for n in (1, 2, 4)
+                if n != threads and n <= max_threads
+            ]
+        )
+
+    best = min(latencies, key=latencies.__getitem__)
+    logger.info(
+        "turn detector model variant selected",
+        extra={
+            "variant": best.name,
+            "latencies": {v.name: round(latency, 4) for v, latency in latencies.items()},
+            "duration": round(time.perf_counter() - started_at, 3),
+        },
+    )
+    return best
+
+
+def predict(session: Any, input_ids: np.ndarray) -> np.ndarray:
+    """EOU probabilities of a batch of inputs with the same number of tokens"""
+    outputs = session.run(None, {"input_ids": input_ids})
+    return outputs[0].reshape(len(input_ids), -1)[:, -1]  # type: ignore[no-any-return]
+
+
+def _benchmark(
+    model_path: str, variant: ModelVariant, inputs: list[np.ndarray]
+) -> tuple[float, np.ndarray]:
+    """median time of a pass over the inputs, and their EOU probabilities"""
+    session = new_session(model_path, variant)
+    probs = np.array([predict(session, ids[None]).item() for ids in inputs])  # warmup
+    durations = []
+    for _ in range(CALIBRATION_RUNS):
+        started_at = time.perf_counter()
+        for ids in inputs:
+            predict(session, ids[None])
+        durations.append(time.perf_counter() - started_at)
+    return statistics.median(durations), probs
+
+
+def _read_calibrations(calibration_path: str) -> dict[str, str]:
+    """the variants calibrated on each host (see _host_key)"""
+    with contextlib.suppress(OSError, ValueError):
+        with open(calibration_path) as f:
+            calibrations = json.load(f)
+        if isinstance(calibrations, dict):
+            return calibrations
+    return {}
+
+
+def _saved_variant(calibration_path: str, host: str) -> ModelVariant | None:
+    with contextlib.suppress(ValueError, TypeError):
+        if name := _read_calibrations(calibration_path).get(host):
+            return ModelVariant.parse(name)
+    return None
+
+
+def _host_key() -> str:
+    import onnxruntime as ort
+
+    return f"{platform.machine()}-{hw.get_cpu_monitor().cpu_count():g}cpu-ort{ort.__version__}"
+
+
+def _optimized_dir(model_path: str) -> str:
+    return os.path.join(os.path.dirname(model_path), "optimized")
@@ -1,5 +1,7 @@
 # cf4/my_agent.py
 import logging
+import os
+import sys
 from dotenv import load_dotenv
 from datetime import date
 
@@ -10,11 +12,15 @@ from livekit.agents.llm import ChatMessage, ChatRole
 from livekit.plugins import deepgram, silero, groq, cartesia
 from livekit.plugins.turn_detector.multilingual import MultilingualModel
 
-from database.database import (
-    get_db, get_available_rooms, create_booking, get_room_by_number,
-    create_call_session, log_conversation_turn, get_conversation_history, find_customer_by_phone
+from database.database import get_db
+from database.async_database import (
+    create_async_sessionmaker, get_available_rooms, book_room, get_room_by_number,
+    create_call_session, get_conversation_history, get_booking_customer_for_session
 )
-from database.models import Booking
+from database.conversation_log import ConversationLogWriter
+from database.models import CallSession, create_async_db_engine
+from database.availability import availability_index
+from live_feed.publisher import LiveCallPublisher
 # --- END IMPORTS ---
 
 load_dotenv()
@@ -22,7 +28,7 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("my-agent")
 
 class MyAgent(Agent):
-    def __init__(self) -> None:
+    def __init__(self, db_sessions, call_session: CallSession) -> None:
         super().__init__(
             instructions=(
                 "You are a helpful FEMALE AI assistant for a hotel in Jaipur, India. "
@@ -32,10 +38,9 @@ class MyAgent(Agent):
                 "to understand their history before proceeding."
             )
         )
-        self.db = next(get_db())
-        # Create a new call session for this agent instance
-        self.call_session = create_call_session(self.db)
-        logger.info(f"New call session created with ID: {self.call_session.id}")
+        # Factory for short-lived async sessions on the worker's shared engine (see prewarm)
+        self.db_sessions = db_sessions
+        self.call_session = call_session
 
     # --- NEW MEMORY TOOL ---
     @function_tool
@@ -45,7 +50,10 @@ class MyAgent(Agent):
         This tool loads the history of that conversation for context.
         """
         logger.info(f"Retrieving past conversation for query ID: {query_id}")
-        history = get_conversation_history(self.db, query_id)
+        async with self.db_sessions() as db:
+            history = await get_conversation_history(db, query_id)
+            # Try to find customer details from the booking linked to that session
+            customer = await get_booking_customer_for_session(db, query_id) if history else None
         if not history:
             return f"I'm sorry, I couldn't find any record for query number {query_id}. We can start a new one, though."
 
@@ -59,10 +67,8 @@ class MyAgent(Agent):
         # This is the key part: we are injecting the past conversation into the AI's memory
         self.llm.chat_context.messages = past_messages + self.llm.chat_context.messages
         
-        # Try to find customer details from the booking linked to that session
-        booking = self.db.query(Booking).filter(Booking.call_session_id == query_id).first()
-        if booking and booking.customer:
-            customer_name = booking.customer.name.split(" ")[0]
+        if customer and customer.name:
+            customer_name = customer.name.split(" ")[0]
 
         return f"Welcome back, {customer_name}! I have your previous chat with ID {query_id}. We were discussing a booking. How can I help you continue?"
 
@@ -74,7 +80,8 @@ class MyAgent(Agent):
         try:
             check_in = date.fromisoformat(check_in_date)
             check_out = date.fromisoformat(check_out_date)
-            rooms = get_available_rooms(self.db, check_in, check_out, num_guests)
+            async with self.db_sessions() as db:
+                rooms = await get_available_rooms(db, check_in, check_out, num_guests)
             if not rooms:
                 return "Ma'am/Sir, unfortunately, we have no rooms available for those dates. Would you like to try different dates?"
 
@@ -96,16 +103,26 @@ class MyAgent(Agent):
             check_in = date.fromisoformat(check_in_date)
             check_out = date.fromisoformat(check_out_date)
             
-            room_to_book = get_room_by_number(self.db, room_number)
-            if not room_to_book:
-                return f"I'm sorry, I couldn't find a room with the number '{room_number}'. Please check the room number."
-
-            booking = create_booking(self.db, customer_name, phone_number, room_to_book.id, check_in, check_out, num_guests)
-            
-            # Link the booking to this call session
-            booking.call_session_id = self.call_session.id
-            self.db.commit()
-
+            async with self.db_sessions() as db:
+                room_to_book = await get_room_by_number(db, room_number)
+                if not room_to_book:
+                    return f"I'm sorry, I couldn't find a room with the number '{room_number}'. Please check the room number."
+
+                # The booking is linked to this call session in the same commit
+                result = await book_room(
+                    db, customer_name, phone_number, room_to_book.id, check_in, check_out, num_guests,
+                    call_session_id=self.call_session.id
+                )
+
+            if not result.confirmed:
+                # Someone else booked the room since we checked availability
+                logger.info(f"Room {room_number} is no longer free: {result.conflicts}")
+                if not result.alternatives:
+                    return f"I'm sorry, room {room_number} was just booked by another guest and no other room is free for those dates. Would you like to try different dates?"
+                options = ", ".join(f"room {room.room_number} ({room.room_type}, ₹{int(room.price_per_night)} per night)" for room in result.alternatives[:3])
+                return f"I'm sorry, room {room_number} was just booked by another guest for those dates. I can offer {options}. Which one would you like?"
+
+            booking = result.booking
             return f"Excellent! Your booking is confirmed, {customer_name}. Your booking ID is {booking.id}. We're excited to welcome you on {check_in_date}."
         except Exception as e:
             logger.error(f"Error creating booking: {e}")
@@ -113,9 +130,34 @@ class MyAgent(Agent):
 
 def prewarm(proc: JobProcess):
     proc.userdata["vad"] = silero.VAD.load()
+    # Build the room availability index once per process, before any call is assigned
+    db = next(get_db())
+    try:
+        availability_index.load(db)
+    finally:
+        db.close()
+    # One async engine (and connection pool) per worker process, shared by every call it runs
+    proc.userdata["db_engine"] = create_async_db_engine()
+    proc.userdata["db_sessions"] = create_async_sessionmaker(proc.userdata["db_engine"])
+    # One conversation log per process too: the turns of all the calls it serves are written
+    # in the same batches, the last ones when the process shuts down
+    turn_log = ConversationLogWriter(proc.userdata["db_engine"])
+    proc.userdata["turn_log"] = turn_log
+
+    async def _close_turn_log():
+        await turn_log.aclose()
+        logger.info(f"Conversation log flushed: {turn_log.metrics()}")
+
+    proc.add_shutdown_callback(_close_turn_log)
 
 async def entrypoint(ctx: JobContext):
-    agent = MyAgent() # Create the agent instance first
+    db_sessions = ctx.proc.userdata["db_sessions"]
+    # Create a new call session for this call
+    async with db_sessions() as db:
+        call_session = await create_call_session(db)
+    logger.info(f"New call session created with ID: {call_session.id}")
+
+    agent = MyAgent(db_sessions, call_session) # Create the agent instance first
     
     session = AgentSession(
         vad=ctx.proc.userdata["vad"],
@@ -126,15 +168,35 @@ async def entrypoint(ctx: JobContext):
     )
 
     # --- ADD EVENT LISTENERS FOR LOGGING ---
-    @session.on("user_speech")
-    async def on_user_speech(transcription: str):
-        if transcription:
-            log_conversation_turn(agent.db, agent.call_session.id, "user", transcription)
-
-    @session.on("agent_speech")
-    async def on_agent_speech(transcription: str):
-        if transcription:
-            log_conversation_turn(agent.db, agent.call_session.id, "agent", transcription)
+    # Turns are queued in memory and written in batches, the final flush runs when the
+    # process shuts down (see prewarm)
+    turn_log = ctx.proc.userdata["turn_log"]
+    turn_log.start()  # no-op if an earlier call in this process started it
+
+    @session.on("conversation_item_added")
+    def on_conversation_item_added(ev):
+        text = ev.item.text_content if ev.item.type == "message" else None
+        if not text or ev.item.role not in ("user", "assistant"):
+            return
+        speaker = "user" if ev.item.role == "user" else "agent"
+        turn_log.log(call_session.id, speaker, text)
+
+    # Live call feed for the admin dashboard (pushed to it over SSE, see live_feed/)
+    live_feed = LiveCallPublisher(
+        os.environ.get("LIVE_FEED_URL", "http://localhost:5000/api/calls/live/events"),
+        token=os.environ.get("LIVE_FEED_TOKEN"),
+    )
+    live_feed.start()
+    live_feed.attach(
+        session,
+        ctx.room.name,
+        callSessionId=call_session.id,
+        agentName="AI Assistant",
+        callerName="Incoming Call...",
+        intent="Unknown",
+        sentiment="neutral",
+    )
+    ctx.add_shutdown_callback(live_feed.aclose)
     # --- END LISTENERS ---
 
     await session.start(agent=agent, room=ctx.room)
@@ -144,6 +206,13 @@ if __name__ == "__main__":
         WorkerOptions(
             entrypoint_fnc=entrypoint,
             prewarm_fnc=prewarm,
+            # prewarm runs once, in a template process the job processes are forked from
+            # (fork isn't available on Windows)
+            multiprocessing_context="zygote" if sys.platform != "win32" else "spawn",
             initialize_process_timeout=60.0,
+            # keep one process warm overnight, more when calls come in bursts (check-in hours)
+            num_idle_processes=1,
+            idle_warm_hit_target=0.95,
+            idle_memory_budget_mb=2048,
         )
     )
\ No newline at end of file
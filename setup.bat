@@ -45,7 +45,7 @@ cd ..
 echo 🐍 Installing Python backend dependencies...
 
 :: Install Python dependencies
-pip install flask flask-cors python-dotenv livekit
+pip install flask flask-cors starlette uvicorn jinja2 python-dotenv livekit
 
 if %errorlevel% equ 0 (
     echo ✅ Python dependencies installed successfully
@@ -51,7 +51,7 @@ else
 fi
 
 # Install Python dependencies
-$PIP_CMD install flask flask-cors python-dotenv livekit
+$PIP_CMD install flask flask-cors starlette uvicorn jinja2 python-dotenv livekit
 
 if [ $? -eq 0 ]; then
     echo "✅ Python dependencies installed successfully"
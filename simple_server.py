@@ -4,121 +4,55 @@
 import os
 import uuid
 import logging
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-from datetime import datetime, timedelta
+from datetime import datetime
 import random
 import json
 
+from database.models import SessionLocal, init_db
+from database.availability import BookingConflictError
+from database.dashboard import seed_demo_data
+from database.stats import dashboard_stats
+from database import dashboard
+from live_feed import CALL_STARTED, CALL_UPDATED, CALL_ENDED, EVENT_TYPES, live_calls
+
 app = Flask(__name__)
 CORS(app, origins=["http://localhost:3000", "http://localhost:3001", "http://127.0.0.1:3000", "http://127.0.0.1:3001"])  # Allow dashboard to access API
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
-# Mock data storage (in production, use a proper database)
-bookings_db = [
-    {
-        "id": "BK001",
-        "guestName": "Rajesh Sharma",
-        "email": "rajesh@example.com",
-        "phone": "+91 9876543210",
-        "checkIn": "2024-10-12",
-        "checkOut": "2024-10-15",
-        "roomNumber": "301",
-        "roomType": "Deluxe",
-        "totalAmount": 15000,
-        "status": "confirmed",
-        "paymentStatus": "paid",
-        "createdAt": "2024-10-10T10:30:00Z"
-    },
-    {
-        "id": "BK002",
-        "guestName": "Priya Patel",
-        "email": "priya@example.com",
-        "phone": "+91 9876543211",
-        "checkIn": "2024-10-13",
-        "checkOut": "2024-10-16",
-        "roomNumber": "205",
-        "roomType": "Standard",
-        "totalAmount": 9000,
-        "status": "pending",
-        "paymentStatus": "pending",
-        "createdAt": "2024-10-10T14:20:00Z"
-    }
-]
-
-restaurant_orders_db = [
-    {
-        "id": "RO001",
-        "orderType": "room-service",
-        "roomNumber": "301",
-        "customerName": "Rajesh Sharma",
-        "items": [
-            {"name": "Butter Chicken", "quantity": 2, "price": 450},
-            {"name": "Naan", "quantity": 4, "price": 60},
-            {"name": "Dal Makhani", "quantity": 1, "price": 320}
-        ],
-        "totalAmount": 1330,
-        "status": "preparing",
-        "orderTime": "2024-10-10T19:30:00Z",
-        "estimatedDelivery": "2024-10-10T20:15:00Z"
-    },
-    {
-        "id": "RO002",
-        "orderType": "restaurant",
-        "tableNumber": "T05",
-        "customerName": "Priya Patel",
-        "items": [
-            {"name": "Masala Dosa", "quantity": 1, "price": 180},
-            {"name": "Filter Coffee", "quantity": 2, "price": 80}
-        ],
-        "totalAmount": 340,
-        "status": "served",
-        "orderTime": "2024-10-10T09:15:00Z",
-        "estimatedDelivery": "2024-10-10T09:45:00Z"
-    }
-]
+# Bookings, restaurant orders and call logs live in the hotel database (database/models.py).
+# Create the tables, and the demo rows on a fresh database, before serving requests.
+# DASHBOARD_STATS_PERSIST=1 keeps the dashboard counters in SQLite across restarts.
+dashboard_stats.persist = os.environ.get("DASHBOARD_STATS_PERSIST") == "1"
+init_db()
+with SessionLocal() as db:
+    seed_demo_data(db)
+    dashboard_stats.sync(db)
 
-call_logs_db = [
-    {
-        "id": "CALL001",
-        "timestamp": "2024-10-10T18:45:00Z",
-        "duration": 180,
-        "callerNumber": "+91 9876543210",
-        "callType": "booking_inquiry",
-        "sentiment": "positive",
-        "resolution": "booking_confirmed",
-        "agentName": "AI Assistant",
-        "transcript": "Customer inquired about room availability for October 15-17. Confirmed deluxe room booking.",
-        "satisfaction": 4.5
-    },
-    {
-        "id": "CALL002",
-        "timestamp": "2024-10-10T16:20:00Z",
-        "duration": 120,
-        "callerNumber": "+91 9876543211",
-        "callType": "room_service",
-        "sentiment": "neutral",
-        "resolution": "order_placed",
-        "agentName": "AI Assistant",
-        "transcript": "Guest requested room service for dinner. Order placed successfully.",
-        "satisfaction": 4.0
+def page_args(**filters):
+    """Reads the pagination (cursor, limit) and date-range query parameters."""
+    return {
+        "cursor": request.args.get("cursor"),
+        "limit": request.args.get("limit", dashboard.DEFAULT_PAGE_SIZE),
+        "date_from": dashboard.parse_date(request.args.get("startDate")),
+        "date_to": dashboard.parse_date(request.args.get("endDate")),
+        **filters,
     }
-]
 
-live_calls_db = [
-    {
-        "id": "LIVE001",
-        "callerNumber": "+91 9876543212",
-        "callType": "complaint",
-        "status": "active",
-        "startTime": "2024-10-10T20:30:00Z",
-        "currentTopic": "room_temperature",
-        "sentiment": "negative",
-        "agentName": "AI Assistant",
-        "liveTranscript": "Guest is complaining about the air conditioning not working properly..."
-    }
-]
+# Live calls are pushed to the dashboard by the broker in live_feed/broker.py.
+# A demo call, so the page isn't empty without a running agent.
+live_calls.publish(CALL_STARTED, "LIVE001", {
+    "callerNumber": "+91 9876543212",
+    "callType": "complaint",
+    "status": "active",
+    "startTime": "2024-10-10T20:30:00Z",
+    "currentTopic": "room_temperature",
+    "sentiment": "negative",
+    "agentName": "AI Assistant",
+    "liveTranscript": "Guest is complaining about the air conditioning not working properly..."
+})
 
 # API Routes
 
@@ -145,21 +79,24 @@ def health_check():
 
 @app.route('/api/dashboard/stats', methods=['GET'])
 def get_dashboard_stats():
-    # Generate some realistic stats
-    today = datetime.now()
+    # Served from the running counters in database/stats.py, nothing is aggregated per request
+    with SessionLocal() as db:
+        totals = dashboard.dashboard_totals(db)
+        sentiment = dashboard.sentiment_shares(dashboard.call_breakdown(db)["sentimentBreakdown"])
+    today = datetime.utcnow().date()
     stats = {
-        "totalBookings": len(bookings_db),
-        "occupancyRate": 75.5,
+        "totalBookings": totals["totalBookings"],
+        "occupancyRate": totals["occupancyRate"],
         "revenue": {
-            "today": 25000,
-            "month": 750000,
-            "growth": 12.5
+            "today": totals["revenueToday"],
+            "month": totals["revenueMonth"],
+            "growth": totals["revenueGrowth"]
         },
         "callMetrics": {
-            "totalCalls": 45,
-            "avgDuration": 150,
-            "satisfactionScore": 4.3,
-            "resolutionRate": 92
+            "totalCalls": totals["totalCalls"],
+            "avgDuration": totals["averageCallDuration"],
+            "satisfactionScore": totals["satisfactionScore"],
+            "resolutionRate": totals["resolutionRate"]
         },
         "recentActivity": [
             {"type": "booking", "message": "New booking confirmed - Room 301", "time": "2 min ago"},
@@ -167,19 +104,11 @@ def get_dashboard_stats():
             {"type": "order", "message": "Room service order delivered", "time": "8 min ago"}
         ],
         "chartData": {
-            "revenue": [
-                {"name": "Mon", "value": 12000},
-                {"name": "Tue", "value": 19000},
-                {"name": "Wed", "value": 15000},
-                {"name": "Thu", "value": 25000},
-                {"name": "Fri", "value": 30000},
-                {"name": "Sat", "value": 35000},
-                {"name": "Sun", "value": 28000}
-            ],
+            "revenue": dashboard.daily_series("revenue", today),
             "sentiment": [
-                {"name": "Positive", "value": 65, "color": "#10B981"},
-                {"name": "Neutral", "value": 25, "color": "#F59E0B"},
-                {"name": "Negative", "value": 10, "color": "#EF4444"}
+                {"name": "Positive", "value": sentiment["positive"], "color": "#10B981"},
+                {"name": "Neutral", "value": sentiment["neutral"], "color": "#F59E0B"},
+                {"name": "Negative", "value": sentiment["negative"], "color": "#EF4444"}
             ]
         }
     }
@@ -188,130 +117,176 @@ def get_dashboard_stats():
 # Booking Management
 @app.route('/api/bookings', methods=['GET'])
 def get_bookings():
-    return jsonify(bookings_db), 200
+    try:
+        args = page_args(status=request.args.get('status'))
+    except ValueError:
+        return jsonify({"error": "Invalid date"}), 400
+    with SessionLocal() as db:
+        return jsonify(dashboard.list_bookings(db, **args).to_dict()), 200
 
 @app.route('/api/bookings', methods=['POST'])
 def create_booking():
     data = request.get_json()
-    new_booking = {
-        "id": f"BK{random.randint(100, 999)}",
-        "guestName": data.get('guestName'),
-        "email": data.get('email'),
-        "phone": data.get('phone'),
-        "checkIn": data.get('checkIn'),
-        "checkOut": data.get('checkOut'),
-        "roomNumber": data.get('roomNumber'),
-        "roomType": data.get('roomType'),
-        "totalAmount": data.get('totalAmount'),
-        "status": data.get('status', 'pending'),
-        "paymentStatus": data.get('paymentStatus', 'pending'),
-        "createdAt": datetime.now().isoformat()
-    }
-    bookings_db.append(new_booking)
-    return jsonify(new_booking), 201
+    with SessionLocal() as db:
+        try:
+            result = dashboard.create_booking(db, data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if not result.confirmed:
+            return jsonify({
+                "error": "No room available for those dates",
+                "conflicts": [[str(d) for d in c] for c in result.conflicts],
+                "alternatives": [room.room_number for room in result.alternatives],
+            }), 409
+        return jsonify(dashboard.serialize_booking(result.booking)), 201
 
 @app.route('/api/bookings/<booking_id>', methods=['PUT'])
 def update_booking(booking_id):
     data = request.get_json()
-    for i, booking in enumerate(bookings_db):
-        if booking['id'] == booking_id:
-            bookings_db[i].update(data)
-            return jsonify(bookings_db[i]), 200
-    return jsonify({"error": "Booking not found"}), 404
+    with SessionLocal() as db:
+        try:
+            booking = dashboard.update_booking(db, booking_id, data)
+        except BookingConflictError as e:
+            return jsonify({"error": "The room has been booked again for those dates",
+                            "conflicts": [[str(d) for d in c] for c in e.result.conflicts]}), 409
+        if booking is None:
+            return jsonify({"error": "Booking not found"}), 404
+        return jsonify(dashboard.serialize_booking(booking)), 200
 
 @app.route('/api/bookings/<booking_id>', methods=['DELETE'])
 def delete_booking(booking_id):
-    global bookings_db
-    bookings_db = [b for b in bookings_db if b['id'] != booking_id]
+    with SessionLocal() as db:
+        if not dashboard.delete_booking(db, booking_id):
+            return jsonify({"error": "Booking not found"}), 404
     return jsonify({"message": "Booking deleted successfully"}), 200
 
 # Restaurant Management
 @app.route('/api/restaurant/orders', methods=['GET'])
 def get_restaurant_orders():
-    return jsonify(restaurant_orders_db), 200
+    try:
+        args = page_args(status=request.args.get('status'))
+    except ValueError:
+        return jsonify({"error": "Invalid date"}), 400
+    with SessionLocal() as db:
+        return jsonify(dashboard.list_orders(db, **args).to_dict()), 200
 
 @app.route('/api/restaurant/orders', methods=['POST'])
 def create_restaurant_order():
     data = request.get_json()
-    new_order = {
-        "id": f"RO{random.randint(100, 999)}",
-        "orderType": data.get('orderType'),
-        "roomNumber": data.get('roomNumber'),
-        "tableNumber": data.get('tableNumber'),
-        "customerName": data.get('customerName'),
-        "items": data.get('items', []),
-        "totalAmount": data.get('totalAmount'),
-        "status": data.get('status', 'pending'),
-        "orderTime": datetime.now().isoformat(),
-        "estimatedDelivery": (datetime.now() + timedelta(minutes=30)).isoformat()
-    }
-    restaurant_orders_db.append(new_order)
-    return jsonify(new_order), 201
+    with SessionLocal() as db:
+        order = dashboard.create_order(db, data)
+        return jsonify(dashboard.serialize_order(order)), 201
 
 @app.route('/api/restaurant/orders/<order_id>', methods=['PUT'])
 def update_restaurant_order(order_id):
     data = request.get_json()
-    for i, order in enumerate(restaurant_orders_db):
-        if order['id'] == order_id:
-            restaurant_orders_db[i].update(data)
-            return jsonify(restaurant_orders_db[i]), 200
-    return jsonify({"error": "Order not found"}), 404
+    with SessionLocal() as db:
+        order = dashboard.update_order(db, order_id, data)
+        if order is None:
+            return jsonify({"error": "Order not found"}), 404
+        return jsonify(dashboard.serialize_order(order)), 200
 
 # Call Analytics
 @app.route('/api/calls/logs', methods=['GET'])
 def get_call_logs():
-    return jsonify(call_logs_db), 200
+    try:
+        args = page_args(sentiment=request.args.get('sentiment'), intent=request.args.get('intent'))
+    except ValueError:
+        return jsonify({"error": "Invalid date"}), 400
+    with SessionLocal() as db:
+        return jsonify(dashboard.list_call_logs(db, **args).to_dict()), 200
 
 @app.route('/api/calls/analytics', methods=['GET'])
 def get_call_analytics():
+    with SessionLocal() as db:
+        breakdown = dashboard.call_breakdown(db)
+    sentiment = breakdown["sentimentBreakdown"]
     analytics = {
-        "totalCalls": len(call_logs_db),
-        "avgDuration": sum(call['duration'] for call in call_logs_db) / len(call_logs_db) if call_logs_db else 0,
+        "totalCalls": breakdown["totalCalls"],
+        "avgDuration": breakdown["avgDuration"],
         "sentimentBreakdown": {
-            "positive": len([c for c in call_logs_db if c['sentiment'] == 'positive']),
-            "neutral": len([c for c in call_logs_db if c['sentiment'] == 'neutral']),
-            "negative": len([c for c in call_logs_db if c['sentiment'] == 'negative'])
+            "positive": sentiment.get("positive", 0),
+            "neutral": sentiment.get("neutral", 0),
+            "negative": sentiment.get("negative", 0)
         },
-        "resolutionRate": 92.5,
-        "avgSatisfaction": sum(call['satisfaction'] for call in call_logs_db) / len(call_logs_db) if call_logs_db else 0,
-        "callTypeBreakdown": {
-            "booking_inquiry": len([c for c in call_logs_db if c['callType'] == 'booking_inquiry']),
-            "room_service": len([c for c in call_logs_db if c['callType'] == 'room_service']),
-            "complaint": len([c for c in call_logs_db if c['callType'] == 'complaint']),
-            "general_inquiry": len([c for c in call_logs_db if c['callType'] == 'general_inquiry'])
-        }
+        "resolutionRate": breakdown["resolutionRate"],
+        "avgSatisfaction": breakdown["avgSatisfaction"],
+        "callTypeBreakdown": breakdown["intentBreakdown"]
     }
     return jsonify(analytics), 200
 
+@app.route('/api/calls/analytics/<timeframe>', methods=['GET'])
+def get_call_analytics_timeframe(timeframe):
+    with SessionLocal() as db:
+        try:
+            return jsonify(dashboard.call_analytics(db, timeframe)), 200
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
 # Live Call Monitoring
 @app.route('/api/calls/live', methods=['GET'])
 def get_live_calls():
-    return jsonify(live_calls_db), 200
+    return jsonify(live_calls.calls()), 200
+
+@app.route('/api/calls/live/stream', methods=['GET'])
+def stream_live_calls():
+    """Server-Sent Events: a snapshot of the live calls, then call_started/updated/ended deltas."""
+    return Response(
+        live_calls.stream(request.headers.get('Last-Event-ID')),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+@app.route('/api/calls/live/events', methods=['POST'])
+def publish_live_call_events():
+    """Receives batches of call events from the agent worker (live_feed/publisher.py)."""
+    token = os.environ.get('LIVE_FEED_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return jsonify({'error': 'Unauthorized'}), 401
+    events = (request.get_json(silent=True) or {}).get('events') or []
+    if any(event.get('type') not in EVENT_TYPES or not event.get('callId') for event in events):
+        return jsonify({'error': 'Invalid live call event'}), 400
+    for event in events:
+        live_calls.publish(event['type'], str(event['callId']), event.get('data'))
+    return jsonify({'published': len(events)}), 200
+
+@app.route('/api/calls/<call_id>/answer', methods=['POST'])
+def answer_live_call(call_id):
+    if live_calls.get(call_id) is None:
+        return jsonify({"error": "Call not found"}), 404
+    live_calls.publish(CALL_UPDATED, call_id, {"status": "active"})
+    return jsonify({"message": "Call answered successfully"}), 200
+
+@app.route('/api/calls/<call_id>/hold', methods=['POST'])
+def hold_live_call(call_id):
+    if live_calls.get(call_id) is None:
+        return jsonify({"error": "Call not found"}), 404
+    live_calls.publish(CALL_UPDATED, call_id, {"status": "on_hold"})
+    return jsonify({"message": "Call put on hold"}), 200
 
 @app.route('/api/calls/live/<call_id>/end', methods=['POST'])
+@app.route('/api/calls/<call_id>/end', methods=['POST'])
 def end_live_call(call_id):
-    global live_calls_db
-    for call in live_calls_db:
-        if call['id'] == call_id:
-            call['status'] = 'ended'
-            call['endTime'] = datetime.now().isoformat()
-            # Move to call logs
-            call_log = {
-                "id": call['id'],
-                "timestamp": call['startTime'],
-                "duration": random.randint(60, 300),
-                "callerNumber": call['callerNumber'],
-                "callType": call['callType'],
-                "sentiment": call['sentiment'],
-                "resolution": "handled",
-                "agentName": call['agentName'],
-                "transcript": call['liveTranscript'],
-                "satisfaction": random.uniform(3.5, 5.0)
-            }
-            call_logs_db.append(call_log)
-            live_calls_db.remove(call)
-            return jsonify({"message": "Call ended successfully"}), 200
-    return jsonify({"error": "Call not found"}), 404
+    call = live_calls.get(call_id)
+    if call is None:
+        return jsonify({"error": "Call not found"}), 404
+
+    end_time = datetime.now().isoformat()
+    # Move to call logs
+    with SessionLocal() as db:
+        dashboard.create_call_log(db, {
+            "startTime": call.get('startTime'),
+            "endTime": end_time,
+            "duration": random.randint(60, 300),
+            "callerNumber": call.get('callerNumber'),
+            "intent": call.get('callType'),
+            "sentiment": call.get('sentiment'),
+            "outcome": "handled",
+            "transcript": call.get('liveTranscript'),
+            "satisfaction": random.uniform(3.5, 5.0)
+        })
+    live_calls.publish(CALL_ENDED, call_id, {"status": "ended", "endTime": end_time})
+    return jsonify({"message": "Call ended successfully"}), 200
 
 if __name__ == '__main__':
     print("🏨 Starting Hotel Admin Dashboard Backend Server...")
@@ -0,0 +1,54 @@
+import random
+
+import pytest
+
+from livekit.agents.utils.audio import AudioByteStream
+
+
+@pytest.mark.parametrize("num_channels", [1, 2])
+@pytest.mark.parametrize("frame_pool_size", [0, 4])
+def test_audio_byte_stream_frames(num_channels: int, frame_pool_size: int):
+    rng = random.Random(0)
+    samples_per_channel = 160
+    frame_size = samples_per_channel * num_channels * 2
+    bstream = AudioByteStream(
+        16000, num_channels, samples_per_channel, frame_pool_size=frame_pool_size
+    )
+
+    data = b""
+    frames_data = []
+    for _ in range(200):
+        chunk = rng.randbytes(rng.choice([0, 1, 2, 3, 100, frame_size, 5000, 20000]))
+        data += chunk
+        # bytes, bytearray and memoryview are accepted
+        pushed = rng.choice([bytes, bytearray, memoryview])(chunk)
+        for frame in bstream.push(pushed):
+            assert frame.samples_per_channel == samples_per_channel
+            assert frame.num_channels == num_channels
+            frames_data.append(bytes(frame.data.cast("B")))
+
+    rest = len(data) % frame_size
+    assert b"".join(frames_data) == data[: len(data) - rest]
+
+    flushed = bstream.flush()
+    if rest % (num_channels * 2) == 0 and rest:
+        assert bytes(flushed[0].data.cast("B")) == data[-rest:]
+        assert flushed[0].samples_per_channel == rest // (num_channels * 2)
+    else:
+        assert flushed == []
+
+
+def test_audio_byte_stream_pool_reuse():
+    bstream = AudioByteStream(16000, 1, 160, frame_pool_size=2)
+
+    kept = bstream.push(bytes(320 * 4))
+    # the frames still referenced keep their data
+    assert len({id(frame.data.obj) for frame in kept}) == 4
+
+    buffers = set()
+    for i in range(10):
+        for frame in bstream.push(bytes([i]) * 320):
+            assert bytes(frame.data.cast("B")) == bytes([i]) * 320
+            buffers.add(id(frame.data.obj))
+    assert len(buffers) <= 2
+    assert all(bytes(frame.data.cast("B")) == bytes(320) for frame in kept)
@@ -0,0 +1,84 @@
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.availability import AvailabilityIndex
+from database.models import Base, Booking, Customer, Room
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all(
+        [
+            Room(id=1, room_number="101", room_type="Standard", price_per_night=3000, capacity=2),
+            Room(id=2, room_number="102", room_type="Deluxe", price_per_night=5000, capacity=3),
+            Room(id=3, room_number="201", room_type="Suite", price_per_night=9000, capacity=4),
+        ]
+    )
+    session.add(Customer(id=1, name="Test Guest", phone_number="+911234567890"))
+    session.commit()
+    yield session
+    session.close()
+
+
+def _book(db, room_id: int, check_in: date, nights: int) -> Booking:
+    booking = Booking(
+        customer_id=1,
+        room_id=room_id,
+        check_in_date=check_in,
+        check_out_date=check_in + timedelta(days=nights),
+        number_of_guests=1,
+    )
+    db.add(booking)
+    db.commit()
+    return booking
+
+
+def _free(index: AvailabilityIndex, check_in: date, nights: int, guests: int = 1) -> list[str]:
+    rooms = index.available_rooms(check_in, check_in + timedelta(days=nights), guests)
+    return [room.room_number for room in rooms]
+
+
+def test_half_open_intervals(db):
+    _book(db, 1, date(2025, 1, 10), 3)  # occupies the nights of the 10th, 11th and 12th
+
+    index = AvailabilityIndex()
+    index.load(db)
+
+    assert _free(index, date(2025, 1, 8), 2) == ["101", "102", "201"]  # checks out on the 10th
+    assert _free(index, date(2025, 1, 13), 1) == ["101", "102", "201"]  # checks in on the 13th
+    assert _free(index, date(2025, 1, 12), 1) == ["102", "201"]
+    assert _free(index, date(2025, 1, 1), 30) == ["102", "201"]
+
+
+def test_capacity_filter(db):
+    index = AvailabilityIndex()
+    index.load(db)
+
+    assert _free(index, date(2025, 1, 1), 1, guests=3) == ["102", "201"]
+    assert _free(index, date(2025, 1, 1), 1, guests=5) == []
+
+
+def test_incremental_updates(db):
+    index = AvailabilityIndex(max_staleness=3600)
+    index.load(db)
+
+    index.add_booking(_book(db, 2, date(2025, 2, 1), 2))
+    assert _free(index, date(2025, 2, 2), 1) == ["101", "201"]
+
+    # written by "another process": only visible once the index syncs
+    _book(db, 3, date(2025, 2, 1), 2)
+    index.sync(db)
+    assert _free(index, date(2025, 2, 2), 1) == ["101", "201"]
+    index.sync(db, force=True)
+    assert _free(index, date(2025, 2, 2), 1) == ["101"]
+
+    # the locally added booking must not be indexed twice
+    index.sync(db, force=True)
+    index.add_booking(db.get(Booking, 1))
+    assert len(index._calendars[2].starts) == 1
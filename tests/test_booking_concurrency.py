@@ -0,0 +1,100 @@
+import asyncio
+import multiprocessing
+import random
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from database import async_database
+from database.models import Base, Booking, Room, configure_sqlite_engine
+
+NUM_PROCESSES = 6
+CALLS_PER_PROCESS = 8
+
+
+def _worker(db_url: str, seed: int, results) -> None:
+    async def _run() -> None:
+        engine = create_async_engine(db_url)
+        configure_sqlite_engine(engine.sync_engine)
+        sessions = async_database.create_async_sessionmaker(engine)
+        rng = random.Random(seed)
+
+        async def _book(i: int) -> bool:
+            check_in = date(2025, 6, 1) + timedelta(days=rng.randrange(10))
+            async with sessions() as db:
+                result = await async_database.book_room(
+                    db,
+                    f"Guest {seed}-{i}",
+                    f"+91{seed:04d}{i:06d}",
+                    rng.choice([1, 2]),
+                    check_in,
+                    check_in + timedelta(days=rng.randint(1, 4)),
+                    2,
+                )
+            return result.confirmed
+
+        # concurrent calls inside one process, like several jobs sharing a worker
+        confirmed = await asyncio.gather(*(_book(i) for i in range(CALLS_PER_PROCESS)))
+        results.put(sum(confirmed))
+        await engine.dispose()
+
+    asyncio.run(_run())
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(), reason="requires fork start method"
+)
+def test_concurrent_bookings_never_overlap(tmp_path):
+    db_file = tmp_path / "hotel.db"
+    engine = configure_sqlite_engine(create_engine(f"sqlite:///{db_file}"))
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(
+            Room.__table__.insert(),
+            [
+                {
+                    "id": 1,
+                    "room_number": "101",
+                    "room_type": "Deluxe",
+                    "price_per_night": 5000,
+                    "capacity": 2,
+                },
+                {
+                    "id": 2,
+                    "room_number": "102",
+                    "room_type": "Deluxe",
+                    "price_per_night": 5000,
+                    "capacity": 2,
+                },
+            ],
+        )
+
+    mp_ctx = multiprocessing.get_context("fork")
+    results = mp_ctx.Queue()
+    procs = [
+        mp_ctx.Process(target=_worker, args=(f"sqlite+aiosqlite:///{db_file}", seed, results))
+        for seed in range(NUM_PROCESSES)
+    ]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join(timeout=60)
+        assert proc.exitcode == 0
+
+    confirmed = sum(results.get(timeout=5) for _ in procs)
+
+    with engine.connect() as conn:
+        bookings = conn.execute(
+            select(Booking.room_id, Booking.check_in_date, Booking.check_out_date).order_by(
+                Booking.room_id, Booking.check_in_date
+            )
+        ).all()
+
+    assert confirmed == len(bookings) > 0
+    # 48 random stays over 10 days in 2 rooms: most of them must have been rejected
+    assert len(bookings) < NUM_PROCESSES * CALLS_PER_PROCESS
+    for prev, cur in zip(bookings, bookings[1:]):
+        if prev.room_id == cur.room_id:
+            assert prev.check_out_date <= cur.check_in_date, f"overlap: {prev} / {cur}"
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from database.conversation_log import ConversationLogWriter
+from database.models import Base, CallSession, ConversationTurn
+
+
+@pytest.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'turns.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(CallSession.__table__.insert(), [{"id": 1}])
+    yield engine
+    await engine.dispose()
+
+
+async def _turns(engine) -> list[tuple[str, str]]:
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            select(ConversationTurn.speaker, ConversationTurn.text).order_by(
+                ConversationTurn.timestamp
+            )
+        )
+        return [tuple(row) for row in result]
+
+
+async def test_flush_on_batch_size(engine):
+    writer = ConversationLogWriter(engine, max_batch_size=3, flush_interval=60)
+    writer.start()
+
+    writer.log(1, "user", "namaste")
+    writer.log(1, "agent", "namaste, kaise help karu?")
+    await asyncio.sleep(0.05)
+    assert writer.metrics().queue_depth == 2
+    assert await _turns(engine) == []
+
+    writer.log(1, "user", "room chahiye")
+    for _ in range(50):
+        if writer.metrics().flush_count:
+            break
+        await asyncio.sleep(0.01)
+
+    metrics = writer.metrics()
+    assert metrics.flush_count == 1 and metrics.flushed_turns == 3 and metrics.queue_depth == 0
+    assert await _turns(engine) == [
+        ("user", "namaste"),
+        ("agent", "namaste, kaise help karu?"),
+        ("user", "room chahiye"),
+    ]
+    await writer.aclose()
+
+
+async def test_flush_on_close(engine):
+    writer = ConversationLogWriter(engine, max_batch_size=100, flush_interval=60)
+    writer.start()
+    for i in range(10):
+        writer.log(1, "user", f"turn {i}")
+
+    await writer.aclose()
+    assert [text for _, text in await _turns(engine)] == [f"turn {i}" for i in range(10)]
+
+    writer.log(1, "user", "too late")
+    assert writer.metrics().queue_depth == 0
+
+
+async def test_failed_flush_keeps_turns(engine):
+    writer = ConversationLogWriter(engine, max_batch_size=100, flush_interval=60)
+    async with engine.begin() as conn:
+        await conn.run_sync(ConversationTurn.__table__.drop)
+
+    writer.log(1, "user", "hello")
+    await writer.flush()
+    assert writer.metrics().failed_flushes == 1
+    assert writer.metrics().queue_depth == 1
+
+    async with engine.begin() as conn:
+        await conn.run_sync(ConversationTurn.__table__.create)
+    await writer.aclose()
+    assert await _turns(engine) == [("user", "hello")]
@@ -0,0 +1,158 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from database import dashboard
+from database.availability import availability_index
+from database.models import Base, Room, configure_sqlite_engine
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = configure_sqlite_engine(create_engine(f"sqlite:///{tmp_path / 'hotel.db'}"))
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all(
+        [
+            Room(
+                id=1, room_number="101", room_type="Standard Room", price_per_night=3000, capacity=2
+            ),
+            Room(
+                id=2, room_number="201", room_type="Deluxe Suite", price_per_night=5000, capacity=3
+            ),
+        ]
+    )
+    session.commit()
+    availability_index.invalidate()
+    yield session
+    session.close()
+    availability_index.invalidate()
+    engine.dispose()
+
+
+def _book(db, day: int, **kwargs):
+    result = dashboard.create_booking(
+        db,
+        {
+            "guestName": f"Guest {day}",
+            "phone": f"+91{day:010d}",
+            "checkIn": f"2025-01-{day:02d}",
+            "checkOut": f"2025-01-{day + 1:02d}",
+            "roomNumber": "101",
+            **kwargs,
+        },
+    )
+    assert result.confirmed
+    return result.booking
+
+
+def test_cursor_pagination(db):
+    for day in range(1, 8):
+        _book(db, day)
+
+    ids, cursor = [], None
+    while True:
+        page = dashboard.list_bookings(db, cursor=cursor, limit=3)
+        ids.extend(item["id"] for item in page.items)
+        if page.next_cursor is None:
+            break
+        cursor = page.next_cursor
+
+    assert ids == [f"BK{i:03d}" for i in range(7, 0, -1)]
+
+
+def test_filters(db):
+    _book(db, 1, status="pending")
+    _book(db, 2)
+    _book(db, 3, status="pending")
+
+    page = dashboard.list_bookings(db, status="pending")
+    assert [b["checkIn"] for b in page.items] == ["2025-01-03", "2025-01-01"]
+
+    page = dashboard.list_bookings(db, date_from=date(2025, 1, 2), date_to=date(2025, 1, 3))
+    assert [b["checkIn"] for b in page.items] == ["2025-01-03", "2025-01-02"]
+
+
+def test_room_selection_and_conflicts(db):
+    booking = _book(db, 10)
+    assert booking.total_amount == 3000
+
+    # the same room is taken, the dashboard gets the conflict back
+    result = dashboard.create_booking(
+        db,
+        {
+            "guestName": "B",
+            "phone": "2",
+            "checkIn": "2025-01-10",
+            "checkOut": "2025-01-12",
+            "roomNumber": "101",
+        },
+    )
+    assert not result.confirmed and result.conflicts == [(date(2025, 1, 10), date(2025, 1, 11))]
+    assert [room.room_number for room in result.alternatives] == ["201"]
+
+    # without a room number, a free room of the requested type is picked
+    result = dashboard.create_booking(
+        db,
+        {
+            "guestName": "B",
+            "phone": "2",
+            "checkIn": "2025-01-10",
+            "checkOut": "2025-01-12",
+            "roomType": "Deluxe Suite",
+        },
+    )
+    assert result.booking.room.room_number == "201"
+
+    with pytest.raises(ValueError):
+        dashboard.create_booking(db, {"guestName": "B", "phone": "2", "checkIn": "2025-01-10"})
+
+
+def test_cancel_and_delete_free_the_room(db):
+    booking = _book(db, 20)
+    assert dashboard.get_booking(db, "BK001") is booking
+    assert dashboard.get_booking(db, "nope") is None
+
+    dashboard.update_booking(db, "BK001", {"status": "cancelled"})
+    assert [
+        r.room_number
+        for r in availability_index.available_rooms(date(2025, 1, 20), date(2025, 1, 21), 1)
+    ] == ["101", "201"]
+
+    rebooked = _book(db, 20)
+    with pytest.raises(dashboard.BookingConflictError):
+        dashboard.update_booking(db, "BK001", {"status": "confirmed"})
+
+    assert dashboard.delete_booking(db, public_id := dashboard.public_id("BK", rebooked.id))
+    assert not dashboard.delete_booking(db, public_id)
+    assert [
+        r.room_number
+        for r in availability_index.available_rooms(date(2025, 1, 20), date(2025, 1, 21), 1)
+    ] == ["101", "201"]
+
+
+def test_reinstatement_takes_the_write_lock(db):
+    _book(db, 25)
+    dashboard.update_booking(db, "BK001", {"status": "cancelled"})
+
+    statements = []
+    engine = db.get_bind()
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)  # noqa: E731
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        booking = dashboard.update_booking(db, "BK001", {"status": "confirmed"})
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert booking.status == "confirmed"
+    # the overlap check and the update run in one transaction holding the write lock
+    begin = statements.index("BEGIN IMMEDIATE")
+    update = next(i for i, s in enumerate(statements) if s.startswith("UPDATE bookings"))
+    assert begin < update
+    assert not any(s.startswith("BEGIN") for s in statements[begin + 1 : update])
+    assert [
+        r.room_number
+        for r in dashboard.get_available_rooms(db, date(2025, 1, 25), date(2025, 1, 26), 1)
+    ] == ["201"]
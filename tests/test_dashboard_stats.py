@@ -0,0 +1,140 @@
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from database import dashboard
+from database.availability import availability_index
+from database.models import Base, Room, StatsRollup, configure_sqlite_engine
+from database.stats import StatsAggregator, dashboard_stats, utcnow
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = configure_sqlite_engine(create_engine(f"sqlite:///{tmp_path / 'hotel.db'}"))
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(
+        Room(id=1, room_number="101", room_type="Standard Room", price_per_night=3000, capacity=2)
+    )
+    session.add(
+        Room(id=2, room_number="201", room_type="Deluxe Suite", price_per_night=5000, capacity=3)
+    )
+    session.commit()
+    availability_index.invalidate()
+    dashboard_stats.invalidate()
+    yield session
+    session.close()
+    availability_index.invalidate()
+    dashboard_stats.invalidate()
+    dashboard_stats.persist = False
+    engine.dispose()
+
+
+def _book(db, nights=2, **kwargs):
+    today = utcnow().date()
+    result = dashboard.create_booking(
+        db,
+        {
+            "guestName": "Guest",
+            "phone": "+910000000001",
+            "checkIn": today.isoformat(),
+            "checkOut": (today + timedelta(days=nights)).isoformat(),
+            **kwargs,
+        },
+    )
+    assert result.confirmed
+    return result.booking
+
+
+def _call(db, sentiment, intent, outcome, duration=100):
+    now = utcnow()
+    return dashboard.create_call_log(
+        db,
+        {
+            "sentiment": sentiment,
+            "intent": intent,
+            "outcome": outcome,
+            "duration": duration,
+            "satisfaction": 4.0,
+            "startTime": now.isoformat(),
+            "endTime": now.isoformat(),
+        },
+    )
+
+
+def _recount(db) -> dict:
+    # the same numbers, aggregated from scratch
+    fresh = StatsAggregator()
+    fresh.rebuild(db)
+    return {
+        m: fresh.total(m)
+        for m in ("bookings", "revenue", "bookings.cancelled", "orders", "orders.pending")
+    }
+
+
+def test_counters_follow_writes(db):
+    booking = _book(db, roomNumber="101")
+    _book(db, roomNumber="201", totalAmount=1000)
+    order = dashboard.create_order(db, {"items": [{"price": 100, "quantity": 3}]})
+
+    totals = dashboard.dashboard_totals(db)
+    assert totals["totalBookings"] == totals["todaysBookings"] == 2
+    assert totals["revenue"] == totals["revenueToday"] == 6000 + 1000
+    assert totals["occupancyRate"] == 100.0
+    assert totals["pendingOrders"] == 1
+
+    dashboard.update_booking(db, dashboard.public_id("BK", booking.id), {"status": "cancelled"})
+    dashboard.update_order(db, dashboard.public_id("ORD", order.id), {"status": "served"})
+    totals = dashboard.dashboard_totals(db)
+    assert totals["revenue"] == 1000
+    assert totals["occupiedRooms"] == 1
+    assert totals["pendingOrders"] == 0
+
+    dashboard.delete_booking(db, dashboard.public_id("BK", booking.id))
+    assert dashboard.dashboard_totals(db)["totalBookings"] == 1
+    assert {m: dashboard_stats.total(m) for m in _recount(db)} == _recount(db)
+
+
+def test_call_analytics(db):
+    _call(db, "positive", "Booking Inquiry", "booking_made", duration=200)
+    _call(db, "negative", "Booking Inquiry", "abandoned")
+    _call(db, "positive", "Room Service", "completed")
+
+    analytics = dashboard.call_analytics(db, "week")
+    assert analytics["totalCalls"] == 3
+    assert analytics["resolutionRate"] == pytest.approx(66.7)
+    assert analytics["sentimentBreakdown"] == {"positive": 67, "neutral": 0, "negative": 33}
+    assert sum(hour["calls"] for hour in analytics["callVolume"]) == 3
+    assert analytics["conversionRates"][0] == {
+        "intent": "Booking Inquiry",
+        "calls": 2,
+        "conversions": 1,
+        "rate": 50,
+    }
+
+    with pytest.raises(ValueError):
+        dashboard.call_analytics(db, "decade")
+
+
+def test_rows_from_other_processes_are_synced(db):
+    dashboard_stats.sync(db)
+    # written behind the aggregator's back, like the voice agent does
+    other = sessionmaker(bind=db.get_bind())()
+    dashboard.create_order(other, {"totalAmount": 50})
+    other.close()
+
+    dashboard_stats.sync(db, force=True)
+    assert dashboard_stats.total("orders") == 1
+
+
+def test_persisted_counters_survive_a_restart(db):
+    dashboard_stats.persist = True
+    _book(db, roomNumber="101")
+    assert db.scalar(select(func.count()).select_from(StatsRollup)) > 0
+
+    restarted = StatsAggregator(persist=True)
+    restarted.load(db)
+    assert restarted.total("bookings") == 1
+    assert restarted.day("revenue", utcnow()) == 6000
@@ -0,0 +1,100 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from database import cache, database
+from database.cache import TTLCache
+from database.models import Base, Room, migrate_indexes
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'hotel.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    cache.history_cache.clear()
+    cache.customer_cache.clear()
+    session = sessionmaker(bind=engine)()
+    session.add(Room(id=1, room_number="101", room_type="Deluxe", price_per_night=5000, capacity=2))
+    session.commit()
+    yield session
+    session.close()
+
+
+def _count_statements(engine) -> list[str]:
+    statements: list[str] = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+def test_ttl_cache_expiry_and_lru(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+
+    c: TTLCache[str, int] = TTLCache(maxsize=2, ttl=10)
+    c.set("a", 1)
+    c.set("b", 2)
+    assert c.get("a") == 1
+    c.set("c", 3)  # evicts "b", the least recently used
+    assert c.get("b") is None and c.get("a") == 1 and c.get("c") == 3
+
+    now[0] = 11
+    assert c.get("a") is None
+    assert len(c) == 1
+
+
+def test_migrate_indexes_is_idempotent(engine):
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_conversation_turns_session_id_timestamp"))
+        conn.execute(text("DROP INDEX ix_bookings_room_id_dates"))
+
+    migrate_indexes(engine)
+    migrate_indexes(engine)
+
+    insp = inspect(engine)
+    assert {ix["name"] for ix in insp.get_indexes("conversation_turns")} == {
+        "ix_conversation_turns_session_id_timestamp"
+    }
+    assert {ix["name"] for ix in insp.get_indexes("bookings")} >= {
+        "ix_bookings_call_session_id",
+        "ix_bookings_room_id_dates",
+    }
+
+
+def test_repeat_caller_lookup(engine, db):
+    database.create_booking(
+        db, "Rajesh Sharma", "+919876543210", 1, date(2025, 3, 1), date(2025, 3, 3), 2
+    )
+    database.create_booking(
+        db, "Rajesh Sharma", "+919876543210", 1, date(2025, 4, 1), date(2025, 4, 2), 1
+    )
+
+    statements = _count_statements(engine)
+    customer = database.find_customer_by_phone(db, "+919876543210")
+    assert len(statements) == 1  # bookings and rooms are joined in, not lazy loaded
+    assert [b.room_number for b in customer.bookings] == ["101", "101"]
+
+    assert database.find_customer_by_phone(db, "+919876543210") is customer
+    assert len(statements) == 1
+
+    # a new booking invalidates the cached customer
+    database.create_booking(
+        db, "Rajesh Sharma", "+919876543210", 1, date(2025, 5, 1), date(2025, 5, 2), 1
+    )
+    assert len(database.find_customer_by_phone(db, "+919876543210").bookings) == 3
+
+
+def test_history_invalidated_on_write(db):
+    call = database.create_call_session(db)
+    database.log_conversation_turn(db, call.id, "user", "hello")
+    assert [t.text for t in database.get_conversation_history(db, call.id)] == ["hello"]
+
+    database.log_conversation_turn(db, call.id, "agent", "namaste")
+    assert [t.text for t in database.get_conversation_history(db, call.id)] == ["hello", "namaste"]
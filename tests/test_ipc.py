@@ -3,8 +3,11 @@ from __future__ import annotations
 import asyncio
 import ctypes
 import io
+import logging
 import multiprocessing as mp
+import os
 import socket
+import sys
 import time
 import uuid
 from dataclasses import dataclass
@@ -12,8 +15,10 @@ from multiprocessing.context import BaseContext
 from typing import ClassVar
 
 import psutil
+import pytest
 
 from livekit.agents import JobContext, JobProcess, ipc, job, utils
+from livekit.agents.inference_runner import _InferenceRunner
 from livekit.protocol import agent
 
 
@@ -107,9 +112,114 @@ def test_sync_channel():
     pch.close()
 
 
-def _generate_fake_job() -> job.RunningJobInfo:
+class _ListHandler(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.records: list[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+
+def test_log_queue():
+    mp_pch, mp_cch = socket.socketpair()
+    received = _ListHandler()
+    lger = logging.getLogger("test_log_queue")
+    lger.setLevel(logging.DEBUG)
+    lger.propagate = False
+    lger.addHandler(received)
+    logging.getLogger("livekit.agents").addHandler(received)  # the number of dropped records
+
+    def _prepare(record: logging.LogRecord) -> None:
+        record.pid = 42
+
+    listener = ipc.log_queue.LogQueueListener(utils.aio.duplex_unix._Duplex.open(mp_pch), _prepare)
+    listener.start()
+    handler = ipc.log_queue.LogQueueHandler(utils.aio.duplex_unix._Duplex.open(mp_cch))
+
+    def _log(level: int, msg: str, **extra: object) -> None:
+        record = lger.makeRecord(lger.name, level, __file__, 1, msg, None, None, extra=extra)
+        handler.handle(record)
+
+    _log(logging.INFO, "hello", job_id="job_a", data={"n": 1})
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = lger.makeRecord(
+            lger.name, logging.ERROR, __file__, 2, "failed", None, sys.exc_info()
+        )
+        handler.handle(record)
+
+    # 2 records below WARNING per second and per job, WARNING and above always go through
+    handler.set_limits(rate_limit=2, debug_sample_rate=0.0, job_id_fnc=lambda: "job_b")
+    for _ in range(10):
+        _log(logging.INFO, "limited")
+        _log(logging.DEBUG, "sampled out")
+    _log(logging.INFO, "limited", job_id="job_c")
+    _log(logging.WARNING, "important")
+
+    handler.close()
+    for _ in range(100):
+        if any(r.getMessage().startswith("log records") for r in received.records):
+            break
+        time.sleep(0.05)
+    listener.stop()
+    lger.removeHandler(received)
+    logging.getLogger("livekit.agents").removeHandler(received)
+
+    records = received.records
+    assert records[0].getMessage() == "hello"
+    assert records[0].job_id == "job_a"
+    assert records[0].data == {"n": 1}
+    assert records[0].pid == 42
+    assert records[0].process == os.getpid()
+    assert records[1].levelno == logging.ERROR
+    assert "ValueError: boom" in records[1].getMessage()
+
+    messages = [r.getMessage() for r in records[2:]]
+    assert messages.count("limited") == 3  # 2 of job_b, 1 of job_c
+    assert "sampled out" not in messages
+    assert "important" in messages
+    assert records[-1].rate_limited == {"job_b": 8}
+
+
+def test_shm_ring():
+    tx = ipc.shm_ring.ShmRing.create(64)
+    rx = ipc.shm_ring.ShmRing.attach(tx.name)
+    tx.unlink()  # both mapped it, the name isn't needed anymore
+
+    # references are read in the order they were written, wrapping around the ring
+    for i in range(20):
+        req = ipc.proto.InferenceRequest(method="m", request_id=str(i), data=bytes([i]) * 24)
+        ipc.shm_ring.put_payload(tx, req)
+        assert req.shm_ref is not None and req.data == b""
+
+        b = io.BytesIO()
+        req.write(b)
+        received = ipc.proto.InferenceRequest()
+        received.read(io.BytesIO(b.getvalue()))
+        ipc.shm_ring.take_payload(rx, received)
+        assert received.data == bytes([i]) * 24 and received.shm_ref is None
+
+    # payloads that don't fit in the free space are sent inline
+    first = ipc.proto.InferenceResponse(request_id="a", data=b"x" * 40)
+    second = ipc.proto.InferenceResponse(request_id="b", data=b"y" * 40)
+    ipc.shm_ring.put_payload(tx, first)
+    ipc.shm_ring.put_payload(tx, second)
+    assert first.shm_ref is not None
+    assert second.shm_ref is None and second.data == b"y" * 40
+    ipc.shm_ring.take_payload(rx, first)
+    assert first.data == b"x" * 40
+
+    rx.close()
+    tx.close()
+
+
+def _generate_fake_job(metadata: str = "") -> job.RunningJobInfo:
     return job.RunningJobInfo(
-        job=agent.Job(id="fake_job_" + str(uuid.uuid4().hex), type=agent.JobType.JT_ROOM),
+        job=agent.Job(
+            id="fake_job_" + str(uuid.uuid4().hex), type=agent.JobType.JT_ROOM, metadata=metadata
+        ),
         url="fake_url",
         token="fake_token",
         accept_arguments=job.JobAcceptArguments(name="", identity="", metadata=""),
@@ -122,6 +232,7 @@ class _StartArgs:
     initialize_counter: mp.Value
     entrypoint_counter: mp.Value
     shutdown_counter: mp.Value
+    proc_shutdown_counter: mp.Value
     initialize_simulate_work_time: float
     entrypoint_simulate_work_time: float
     shutdown_simulate_work_time: float
@@ -133,6 +244,7 @@ def _new_start_args(mp_ctx: BaseContext) -> _StartArgs:
         initialize_counter=mp_ctx.Value(ctypes.c_uint),
         entrypoint_counter=mp_ctx.Value(ctypes.c_uint),
         shutdown_counter=mp_ctx.Value(ctypes.c_uint),
+        proc_shutdown_counter=mp_ctx.Value(ctypes.c_uint),
         initialize_simulate_work_time=0.0,
         entrypoint_simulate_work_time=0.0,
         shutdown_simulate_work_time=0.0,
@@ -147,6 +259,12 @@ def _initialize_proc(proc: JobProcess) -> None:
     with start_args.initialize_counter.get_lock():
         start_args.initialize_counter.value += 1
 
+    async def _proc_shutdown() -> None:
+        with start_args.proc_shutdown_counter.get_lock():
+            start_args.proc_shutdown_counter.value += 1
+
+    proc.add_shutdown_callback(_proc_shutdown)
+
     time.sleep(start_args.initialize_simulate_work_time)
 
     with start_args.update_ev:
@@ -180,9 +298,27 @@ async def _job_entrypoint(job_ctx: JobContext) -> None:
         start_args.update_ev.notify()
 
 
-async def _wait_for_elements(q: asyncio.Queue, num_elements: int) -> None:
-    for _ in range(num_elements):
-        await q.get()
+async def _crashing_job_entrypoint(job_ctx: JobContext) -> None:
+    if job_ctx.job.metadata == "crash":
+        raise RuntimeError("job crashed")
+
+    await _job_entrypoint(job_ctx)
+
+
+async def _busy_job_entrypoint(job_ctx: JobContext) -> None:
+    end = time.process_time() + 1.0
+    while time.process_time() < end:
+        pass
+
+    await _job_entrypoint(job_ctx)
+
+
+async def _wait_for_elements(q: asyncio.Queue, num_elements: int, timeout: float = 30.0) -> None:
+    async def _wait() -> None:
+        for _ in range(num_elements):
+            await q.get()
+
+    await asyncio.wait_for(_wait(), timeout=timeout)
 
 
 async def test_proc_pool():
@@ -201,6 +337,7 @@ async def test_proc_pool():
         memory_limit_mb=0,
         mp_ctx=mp_ctx,
         loop=loop,
+        http_proxy=None,
     )
 
     start_args = _new_start_args(mp_ctx)
@@ -231,7 +368,7 @@ async def test_proc_pool():
         close_q.put_nowait(None)
         exitcodes.append(proc.exitcode)
 
-    pool.start()
+    await pool.start()
 
     await _wait_for_elements(created_q, num_idle_processes)
     await _wait_for_elements(start_q, num_idle_processes)
@@ -264,6 +401,282 @@ async def test_proc_pool():
         assert exitcode == 0, f"process did not exit cleanly: {exitcode}"
 
 
+async def test_shared_proc_pool():
+    mp_ctx = mp.get_context("spawn")
+    loop = asyncio.get_running_loop()
+    pool = ipc.proc_pool.ProcPool(
+        initialize_process_fnc=_initialize_proc,
+        job_entrypoint_fnc=_crashing_job_entrypoint,
+        num_idle_processes=2,
+        job_executor_type=job.JobExecutorType.SHARED_PROCESS,
+        jobs_per_process=2,
+        initialize_timeout=20.0,
+        close_timeout=20.0,
+        inference_executor=None,
+        memory_warn_mb=0,
+        memory_limit_mb=0,
+        mp_ctx=mp_ctx,
+        loop=loop,
+        http_proxy=None,
+    )
+
+    start_args = _new_start_args(mp_ctx)
+    start_args.entrypoint_simulate_work_time = 2.0
+
+    @pool.on("process_created")
+    def _process_created(proc: ipc.job_shared_proc_executor.SharedJobExecutor):
+        proc.user_arguments = start_args
+
+    await pool.start()
+
+    # both idle slots are in the same, prewarmed once, process
+    assert len(pool.processes) == 2
+    assert pool.processes[0].pid == pool.processes[1].pid
+    assert start_args.initialize_counter.value == 1
+
+    crashing, healthy = _generate_fake_job("crash"), _generate_fake_job()
+    await pool.launch_job(crashing)
+    await pool.launch_job(healthy)
+    crashed_slot = pool.get_by_job_id(crashing.job.id)
+    healthy_slot = pool.get_by_job_id(healthy.job.id)
+    assert crashed_slot.pid == healthy_slot.pid
+
+    # the crashed job is closed like any other, its sibling keeps running
+    await asyncio.sleep(0.5)
+    await crashed_slot.aclose()
+    assert crashed_slot.status == ipc.job_executor.JobStatus.FAILED
+    assert healthy_slot.status == ipc.job_executor.JobStatus.RUNNING
+
+    await healthy_slot.join()
+    assert healthy_slot.status == ipc.job_executor.JobStatus.SUCCESS
+    assert healthy_slot.usage.cpu_time > 0
+    assert start_args.entrypoint_counter.value == 1
+    assert start_args.shutdown_counter.value == 1
+
+    pids = {proc.pid for proc in pool.processes} | {healthy_slot.pid}
+    await pool.aclose()
+    for pid in pids:
+        assert not psutil.pid_exists(pid)
+
+
+async def test_zygote_proc_pool():
+    mp_ctx = mp.get_context("spawn")
+    loop = asyncio.get_running_loop()
+    num_idle_processes = 3
+    pool = ipc.proc_pool.ProcPool(
+        initialize_process_fnc=_initialize_proc,
+        job_entrypoint_fnc=_job_entrypoint,
+        num_idle_processes=num_idle_processes,
+        job_executor_type=job.JobExecutorType.PROCESS,
+        use_zygote=True,
+        initialize_timeout=20.0,
+        close_timeout=20.0,
+        inference_executor=None,
+        memory_warn_mb=0,
+        memory_limit_mb=0,
+        mp_ctx=mp_ctx,
+        loop=loop,
+        http_proxy=None,
+    )
+
+    start_args = _new_start_args(mp_ctx)
+    exitcodes = {}
+
+    @pool.on("process_created")
+    def _process_created(proc: ipc.job_proc_executor.ProcJobExecutor):
+        proc.user_arguments = start_args
+
+    @pool.on("process_closed")
+    def _process_closed(proc: ipc.job_proc_executor.ProcJobExecutor):
+        exitcodes[proc.pid] = proc.exitcode
+
+    await pool.start()
+
+    # the idle processes are forks of the zygote, the only one running initialize_process_fnc
+    zygote_pid = pool._zygote.proc.pid
+    pids = {proc.pid for proc in pool.processes}
+    assert len(pids) == num_idle_processes
+    assert zygote_pid not in pids
+    assert all(psutil.Process(pid).ppid() == zygote_pid for pid in pids)
+    assert start_args.initialize_counter.value == 1
+
+    fake_job = _generate_fake_job()
+    await pool.launch_job(fake_job)
+    job_proc = pool.get_by_job_id(fake_job.job.id)
+    await job_proc.join()
+    assert job_proc.status == ipc.job_executor.JobStatus.SUCCESS
+    assert job_proc.exitcode == 0
+    assert start_args.entrypoint_counter.value == 1
+
+    # a forked process killed from outside is reported like any other child process
+    idle_proc = next(p for p in pool.processes if p.running_job is None)
+    psutil.Process(idle_proc.pid).kill()
+    await idle_proc.join()
+    assert idle_proc.exitcode == -9
+
+    pids |= {proc.pid for proc in pool.processes}
+    await pool.aclose()
+    assert start_args.initialize_counter.value == 1
+    assert exitcodes[job_proc.pid] == 0
+    for pid in pids | {zygote_pid}:
+        assert not psutil.pid_exists(pid)
+
+
+def test_idle_autoscaler():
+    scaler = ipc.idle_autoscaler.IdleAutoscaler(
+        min_idle=1, max_idle=8, warm_hit_target=0.95, memory_budget_mb=500
+    )
+    assert scaler.target(now=0.0) == 1
+
+    scaler.on_process_ready(2.0, memory_mb=100)
+    assert scaler.max_idle == 5
+
+    # a burst of 2 jobs/s, ~4 expected arrivals during a 2s spawn: capped by the memory budget
+    for i in range(8):
+        scaler.on_job_arrival(now=i * 0.5)
+    assert 2.0 <= scaler.arrival_rate(now=3.5) <= 2.5
+    assert scaler.target(now=3.5) == 5
+
+    # the rate decays once the jobs stop, the pool only shrinks after SCALE_DOWN_DELAY
+    assert scaler.arrival_rate(now=63.5) < 0.2
+    assert scaler.target(now=63.5) == 5
+    assert scaler.target(now=3.5 + ipc.idle_autoscaler.SCALE_DOWN_DELAY) == 1
+
+    # bigger processes lower the budgeted maximum right away
+    for i in range(8):
+        scaler.on_job_arrival(now=200 + i * 0.5)
+    assert scaler.target(now=203.5) == 5
+    scaler.on_process_ready(2.0, memory_mb=400)
+    assert scaler.max_idle == 2
+    assert scaler.target(now=203.5) == 2
+
+
+class _BatchEchoRunner(_InferenceRunner):
+    INFERENCE_METHOD = "test_batch_echo"
+    BATCH_WINDOW = 0.05
+    MAX_BATCH_SIZE = 4
+
+    def initialize(self) -> None:
+        pass
+
+    def run(self, data: bytes) -> bytes | None:
+        if data == b"fail":
+            raise ValueError("bad input")
+        return data + b":1"
+
+    def run_batch(self, data: list[bytes]) -> list[bytes | None]:
+        if b"fail" in data:
+            raise ValueError("bad input in the batch")
+        return [d + f":{len(data)}".encode() for d in data]
+
+
+async def test_inference_batching():
+    inference = ipc.inference_proc_executor.InferenceProcExecutor(
+        runners={_BatchEchoRunner.INFERENCE_METHOD: _BatchEchoRunner},
+        initialize_timeout=20.0,
+        close_timeout=5.0,
+        memory_warn_mb=0,
+        memory_limit_mb=0,
+        ping_interval=2.5,
+        ping_timeout=10.0,
+        high_ping_threshold=1.0,
+        mp_ctx=mp.get_context("spawn"),
+        loop=asyncio.get_running_loop(),
+        http_proxy=None,
+    )
+    await inference.start()
+    await inference.initialize()
+
+    async def _infer(data: bytes) -> bytes | None:
+        return await inference.do_inference(_BatchEchoRunner.INFERENCE_METHOD, data)
+
+    # requests sent together are run in batches of up to MAX_BATCH_SIZE
+    results = await asyncio.gather(*(_infer(str(i).encode()) for i in range(8)))
+    for i, res in enumerate(results):
+        assert res is not None
+        data, batch_size = res.split(b":")
+        assert data == str(i).encode()
+        assert 1 < int(batch_size) <= 4
+
+    # a batch that fails is retried one by one, only the bad request gets an error
+    results = await asyncio.gather(
+        _infer(b"a"), _infer(b"fail"), _infer(b"b"), return_exceptions=True
+    )
+    assert results[0] == b"a:1" and results[2] == b"b:1"
+    assert isinstance(results[1], RuntimeError)
+
+    await inference.aclose()
+
+
+class _PidRunner(_InferenceRunner):
+    INFERENCE_METHOD = "test_pid"
+
+    def initialize(self) -> None:
+        pass
+
+    def run(self, data: bytes) -> bytes | None:
+        if data == b"crash":
+            os._exit(1)
+        time.sleep(float(data))
+        return str(os.getpid()).encode()
+
+
+async def test_inference_pool():
+    pool = ipc.inference_pool.InferencePool(
+        num_processes=2,
+        runners={_PidRunner.INFERENCE_METHOD: _PidRunner},
+        initialize_timeout=20.0,
+        close_timeout=5.0,
+        memory_warn_mb=0,
+        memory_limit_mb=0,
+        ping_interval=0.5,
+        ping_timeout=10.0,
+        high_ping_threshold=1.0,
+        mp_ctx=mp.get_context("spawn"),
+        loop=asyncio.get_running_loop(),
+        http_proxy=None,
+        stuck_timeout=1.0,
+    )
+    await pool.start()
+    await pool.initialize()
+    assert len(pool.processes) == 2
+
+    async def _infer(data: bytes) -> int:
+        res = await pool.do_inference(_PidRunner.INFERENCE_METHOD, data)
+        assert res is not None
+        return int(res)
+
+    async def _wait_for_processes(count: int) -> None:
+        for _ in range(100):
+            if len(pool.processes) == count:
+                return
+            await asyncio.sleep(0.1)
+        raise AssertionError(f"expected {count} processes, got {len(pool.processes)}")
+
+    # concurrent requests are spread over the processes, sequential ones stay on one of them
+    assert len(set(await asyncio.gather(*(_infer(b"0.3") for _ in range(4))))) == 2
+    assert len({await _infer(b"0") for _ in range(4)}) == 1
+
+    # a process that crashes is restarted
+    pids = {p.pid for p in pool.processes}
+    with pytest.raises(RuntimeError):
+        await pool.do_inference(_PidRunner.INFERENCE_METHOD, b"crash")
+    await _wait_for_processes(1)
+    await _wait_for_processes(2)
+    assert len({p.pid for p in pool.processes} - pids) == 1
+
+    # a process stuck on a request is killed, the other one keeps serving
+    stuck = asyncio.create_task(_infer(b"60"))
+    await asyncio.sleep(0.2)
+    assert await _infer(b"0") in {p.pid for p in pool.processes}
+    with pytest.raises(RuntimeError):
+        await asyncio.wait_for(stuck, timeout=5)
+    await _wait_for_processes(2)
+
+    await pool.aclose()
+    assert not pool.is_alive()
+
+
 async def test_slow_initialization():
     mp_ctx = mp.get_context("spawn")
     loop = asyncio.get_running_loop()
@@ -280,6 +693,7 @@ async def test_slow_initialization():
         memory_limit_mb=0,
         mp_ctx=mp_ctx,
         loop=loop,
+        http_proxy=None,
     )
 
     start_args = _new_start_args(mp_ctx)
@@ -301,7 +715,9 @@ async def test_slow_initialization():
         pids.append(proc.pid)
         exitcodes.append(proc.exitcode)
 
-    pool.start()
+    # the idle processes never finish initializing, so the pool never gets ready
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(pool.start(), timeout=5.0)
 
     await _wait_for_elements(start_q, num_idle_processes)
     await _wait_for_elements(close_q, num_idle_processes)
@@ -322,12 +738,14 @@ def _create_proc(
     close_timeout: float,
     mp_ctx: BaseContext,
     initialize_timeout: float = 20.0,
+    job_entrypoint_fnc=_job_entrypoint,
+    usage_interval: float = 5.0,
 ) -> tuple[ipc.job_proc_executor.ProcJobExecutor, _StartArgs]:
     start_args = _new_start_args(mp_ctx)
     loop = asyncio.get_running_loop()
     proc = ipc.job_proc_executor.ProcJobExecutor(
         initialize_process_fnc=_initialize_proc,
-        job_entrypoint_fnc=_job_entrypoint,
+        job_entrypoint_fnc=job_entrypoint_fnc,
         initialize_timeout=initialize_timeout,
         close_timeout=close_timeout,
         memory_warn_mb=0,
@@ -338,6 +756,8 @@ def _create_proc(
         inference_executor=None,
         mp_ctx=mp_ctx,
         loop=loop,
+        http_proxy=None,
+        usage_interval=usage_interval,
     )
     proc.user_arguments = start_args
     return proc, start_args
@@ -354,6 +774,7 @@ async def test_shutdown_no_job():
     assert proc.exitcode == 0
     assert not proc.killed
     assert start_args.shutdown_counter.value == 0, "shutdown_cb isn't called when there is no job"
+    assert start_args.proc_shutdown_counter.value == 1
 
 
 async def test_job_slow_shutdown():
@@ -391,3 +812,139 @@ async def test_job_graceful_shutdown():
     assert proc.exitcode == 0, "process should have exited cleanly"
     assert not proc.killed
     assert start_args.shutdown_counter.value == 1
+    assert start_args.proc_shutdown_counter.value == 1
+
+
+def test_job_usage():
+    usage = ipc.resource_usage.JobUsage(started_at=time.time() - 10.0)
+    usage.add_sample(cpu_time=2.0, cpu_cores=0.5, memory_mb=300.0, loop_lag=0.05)
+    usage.add_sample(cpu_time=5.0, cpu_cores=0.2, memory_mb=200.0, loop_lag=0.01)
+    assert usage.cpu_time == 5.0
+    assert usage.memory_mb == 200.0
+    assert usage.peak_memory_mb == 300.0
+    assert usage.max_loop_lag == 0.05
+    assert usage.avg_cpu_cores == pytest.approx(0.5, rel=0.05)
+
+    usage.end()
+    ended_at = usage.ended_at
+    assert ended_at is not None
+    usage.end()
+    assert usage.ended_at == ended_at
+
+    rate = ipc.resource_usage.CpuRate()
+    assert rate.update(1.0) == 0.0
+    time.sleep(0.1)
+    assert rate.update(1.05) == pytest.approx(0.5, rel=0.3)
+
+
+async def test_proc_job_usage():
+    mp_ctx = mp.get_context("spawn")
+    proc, _ = _create_proc(
+        close_timeout=10.0,
+        mp_ctx=mp_ctx,
+        job_entrypoint_fnc=_busy_job_entrypoint,
+        usage_interval=0.2,
+    )
+    await proc.start()
+    await proc.initialize()
+
+    await proc.launch_job(_generate_fake_job())
+    await proc.join()
+
+    usage = proc.usage
+    assert usage.ended_at is not None
+    assert usage.cpu_time > 0.5  # the job burns 1s of CPU, not counting the prewarm
+    assert usage.peak_memory_mb > 0
+    assert proc.proc_usage is not None
+
+
+def _blocking_call() -> None:
+    time.sleep(0.3)
+
+
+async def test_loop_stall_profiler(tmp_path, caplog):
+    profiler = ipc.loop_profiler.LoopStallProfiler(
+        asyncio.get_running_loop(),
+        threshold=0.05,
+        job_id_fnc=lambda: "fake_job",
+        profile_dir=str(tmp_path),
+    )
+    profiler.start()
+    await asyncio.sleep(0.1)
+    _blocking_call()
+    await asyncio.sleep(0.1)
+    profiler.job_ended("fake_job")
+    profiler.stop()
+
+    stalls = [r for r in caplog.records if r.getMessage() == "event loop stalled"]
+    assert len(stalls) == 1
+    assert stalls[0].job_id == "fake_job"
+    assert 0.2 < stalls[0].duration < 0.4
+    assert "_blocking_call" in stalls[0].stack[-1]
+
+    summary = [r for r in caplog.records if r.getMessage().startswith("the event loop of the job")]
+    assert len(summary) == 1
+    assert summary[0].stalls == 1
+
+    lines = (tmp_path / "fake_job.collapsed").read_text().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert "test_loop_stall_profiler" in stack and "_blocking_call" in stack.split(";")[-1]
+    assert int(count) > 10
+
+
+def _noop_initialize_proc(proc: JobProcess) -> None:
+    pass
+
+
+async def _pipelined_job_entrypoint(job_ctx: JobContext) -> None:
+    results = job_ctx.proc.user_arguments
+    results.put(("started", job_ctx._info.token))
+    await job_ctx._assigned.wait()
+    results.put(("assigned", job_ctx._info.token))
+    await job_ctx._on_first_audio()
+    job_ctx.shutdown("done")
+
+
+@pytest.mark.parametrize(
+    "executor_type", [job.JobExecutorType.PROCESS, job.JobExecutorType.SHARED_PROCESS]
+)
+async def test_pipelined_job_assignment(executor_type):
+    mp_ctx = mp.get_context("spawn")
+    loop = asyncio.get_running_loop()
+    pool = ipc.proc_pool.ProcPool(
+        initialize_process_fnc=_noop_initialize_proc,
+        job_entrypoint_fnc=_pipelined_job_entrypoint,
+        num_idle_processes=1,
+        job_executor_type=executor_type,
+        jobs_per_process=2,
+        initialize_timeout=20.0,
+        close_timeout=20.0,
+        inference_executor=None,
+        memory_warn_mb=0,
+        memory_limit_mb=0,
+        mp_ctx=mp_ctx,
+        loop=loop,
+        http_proxy=None,
+    )
+    results = mp_ctx.Queue()
+    pool.on("process_created", lambda proc: setattr(proc, "user_arguments", results))
+    await pool.start()
+
+    info = _generate_fake_job()
+    info.token = ""
+    info.request_received_at = time.time()
+    executor = await pool.launch_job(info)
+
+    # the entrypoint runs before the job is assigned
+    assert await loop.run_in_executor(None, results.get, True, 10) == ("started", "")
+    await executor.assign_job("ws://assigned", "assigned_token")
+    assert await loop.run_in_executor(None, results.get, True, 10) == (
+        "assigned",
+        "assigned_token",
+    )
+    assert executor.running_job.token == "assigned_token"
+
+    await executor.join()
+    assert executor.status == ipc.job_executor.JobStatus.SUCCESS
+    await pool.aclose()
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import threading
+
+import pytest
+from aiohttp import web
+
+from live_feed import CALL_ENDED, CALL_STARTED, CALL_UPDATED, LiveCallBroker
+from live_feed.publisher import LiveCallPublisher
+
+
+def _parse(chunk: str):
+    fields = dict(
+        line.split(": ", 1) for line in chunk.strip().splitlines() if not line.startswith(":")
+    )
+    return fields.get("event"), json.loads(fields["data"]) if "data" in fields else None
+
+
+def _take(stream, n):
+    events = []
+    for chunk in stream:
+        event, data = _parse(chunk)
+        if event is not None:
+            events.append((event, data))
+        if len(events) == n:
+            return events
+
+
+def test_snapshot_then_deltas():
+    broker = LiveCallBroker()
+    broker.publish(CALL_STARTED, "a", {"callerNumber": "+91"})
+    stream = broker.stream()
+
+    ((event, data),) = _take(stream, 1)
+    assert event == "snapshot" and [c["id"] for c in data["calls"]] == ["a"]
+
+    broker.publish(CALL_UPDATED, "a", {"messages": [{"role": "user", "text": "hi"}]})
+    broker.publish(
+        CALL_UPDATED,
+        "a",
+        {"messages": [{"role": "assistant", "text": "hello"}], "agentState": "speaking"},
+    )
+    broker.publish(CALL_ENDED, "a")
+    assert [e for e, _ in _take(stream, 3)] == [CALL_UPDATED, CALL_UPDATED, CALL_ENDED]
+    assert broker.calls() == []
+    stream.close()
+    assert broker.subscriber_count == 0
+
+
+def test_updates_are_merged_into_the_call_state():
+    broker = LiveCallBroker()
+    broker.publish(CALL_UPDATED, "a", {"messages": [{"text": "1"}]})  # unknown call is created
+    broker.publish(CALL_UPDATED, "a", {"messages": [{"text": "2"}], "status": "on_hold"})
+    call = broker.get("a")
+    assert [m["text"] for m in call["messages"]] == ["1", "2"]
+    assert call["status"] == "on_hold"
+    with pytest.raises(ValueError):
+        broker.publish("call_exploded", "a")
+
+
+def test_resume_from_last_event_id():
+    broker = LiveCallBroker(history=4)
+    first = broker.publish(CALL_STARTED, "a")
+    broker.publish(CALL_UPDATED, "a", {"agentState": "thinking"})
+
+    # only the missed event is replayed
+    ((event, data),) = _take(broker.stream(last_event_id=str(first)), 1)
+    assert (event, data["agentState"]) == (CALL_UPDATED, "thinking")
+
+    # too far behind the log: a fresh snapshot instead
+    for _ in range(10):
+        broker.publish(CALL_UPDATED, "a", {"agentState": "listening"})
+    ((event, data),) = _take(broker.stream(last_event_id=str(first)), 1)
+    assert event == "snapshot" and data["calls"][0]["agentState"] == "listening"
+
+
+def test_fan_out_to_many_subscribers():
+    broker = LiveCallBroker(heartbeat=0.05)
+    clients, events = 150, 20
+    received = [None] * clients
+    ready = threading.Barrier(clients + 1)
+
+    def client(i):
+        stream = broker.stream()
+        next(stream)  # retry hint
+        next(stream)  # snapshot
+        ready.wait()
+        received[i] = [data["n"] for _, data in _take(stream, events)]
+        stream.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for t in threads:
+        t.start()
+    ready.wait()
+    for n in range(events):
+        broker.publish(CALL_UPDATED, "a", {"n": n})
+    for t in threads:
+        t.join(timeout=10)
+
+    assert all(r == list(range(events)) for r in received)
+
+
+async def test_astream_wakes_every_subscriber():
+    broker = LiveCallBroker()
+
+    async def take(n):
+        events = []
+        async for chunk in broker.astream():
+            if chunk.startswith("id:"):
+                events.append(chunk)
+            if len(events) == n:
+                return events
+
+    readers = [asyncio.create_task(take(2)) for _ in range(50)]
+    await asyncio.sleep(0.05)
+    broker.publish(CALL_STARTED, "a", {"callerNumber": "+91"})
+    results = await asyncio.wait_for(asyncio.gather(*readers), 2)
+    assert all("call_started" in events[1] for events in results)
+    broker.close()
+
+
+async def test_publisher_batches_and_coalesces():
+    batches = []
+
+    async def ingest(request):
+        batches.append((await request.json())["events"])
+        return web.json_response({"published": len(batches[-1])})
+
+    app = web.Application()
+    app.router.add_post("/api/calls/live/events", ingest)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    publisher = LiveCallPublisher(
+        f"http://127.0.0.1:{port}/api/calls/live/events", flush_interval=0.05
+    )
+    publisher.start()
+    publisher.publish(CALL_STARTED, "a", callerNumber="+91")
+    await asyncio.sleep(0.2)
+    for i in range(50):  # interim transcripts
+        publisher.publish(CALL_UPDATED, "a", liveTranscript=f"word {i}", transcriptFinal=False)
+    publisher.publish(CALL_UPDATED, "a", messages=[{"role": "user", "text": "hi"}])
+    await publisher.aclose()  # the call is still open, so it's ended on shutdown
+    await runner.cleanup()
+
+    events = [event for batch in batches for event in batch]
+    assert [e["type"] for e in events] == [CALL_STARTED, CALL_UPDATED, CALL_ENDED]
+    assert events[1]["data"]["liveTranscript"] == "word 49"
+    assert events[1]["data"]["messages"] == [{"role": "user", "text": "hi"}]
+    assert publisher.sent_events == 3 and publisher.dropped_events == 0
@@ -0,0 +1,150 @@
+import asyncio
+import importlib
+import sys
+from datetime import timedelta
+
+import jwt
+import pytest
+from starlette.testclient import TestClient
+
+from livekit import api
+from token_service import RoomPool, TokenCache, TokenService
+
+API_KEY = "devkey"
+API_SECRET = "secret" * 6
+
+
+def test_mint_matches_access_token():
+    service = TokenService("ws://localhost:7880", API_KEY, API_SECRET, ttl=timedelta(minutes=5))
+    token = service.mint("bob", "room-1", name="Bob", can_publish=False)
+
+    expected = jwt.decode(
+        api.AccessToken(API_KEY, API_SECRET)
+        .with_identity("bob")
+        .with_name("Bob")
+        .with_ttl(timedelta(minutes=5))
+        .with_grants(api.VideoGrants(room_join=True, room="room-1", can_publish=False))
+        .to_jwt(),
+        API_SECRET,
+        algorithms=["HS256"],
+        options={"verify_aud": False},
+    )
+    claims = jwt.decode(token, API_SECRET, algorithms=["HS256"], options={"verify_aud": False})
+    assert jwt.get_unverified_header(token) == {"alg": "HS256", "typ": "JWT"}
+    assert claims == expected
+
+    verified = api.TokenVerifier(API_KEY, API_SECRET).verify(token)
+    assert verified.identity == "bob"
+    assert verified.video.room == "room-1" and verified.video.can_publish is False
+
+
+async def test_start_shares_one_client():
+    service = TokenService("ws://localhost:7880", API_KEY, API_SECRET)
+    assert service.configured and not service.connected
+    await service.start()
+    client = service.api
+    await service.start()
+    assert service.api is client
+    await service.aclose()
+    assert not service.connected
+
+    assert not TokenService(None, None, None).configured
+
+
+def test_cache_reuses_fresh_tokens():
+    service = TokenService("ws://localhost:7880", API_KEY, API_SECRET)
+    token = service.mint("bob", "room-1")
+    assert service.mint("bob", "room-1") == token
+    assert service.mint("bob", "room-2") != token
+    assert service.mint("bob", "room-1", can_publish=False) != token
+    assert service.cache.hits == 1
+
+    assert TokenService("ws://localhost:7880", API_KEY, API_SECRET, cache=False).cache is None
+
+
+def test_cache_never_returns_near_expiry_tokens():
+    cache = TokenCache(window=timedelta(minutes=1), min_validity=timedelta(minutes=10))
+    cache.put(("a",), "old", now=1000, exp=1000 + 3600)
+    assert cache.get(("a",), now=1030) == ("old", 4600)
+    assert cache.get(("a",), now=1061) is None  # past the reuse window
+    assert len(cache) == 0
+
+    cache.put(("b",), "short", now=1000, exp=1000 + 900)
+    assert cache.get(("b",), now=1001) == ("short", 1900)
+    cache._entries[("b",)] = ("short", 1000, 1000 + 300)
+    assert cache.get(("b",), now=1001) is None  # expires in under min_validity
+
+    cache.put(("c",), "never", now=1000, exp=1000 + 60)
+    assert len(cache) == 0
+
+
+async def test_room_pool_prepares_rooms_ahead():
+    service = TokenService("ws://localhost:7880", API_KEY, API_SECRET)
+    pool = RoomPool(service, size=3, prefix="call-", create_rooms=False)
+    pool.start()
+    for _ in range(100):
+        if len(pool) == 3:
+            break
+        await asyncio.sleep(0.01)
+    assert len(pool) == 3
+
+    room = await pool.acquire()
+    assert pool.hits == 1 and room.name.startswith("call-")
+    verified = api.TokenVerifier(API_KEY, API_SECRET).verify(room.token)
+    assert verified.identity == room.identity and verified.video.room == room.name
+
+    for _ in range(100):  # the taken room is replaced
+        if len(pool) == 3:
+            break
+        await asyncio.sleep(0.01)
+    assert len(pool) == 3
+
+    pool._ready[0].prepared_at -= 3600  # too old to hand out
+    names = {r.name for r in pool._ready[1:]}
+    assert (await pool.acquire()).name in names
+    await pool.aclose()
+
+    off = RoomPool(service, size=0, create_rooms=False)
+    off.start()
+    assert len(off) == 0 and (await off.acquire()).name.startswith("agent-demo-")
+    assert off.misses == 1
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("LIVEKIT_URL", "ws://localhost:7880")
+    monkeypatch.setenv("LIVEKIT_API_KEY", API_KEY)
+    monkeypatch.setenv("LIVEKIT_API_SECRET", API_SECRET)
+    monkeypatch.setenv("ROOM_POOL_SIZE", "2")
+    # the server reads its configuration when it is imported
+    monkeypatch.delitem(sys.modules, "web_server", raising=False)
+    web_server = importlib.import_module("web_server")
+    with TestClient(web_server.app) as client:
+        yield client
+    monkeypatch.delitem(sys.modules, "web_server")
+
+
+@pytest.mark.parametrize("body", [b"{not json", b"\xff\xfe", b'["room-1"]', b'"room-1"'])
+def test_get_token_rejects_bodies_that_are_not_objects(client, body):
+    response = client.post("/get-token", content=body)
+    assert response.status_code == 400
+    assert response.json() == {"error": "request body must be a JSON object"}
+
+
+def test_get_token_new_room_uses_the_pool(client):
+    response = client.post("/get-token", json={"newRoom": True})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["url"] == "ws://localhost:7880" and data["roomName"].startswith("call-")
+    verified = api.TokenVerifier(API_KEY, API_SECRET).verify(data["token"])
+    assert verified.video.room == data["roomName"]
+
+
+@pytest.mark.parametrize("body", [b"", b"{}", b'{"participantName": "bob"}'])
+def test_get_token_defaults_to_default_room(client, body):
+    response = client.post("/get-token", content=body)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["roomName"] == "default-room"
+    verified = api.TokenVerifier(API_KEY, API_SECRET).verify(data["token"])
+    assert verified.video.room == "default-room"
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+pytest.importorskip("transformers")
+pytest.importorskip("tokenizers")
+
+from tokenizers import AddedToken, Tokenizer, decoders, models, pre_tokenizers, trainers  # noqa: E402
+from transformers import AutoTokenizer, PreTrainedTokenizerFast  # noqa: E402
+
+from livekit.plugins.turn_detector import base, english, multilingual, variants  # noqa: E402
+
+CHAT_TEMPLATE = (
+    "{% for message in messages %}"
+    "<|im_start|>{{ message['role'] }}\n{{ message['content'] }}<|im_end|>\n"
+    "{% endfor %}"
+)
+
+
+def _conversations() -> list[list[dict]]:
+    conversations = variants.load_validation_set()
+    # the transcript of the user growing while they speak, and a history longer than
+    # MAX_HISTORY_TOKENS
+    words = "so i was wondering if you could maybe book me a table for".split()
+    conversations += [
+        [{"role": "assistant", "content": "Hi! How can I help?"}]
+        + [{"role": "user", "content": " ".join(words[:n])}]
+        for n in range(1, len(words) + 1)
+    ]
+    conversations.append(
+        [
+            {"role": role, "content": f"turn {i}: " + " ".join(words)}
+            for i, role in enumerate(["user", "assistant"] * 6)
+        ]
+    )
+    # punctuation only content is normalized away by the multilingual model
+    conversations.append(
+        [
+            {"role": "user", "content": "I'd like to book"},
+            {"role": "user", "content": "..."},
+            {"role": "assistant", "content": "Sure, for when?"},
+            {"role": "user", "content": "Tomorrow   at 8"},
+        ]
+    )
+    return conversations
+
+
+def _tokenizer(lstrip: bool, rstrip: bool) -> PreTrainedTokenizerFast:
+    """a small byte-level BPE tokenizer with the special tokens of the chat template"""
+    tokenizer = Tokenizer(models.BPE())
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    special_tokens = [
+        AddedToken(token, lstrip=lstrip, rstrip=rstrip, special=True, normalized=False)
+        for token in ("<|im_start|>", "<|im_end|>")
+    ]
+    trainer = trainers.BpeTrainer(
+        vocab_size=400,
+        special_tokens=special_tokens,
+        initial_alphabet=pre_tokenizers.ByteLevel.alphabet(),
+        show_progress=False,
+    )
+    corpus = [msg["content"] for chat_ctx in _conversations() for msg in chat_ctx]
+    tokenizer.train_from_iterator(corpus, trainer)
+    return PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer, truncation_side="left", chat_template=CHAT_TEMPLATE
+    )
+
+
+class _Session:
+    """counts the inference runs, the EOU probability of an input is its last token id"""
+
+    def __init__(self) -> None:
+        self.runs = 0
+
+    def run(self, _: None, inputs: dict[str, np.ndarray]) -> list[np.ndarray]:
+        self.runs += 1
+        return [(inputs["input_ids"] / 1000).astype(np.float32)[..., None]]
+
+
+def _runner(
+    monkeypatch: pytest.MonkeyPatch,
+    runner_cls: type[base._EUORunnerBase] = english._EUORunnerEn,
+    tokenizer: PreTrainedTokenizerFast | None = None,
+) -> tuple[base._EUORunnerBase, _Session]:
+    tokenizer = tokenizer or _tokenizer(lstrip=False, rstrip=False)
+    session = _Session()
+    monkeypatch.setattr(base, "_download_from_hf_hub", lambda *args, **kwargs: "model.onnx")
+    monkeypatch.setattr(AutoTokenizer, "from_pretrained", lambda *args, **kwargs: tokenizer)
+    monkeypatch.setattr(
+        base._EUORunnerBase, "_load_session", lambda self, path: (session, "basic-t1")
+    )
+    runner = runner_cls()
+    runner.initialize()
+    return runner, session
+
+
+def _chat(i: int) -> bytes:
+    return base._encode_chat_ctx(
+        [
+            {"role": "user", "content": f"hello number {i}"},
+            {"role": "assistant", "content": "hi, how can i help"},
+            {"role": "user", "content": f"i need room {i}"},
+        ]
+    )
+
+
+def _chat_text(runner: base._EUORunnerBase, i: int) -> str:
+    return runner._format_chat_ctx(runner._parse_chat_ctx(_chat(i)))
+
+
+@pytest.mark.parametrize(
+    "lstrip, rstrip", [(False, False), (True, False), (False, True), (True, True)]
+)
+@pytest.mark.parametrize("runner_cls", [english._EUORunnerEn, multilingual._EUORunnerMultilingual])
+def test_tokenize_matches_the_truncating_tokenizer(monkeypatch, runner_cls, lstrip, rstrip):
+    tokenizer = _tokenizer(lstrip, rstrip)
+    runner, _ = _runner(monkeypatch, runner_cls, tokenizer)
+
+    truncated = 0
+    for chat_ctx in _conversations():
+        text = runner._format_chat_ctx(chat_ctx)
+        expected = tokenizer(
+            text, add_special_tokens=False, max_length=base.MAX_HISTORY_TOKENS, truncation=True
+        )["input_ids"]
+        # twice, the second time the history comes from the token cache
+        assert runner._tokenize(text) == expected
+        assert runner._tokenize(text) == expected
+        truncated += len(expected) == base.MAX_HISTORY_TOKENS
+
+    assert truncated > 0
+
+
+def test_repeated_input_hits_the_result_cache(monkeypatch):
+    runner, session = _runner(monkeypatch)
+
+    p, _, variant, text = base._decode_result(runner.run(_chat(0)))
+    assert session.runs == 1 and variant == "basic-t1"
+    assert p == pytest.approx(runner._tokenize(text)[-1] / 1000)
+
+    # the EOU detection runs again on the same transcript
+    assert base._decode_result(runner.run(_chat(0)))[0] == p
+    assert session.runs == 1
+
+    # a batch runs each new input once
+    results = runner.run_batch([_chat(1), _chat(0), _chat(1)])
+    assert session.runs == 2
+    assert [base._decode_result(r)[0] for r in results] == [
+        base._decode_result(results[0])[0],
+        p,
+        base._decode_result(results[0])[0],
+    ]
+
+
+def test_caches_are_bounded_lru(monkeypatch):
+    monkeypatch.setattr(base, "TOKEN_CACHE_SIZE", 8)
+    monkeypatch.setattr(base, "RESULT_CACHE_SIZE", 4)
+    runner, session = _runner(monkeypatch)
+
+    for i in range(20):
+        runner.run(_chat(i))
+        assert len(runner._token_cache) <= 8
+        assert len(runner._result_cache) <= 4
+    assert session.runs == 20
+
+    # the oldest entries were evicted, using an entry makes it the most recent
+    runner.run(_chat(16))
+    assert session.runs == 20
+    runner.run(_chat(0))
+    assert session.runs == 21
+    assert list(runner._result_cache)[-1] == tuple(runner._tokenize(_chat_text(runner, 0)))
+    runner.run(_chat(17))  # evicted by _chat(0), 16 was used since
+    runner.run(_chat(16))
+    assert session.runs == 22
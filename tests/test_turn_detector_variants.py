@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import json
+import logging
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+onnx = pytest.importorskip("onnx")
+
+from livekit.plugins.turn_detector import variants  # noqa: E402
+
+VOCAB_SIZE, HIDDEN_SIZE = 1000, 64
+
+
+class _CPUMonitor:
+    def __init__(self, cpu_count: float) -> None:
+        self._cpu_count = cpu_count
+
+    def cpu_count(self) -> float:
+        return self._cpu_count
+
+
+@pytest.fixture
+def model_path(tmp_path, monkeypatch) -> str:
+    """a tiny model with the inputs and outputs of the turn detector, on a 4 CPUs host"""
+    from onnx import TensorProto, helper, numpy_helper
+
+    monkeypatch.delenv(variants.VARIANT_ENV, raising=False)
+    monkeypatch.setattr(variants.hw, "get_cpu_monitor", lambda: _CPUMonitor(4))
+
+    rng = np.random.default_rng(0)
+    weights = {
+        "embeddings": rng.standard_normal((VOCAB_SIZE, HIDDEN_SIZE)),
+        "gamma": np.ones(HIDDEN_SIZE),
+        "beta": np.zeros(HIDDEN_SIZE),
+        "w1": rng.standard_normal((HIDDEN_SIZE, HIDDEN_SIZE)) / 8,
+        "b1": rng.standard_normal(HIDDEN_SIZE),
+        "w2": rng.standard_normal((HIDDEN_SIZE, 1)) / 8,
+    }
+    nodes = [
+        helper.make_node("Gather", ["embeddings", "input_ids"], ["embedded"]),
+        helper.make_node(
+            "LayerNormalization", ["embedded", "gamma", "beta"], ["normalized"], axis=-1
+        ),
+        helper.make_node("MatMul", ["normalized", "w1"], ["hidden"]),
+        helper.make_node("Add", ["hidden", "b1"], ["biased"]),
+        helper.make_node("Relu", ["biased"], ["activated"]),
+        helper.make_node("MatMul", ["activated", "w2"], ["logits"]),
+        helper.make_node("Sigmoid", ["logits"], ["probs"]),
+    ]
+    graph = helper.make_graph(
+        nodes,
+        "eou",
+        [helper.make_tensor_value_info("input_ids", TensorProto.INT64, ["batch", "tokens"])],
+        [helper.make_tensor_value_info("probs", TensorProto.FLOAT, ["batch", "tokens", 1])],
+        [numpy_helper.from_array(w.astype(np.float32), name) for name, w in weights.items()],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 17)])
+    model.ir_version = 8
+
+    path = str(tmp_path / "onnx" / "model_q8.onnx")
+    os.makedirs(os.path.dirname(path))
+    onnx.save(model, path)
+    variants.build_optimized_models(path)
+    return path
+
+
+@pytest.fixture
+def inputs() -> list[np.ndarray]:
+    rng = np.random.default_rng(1)
+    return [rng.integers(0, VOCAB_SIZE, size=n, dtype=np.int64) for n in (5, 40, 128, 128, 90)]
+
+
+def _calibration(model_path: str) -> dict[str, str]:
+    with open(os.path.join(os.path.dirname(model_path), "optimized", "calibration.json")) as f:
+        return json.load(f)  # type: ignore[no-any-return]
+
+
+def test_model_variant_names():
+    assert variants.ModelVariant.parse("extended-t2") == variants.ModelVariant("extended", 2)
+    assert variants.ModelVariant("original", 4).name == "original-t4"
+    for name in ("extended", "extended-t0", "all-t2", "basic-tx", ""):
+        with pytest.raises(ValueError):
+            variants.ModelVariant.parse(name)
+
+
+def test_sessions_of_the_variants(model_path, inputs):
+    def _probs(optimization: str) -> np.ndarray:
+        session = variants.new_session(model_path, variants.ModelVariant(optimization, 1))
+        return np.array([variants.predict(session, ids[None]).item() for ids in inputs])
+
+    reference = _probs(variants.ORIGINAL)
+    for optimization in variants.OPTIMIZATION_LEVELS:
+        assert _probs(optimization) == pytest.approx(reference, abs=variants.ACCURACY_BUDGET)
+
+
+def test_forced_variant(model_path, inputs, monkeypatch):
+    def _calibrate(*args):
+        raise AssertionError("a forced variant isn't calibrated")
+
+    monkeypatch.setattr(variants, "calibrate", _calibrate)
+    monkeypatch.setenv(variants.VARIANT_ENV, "extended-t3")
+    assert variants.select_variant(model_path, inputs) == variants.ModelVariant("extended", 3)
+
+    monkeypatch.setenv(variants.VARIANT_ENV, "fastest")
+    with pytest.raises(ValueError):
+        variants.select_variant(model_path, inputs)
+
+
+def test_calibration_is_saved(model_path, inputs, monkeypatch):
+    variant = variants.select_variant(model_path, inputs)
+    assert variant.threads in (1, 2, 4)
+    assert _calibration(model_path) == {variants._host_key(): variant.name}
+
+    # the next starts use the saved variant
+    def _calibrate(*args):
+        raise AssertionError("the calibration runs once per host")
+
+    with monkeypatch.context() as m:
+        m.setattr(variants, "calibrate", _calibrate)
+        assert variants.select_variant(model_path, inputs) == variant
+
+    # another host (or onnxruntime version) calibrates again, next to the first one
+    monkeypatch.setattr(variants.hw, "get_cpu_monitor", lambda: _CPUMonitor(1))
+    other = variants.select_variant(model_path, inputs)
+    assert other.threads == 1
+    assert len(_calibration(model_path)) == 2
+
+
+@pytest.mark.parametrize("saved", ["{not json", '["extended-t2"]', '{"%s": "extended-t0"}'])
+def test_invalid_calibration_falls_back_to_calibrating(model_path, inputs, saved):
+    with open(os.path.join(os.path.dirname(model_path), "optimized", "calibration.json"), "w") as f:
+        f.write(saved % variants._host_key() if "%s" in saved else saved)
+
+    variant = variants.select_variant(model_path, inputs)
+    assert _calibration(model_path) == {variants._host_key(): variant.name}
+
+
+def test_accuracy_budget(model_path, inputs, monkeypatch, caplog):
+    new_session = variants.new_session
+
+    class _ShiftedSession:
+        # the EOU probabilities of the extended graph are off by more than the budget
+        def __init__(self, session):
+            self._session = session
+
+        def run(self, output_names, feeds):
+            return [self._session.run(output_names, feeds)[0] + 2 * variants.ACCURACY_BUDGET]
+
+    def _new_session(path, variant):
+        session = new_session(path, variant)
+        return _ShiftedSession(session) if variant.optimization == "extended" else session
+
+    monkeypatch.setattr(variants, "new_session", _new_session)
+    with caplog.at_level(logging.DEBUG, logger="livekit.plugins.turn_detector"):
+        variant = variants.calibrate(model_path, inputs)
+
+    assert variant.optimization != "extended"
+    rejected = [r.variant for r in caplog.records if "over the accuracy budget" in r.message]
+    assert rejected == ["extended-t2"]
+    (selected,) = [r for r in caplog.records if r.message == "turn detector model variant selected"]
+    assert "original-t2" in selected.latencies and "extended-t2" not in selected.latencies
+
+
+def test_time_budget(model_path, inputs, monkeypatch):
+    benchmarked = []
+    benchmark = variants._benchmark
+
+    def _benchmark(path, variant, inputs):
+        benchmarked.append(variant.name)
+        time.sleep(0.05)
+        return benchmark(path, variant, inputs)
+
+    monkeypatch.setattr(variants, "_benchmark", _benchmark)
+    monkeypatch.setattr(variants, "CALIBRATION_TIME_BUDGET", 0.0)
+    # the original model is always benchmarked, it is the accuracy reference
+    assert variants.calibrate(model_path, inputs) == variants.ModelVariant("original", 2)
+    assert benchmarked == ["original-t2"]
+
+    benchmarked.clear()
+    monkeypatch.setattr(variants, "CALIBRATION_TIME_BUDGET", 60.0)
+    variants.calibrate(model_path, inputs)
+    # the 3 graphs with 2 threads (the default on 4 CPUs), the fastest with 1 and 4 threads
+    assert benchmarked[:3] == ["original-t2", "basic-t2", "extended-t2"]
+    assert [name.rpartition("-t")[2] for name in benchmarked[3:]] == ["1", "4"]
+
+
+def _select_variant(model_path: str, inputs: list[np.ndarray], results) -> None:
+    results.put(variants.select_variant(model_path, inputs).name)
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(), reason="requires fork start method"
+)
+def test_processes_calibrate_once(model_path, inputs, monkeypatch, tmp_path):
+    calibrations = tmp_path / "calibrations"
+
+    def _calibrate(path, inputs):
+        with open(calibrations, "a") as f:
+            f.write(f"{os.getpid()}\n")
+        time.sleep(0.5)
+        return variants.ModelVariant("basic", 1)
+
+    # the forked processes inherit the patched module
+    monkeypatch.setattr(variants, "calibrate", _calibrate)
+    mp_ctx = multiprocessing.get_context("fork")
+    results = mp_ctx.Queue()
+    procs = [
+        mp_ctx.Process(target=_select_variant, args=(model_path, inputs, results)) for _ in range(4)
+    ]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join(10)
+        assert proc.exitcode == 0
+
+    assert sorted(results.get(timeout=1) for _ in procs) == ["basic-t1"] * 4
+    assert len(calibrations.read_text().splitlines()) == 1
@@ -1,5 +1,11 @@
+import asyncio
+import os
+import tracemalloc
+
+import numpy as np
 import pytest
 
+from livekit import rtc
 from livekit.agents import vad
 from livekit.plugins import silero
 
@@ -83,3 +89,94 @@ async def test_file_vad(sample_rate):
 
     assert start_of_speech_i > 0, "no start of speech detected"
     assert start_of_speech_i == end_of_speech_i, "start and end of speech mismatch"
+
+
+async def test_batched_vad():
+    """the streams of a batched VAD emit the same events as when each runs its own inference"""
+    audio = await utils.read_audio_file(
+        os.path.join(os.path.dirname(__file__), "change-sophie.wav")
+    )
+    frames = [
+        rtc.AudioFrame(
+            data=audio.data[i : i + audio.sample_rate // 100].tobytes(),
+            sample_rate=audio.sample_rate,
+            num_channels=1,
+            samples_per_channel=len(audio.data[i : i + audio.sample_rate // 100]),
+        )
+        for i in range(0, len(audio.data), audio.sample_rate // 100)
+    ]
+
+    batched_vad = silero.VAD.load(
+        min_speech_duration=0.5, min_silence_duration=0.75, max_batch_delay=0.005
+    )
+
+    async def _events(vad_: silero.VAD, offset: int) -> list[tuple[vad.VADEventType, float]]:
+        stream = vad_.stream()
+        for frame in frames[offset:]:
+            stream.push_frame(frame)
+            await asyncio.sleep(0)
+        stream.end_input()
+        return [(ev.type, ev.probability) async for ev in stream]
+
+    # the streams are out of phase, as with the audio of several rooms
+    expected = [await _events(VAD, offset) for offset in range(3)]
+    batched = await asyncio.gather(*(_events(batched_vad, offset) for offset in range(3)))
+    for events, expected_events in zip(batched, expected):
+        assert [t for t, _ in events] == [t for t, _ in expected_events]
+        assert [p for _, p in events] == pytest.approx([p for _, p in expected_events], abs=1e-4)
+
+
+class _SpeechSession:
+    """stands in for the silero model, every window is speech"""
+
+    def __init__(self) -> None:
+        self._prob = np.full((1, 1), 0.9, dtype=np.float32)
+
+    def run(self, _: None, inputs: dict[str, np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+        return self._prob, inputs["state"]
+
+
+async def test_speech_buffer_no_allocations():
+    """during a long speech, buffering its audio doesn't allocate: past the warmup, the memory
+    allocated by a stream is the events it emits, never a copy of its speech buffer"""
+    from livekit.plugins.silero.vad import _VADOptions
+
+    opts = _VADOptions(
+        min_speech_duration=0.05,
+        min_silence_duration=0.55,
+        prefix_padding_duration=0.5,
+        max_buffered_speech=10.0,
+        activation_threshold=0.5,
+        sample_rate=16000,
+    )
+    stream = silero.VAD(session=_SpeechSession(), opts=opts).stream()
+    window = 512  # a frame is one inference window
+    frame = rtc.AudioFrame(
+        data=np.arange(window, dtype=np.int16).tobytes(),
+        sample_rate=16000,
+        num_channels=1,
+        samples_per_channel=window,
+    )
+
+    async def _push_windows(n: int) -> None:
+        for _ in range(n):
+            stream.push_frame(frame)
+            while (await stream.__anext__()).type != vad.VADEventType.INFERENCE_DONE:
+                pass
+
+    await _push_windows(400)  # 12.8s, the speech buffer (10.5s) has wrapped around
+    assert stream._speech_buffer is not None and stream._speech_buffer_max_reached
+
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        await _push_windows(1000)  # 32s of speech
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        await stream.aclose()
+
+    speech_buffer_size = int((10.0 + 0.5) * 16000) * 2
+    assert current - start < 16 * 1024
+    assert peak - start < speech_buffer_size // 4
@@ -0,0 +1,356 @@
+# cf4/token_service.py
+#
+# LiveKit access for the ASGI servers (enhanced_server.py, web_server.py): one LiveKitAPI
+# client with a pooled aiohttp session for the lifetime of the app, participant tokens
+# signed with a cached HMAC key and reused while fresh, and a pool of rooms prepared ahead
+# of "start a call".
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Optional
+
+import aiohttp
+
+from livekit import api
+from livekit.api.access_token import Claims
+
+DEFAULT_TTL = timedelta(hours=6)
+
+logger = logging.getLogger("token-service")
+
+
+def _b64(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+class JWTSigner:
+    """
+    HS256 signer for LiveKit access tokens.
+
+    The keyed HMAC state and the encoded JWT header are computed once; signing a token is
+    then a copy of the HMAC state plus one update. The output is the same JWT that
+    `api.AccessToken.to_jwt()` produces.
+    """
+
+    def __init__(self, api_key: str, api_secret: str) -> None:
+        self.api_key = api_key
+        self._hmac = hmac.new(api_secret.encode(), digestmod=hashlib.sha256)
+        self._header = _b64(
+            json.dumps({"alg": "HS256", "typ": "JWT"}, separators=(",", ":")).encode()
+        )
+
+    def sign(self, claims: dict) -> str:
+        payload = _b64(json.dumps(claims, separators=(",", ":")).encode())
+        signing_input = self._header + b"." + payload
+        mac = self._hmac.copy()
+        mac.update(signing_input)
+        return (signing_input + b"." + _b64(mac.digest())).decode()
+
+
+class TokenCache:
+    """
+    Recently minted tokens by (identity, room, name, ttl, grants).
+
+    A token is handed out again for at most `window` after it was signed, and never once
+    it has less than `min_validity` left before it expires, so a client always gets a token
+    it can still connect and reconnect with.
+    """
+
+    def __init__(
+        self,
+        *,
+        window: timedelta = timedelta(minutes=1),
+        min_validity: timedelta = timedelta(minutes=10),
+        max_entries: int = 4096,
+    ) -> None:
+        self._window = window.total_seconds()
+        self._min_validity = min_validity.total_seconds()
+        self._max_entries = max_entries
+        self._entries: OrderedDict[tuple, tuple[str, float, int]] = (
+            OrderedDict()
+        )  # token, signed at, exp
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: tuple, now: float) -> Optional[tuple[str, int]]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            token, signed_at, exp = entry
+            if now - signed_at < self._window and exp - now >= self._min_validity:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return token, exp
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: tuple, token: str, now: float, exp: int) -> None:
+        if exp - now < self._min_validity:
+            return  # would never be handed out
+        self._entries[key] = (token, now, exp)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class TokenService:
+    """
+    Everything the servers need from LiveKit.
+
+    `start` must run on the server's event loop (from the ASGI lifespan): the LiveKitAPI
+    client and its connection pool belong to that loop and are reused by every request
+    until `aclose`. Tokens are cached (see TokenCache), so a page refresh or a reconnect of
+    the same participant doesn't sign a new one; pass `cache=False` to sign every time.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str],
+        api_key: Optional[str],
+        api_secret: Optional[str],
+        *,
+        ttl: timedelta = DEFAULT_TTL,
+        max_connections: int = 32,
+        cache: bool = True,
+    ) -> None:
+        self.url = url
+        self._api_key = api_key
+        self._api_secret = api_secret
+        self._ttl = ttl
+        self._max_connections = max_connections
+        self.cache = TokenCache() if cache else None
+        self._signer = JWTSigner(api_key, api_secret) if api_key and api_secret else None
+        self._http: Optional[aiohttp.ClientSession] = None
+        self._api: Optional[api.LiveKitAPI] = None
+
+    @classmethod
+    def from_env(cls, **kwargs) -> "TokenService":
+        return cls(
+            os.environ.get("LIVEKIT_URL"),
+            os.environ.get("LIVEKIT_API_KEY"),
+            os.environ.get("LIVEKIT_API_SECRET"),
+            **kwargs,
+        )
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.url and self._signer)
+
+    @property
+    def connected(self) -> bool:
+        return self._api is not None
+
+    @property
+    def api(self) -> api.LiveKitAPI:
+        if self._api is None:
+            raise RuntimeError(
+                "TokenService isn't started, or LiveKit credentials are not configured"
+            )
+        return self._api
+
+    async def start(self) -> None:
+        if self._api is not None or not self.configured:
+            return
+
+        http_url = self.url.replace("wss://", "https://").replace("ws://", "http://")
+        self._http = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=10),
+            connector=aiohttp.TCPConnector(limit=self._max_connections, keepalive_timeout=60),
+        )
+        self._api = api.LiveKitAPI(http_url, self._api_key, self._api_secret, session=self._http)
+
+    async def aclose(self) -> None:
+        if self._api is not None:
+            await self._api.aclose()
+            self._api = None
+        if self._http is not None:
+            await self._http.close()
+            self._http = None
+
+    def mint(
+        self,
+        identity: str,
+        room: str,
+        *,
+        name: Optional[str] = None,
+        ttl: Optional[timedelta] = None,
+        **grants,
+    ) -> str:
+        """A token to join `room`. Extra keyword arguments are VideoGrants fields."""
+        return self.mint_with_expiry(identity, room, name=name, ttl=ttl, **grants)[0]
+
+    def mint_with_expiry(
+        self,
+        identity: str,
+        room: str,
+        *,
+        name: Optional[str] = None,
+        ttl: Optional[timedelta] = None,
+        **grants,
+    ) -> tuple[str, int]:
+        """`mint`, also returning the token's expiry (unix time)."""
+        if self._signer is None:
+            raise RuntimeError("LiveKit credentials are not configured")
+
+        ttl = ttl or self._ttl
+        now = time.time()
+        key = (identity, room, name, ttl, tuple(sorted(grants.items())))
+        if self.cache is not None:
+            cached = self.cache.get(key, now)
+            if cached is not None:
+                return cached
+
+        claims = Claims(
+            name=name or identity, video=api.VideoGrants(room_join=True, room=room, **grants)
+        ).asdict()
+        exp = int(now) + int(ttl.total_seconds())
+        claims.update(
+            {
+                "sub": identity,
+                "iss": self._signer.api_key,
+                "nbf": int(now),
+                "exp": exp,
+            }
+        )
+        token = self._signer.sign(claims)
+        if self.cache is not None:
+            self.cache.put(key, token, now, exp)
+        return token, exp
+
+
+@dataclass
+class PooledRoom:
+    name: str
+    identity: str
+    token: str
+    expires_at: int
+    prepared_at: float  # time.monotonic()
+
+
+class RoomPool:
+    """
+    Rooms prepared ahead of "start a call": a generated room name, the room itself when
+    `create_rooms` is set, and a signed token for an anonymous caller in it.
+
+    A background task keeps `size` of them ready; `acquire` takes one, or prepares one on
+    the spot when the pool is empty (or `size` is 0, which turns the pool off). Entries
+    older than `max_age`, or whose token would expire within `min_validity`, are thrown
+    away rather than handed out. Keep `max_age` below `empty_timeout`: LiveKit closes a
+    room nobody joined once that runs out.
+    """
+
+    def __init__(
+        self,
+        tokens: TokenService,
+        *,
+        size: int = 0,
+        prefix: str = "agent-demo-",
+        create_rooms: bool = True,
+        empty_timeout: timedelta = timedelta(minutes=10),
+        max_age: timedelta = timedelta(minutes=5),
+        min_validity: timedelta = timedelta(minutes=10),
+    ) -> None:
+        self._tokens = tokens
+        self._size = size
+        self._prefix = prefix
+        self._create_rooms = create_rooms
+        self._empty_timeout = int(empty_timeout.total_seconds())
+        self._max_age = max_age.total_seconds()
+        self._min_validity = min_validity.total_seconds()
+        self._ready: list[PooledRoom] = []
+        self._refill: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._ready)
+
+    def start(self) -> None:
+        if self._task is None and self._size > 0 and self._tokens.configured:
+            self._closed = False
+            self._refill = asyncio.Event()
+            self._task = asyncio.create_task(self._run(), name="RoomPool._run")
+
+    async def aclose(self) -> None:
+        # the flag as well as cancel(): wait_for may swallow a cancel that races the event
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._ready.clear()
+
+    def take(self) -> Optional[PooledRoom]:
+        """A ready room, or None if there is none."""
+        self._evict()
+        if self._refill is not None:
+            self._refill.set()
+        if not self._ready:
+            return None
+        return self._ready.pop(0)
+
+    async def acquire(self) -> PooledRoom:
+        room = self.take()
+        if room is not None:
+            self.hits += 1
+            return room
+        self.misses += 1
+        return await self._prepare()
+
+    def _fresh(self, room: PooledRoom) -> bool:
+        return (
+            time.monotonic() - room.prepared_at < self._max_age
+            and room.expires_at - time.time() >= self._min_validity
+        )
+
+    def _evict(self) -> None:
+        self._ready = [room for room in self._ready if self._fresh(room)]
+
+    async def _prepare(self) -> PooledRoom:
+        name = f"{self._prefix}{uuid.uuid4().hex[:8]}"
+        if self._create_rooms:
+            await self._tokens.api.room.create_room(
+                api.CreateRoomRequest(name=name, empty_timeout=self._empty_timeout)
+            )
+        identity = f"user-{os.urandom(4).hex()}"
+        token, expires_at = self._tokens.mint_with_expiry(identity, name)
+        return PooledRoom(name, identity, token, expires_at, time.monotonic())
+
+    async def _run(self) -> None:
+        retry = 1.0
+        while not self._closed:
+            self._evict()
+            while len(self._ready) < self._size:
+                try:
+                    self._ready.append(await self._prepare())
+                    retry = 1.0
+                except Exception as e:
+                    logger.warning("failed to prepare a pooled room", extra={"error": str(e)})
+                    await asyncio.sleep(retry)
+                    retry = min(retry * 2, 60.0)
+            self._refill.clear()
+            try:
+                # wake up when a room is taken, or in time to replace the oldest one
+                await asyncio.wait_for(self._refill.wait(), self._max_age / 2)
+            except asyncio.TimeoutError:
+                pass
@@ -1,44 +1,86 @@
-from flask import Flask, render_template, request, jsonify
-from livekit import api
+import contextlib
+import logging
 import os
+
+import uvicorn
 from dotenv import load_dotenv
-import logging
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.templating import Jinja2Templates
+
+from token_service import RoomPool, TokenService
 
 load_dotenv()
 
-app = Flask(__name__)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("web-server")
 
-LIVEKIT_URL = os.getenv('LIVEKIT_URL', 'ws://localhost:7880')
-LIVEKIT_API_KEY = os.getenv('LIVEKIT_API_KEY')
-LIVEKIT_API_SECRET = os.getenv('LIVEKIT_API_SECRET')
+os.environ.setdefault("LIVEKIT_URL", "ws://localhost:7880")
+tokens = TokenService.from_env()
+# "start a call" ({"newRoom": true}) takes a room name and token signed ahead of time;
+# LiveKit creates the room when the caller joins it
+rooms = RoomPool(
+    tokens, size=int(os.getenv("ROOM_POOL_SIZE", "4")), prefix="call-", create_rooms=False
+)
+templates = Jinja2Templates(directory="templates")
+
+
+async def index(request: Request):
+    return templates.TemplateResponse(request, "index.html")
+
 
-@app.route('/')
-def index():
-    return render_template('index.html')
+async def get_token(request: Request):
+    try:
+        # an empty body asks for the defaults
+        data = await request.json() if await request.body() else {}
+    except ValueError:  # json.JSONDecodeError, or a body that isn't UTF-8
+        return JSONResponse({"error": "request body must be a JSON object"}, status_code=400)
+    if not isinstance(data, dict):
+        return JSONResponse({"error": "request body must be a JSON object"}, status_code=400)
+    room_name = data.get("roomName")
+    participant_name = data.get("participantName")
 
-@app.route('/get-token', methods=['POST'])
-def get_token():
-    data = request.json
-    room_name = data.get('roomName', 'default-room')
-    participant_name = data.get('participantName', f'user-{os.urandom(4).hex()}')
-    
+    if not room_name and data.get("newRoom"):
+        room = await rooms.acquire()
+        room_name = room.name
+        if not participant_name:
+            logger.info(f"🔑 Using prepared token for {room.identity} in room {room_name}")
+            return JSONResponse({"token": room.token, "url": tokens.url, "roomName": room_name})
+
+    room_name = room_name or "default-room"
+    participant_name = participant_name or f"user-{os.urandom(4).hex()}"
     logger.info(f"🔑 Generating token for {participant_name} in room {room_name}")
-    
-    token = api.AccessToken(LIVEKIT_API_KEY, LIVEKIT_API_SECRET) \
-        .with_identity(participant_name) \
-        .with_name(participant_name) \
-        .with_grants(api.VideoGrants(
-            room_join=True,
-            room=room_name,
-        ))
-    
-    return jsonify({
-        'token': token.to_jwt(),
-        'url': LIVEKIT_URL
-    })
-
-if __name__ == '__main__':
+
+    return JSONResponse(
+        {
+            "token": tokens.mint(participant_name, room_name),
+            "url": tokens.url,
+            "roomName": room_name,
+        }
+    )
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    await tokens.start()
+    rooms.start()
+    try:
+        yield
+    finally:
+        await rooms.aclose()
+        await tokens.aclose()
+
+
+app = Starlette(
+    routes=[
+        Route("/", index),
+        Route("/get-token", get_token, methods=["POST"]),
+    ],
+    lifespan=lifespan,
+)
+
+if __name__ == "__main__":
     logger.info("🌐 Web Server starting on http://localhost:5000")
-    app.run(debug=False, port=5000, host='0.0.0.0', use_reloader=False)
\ No newline at end of file
+    uvicorn.run(app, port=5000, host="0.0.0.0")